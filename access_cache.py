@@ -0,0 +1,130 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Сколько секунд доверяем записи «доступа нет», прочитанной из базы.
+# Выдача доступа в этом процессе обновляет кэш сразу; TTL нужен только
+# на случай записей из других процессов (скрипты, отдельный webhook-сервер)
+NEGATIVE_TTL = 30
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """Разбор TIMESTAMP из SQLite"""
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        logger.warning(f"Некорректная дата в таблице доступа: {value}")
+        return None
+
+class AccessCache:
+    """Индекс активного доступа в памяти: user_id -> записи доступа со сроком"""
+
+    def __init__(self, negative_ttl: float = NEGATIVE_TTL):
+        self.negative_ttl = negative_ttl
+        self._entries: Dict[int, List[Dict[str, Any]]] = {}
+        self._loaded_at: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _active(rows: List[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+        """Записи, срок которых еще не истек"""
+        return [row for row in rows if row["_expires"] is not None and row["_expires"] > now]
+
+    @staticmethod
+    def _public(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Копии записей без служебных полей"""
+        return [{key: value for key, value in row.items() if key != "_expires"} for row in rows]
+
+    def load(self, rows: Iterable[Dict[str, Any]]):
+        """Начальная загрузка активного доступа из базы"""
+        entries: Dict[int, List[Dict[str, Any]]] = {}
+        for row in rows:
+            entries.setdefault(row["user_id"], []).append(
+                dict(row, _expires=parse_timestamp(row["expires_at"]))
+            )
+        loaded_at = time.monotonic()
+        with self._lock:
+            self._entries = entries
+            self._loaded_at = {user_id: loaded_at for user_id in entries}
+        logger.info(f"Кэш доступа загружен: {len(entries)} пользователей")
+
+    def get(self, user_id: int) -> Optional[List[Dict[str, Any]]]:
+        """Активный доступ из кэша или None, если нужно идти в базу"""
+        now = datetime.now()
+        with self._lock:
+            rows = self._entries.get(user_id)
+            if rows is not None:
+                active = self._active(rows, now)
+                fresh_negative = time.monotonic() - self._loaded_at[user_id] < self.negative_ttl
+                if active or fresh_negative:
+                    self.hits += 1
+                    return self._public(active)
+            self.misses += 1
+            return None
+
+    def has_active_access(self, user_id: int) -> Optional[bool]:
+        """Быстрая проверка: True/False из кэша или None при промахе"""
+        rows = self.get(user_id)
+        return None if rows is None else bool(rows)
+
+    def put(self, user_id: int, rows: List[Dict[str, Any]]):
+        """Сохранение результата запроса к базе"""
+        with self._lock:
+            self._entries[user_id] = [dict(row, _expires=parse_timestamp(row["expires_at"])) for row in rows]
+            self._loaded_at[user_id] = time.monotonic()
+
+    def grant(self, row: Dict[str, Any]):
+        """Запись выдачи или продления доступа (write-through)"""
+        user_id = row["user_id"]
+        now = datetime.now()
+        with self._lock:
+            rows = [
+                cached for cached in self._active(self._entries.get(user_id, []), now)
+                if cached["access_type"] != row["access_type"]
+            ]
+            rows.append(dict(row, _expires=parse_timestamp(row["expires_at"])))
+            self._entries[user_id] = rows
+            self._loaded_at[user_id] = time.monotonic()
+
+    def revoke(self, user_id: int, access_type: str):
+        """Удаление отозванного права пользователя"""
+        with self._lock:
+            rows = self._entries.get(user_id)
+            if rows is not None:
+                self._entries[user_id] = [row for row in rows if row["access_type"] != access_type]
+
+    def evict_expired(self) -> int:
+        """Удаление истекших записей; возвращает число затронутых пользователей"""
+        now = datetime.now()
+        evicted = 0
+        with self._lock:
+            for user_id, rows in list(self._entries.items()):
+                active = self._active(rows, now)
+                if len(active) != len(rows):
+                    self._entries[user_id] = active
+                    evicted += 1
+        return evicted
+
+    def invalidate(self, user_id: int):
+        """Сброс записи пользователя"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._loaded_at.pop(user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики попаданий и промахов"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "users": len(self._entries),
+            }
@@ -0,0 +1,123 @@
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Tuple
+from database import Database, get_database, POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+class AsyncDatabase:
+    """Асинхронный доступ к базе: чтения выполняются в выделенных потоках,
+    записи ставятся в очередь DatabaseWriter; event loop бота не блокируется"""
+
+    def __init__(self, db: Database = None, max_workers: int = POOL_SIZE):
+        self.db = db or get_database()
+        # Потоков не больше, чем соединений в пуле, чтобы каждый держал свое
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+
+    async def _run(self, func, *args, **kwargs):
+        """Выполнение синхронного метода Database в пуле потоков"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def shutdown(self):
+        """Остановка потоков базы данных"""
+        self._executor.shutdown(wait=True)
+
+    async def add_user(self, user_id: int, username: str = None, first_name: str = None, last_name: str = None) -> bool:
+        """Добавление нового пользователя"""
+        return await asyncio.wrap_future(self.db.submit_add_user(user_id, username, first_name, last_name))
+
+    async def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Получение информации о пользователе"""
+        return await self._run(self.db.get_user, user_id)
+
+    async def create_payment(self, user_id: int, payment_type: str, amount: float, yookassa_payment_id: str) -> bool:
+        """Создание записи о платеже"""
+        return await asyncio.wrap_future(self.db.submit_create_payment(user_id, payment_type, amount, yookassa_payment_id))
+
+    async def update_payment_status(self, yookassa_payment_id: str, status: str) -> bool:
+        """Обновление статуса платежа"""
+        return await asyncio.wrap_future(self.db.submit_update_payment_status(yookassa_payment_id, status))
+
+    async def update_pending_statuses(self, updates: List[Tuple[str, str]]) -> List[str]:
+        """Пакетное обновление статусов ожидающих платежей"""
+        return await asyncio.wrap_future(self.db.submit_update_pending_statuses(updates))
+
+    async def get_payment(self, yookassa_payment_id: str) -> Optional[Dict[str, Any]]:
+        """Получение информации о платеже"""
+        return await self._run(self.db.get_payment, yookassa_payment_id)
+
+    async def get_payment_history(self, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        """Последние платежи пользователя"""
+        return await self._run(self.db.get_payment_history, user_id, limit)
+
+    async def get_pending_payments(self) -> List[Dict[str, Any]]:
+        """Платежи, ожидающие подтверждения"""
+        return await self._run(self.db.get_pending_payments)
+
+    async def grant_access(self, user_id: int, access_type: str) -> bool:
+        """Предоставление доступа пользователю"""
+        return await asyncio.wrap_future(self.db.submit_grant_access(user_id, access_type))
+
+    async def get_user_access(self, user_id: int) -> List[Dict[str, Any]]:
+        """Получение активного доступа пользователя"""
+        # Попадание в кэш отдаем сразу, без перехода в поток базы
+        cached = self.db.access_cache.get(user_id)
+        if cached is not None:
+            return cached
+        return await self._run(self.db.query_user_access, user_id)
+
+    async def has_active_access(self, user_id: int) -> bool:
+        """Есть ли у пользователя активный доступ (из кэша, если возможно)"""
+        cached = self.db.access_cache.has_active_access(user_id)
+        if cached is not None:
+            return cached
+        return bool(await self._run(self.db.query_user_access, user_id))
+
+    async def revoke_expired_access(self) -> int:
+        """Отзыв истекшего доступа"""
+        return await asyncio.wrap_future(self.db.submit_revoke_expired_access())
+
+    async def revoke_entitlements(self, entitlements: List[Tuple[int, str, str]]) -> Optional[List[Tuple[int, str, str]]]:
+        """Отзыв конкретных прав доступа (с проверкой expires_at); None — ошибка записи"""
+        return await asyncio.wrap_future(self.db.submit_revoke_entitlements(entitlements))
+
+    async def enqueue_revocations(self, revocations: List[Tuple[int, str]]) -> Optional[int]:
+        """Постановка неудавшихся удалений из каналов в outbox; None — ошибка записи"""
+        return await asyncio.wrap_future(self.db.submit_enqueue_revocations(revocations))
+
+    async def get_active_expiries(self) -> List[Tuple[int, str, str]]:
+        """Все активные права в порядке истечения"""
+        return await self._run(self.db.get_active_expiries)
+
+    async def claim_fulfilment(self, yookassa_payment_id: str) -> Any:
+        """Захват оплаченного платежа для выдачи доступа (см. Database.submit_claim_fulfilment)"""
+        return await asyncio.wrap_future(self.db.submit_claim_fulfilment(yookassa_payment_id))
+
+    async def complete_fulfilment(self, yookassa_payment_id: str) -> bool:
+        """Отметка о завершенной выдаче"""
+        return await asyncio.wrap_future(self.db.submit_complete_fulfilment(yookassa_payment_id))
+
+    async def get_unfulfilled_payments(self, days: int) -> List[Dict[str, Any]]:
+        """Оплаченные платежи без завершенной выдачи"""
+        return await self._run(self.db.get_unfulfilled_payments, days)
+
+    async def get_expired_users(self) -> List[int]:
+        """Получение пользователей с истекшим доступом"""
+        return await self._run(self.db.get_expired_users)
+
+
+_shared_async_database: Optional[AsyncDatabase] = None
+_shared_lock = threading.Lock()
+
+def get_async_database() -> AsyncDatabase:
+    """Общий асинхронный доступ к базе поверх get_database()"""
+    global _shared_async_database
+    if _shared_async_database is None:
+        with _shared_lock:
+            if _shared_async_database is None:
+                _shared_async_database = AsyncDatabase()
+    return _shared_async_database
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import logging
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+logger = logging.getLogger(__name__)
+
+# Максимальный размер тела запроса (байты)
+MAX_BODY_SIZE = 1024 * 1024
+# Сколько ждем следующего запроса на keep-alive соединении (секунды)
+KEEPALIVE_TIMEOUT = 75
+# Сколько ждем заголовков начатого запроса (секунды)
+HEADER_TIMEOUT = 10
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+class Request:
+    """Входящий HTTP-запрос"""
+
+    def __init__(self, method: str, target: str, headers: Dict[str, str], body: bytes):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.headers = headers  # имена в нижнем регистре
+        self.body = body
+
+    def json(self) -> Any:
+        """Тело запроса как JSON (None, если разобрать не удалось)"""
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return None
+
+class Response:
+    """Ответ обработчика"""
+
+    def __init__(self, status: int = 200, body: bytes = b"", content_type: str = "text/plain; charset=utf-8"):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+
+def json_response(data: Any, status: int = 200) -> Response:
+    """JSON-ответ"""
+    return Response(status, json.dumps(data, ensure_ascii=False).encode(), "application/json")
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+class AsyncHTTPServer:
+    """Минимальный HTTP/1.1 сервер на asyncio.
+
+    Работает в event loop вызывающего кода (например, Application бота), держит
+    keep-alive соединения и вызывает обработчики маршрутов как корутины.
+    Поддерживаются только тела с Content-Length: этого достаточно для
+    уведомлений ЮKassa и Telegram.
+    """
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 0, max_body_size: int = MAX_BODY_SIZE,
+                 reuse_port: bool = False):
+        self.host = host
+        self.port = port
+        self.max_body_size = max_body_size
+        self.reuse_port = reuse_port
+        self._routes: Dict[Tuple[str, str], Handler] = {}
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._connections = set()
+        self.requests = 0
+        self.errors = 0
+
+    def route(self, method: str, path: str, handler: Handler):
+        """Регистрация обработчика маршрута"""
+        self._routes[(method.upper(), path)] = handler
+
+    async def start(self):
+        """Запуск приема соединений в текущем event loop"""
+        self._server = await asyncio.start_server(
+            self._serve, self.host, self.port, reuse_port=self.reuse_port or None, backlog=512
+        )
+        # При port=0 порт выбирает система
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"HTTP сервер слушает {self.host}:{self.port}")
+
+    async def stop(self):
+        """Остановка приема и закрытие открытых соединений"""
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in list(self._connections):
+            writer.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _read_request(self, reader: asyncio.StreamReader, first_timeout: float) -> Optional[Request]:
+        """Чтение одного запроса; None — клиент закрыл соединение"""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), first_timeout)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            return None
+
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, version = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        headers[":version"] = version
+
+        length = int(headers.get("content-length", 0))
+        if length > self.max_body_size:
+            raise ValueError(413)
+        body = await asyncio.wait_for(reader.readexactly(length), HEADER_TIMEOUT) if length else b""
+        return Request(method.upper(), target, headers, body)
+
+    async def _dispatch(self, request: Request) -> Response:
+        handler = self._routes.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in self._routes):
+                return json_response({"error": "Method not allowed"}, 405)
+            return json_response({"error": "Not found"}, 404)
+        try:
+            return await handler(request)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Ошибка в обработчике {request.method} {request.path}: {e}")
+            return json_response({"error": "Internal error"}, 500)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections.add(writer)
+        try:
+            timeout = HEADER_TIMEOUT
+            while True:
+                try:
+                    request = await self._read_request(reader, timeout)
+                except (ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                    status = 413 if e.args == (413,) else 400
+                    await self._write(writer, json_response({"error": REASONS[status]}, status), False)
+                    break
+                if request is None:
+                    break
+
+                self.requests += 1
+                keep_alive = (
+                    request.headers.get("connection", "").lower() != "close"
+                    and request.headers[":version"] == "HTTP/1.1"
+                )
+                await self._write(writer, await self._dispatch(request), keep_alive)
+                if not keep_alive:
+                    break
+                timeout = KEEPALIVE_TIMEOUT
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    @staticmethod
+    async def _write(writer: asyncio.StreamWriter, response: Response, keep_alive: bool):
+        head = (
+            f"HTTP/1.1 {response.status} {REASONS.get(response.status, 'Unknown')}\r\n"
+            f"Content-Type: {response.content_type}\r\n"
+            f"Content-Length: {len(response.body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + response.body)
+        await writer.drain()
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import threading
+import uuid
+import weakref
+from typing import Optional, Tuple
+import httpx  # ставится вместе с python-telegram-bot
+from config import (
+    YOOKASSA_SHOP_ID, YOOKASSA_SECRET_KEY, YOOKASSA_API_URL,
+    YOOKASSA_TIMEOUT, YOOKASSA_CONNECT_TIMEOUT, YOOKASSA_MAX_CONCURRENCY,
+)
+from yookassa_client import YooKassaClient
+
+logger = logging.getLogger(__name__)
+
+# Повторов создания платежа после сетевой ошибки или ответа 5xx
+CREATE_RETRIES = 2
+# Пауза перед первым повтором (секунды), дальше удваивается
+CREATE_RETRY_DELAY = 0.5
+
+def idempotence_key(user_id: int, payment_type: str, attempt) -> str:
+    """Ключ идемпотентности создания платежа.
+
+    attempt — токен действия пользователя (id callback-запроса или сообщения):
+    повтор того же запроса и повторная доставка того же обновления дают тот же
+    ключ, и ЮKassa вернет уже созданный платеж вместо нового.
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"askeza:{user_id}:{payment_type}:{attempt}"))
+
+class YooKassaAPIError(RuntimeError):
+    """Ответ API ЮKassa с кодом ошибки"""
+
+    def __init__(self, status_code: int, description: str):
+        super().__init__(f"HTTP {status_code}: {description}")
+        self.status_code = status_code
+
+def is_transient(error: Exception) -> bool:
+    """Ошибка, после которой запрос можно повторить"""
+    return isinstance(error, httpx.TransportError) or (
+        isinstance(error, YooKassaAPIError) and error.status_code >= 500
+    )
+
+class AsyncYooKassaClient(YooKassaClient):
+    """Асинхронный клиент ЮKassa поверх HTTP API.
+
+    Запросы идут через один httpx.AsyncClient с keep-alive соединениями и
+    ограничением числа одновременных запросов, поэтому создание платежа для
+    одного пользователя не останавливает event loop бота. Результаты —
+    те же словари, что у YooKassaClient; разбор webhook и цены наследуются.
+    """
+
+    def __init__(self, shop_id: str = None, secret_key: str = None, base_url: str = None,
+                 timeout: float = YOOKASSA_TIMEOUT, connect_timeout: float = YOOKASSA_CONNECT_TIMEOUT,
+                 max_concurrency: int = YOOKASSA_MAX_CONCURRENCY):
+        super().__init__()
+        self.shop_id = shop_id or YOOKASSA_SHOP_ID
+        self.secret_key = secret_key or YOOKASSA_SECRET_KEY
+        self.base_url = (base_url or YOOKASSA_API_URL).rstrip("/")
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.max_concurrency = max_concurrency
+        # httpx.AsyncClient и семафор привязаны к event loop, в котором созданы;
+        # бот и фоновая сверка платежей работают в разных loop
+        self._sessions = weakref.WeakKeyDictionary()  # loop -> (AsyncClient, Semaphore)
+
+    def _session(self) -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        """HTTP-сессия текущего event loop (создается при первом запросе)"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None:
+            client = httpx.AsyncClient(
+                base_url=self.base_url,
+                auth=(self.shop_id, self.secret_key),
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+            session = self._sessions[loop] = (client, asyncio.Semaphore(self.max_concurrency))
+        return session
+
+    async def _request(self, method: str, path: str, **kwargs) -> dict:
+        """Запрос к API; ошибки HTTP и сети превращаются в исключение с описанием"""
+        client, semaphore = self._session()
+        async with semaphore:
+            response = await client.request(method, path, **kwargs)
+        if response.status_code >= 400:
+            try:
+                description = response.json().get("description")
+            except ValueError:
+                description = None
+            raise YooKassaAPIError(response.status_code, description or response.text)
+        return response.json()
+
+    async def _create(self, body: dict, key: str) -> dict:
+        """POST /payments с повтором временных ошибок под тем же ключом"""
+        for attempt in range(CREATE_RETRIES + 1):
+            try:
+                return await self._request("POST", "/payments", json=body, headers={"Idempotence-Key": key})
+            except Exception as e:
+                if attempt == CREATE_RETRIES or not is_transient(e):
+                    raise
+                delay = CREATE_RETRY_DELAY * 2 ** attempt
+                logger.warning(f"Создание платежа не удалось ({e!r}), повтор через {delay:.1f} с")
+                await asyncio.sleep(delay)
+
+    async def create_payment(self, amount: float, description: str, return_url: str = None,
+                             idempotence_key: str = None) -> dict:
+        """Создание платежа в ЮKassa.
+
+        idempotence_key — из idempotence_key(); без него ключ создается на вызов
+        и защищает только от повторов внутри этого вызова.
+        """
+        key = idempotence_key or str(uuid.uuid4())
+        try:
+            payment = await self._create({
+                "amount": {
+                    "value": f"{amount:.2f}",
+                    "currency": "RUB"
+                },
+                "confirmation": {
+                    "type": "redirect",
+                    "return_url": return_url or "https://t.me/your_bot"
+                },
+                "capture": True,
+                "description": description,
+                "metadata": {
+                    "payment_id": key
+                }
+            }, key)
+
+            return {
+                "success": True,
+                "payment_id": payment["id"],
+                "confirmation_url": payment["confirmation"]["confirmation_url"],
+                "status": payment["status"]
+            }
+        except Exception as e:
+            logger.error(f"Ошибка при создании платежа: {e!r}")
+            return {
+                "success": False,
+                "error": str(e) or repr(e)
+            }
+
+    async def get_payment_status(self, payment_id: str) -> dict:
+        """Получение статуса платежа"""
+        try:
+            payment = await self._request("GET", f"/payments/{payment_id}")
+            return {
+                "success": True,
+                "status": payment["status"],
+                "paid": payment["status"] == "succeeded"
+            }
+        except Exception as e:
+            logger.error(f"Ошибка при получении статуса платежа {payment_id}: {e!r}")
+            return {
+                "success": False,
+                "error": str(e) or repr(e)
+            }
+
+    async def close(self):
+        """Закрытие HTTP-соединений текущего event loop"""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session[0].aclose()
+
+
+_shared_client: Optional[AsyncYooKassaClient] = None
+_shared_lock = threading.Lock()
+
+def get_async_yookassa_client() -> AsyncYooKassaClient:
+    """Общий асинхронный клиент ЮKassa для всех модулей процесса"""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_lock:
+            if _shared_client is None:
+                _shared_client = AsyncYooKassaClient()
+    return _shared_client
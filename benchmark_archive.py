@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк горячих запросов к платежам при росте общего числа платежей
+(опрос ожидающих и история пользователя до и после архивации)
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from database import Database
+from payment_archive import PaymentArchiver
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+USERS = 10_000
+PENDING = 200
+FRESH = 2_000
+ITERATIONS = 300
+
+def fill_payments(db: Database, total: int):
+    """Синтетические платежи: старые завершенные, свежие и ожидающие"""
+    old = max(total - FRESH - PENDING, 0)
+
+    def rows():
+        for i in range(total):
+            if i < old:
+                status, age = random.choice(("succeeded", "canceled")), f"-{random.randint(100, 1000)} days"
+            elif i < old + FRESH:
+                status, age = "succeeded", f"-{random.randint(0, 30)} days"
+            else:
+                status, age = "pending", "-5 minutes"
+            yield (random.randrange(USERS), "askeza", 990, f"bench-{i}", status, age)
+
+    with db.connection() as conn:
+        conn.executemany('''
+            INSERT INTO payments (user_id, payment_type, amount, yookassa_payment_id, status, created_at)
+            VALUES (?, ?, ?, ?, ?, datetime('now', ?))
+        ''', rows())
+
+def measure(func, *args_factory) -> float:
+    """Медиана времени вызова в миллисекундах"""
+    timings = []
+    for _ in range(ITERATIONS):
+        args = [factory() for factory in args_factory]
+        started = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def hot_latency(db: Database) -> dict:
+    """Задержка горячих запросов"""
+    return {
+        "pending": measure(db.get_pending_payments),
+        "history": measure(db.get_payment_history, lambda: random.randrange(USERS)),
+    }
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    print("📊 Горячие запросы к платежам (медиана, мс)")
+    print("=" * 78)
+    print(f"{'Платежей':>10} | {'до архивации':^25} | {'после архивации':^25} | {'в горячей':>9}")
+    print(f"{'':>10} | {'pending':>12}{'history':>13} | {'pending':>12}{'history':>13} |")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for total in sizes:
+            db = Database(os.path.join(tmp_dir, f"payments-{total}.db"))
+            fill_payments(db, total)
+            before = hot_latency(db)
+
+            PaymentArchiver(db, older_than_days=90, batch_size=500, pause=0).run_once()
+            after = hot_latency(db)
+            with db.connection() as conn:
+                hot_rows = conn.execute("SELECT COUNT(*) FROM payments").fetchone()[0]
+            db.close()
+
+            print(f"{total:>10} | {before['pending']:>12.3f}{before['history']:>13.3f} | "
+                  f"{after['pending']:>12.3f}{after['history']:>13.3f} | {hot_rows:>9}")
+
+if __name__ == "__main__":
+    main()
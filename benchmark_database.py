@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк задержки get_user_access: соединение на каждый вызов против пула
+"""
+
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from database import Database
+
+USERS = 5000
+CALLS = 5000
+
+def legacy_get_user_access(db_path: str, user_id: int):
+    """Старая реализация: новое соединение на каждый вызов"""
+    with sqlite3.connect(db_path) as conn:
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT * FROM entitlements
+            WHERE user_id = ? AND is_active = TRUE AND expires_at > CURRENT_TIMESTAMP
+        ''', (user_id,))
+        return [dict(row) for row in cursor.fetchall()]
+
+def fill_database(db: Database):
+    """Заполнение базы тестовыми пользователями с доступом"""
+    expires_at = datetime.now() + timedelta(days=30)
+    with db.connection() as conn:
+        conn.executemany(
+            'INSERT INTO users (user_id, username) VALUES (?, ?)',
+            ((user_id, f"user{user_id}") for user_id in range(USERS))
+        )
+        conn.executemany(
+            'INSERT INTO entitlements (user_id, access_type, expires_at) VALUES (?, ?, ?)',
+            ((user_id, 'askeza', expires_at) for user_id in range(0, USERS, 2))
+        )
+
+def measure(func) -> list:
+    """Замер задержки каждого вызова в микросекундах"""
+    timings = []
+    for i in range(CALLS):
+        user_id = (i * 7919) % USERS
+        started = time.perf_counter()
+        func(user_id)
+        timings.append((time.perf_counter() - started) * 1_000_000)
+    return timings
+
+def report(name: str, timings: list):
+    """Вывод статистики"""
+    timings = sorted(timings)
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"{name:<28} p50={statistics.median(timings):8.1f} мкс  p99={p99:8.1f} мкс  "
+          f"среднее={statistics.mean(timings):8.1f} мкс")
+
+def main():
+    print("📊 Бенчмарк get_user_access")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "bench.db")
+        db = Database(db_path)
+        fill_database(db)
+        print(f"Пользователей: {USERS}, вызовов: {CALLS}\n")
+
+        before = measure(lambda user_id: legacy_get_user_access(db_path, user_id))
+        after = measure(db.get_user_access)
+
+        report("До (connect на вызов)", before)
+        report("После (пул соединений)", after)
+        print(f"\n⚡ Ускорение по медиане: {statistics.median(before) / statistics.median(after):.1f}x")
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк слоя данных на синтетической базе 10k / 100k / 1M пользователей.
+
+Результат печатается в JSON, чтобы сравнивать прогоны между коммитами:
+    python benchmark_scale.py --scales 10000 100000 --output before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Any, List
+from database import Database
+
+DEFAULT_SCALES = (10_000, 100_000, 1_000_000)
+# Вызовов каждой операции на одном масштабе
+DEFAULT_CALLS = 2_000
+# Вызовов revoke_expired_access: каждый — полный проход по истекшим
+REVOKE_CALLS = 20
+# Истекших прав, подкладываемых перед каждым вызовом revoke_expired_access
+EXPIRED_PER_REVOKE = 100
+PAYMENTS_PER_USER = 2
+ACCESS_TYPES = ("askeza", "numerology")
+
+def generate(db: Database, users: int, seed: int = 42):
+    """Синтетические пользователи, права доступа и платежи.
+
+    Половина пользователей с активным доступом, десятая часть — с истекшим;
+    платежи в основном завершенные, 1% ожидающих.
+    """
+    rnd = random.Random(seed)
+    now = datetime.now()
+
+    def entitlement_rows():
+        for user_id in range(users):
+            roll = rnd.random()
+            if roll < 0.5:
+                yield (user_id, "askeza", now + timedelta(days=rnd.randint(1, 30)), True)
+            elif roll < 0.6:
+                yield (user_id, "askeza", now - timedelta(days=rnd.randint(1, 300)), False)
+
+    def payment_rows():
+        for i in range(users * PAYMENTS_PER_USER):
+            status = "pending" if rnd.random() < 0.01 else rnd.choice(("succeeded", "canceled"))
+            yield (rnd.randrange(users), rnd.choice(ACCESS_TYPES), 990, f"synthetic-{i}",
+                   status, f"-{rnd.randint(0, 60)} days")
+
+    with db.connection() as conn:
+        conn.executemany(
+            'INSERT INTO users (user_id, username, first_name) VALUES (?, ?, ?)',
+            ((user_id, f"user{user_id}", "Имя") for user_id in range(users))
+        )
+        conn.executemany(
+            'INSERT INTO entitlements (user_id, access_type, expires_at, is_active) VALUES (?, ?, ?, ?)',
+            entitlement_rows()
+        )
+        conn.executemany('''
+            INSERT INTO payments (user_id, payment_type, amount, yookassa_payment_id, status, created_at)
+            VALUES (?, ?, ?, ?, ?, datetime('now', ?))
+        ''', payment_rows())
+        conn.execute('ANALYZE')
+    db.load_access_cache()
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Перцентиль по отсортированному списку"""
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def measure(func: Callable, args: List[tuple], prepare: Callable = None) -> Dict[str, Any]:
+    """Задержка каждого вызова и итоговая пропускная способность"""
+    timings = []
+    busy = 0.0
+    for call_args in args:
+        if prepare:
+            prepare()
+        started = time.perf_counter()
+        func(*call_args)
+        elapsed = time.perf_counter() - started
+        busy += elapsed
+        timings.append(elapsed * 1000)
+    timings.sort()
+    return {
+        "calls": len(timings),
+        "p50_ms": round(percentile(timings, 0.50), 4),
+        "p99_ms": round(percentile(timings, 0.99), 4),
+        "max_ms": round(timings[-1], 4),
+        "throughput_ops": round(len(timings) / busy, 1) if busy else None,
+    }
+
+def measure_burst(submit: Callable, args: List[tuple]) -> Dict[str, Any]:
+    """Пропускная способность записи всплеском через очередь DatabaseWriter"""
+    started = time.perf_counter()
+    futures = [submit(*call_args) for call_args in args]
+    for future in futures:
+        future.result()
+    elapsed = time.perf_counter() - started
+    return {"calls": len(args), "elapsed_s": round(elapsed, 4), "throughput_ops": round(len(args) / elapsed, 1)}
+
+def run_scale(db: Database, users: int, calls: int, rnd: random.Random) -> Dict[str, Any]:
+    """Все операции на одном масштабе"""
+    existing = [(rnd.randrange(users),) for _ in range(calls)]
+    results: Dict[str, Any] = {}
+
+    new_users = [(users + i, f"new{i}", "Имя", None) for i in range(calls)]
+    results["add_user"] = measure(db.add_user, new_users)
+    burst_users = [(users + calls + i, f"burst{i}", "Имя", None) for i in range(calls)]
+    results["add_user_burst"] = measure_burst(db.submit_add_user, burst_users)
+
+    results["get_user_access"] = measure(db.get_user_access, existing)
+    results["get_user_access_uncached"] = measure(db.query_user_access, existing)
+
+    payments = [(user_id, "askeza", 990, f"bench-{users}-{i}") for i, (user_id,) in enumerate(existing)]
+    results["create_payment"] = measure(db.create_payment, payments)
+    results["update_payment_status"] = measure(
+        db.update_payment_status, [(payment_id, "succeeded") for _, _, _, payment_id in payments]
+    )
+
+    results["payment_history"] = measure(db.get_payment_history, existing)
+
+    def expire_some():
+        # Подкладываем истекшие права, чтобы каждый проход что-то отзывал
+        sample = [(rnd.randrange(users),) for _ in range(EXPIRED_PER_REVOKE)]
+        with db.connection() as conn:
+            conn.executemany('''
+                INSERT INTO entitlements (user_id, access_type, expires_at, is_active)
+                VALUES (?, 'numerology', datetime('now', '-1 day'), TRUE)
+                ON CONFLICT (user_id, access_type) DO UPDATE SET
+                    expires_at = excluded.expires_at, is_active = TRUE
+            ''', sample)
+
+    results["revoke_expired_access"] = measure(db.revoke_expired_access, [()] * REVOKE_CALLS, prepare=expire_some)
+    return results
+
+def git_commit() -> str:
+    """Текущий коммит для сопоставления прогонов"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк слоя данных на синтетической базе")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(DEFAULT_SCALES), help="число пользователей")
+    parser.add_argument("--calls", type=int, default=DEFAULT_CALLS, help="вызовов каждой операции")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="файл для JSON (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "calls": args.calls,
+        "scales": {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for users in args.scales:
+            db = Database(os.path.join(tmp_dir, f"scale-{users}.db"))
+            started = time.perf_counter()
+            generate(db, users, args.seed)
+            generated = time.perf_counter() - started
+
+            operations = run_scale(db, users, args.calls, random.Random(args.seed))
+            report["scales"][str(users)] = {
+                "users": users,
+                "payments": users * PAYMENTS_PER_USER,
+                "generate_s": round(generated, 2),
+                "file_mb": round(os.path.getsize(db.db_path) / 1024 / 1024, 1),
+                "operations": operations,
+            }
+            db.close()
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк отрисовки экранов: стоимость текста и клавиатуры на одно обновление.
+
+Сравнивает прежнюю сборку (многострочный текст и InlineKeyboardMarkup/
+ReplyKeyboardMarkup заново в каждом вызове обработчика) с каталогом views,
+где статические экраны собраны при импорте, а на запрос подставляются только
+имя пользователя или данные платежа. Сеть и Telegram не участвуют:
+    python benchmark_views.py --iterations 20000
+"""
+
+import argparse
+import time
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
+import views
+
+DEFAULT_ITERATIONS = 20_000
+
+def legacy_main_menu(has_access: bool):
+    """Прежний show_main_menu: клавиатура и текст на каждый вызов"""
+    if has_access:
+        keyboard = [
+            [InlineKeyboardButton("❓ Вопрос/Ответ", callback_data="faq")],
+            [InlineKeyboardButton("📺 Закрытый канал", callback_data="private_channel")],
+            [InlineKeyboardButton("💬 Закрытый чат", callback_data="private_chat")],
+            [InlineKeyboardButton("💳 Оплатить доступ", callback_data="payment")]
+        ]
+    else:
+        keyboard = [
+            [InlineKeyboardButton("❓ Вопрос/Ответ", callback_data="faq")],
+            [InlineKeyboardButton("💳 Оплатить доступ", callback_data="payment")]
+        ]
+    return views.MAIN_MENU_TEXT, InlineKeyboardMarkup(keyboard)
+
+def legacy_payment_options_text():
+    """Прежний show_payment_options_text"""
+    keyboard = [
+        [KeyboardButton("🔸 Аскеза - 990₽"), KeyboardButton("🔸 Нумерология - 2490₽")],
+        [KeyboardButton("📋 Проверить платежи")],
+        [KeyboardButton("🔙 Назад")]
+    ]
+    return views.PAYMENT_OPTIONS_TEXT, ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+
+def legacy_welcome(username: str):
+    """Прежний start_command: f-строка и клавиатура"""
+    keyboard = [[KeyboardButton("❓ Вопрос/Ответ"), KeyboardButton("💳 Оплатить доступ")]]
+    return views.WELCOME_TEXT.format(username=username), ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+
+def legacy_payment_created(description: str, amount: float, payment_id: str, url: str):
+    """Прежний create_payment: все три кнопки заново"""
+    keyboard = [
+        [InlineKeyboardButton("💳 Оплатить", url=url)],
+        [InlineKeyboardButton("🔍 Проверить статус", callback_data="check_access")],
+        [InlineKeyboardButton("🔙 Назад", callback_data="payment")]
+    ]
+    text = views.PAYMENT_CREATED_TEXT.format(description=description, amount=amount, payment_id=payment_id)
+    return text, InlineKeyboardMarkup(keyboard)
+
+# Экран -> (прежняя сборка, каталог)
+SCREENS = {
+    "main_menu": (lambda i: legacy_main_menu(i % 2 == 0), lambda i: views.MAIN_MENU[i % 2 == 0]),
+    "payment_options_text": (lambda i: legacy_payment_options_text(), lambda i: views.PAYMENT_OPTIONS_REPLY),
+    "welcome": (lambda i: legacy_welcome(f"user{i}"), lambda i: views.WELCOME.format(username=f"user{i}")),
+    "payment_created": (
+        lambda i: legacy_payment_created("Аскеза", 990, f"pay-{i}", f"https://yoomoney.ru/checkout/pay-{i}"),
+        lambda i: views.payment_created("Аскеза", 990, f"pay-{i}", f"https://yoomoney.ru/checkout/pay-{i}"),
+    ),
+}
+
+def measure(render, iterations: int) -> float:
+    """Средняя стоимость одной отрисовки, микросекунды"""
+    started = time.perf_counter()
+    for i in range(iterations):
+        render(i)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарк отрисовки экранов бота")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    args = parser.parse_args()
+
+    print(f"📊 Отрисовка экрана на обновление, {args.iterations} итераций")
+    print("=" * 60)
+    print(f"{'экран':<24} {'до, мкс':>10} {'каталог, мкс':>14} {'ускорение':>10}")
+    for name, (legacy, catalog) in SCREENS.items():
+        # Прогрев
+        measure(legacy, 1000)
+        measure(catalog, 1000)
+        before, after = measure(legacy, args.iterations), measure(catalog, args.iterations)
+        print(f"{name:<24} {before:10.2f} {after:14.2f} {before / after:9.1f}x")
+
+if __name__ == "__main__":
+    main()
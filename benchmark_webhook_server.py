@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест приема webhook ЮKassa: Flask (dev-сервер в отдельном потоке)
+против асинхронного PaymentServer в event loop бота.
+
+Оба сервера сохраняют уведомление в очередь webhook_events и отвечают 200;
+обработчики очереди работают, но ничего не отправляют в Telegram. Результат —
+JSON с запросами в секунду и задержками p50/p99:
+    python benchmark_webhook_server.py --requests 5000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, Any, List
+from urllib.parse import urlsplit
+from flask import Flask, request, jsonify
+from werkzeug.serving import make_server
+from async_database import AsyncDatabase
+from benchmark_scale import percentile, git_commit
+from database import Database
+from payment_server import PaymentServer
+from webhook_queue import WebhookQueue, WebhookWorkerPool, validate_notification
+
+DEFAULT_REQUESTS = 3_000
+DEFAULT_CONCURRENCY = 50
+
+def notification(i: int) -> dict:
+    return {
+        "type": "notification",
+        "event": "payment.waiting_for_capture",
+        "object": {"id": f"bench-{i}", "status": "waiting_for_capture", "amount": {"value": "990.00", "currency": "RUB"}},
+    }
+
+async def noop(payload: Dict[str, Any]):
+    """Обработчик очереди без обращений к Telegram"""
+
+def flask_app(queue: WebhookQueue) -> Flask:
+    """Прежний путь: Flask-маршрут с синхронной записью в очередь"""
+    app = Flask(__name__)
+
+    @app.route('/webhook/yookassa', methods=['POST'])
+    def yookassa_webhook():
+        webhook_data = request.get_json(silent=True)
+        error = validate_notification(webhook_data)
+        if error:
+            return jsonify({"error": error}), 400
+        queue.enqueue(webhook_data)
+        return jsonify({"status": "queued"})
+
+    return app
+
+def serve_flask(db_path: str, ports: multiprocessing.Queue):
+    """Flask dev-сервер (threaded, как app.run) и обработчики очереди в своих потоках"""
+    queue = WebhookQueue(Database(db_path))
+    WebhookWorkerPool(queue, noop).start_in_thread()
+    server = make_server("127.0.0.1", 0, flask_app(queue), threaded=True)
+    ports.put(server.server_port)
+    server.serve_forever()
+
+def serve_async(db_path: str, ports: multiprocessing.Queue):
+    """PaymentServer в event loop процесса (как loop Application бота)"""
+    async def run():
+        server = PaymentServer(AsyncDatabase(Database(db_path)),
+                               host="127.0.0.1", port=0, reconcile_interval=None)
+        server.workers.handler = noop
+        await server.start()
+        ports.put(server.http.port)
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+async def post(connection, host: str, port: int, body: bytes):
+    """POST /webhook/yookassa по keep-alive соединению; возвращает (статус, соединение или None)"""
+    if connection is None:
+        connection = await asyncio.open_connection(host, port)
+    reader, writer = connection
+    writer.write(
+        f"POST /webhook/yookassa HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").lower()
+    status = int(head.split(" ", 2)[1])
+    length = int(head.split("content-length:", 1)[1].split("\r\n", 1)[0])
+    await reader.readexactly(length)
+    # Flask dev-сервер отвечает по HTTP/1.0 и закрывает соединение
+    if "connection: close" in head or head.startswith("http/1.0"):
+        writer.close()
+        connection = None
+    return status, connection
+
+async def load(url: str, requests: int, concurrency: int) -> Dict[str, Any]:
+    """requests POST-запросов из concurrency параллельных клиентов.
+
+    Клиент — минимальный HTTP/1.1 поверх asyncio: пул соединений httpx при
+    десятках параллельных запросов сам становится узким местом замера.
+    """
+    host, port = urlsplit(url).hostname, urlsplit(url).port
+    timings: List[float] = []
+    failures = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal failures
+        connection = None
+        for i in counter:
+            body = json.dumps(notification(i)).encode()
+            started = time.perf_counter()
+            try:
+                status, connection = await post(connection, host, port, body)
+                if status != 200:
+                    failures += 1
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                failures += 1
+                connection = None
+            timings.append((time.perf_counter() - started) * 1000)
+        if connection:
+            connection[1].close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    timings.sort()
+    return {
+        "requests": requests,
+        "failures": failures,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(timings, 0.50), 3),
+        "p99_ms": round(percentile(timings, 0.99), 3),
+        "max_ms": round(timings[-1], 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест приема webhook ЮKassa")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--output", help="файл для JSON (по умолчанию stdout)")
+    args = parser.parse_args()
+    # Журнал запросов werkzeug искажает замер
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "concurrency": args.concurrency,
+        "servers": {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, serve in (("flask", serve_flask), ("async", serve_async)):
+            # Сервер в отдельном процессе, чтобы генератор нагрузки не делил с ним GIL
+            ports = multiprocessing.Queue()
+            process = multiprocessing.Process(target=serve, args=(os.path.join(tmp_dir, f"{name}.db"), ports), daemon=True)
+            process.start()
+            url = f"http://127.0.0.1:{ports.get(timeout=30)}"
+            # Прогрев: соединения и первые записи
+            asyncio.run(load(url, min(200, args.requests), args.concurrency))
+            report["servers"][name] = asyncio.run(load(url, args.requests, args.concurrency))
+            process.terminate()
+            process.join()
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк записи: всплеск из 1000 команд /start (add_user)
+"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from async_database import AsyncDatabase
+from database import Database
+
+BURST = 1000
+LEGACY_THREADS = 8
+
+def legacy_add_user(db_path: str, user_id: int) -> bool:
+    """Старая реализация: соединение и COMMIT на каждую запись"""
+    try:
+        with sqlite3.connect(db_path, timeout=1) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR IGNORE INTO users (user_id, username, first_name, last_name)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, f"user{user_id}", "Имя", None))
+            conn.commit()
+            return cursor.rowcount > 0
+    except sqlite3.OperationalError:
+        return False
+
+def run_legacy(db_path: str) -> dict:
+    """Всплеск через пул потоков со старой записью"""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=LEGACY_THREADS) as executor:
+        results = list(executor.map(lambda user_id: legacy_add_user(db_path, user_id), range(BURST)))
+    elapsed = time.perf_counter() - started
+    return {"elapsed": elapsed, "ok": results.count(True), "failed": results.count(False)}
+
+async def run_writer(db: Database) -> dict:
+    """Всплеск через AsyncDatabase и поток записи"""
+    adb = AsyncDatabase(db)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        adb.add_user(user_id, f"user{user_id}", "Имя") for user_id in range(BURST)
+    ))
+    elapsed = time.perf_counter() - started
+    adb.shutdown()
+    return {"elapsed": elapsed, "ok": results.count(True), "failed": results.count(False)}
+
+def report(name: str, result: dict):
+    """Вывод результата"""
+    print(f"{name:<30} {result['elapsed'] * 1000:8.1f} мс  "
+          f"{BURST / result['elapsed']:9.0f} оп/с  успешно={result['ok']} ошибок={result['failed']}")
+
+def main():
+    print(f"📊 Всплеск из {BURST} команд /start")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_db = Database(os.path.join(tmp_dir, "legacy.db"))
+        legacy_db.close()
+        legacy = run_legacy(legacy_db.db_path)
+
+        db = Database(os.path.join(tmp_dir, "writer.db"))
+        writer = asyncio.run(run_writer(db))
+        stats = db.writer.stats()
+        db.close()
+
+    report("До (COMMIT на запись)", legacy)
+    report("После (поток записи)", writer)
+    print(f"\nТранзакций: {stats['batches']}, средний размер пакета: {stats['avg_batch_size']:.1f}, "
+          f"пропускная способность писателя: {stats['ops_per_busy_second']:.0f} оп/с")
+
+if __name__ == "__main__":
+    main()
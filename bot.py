@@ -1,13 +1,26 @@
 
 import logging
 import asyncio
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters
+import multiprocessing
+import secrets
+import signal
+from telegram.ext import Application
 from telegram import Update
 from telegram.ext import ContextTypes
-from config import BOT_TOKEN, YOOKASSA_SECRET_KEY
+from config import (
+    BOT_TOKEN, YOOKASSA_SECRET_KEY, TELEGRAM_MODE, TELEGRAM_API_URL, TELEGRAM_WEBHOOK_URL,
+    TELEGRAM_WEBHOOK_SECRET, TELEGRAM_WEBHOOK_HOST, TELEGRAM_WEBHOOK_PORT, TELEGRAM_WEBHOOK_PATH,
+    TELEGRAM_WEBHOOK_WORKERS,
+)
 from handlers import BotHandlers
-from database import Database
-from channel_manager import ChannelManager
+from async_database import get_async_database
+from entitlement_migration import EntitlementMigrator
+from payment_archive import PaymentArchiver
+from expiry_scheduler import ExpiryScheduler
+from payment_server import PaymentServer
+from notification_outbox import NotificationDispatcher
+from telegram_webhook import serve_webhook
+from telegram_transport import get_bot, create_bot
 import json
 
 # Настройка логирования
@@ -18,10 +31,20 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class AskezaBot:
-    def __init__(self):
+    def __init__(self, payment_server: bool = False, background: bool = True):
         self.handlers = BotHandlers()
-        self.db = Database()
-        self.channel_manager = ChannelManager()
+        self.db = get_async_database()
+        # Один менеджер каналов на процесс: обработчики, планировщик и outbox
+        self.channel_manager = self.handlers.channel_manager
+        # Отзыв доступа точно в момент истечения вместо ежечасного обхода таблицы
+        self.expiry_scheduler = ExpiryScheduler(self.db, self.channel_manager)
+        # Приглашения и уведомления об оплате из outbox
+        self.dispatcher = NotificationDispatcher(self.db.db, self.channel_manager)
+        # Webhook ЮKassa и сверка платежей в event loop приложения
+        self.with_payment_server = payment_server
+        self.payment_server = None
+        # Из нескольких процессов-воркеров webhook фоновые задачи нужны одному
+        self.background = background
     
     async def debug_callback_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик для отладки callback'ов"""
@@ -45,108 +68,50 @@ class AskezaBot:
                 logger.error("Не удалось распарсить JSON из webhook")
                 return
             
-            # Обрабатываем webhook через YooKassa клиент
-            result = self.handlers.yookassa.process_webhook(webhook_json)
-            
-            if result["success"] and result.get("status") == "succeeded":
-                payment_id = result["payment_id"]
-                
-                # Обновляем статус платежа в базе данных
-                self.db.update_payment_status(payment_id, "succeeded")
-                
-                # Получаем информацию о платеже
-                payment_info = self.db.get_payment(payment_id)
-                if payment_info:
-                    user_id = payment_info["user_id"]
-                    payment_type = payment_info["payment_type"]
-                    
-                    # Предоставляем доступ
-                    self.db.grant_access(user_id, payment_type)
-                    
-                    # Добавляем пользователя в каналы
-                    await self.channel_manager.grant_access_to_user(user_id, payment_type)
-                    
-                    # Уведомляем пользователя
-                    success_text = f"""
-✅ Платеж успешно обработан!
-
-🎉 Поздравляем! Вам предоставлен доступ к {payment_type}.
-
-Теперь вы можете:
-• Получать эксклюзивные материалы
-• Участвовать в закрытых обсуждениях
-• Получать персональные консультации
-                    """
-                    
-                    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-                    keyboard = [
-                        [InlineKeyboardButton("📺 Закрытый канал", callback_data="private_channel")],
-                        [InlineKeyboardButton("💬 Закрытый чат", callback_data="private_chat")],
-                        [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_main")]
-                    ]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-                    
-                    await context.bot.send_message(
-                        chat_id=user_id,
-                        text=success_text,
-                        reply_markup=reply_markup
-                    )
+            # Статус проверяется в API ЮKassa; доступ — ровно один раз на платеж, уведомления — через outbox
+            await self.handlers.fulfiller.apply_notification(webhook_json, self.handlers.yookassa)
             
         except Exception as e:
             logger.error(f"Ошибка при обработке webhook: {e}")
     
-    async def cleanup_expired_access(self):
-        """Очистка истекшего доступа"""
-        try:
-            expired_users = self.db.get_expired_users()
-            revoked_count = self.db.revoke_expired_access()
-            
-            if revoked_count > 0:
-                logger.info(f"Отозван доступ у {revoked_count} пользователей")
-                
-                # Удаляем пользователей из каналов и уведомляем
-                for user_id in expired_users:
-                    try:
-                        # Удаляем из каналов
-                        await self.channel_manager.revoke_access_from_user(user_id)
-                        
-                        # Уведомляем пользователя
-                        from telegram import Bot
-                        bot = Bot(token=BOT_TOKEN)
-                        await bot.send_message(
-                            chat_id=user_id,
-                            text="⏰ Ваш доступ к материалам Аскезы истек. Для продления обратитесь к боту."
-                        )
-                    except Exception as e:
-                        logger.error(f"Не удалось обработать пользователя {user_id}: {e}")
-            
-        except Exception as e:
-            logger.error(f"Ошибка при очистке истекшего доступа: {e}")
+    async def post_init(self, application: Application):
+        """Запуск планировщика истечения доступа и сервера платежей в event loop приложения"""
+        # Права бота и названия каналов обновляются в фоне
+        await self.channel_manager.chat_info.start(application.bot)
+        if self.background:
+            await self.expiry_scheduler.start()
+            # Пополнение пула одноразовых ссылок и отзыв использованных/истекших
+            await self.channel_manager.invites.start(application.bot)
+            await self.dispatcher.start()
+        if self.with_payment_server:
+            self.payment_server = PaymentServer(self.db)
+            await self.payment_server.start()
     
-    async def periodic_cleanup(self):
-        """Периодическая очистка истекшего доступа"""
-        while True:
-            await asyncio.sleep(3600)  # Проверяем каждый час
-            await self.cleanup_expired_access()
+    async def post_shutdown(self, application: Application):
+        """Остановка фоновых задач и HTTP-соединений ЮKassa"""
+        if self.payment_server:
+            await self.payment_server.stop()
+        await self.expiry_scheduler.stop()
+        await self.dispatcher.stop()
+        await self.channel_manager.invites.stop()
+        await self.channel_manager.chat_info.stop()
+        await self.handlers.yookassa.close()
     
-    def start_cleanup_task(self):
-        """Запуск задачи периодической очистки"""
-        import threading
-        import time
-        
-        def cleanup_worker():
-            while True:
-                time.sleep(3600)  # Ждем час
-                # Создаем новый event loop для очистки
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                loop.run_until_complete(self.cleanup_expired_access())
-                loop.close()
-        
-        cleanup_thread = threading.Thread(target=cleanup_worker, daemon=True)
-        cleanup_thread.start()
+    def build_application(self, base_url: str = TELEGRAM_API_URL) -> Application:
+        """Приложение с обработчиками; одинаковое для polling и webhook"""
+        # Приложение отправляет через общий бот процесса с ограничением частоты
+        bot = get_bot() if base_url == TELEGRAM_API_URL else create_bot(base_url=base_url)
+        application = (
+            Application.builder()
+            .bot(bot)
+            .post_init(self.post_init)
+            .post_shutdown(self.post_shutdown)
+            .build()
+        )
+        self.handlers.register(application)
+        return application
     
-    def run(self):
+    def run(self, mode: str = TELEGRAM_MODE):
         """Запуск бота"""
         if not BOT_TOKEN:
             logger.error("BOT_TOKEN не установлен!")
@@ -156,34 +121,71 @@ class AskezaBot:
             logger.warning("YOOKASSA_SECRET_KEY не настроен! Платежи не будут работать.")
             logger.warning("Смотрите инструкции в файле YOOKASSA_SETUP.md")
         
-        # Создаем приложение
-        self.application = Application.builder().token(BOT_TOKEN).build()
+        # Переносим права из устаревших таблиц доступа небольшими пакетами
+        EntitlementMigrator(self.db.db).start()
         
-        # Добавляем обработчики
-        self.application.add_handler(CommandHandler("start", self.handlers.start_command))
-        self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handlers.handle_message))
-        self.application.add_handler(CallbackQueryHandler(self.handlers.button_callback))
+        # Переносим старые завершенные платежи в архив
+        PaymentArchiver(self.db.db).start()
         
-        logger.info("Обработчики зарегистрированы:")
-        logger.info("- CommandHandler для /start")
-        logger.info("- MessageHandler для текстовых сообщений")
-        logger.info("- CallbackQueryHandler для кнопок")
+        if mode == 'webhook':
+            self.run_webhook()
+            return
         
-        # Обработчик для webhook от ЮKassa (если используется) - отключен для избежания конфликтов
-        # self.application.add_handler(
-        #     MessageHandler(filters.TEXT & ~filters.COMMAND, self.webhook_handler)
-        # )
+        self.application = self.build_application()
+        logger.info("Бот запущен!")
         
-        # Обработчик ошибок
-        self.application.add_error_handler(self.handlers.error_handler)
+        # Запускаем бота; chat_member приходит только если запрошен явно
+        self.application.run_polling(allowed_updates=Update.ALL_TYPES)
+    
+    def run_webhook(self, workers: int = TELEGRAM_WEBHOOK_WORKERS):
+        """Прием обновлений по webhook в одном или нескольких процессах"""
+        if not TELEGRAM_WEBHOOK_URL:
+            logger.error("TELEGRAM_WEBHOOK_URL не установлен!")
+            return
         
-        # Запускаем задачу периодической очистки (отключено для отладки)
-        # self.start_cleanup_task()
+        # Все воркеры проверяют один и тот же секрет
+        secret = TELEGRAM_WEBHOOK_SECRET or secrets.token_urlsafe(32)
+        if workers <= 1:
+            logger.info(f"Бот запущен в режиме webhook на порту {TELEGRAM_WEBHOOK_PORT}")
+            asyncio.run(self.serve_webhook(secret, TELEGRAM_WEBHOOK_URL))
+            return
         
-        logger.info("Бот запущен!")
+        # Каждый воркер — отдельный процесс со своим event loop и Application;
+        # ядро распределяет соединения между ними через SO_REUSEPORT
+        context = multiprocessing.get_context("spawn")
+        processes = [
+            context.Process(target=run_webhook_worker, args=(index, secret, self.with_payment_server),
+                            name=f"telegram-webhook-{index}")
+            for index in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        logger.info(f"Бот запущен в режиме webhook: {workers} процессов на порту {TELEGRAM_WEBHOOK_PORT}")
         
-        # Запускаем бота
-        self.application.run_polling()
+        # SIGTERM родителя, как и Ctrl+C, останавливает воркеры штатно
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
+    
+    async def serve_webhook(self, secret: str, webhook_url: str = None, reuse_port: bool = False):
+        """Один процесс webhook: приложение и HTTP-сервер в текущем event loop"""
+        self.application = self.build_application()
+        await serve_webhook(
+            self.application, secret, TELEGRAM_WEBHOOK_HOST, TELEGRAM_WEBHOOK_PORT, TELEGRAM_WEBHOOK_PATH,
+            webhook_url=webhook_url, reuse_port=reuse_port
+        )
+
+def run_webhook_worker(index: int, secret: str, payment_server: bool):
+    """Процесс-воркер webhook Telegram"""
+    # Сервер платежей, фоновые задачи и setWebhook — только в первом воркере
+    bot = AskezaBot(payment_server=payment_server and index == 0, background=index == 0)
+    asyncio.run(bot.serve_webhook(secret, TELEGRAM_WEBHOOK_URL if index == 0 else None, reuse_port=True))
 
 if __name__ == "__main__":
     bot = AskezaBot()
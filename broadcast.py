@@ -0,0 +1,182 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from typing import Optional, List, Dict, Any, Callable, Tuple
+from telegram import Bot, InlineKeyboardMarkup
+from telegram.error import TelegramError, Forbidden, BadRequest, TimedOut
+from config import BROADCAST_CONCURRENCY, BROADCAST_BATCH, BROADCAST_MAX_ATTEMPTS
+from database import Database, get_database
+from telegram_transport import get_bot, priority, PRIORITY_BULK
+
+logger = logging.getLogger(__name__)
+
+# Сегменты аудитории: запрос, возвращающий user_id получателей
+SEGMENTS = {
+    # Действующая подписка на Аскезу (idx_entitlements_active_expiry)
+    'askeza_active': '''
+        SELECT user_id FROM entitlements
+        WHERE access_type = 'askeza' AND is_active = TRUE AND expires_at > CURRENT_TIMESTAMP
+    ''',
+    # Хотя бы одна успешная оплата, в том числе архивная (idx_payment_fulfilments_user)
+    'paid': 'SELECT DISTINCT user_id FROM payment_fulfilments',
+    # Все, кто запускал бота
+    'all': 'SELECT user_id FROM users',
+}
+
+# Следующие получатели кампании (idx_broadcast_deliveries_status).
+# Захват одним оператором: две копии рассылки не отправят одно сообщение дважды
+CLAIM_QUERY = '''
+    UPDATE broadcast_deliveries SET status = 'sending', attempts = attempts + 1, updated_at = ?
+    WHERE campaign_id = ? AND user_id IN (
+        SELECT user_id FROM broadcast_deliveries
+        WHERE campaign_id = ? AND status = 'pending'
+        ORDER BY user_id
+        LIMIT ?
+    )
+    RETURNING user_id, attempts
+'''
+
+# Получатели по состояниям (idx_broadcast_deliveries_status)
+PROGRESS_QUERY = '''
+    SELECT status, COUNT(*) AS count FROM broadcast_deliveries
+    WHERE campaign_id = ?
+    GROUP BY status
+'''
+
+# Операции записи: выполняются в потоке DatabaseWriter
+
+def _create(conn: sqlite3.Connection, name: str, segment: str, text: str, reply_markup: Optional[str],
+            now: float) -> int:
+    row = conn.execute('SELECT id FROM broadcast_campaigns WHERE name = ?', (name,)).fetchone()
+    if row:
+        return row["id"]
+    campaign_id = conn.execute('''
+        INSERT INTO broadcast_campaigns (name, segment, text, reply_markup, created_at) VALUES (?, ?, ?, ?, ?)
+    ''', (name, segment, text, reply_markup, now)).lastrowid
+    conn.execute(f'''
+        INSERT OR IGNORE INTO broadcast_deliveries (campaign_id, user_id)
+        SELECT ?, user_id FROM ({SEGMENTS[segment]})
+    ''', (campaign_id,))
+    return campaign_id
+
+def _claim(conn: sqlite3.Connection, campaign_id: int, limit: int, now: float) -> List[Tuple[int, int]]:
+    return [(row["user_id"], row["attempts"]) for row in conn.execute(CLAIM_QUERY, (now, campaign_id, campaign_id, limit))]
+
+def _record(conn: sqlite3.Connection, campaign_id: int, results: List[Tuple[int, str, Optional[str]]], now: float):
+    conn.executemany('''
+        UPDATE broadcast_deliveries SET status = ?, error = ?, updated_at = ?
+        WHERE campaign_id = ? AND user_id = ?
+    ''', [(status, error, now, campaign_id, user_id) for user_id, status, error in results])
+
+def _interrupt(conn: sqlite3.Connection, campaign_id: int) -> int:
+    # Прерванные отправки могли дойти: повтор означал бы дубль
+    return conn.execute('''
+        UPDATE broadcast_deliveries SET status = 'unknown', error = 'interrupted'
+        WHERE campaign_id = ? AND status = 'sending'
+    ''', (campaign_id,)).rowcount
+
+def _complete(conn: sqlite3.Connection, campaign_id: int, now: float):
+    conn.execute('''
+        UPDATE broadcast_campaigns SET status = 'done', finished_at = ?
+        WHERE id = ? AND status = 'running' AND NOT EXISTS (
+            SELECT 1 FROM broadcast_deliveries WHERE campaign_id = ? AND status = 'pending'
+        )
+    ''', (now, campaign_id, campaign_id))
+
+class BroadcastEngine:
+    """Рассылка по сегменту пользователей с продолжением после сбоя.
+
+    Кампания фиксирует аудиторию сегмента строками broadcast_deliveries.
+    Получатели захватываются пачками и отправляются параллельно через общий
+    бот в полосе рассылок, поэтому темп задает ограничитель транспорта, а
+    подтверждения оплат рассылку не ждут. Состояние каждого получателя
+    сохраняется, и повторный запуск продолжает с неотправленных; отправки,
+    прерванные на лету, помечаются unknown и не повторяются.
+    """
+
+    def __init__(self, db: Database = None, bot: Bot = None, concurrency: int = BROADCAST_CONCURRENCY,
+                 batch_size: int = BROADCAST_BATCH, max_attempts: int = BROADCAST_MAX_ATTEMPTS):
+        self.db = db or get_database()
+        self.bot = bot or get_bot()
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+
+    async def _write(self, operation, *args):
+        return await asyncio.wrap_future(self.db.writer.submit(operation, *args))
+
+    async def _read(self, query: str, params: tuple) -> List[Dict[str, Any]]:
+        def read():
+            with self.db.connection() as conn:
+                return [dict(row) for row in conn.execute(query, params)]
+        return await asyncio.get_running_loop().run_in_executor(None, read)
+
+    async def create(self, name: str, segment: str, text: str, reply_markup: InlineKeyboardMarkup = None) -> int:
+        """Кампания с аудиторией сегмента; существующая с тем же именем возвращается как есть"""
+        if segment not in SEGMENTS:
+            raise ValueError(f"Неизвестный сегмент: {segment}")
+        markup = reply_markup.to_json() if reply_markup else None
+        return await self._write(_create, name, segment, text, markup, time.time())
+
+    async def progress(self, campaign_id: int) -> Dict[str, int]:
+        """Число получателей по состояниям и всего"""
+        counts = {row["status"]: row["count"] for row in await self._read(PROGRESS_QUERY, (campaign_id,))}
+        counts["total"] = sum(counts.values())
+        return counts
+
+    async def _send(self, semaphore: asyncio.Semaphore, user_id: int, attempts: int, text: str,
+                    markup: Optional[InlineKeyboardMarkup]) -> Tuple[int, str, Optional[str]]:
+        async with semaphore:
+            try:
+                await self.bot.send_message(chat_id=user_id, text=text, reply_markup=markup)
+                return user_id, 'sent', None
+            except Forbidden as e:
+                # Пользователь заблокировал бота или удалил аккаунт
+                return user_id, 'blocked', str(e)
+            except BadRequest as e:
+                return user_id, 'failed', str(e)
+            except TimedOut as e:
+                # Запрос мог дойти до Telegram: не повторяем, чтобы не прислать дубль
+                return user_id, 'unknown', str(e)
+            except TelegramError as e:
+                status = 'pending' if attempts < self.max_attempts else 'failed'
+                return user_id, status, str(e)
+
+    async def run(self, campaign_id: int, on_progress: Callable[[Dict[str, Any]], None] = None) -> Dict[str, int]:
+        """Отправка оставшимся получателям; возвращает итоговый прогресс"""
+        rows = await self._read('SELECT text, reply_markup FROM broadcast_campaigns WHERE id = ?', (campaign_id,))
+        if not rows:
+            raise ValueError(f"Кампания {campaign_id} не найдена")
+        text, markup = rows[0]["text"], rows[0]["reply_markup"]
+        markup = InlineKeyboardMarkup.de_json(json.loads(markup), self.bot) if markup else None
+
+        interrupted = await self._write(_interrupt, campaign_id)
+        if interrupted:
+            logger.warning(f"Рассылка {campaign_id}: {interrupted} прерванных отправок не повторяем")
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started = time.monotonic()
+        sent = 0
+        with priority(PRIORITY_BULK):
+            while True:
+                claimed = await self._write(_claim, campaign_id, self.batch_size, time.time())
+                if not claimed:
+                    break
+                results = await asyncio.gather(*(
+                    self._send(semaphore, user_id, attempts, text, markup) for user_id, attempts in claimed
+                ))
+                await self._write(_record, campaign_id, results, time.time())
+                sent += sum(status == 'sent' for _, status, _ in results)
+
+                progress = await self.progress(campaign_id)
+                elapsed = time.monotonic() - started
+                report = dict(progress, rate=sent / elapsed if elapsed else 0.0)
+                logger.info(f"Рассылка {campaign_id}: отправлено {progress.get('sent', 0)} из {progress['total']}, "
+                            f"осталось {progress.get('pending', 0)}, {report['rate']:.1f} сообщений/с")
+                if on_progress:
+                    on_progress(report)
+
+        await self._write(_complete, campaign_id, time.time())
+        return await self.progress(campaign_id)
@@ -5,18 +5,19 @@
 
 import logging
 import asyncio
-from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
-from database import Database
+from async_database import get_async_database
 from channel_manager import ChannelManager
-from config import BOT_TOKEN, PRIVATE_CHANNEL_ID, PRIVATE_CHAT_ID
+from config import PRIVATE_CHANNEL_ID, PRIVATE_CHAT_ID
+from telegram_transport import get_bot
+import views
 
 logger = logging.getLogger(__name__)
 
 class CallbackHandler:
     def __init__(self):
-        self.bot = Bot(token=BOT_TOKEN)
-        self.db = Database()
-        self.channel_manager = ChannelManager()
+        self.bot = get_bot()
+        self.db = get_async_database()
+        self.channel_manager = ChannelManager(self.bot)
     
     async def handle_callback(self, callback_data: str, user_id: int):
         """Обработка callback'ов от инлайн кнопок"""
@@ -35,29 +36,20 @@ class CallbackHandler:
         except Exception as e:
             logger.error(f"Ошибка при обработке callback {callback_data}: {e}")
     
+    async def send(self, user_id: int, screen: views.Screen):
+        """Отправка готового экрана пользователю"""
+        await self.bot.send_message(chat_id=user_id, text=screen.text, reply_markup=screen.reply_markup)
+    
     async def give_channel_access(self, user_id: int):
         """Предоставление доступа к каналу"""
         try:
             # Проверяем, есть ли у пользователя доступ
-            user_access = self.db.get_user_access(user_id)
+            user_access = await self.db.get_user_access(user_id)
             if not user_access:
-                await self.bot.send_message(
-                    chat_id=user_id,
-                    text="❌ У вас нет активного доступа. Сначала оплатите подписку."
-                )
+                await self.send(user_id, views.NO_ACCESS)
                 return
             
-            if PRIVATE_CHANNEL_ID:
-                channel_text = f"""
-📺 Закрытый канал Аскезы
-
-Присоединяйтесь к нашему закрытому каналу для получения эксклюзивных материалов:
-https://t.me/{PRIVATE_CHANNEL_ID.replace('@', '')}
-                """
-            else:
-                channel_text = "❌ Канал не настроен. Обратитесь к администратору."
-            
-            await self.bot.send_message(chat_id=user_id, text=channel_text)
+            await self.send(user_id, views.CHANNEL_LINK if PRIVATE_CHANNEL_ID else views.CHANNEL_NOT_CONFIGURED)
             logger.info(f"Доступ к каналу предоставлен пользователю {user_id}")
             
         except Exception as e:
@@ -71,25 +63,12 @@ https://t.me/{PRIVATE_CHANNEL_ID.replace('@', '')}
         """Предоставление доступа к чату"""
         try:
             # Проверяем, есть ли у пользователя доступ
-            user_access = self.db.get_user_access(user_id)
+            user_access = await self.db.get_user_access(user_id)
             if not user_access:
-                await self.bot.send_message(
-                    chat_id=user_id,
-                    text="❌ У вас нет активного доступа. Сначала оплатите подписку."
-                )
+                await self.send(user_id, views.NO_ACCESS)
                 return
             
-            if PRIVATE_CHAT_ID:
-                chat_text = f"""
-💬 Закрытый чат Аскезы
-
-Присоединяйтесь к нашему закрытому чату для общения с единомышленниками:
-https://t.me/{PRIVATE_CHAT_ID.replace('@', '')}
-                """
-            else:
-                chat_text = "❌ Чат не настроен. Обратитесь к администратору."
-            
-            await self.bot.send_message(chat_id=user_id, text=chat_text)
+            await self.send(user_id, views.CHAT_LINK if PRIVATE_CHAT_ID else views.CHAT_NOT_CONFIGURED)
             logger.info(f"Доступ к чату предоставлен пользователю {user_id}")
             
         except Exception as e:
@@ -102,35 +81,8 @@ https://t.me/{PRIVATE_CHAT_ID.replace('@', '')}
     async def show_main_menu(self, user_id: int):
         """Показ главного меню"""
         try:
-            user_access = self.db.get_user_access(user_id)
-            has_access = len(user_access) > 0
-            
-            if has_access:
-                keyboard = [
-                    [InlineKeyboardButton("❓ Вопрос/Ответ", callback_data="faq")],
-                    [InlineKeyboardButton("📺 Закрытый канал", callback_data="private_channel")],
-                    [InlineKeyboardButton("💬 Закрытый чат", callback_data="private_chat")],
-                    [InlineKeyboardButton("💳 Оплатить доступ", callback_data="payment")]
-                ]
-            else:
-                keyboard = [
-                    [InlineKeyboardButton("❓ Вопрос/Ответ", callback_data="faq")],
-                    [InlineKeyboardButton("💳 Оплатить доступ", callback_data="payment")]
-                ]
-            
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            main_text = """
-🌟 Добро пожаловать в бот Аскезы! 🌟
-
-Выберите, что вас интересует:
-            """
-            
-            await self.bot.send_message(
-                chat_id=user_id,
-                text=main_text,
-                reply_markup=reply_markup
-            )
+            has_access = await self.db.has_active_access(user_id)
+            await self.send(user_id, views.MAIN_MENU[has_access])
             logger.info(f"Главное меню показано пользователю {user_id}")
             
         except Exception as e:
@@ -1,68 +1,73 @@
+import asyncio
 import logging
+from typing import Dict, List, Iterable
 from telegram import Bot, ChatMember
-from telegram.error import TelegramError
-from config import BOT_TOKEN, PRIVATE_CHANNEL_ID
-from database import Database
+from telegram.error import BadRequest, Forbidden, TelegramError
+from config import PRIVATE_CHANNEL_ID, PRIVATE_CHAT_ID
+from async_database import get_async_database
+from chat_info import ChatInfoCache, get_chat_info_cache
+from invite_pool import InviteLinkPool, get_invite_pool
+from membership_index import MembershipIndex, get_membership_index
+from telegram_transport import get_bot
 
 logger = logging.getLogger(__name__)
 
+# Одновременных обращений к Telegram при пакетном отзыве доступа
+REVOKE_CONCURRENCY = 8
+
 class ChannelManager:
-    def __init__(self):
-        self.bot = Bot(token=BOT_TOKEN)
-        self.db = Database()
+    def __init__(self, bot: Bot = None, invites: InviteLinkPool = None, chat_info: ChatInfoCache = None,
+                 members: MembershipIndex = None):
+        # По умолчанию — общий бот процесса: один HTTP-пул и общие лимиты частоты
+        self.bot = bot or get_bot()
+        self.db = get_async_database()
+        # Одноразовые ссылки выдаются из заранее созданного пула
+        self.invites = invites or get_invite_pool()
+        # Права бота и названия чатов с ограниченным сроком
+        self.chat_info = chat_info or get_chat_info_cache()
+        # Участники канала и чата по событиям chat_member; общий индекс — при первом обращении
+        self._members = members
+    
+    @property
+    def members(self) -> MembershipIndex:
+        if self._members is None:
+            self._members = get_membership_index()
+        return self._members
+
+    async def _kick(self, chat_id, user_id: int):
+        """Удаление участника без бессрочной блокировки: после ban сразу unban,
+        чтобы при продлении подписки пользователь мог войти по новой ссылке"""
+        await self.bot.ban_chat_member(chat_id, user_id)
+        await self.bot.unban_chat_member(chat_id, user_id, only_if_banned=True)
+        await self.members.record(chat_id, user_id, 'left')
+    
     
     async def check_bot_permissions(self) -> dict:
-        """Проверка прав бота в каналах и чатах"""
+        """Проверка прав бота в каналах и чатах.
+        
+        Право приглашать берется из прав администратора (can_invite_users),
+        пробные пригласительные ссылки не создаются.
+        """
         permissions = {
             'channel': {'is_admin': False, 'can_invite': False, 'error': None},
             'chat': {'is_admin': False, 'can_invite': False, 'error': None}
         }
         
-        # Инициализируем бота если нужно
-        if not self.bot._initialized:
-            await self.bot.initialize()
-        
-        # Проверяем права в канале
-        if PRIVATE_CHANNEL_ID:
-            try:
-                bot_member = await self.bot.get_chat_member(chat_id=PRIVATE_CHANNEL_ID, user_id=self.bot.id)
-                permissions['channel']['is_admin'] = bot_member.status in ['administrator', 'creator']
-                
-                if permissions['channel']['is_admin']:
-                    # Проверяем права на приглашение
-                    try:
-                        await self.bot.create_chat_invite_link(chat_id=PRIVATE_CHANNEL_ID, member_limit=1)
-                        permissions['channel']['can_invite'] = True
-                    except TelegramError as e:
-                        permissions['channel']['error'] = str(e)
-            except TelegramError as e:
-                permissions['channel']['error'] = str(e)
-        
-        # Проверяем права в чате (если настроен)
-        try:
-            from config import PRIVATE_CHAT_ID
-            if PRIVATE_CHAT_ID:
-                try:
-                    bot_member = await self.bot.get_chat_member(chat_id=PRIVATE_CHAT_ID, user_id=self.bot.id)
-                    permissions['chat']['is_admin'] = bot_member.status in ['administrator', 'creator']
-                    
-                    if permissions['chat']['is_admin']:
-                        # Проверяем права на приглашение
-                        try:
-                            await self.bot.create_chat_invite_link(chat_id=PRIVATE_CHAT_ID, member_limit=1)
-                            permissions['chat']['can_invite'] = True
-                        except TelegramError as e:
-                            permissions['chat']['error'] = str(e)
-                except TelegramError as e:
-                    permissions['chat']['error'] = str(e)
-        except ImportError:
-            # PRIVATE_CHAT_ID не настроен
-            permissions['chat']['error'] = 'PRIVATE_CHAT_ID не настроен'
+        for key, chat_id in (('channel', PRIVATE_CHANNEL_ID), ('chat', PRIVATE_CHAT_ID)):
+            if not chat_id:
+                permissions[key]['error'] = f"PRIVATE_{key.upper()}_ID не настроен"
+                continue
+            info = await self.chat_info.get(self.bot, chat_id)
+            permissions[key].update(is_admin=info['is_admin'], can_invite=info['can_invite'], error=info['error'])
         
         return permissions
     
-    async def add_user_to_channel(self, user_id: int) -> bool:
-        """Добавление пользователя в закрытый канал"""
+    async def add_user_to_channel(self, user_id: int, raise_rejected: bool = False) -> bool:
+        """Добавление пользователя в закрытый канал.
+
+        raise_rejected — пробросить Forbidden/BadRequest вместо False: так outbox
+        отличает отказ Telegram (пользователь заблокировал бота) от временной ошибки.
+        """
         if not PRIVATE_CHANNEL_ID:
             logger.warning("PRIVATE_CHANNEL_ID не настроен")
             return False
@@ -72,41 +77,32 @@ class ChannelManager:
             if not self.bot._initialized:
                 await self.bot.initialize()
             
-            # Проверяем, является ли бот администратором канала
-            bot_member = await self.bot.get_chat_member(chat_id=PRIVATE_CHANNEL_ID, user_id=self.bot.id)
-            if bot_member.status not in ['administrator', 'creator']:
-                logger.error(f"Бот не является администратором канала {PRIVATE_CHANNEL_ID}")
-                return False
-            
-            # Проверяем, есть ли у бота права на приглашение пользователей
-            chat = await self.bot.get_chat(chat_id=PRIVATE_CHANNEL_ID)
-            if not chat.invite_link:
-                logger.warning("У канала нет постоянной пригласительной ссылки")
-            
-            # Создаем временную пригласительную ссылку
-            invite_link = await self.bot.create_chat_invite_link(
-                chat_id=PRIVATE_CHANNEL_ID,
-                member_limit=1,
-                expire_date=None  # Ссылка не истекает
-            )
+            # Одноразовая ссылка из пула; права бота проверяются при пополнении пула
+            invite_link = await self.invites.issue(self.bot, PRIVATE_CHANNEL_ID, user_id)
             
             # Отправляем приглашение пользователю
             await self.bot.send_message(
                 chat_id=user_id,
-                text=f"📺 Добро пожаловать в закрытый канал Аскезы!\n\n{invite_link.invite_link}"
+                text=f"📺 Добро пожаловать в закрытый канал Аскезы!\n\n{invite_link}"
             )
             
             logger.info(f"Пользователь {user_id} добавлен в канал")
             return True
             
         except TelegramError as e:
+            if raise_rejected and isinstance(e, (Forbidden, BadRequest)):
+                raise
             logger.error(f"Ошибка при добавлении пользователя {user_id} в канал: {e}")
             if "Not enough rights" in str(e) or "CHAT_ADMIN_REQUIRED" in str(e):
                 logger.error("Бот не имеет достаточных прав для добавления пользователей в канал")
             return False
     
-    async def add_user_to_chat(self, user_id: int) -> bool:
-        """Добавление пользователя в закрытый чат"""
+    async def add_user_to_chat(self, user_id: int, raise_rejected: bool = False) -> bool:
+        """Добавление пользователя в закрытый чат.
+
+        raise_rejected — пробросить Forbidden/BadRequest вместо False: так outbox
+        отличает отказ Telegram (пользователь заблокировал бота) от временной ошибки.
+        """
         try:
             from config import PRIVATE_CHAT_ID
             if not PRIVATE_CHAT_ID:
@@ -124,34 +120,21 @@ class ChannelManager:
             # Получаем PRIVATE_CHAT_ID
             from config import PRIVATE_CHAT_ID
             
-            # Проверяем, является ли бот администратором чата
-            bot_member = await self.bot.get_chat_member(chat_id=PRIVATE_CHAT_ID, user_id=self.bot.id)
-            if bot_member.status not in ['administrator', 'creator']:
-                logger.error(f"Бот не является администратором чата {PRIVATE_CHAT_ID}")
-                return False
-            
-            # Проверяем, есть ли у бота права на приглашение пользователей
-            chat = await self.bot.get_chat(chat_id=PRIVATE_CHAT_ID)
-            if not chat.invite_link:
-                logger.warning("У чата нет постоянной пригласительной ссылки")
-            
-            # Создаем временную пригласительную ссылку
-            invite_link = await self.bot.create_chat_invite_link(
-                chat_id=PRIVATE_CHAT_ID,
-                member_limit=1,
-                expire_date=None  # Ссылка не истекает
-            )
+            # Одноразовая ссылка из пула; права бота проверяются при пополнении пула
+            invite_link = await self.invites.issue(self.bot, PRIVATE_CHAT_ID, user_id)
             
             # Отправляем приглашение пользователю
             await self.bot.send_message(
                 chat_id=user_id,
-                text=f"💬 Добро пожаловать в закрытый чат Аскезы!\n\n{invite_link.invite_link}"
+                text=f"💬 Добро пожаловать в закрытый чат Аскезы!\n\n{invite_link}"
             )
             
             logger.info(f"Пользователь {user_id} добавлен в чат")
             return True
             
         except TelegramError as e:
+            if raise_rejected and isinstance(e, (Forbidden, BadRequest)):
+                raise
             logger.error(f"Ошибка при добавлении пользователя {user_id} в чат: {e}")
             if "Not enough rights" in str(e) or "CHAT_ADMIN_REQUIRED" in str(e):
                 logger.error("Бот не имеет достаточных прав для добавления пользователей в чат")
@@ -169,13 +152,12 @@ class ChannelManager:
                 await self.bot.initialize()
             
             # Проверяем, является ли бот администратором канала
-            bot_member = await self.bot.get_chat_member(PRIVATE_CHANNEL_ID, self.bot.id)
-            if bot_member.status not in ['administrator', 'creator']:
+            if not (await self.chat_info.get(self.bot, PRIVATE_CHANNEL_ID))['is_admin']:
                 logger.error("Бот не является администратором канала")
                 return False
             
             # Удаляем пользователя из канала
-            await self.bot.ban_chat_member(PRIVATE_CHANNEL_ID, user_id)
+            await self._kick(PRIVATE_CHANNEL_ID, user_id)
             
             logger.info(f"Пользователь {user_id} удален из канала")
             return True
@@ -204,13 +186,12 @@ class ChannelManager:
             from config import PRIVATE_CHAT_ID
             
             # Проверяем, является ли бот администратором чата
-            bot_member = await self.bot.get_chat_member(PRIVATE_CHAT_ID, self.bot.id)
-            if bot_member.status not in ['administrator', 'creator']:
+            if not (await self.chat_info.get(self.bot, PRIVATE_CHAT_ID))['is_admin']:
                 logger.error("Бот не является администратором чата")
                 return False
             
             # Удаляем пользователя из чата
-            await self.bot.ban_chat_member(PRIVATE_CHAT_ID, user_id)
+            await self._kick(PRIVATE_CHAT_ID, user_id)
             
             logger.info(f"Пользователь {user_id} удален из чата")
             return True
@@ -224,11 +205,8 @@ class ChannelManager:
         if not PRIVATE_CHANNEL_ID:
             return False
         
-        try:
-            member = await self.bot.get_chat_member(PRIVATE_CHANNEL_ID, user_id)
-            return member.status in ['member', 'administrator', 'creator']
-        except TelegramError:
-            return False
+        # Индекс участников; get_chat_member — только при промахе или устаревшей записи
+        return await self.members.is_member(self.bot, PRIVATE_CHANNEL_ID, user_id)
     
     async def send_channel_invite(self, user_id: int) -> bool:
         """Отправка пригласительной ссылки на канал пользователю"""
@@ -241,22 +219,11 @@ class ChannelManager:
             if not self.bot._initialized:
                 await self.bot.initialize()
             
-            # Проверяем, является ли бот администратором канала
-            bot_member = await self.bot.get_chat_member(chat_id=PRIVATE_CHANNEL_ID, user_id=self.bot.id)
-            if bot_member.status not in ['administrator', 'creator']:
-                logger.error(f"Бот не является администратором канала {PRIVATE_CHANNEL_ID}")
-                return False
+            # Название канала из кэша
+            channel_name = (await self.chat_info.get(self.bot, PRIVATE_CHANNEL_ID))['title'] or "Закрытый канал Аскезы"
             
-            # Получаем информацию о канале
-            chat = await self.bot.get_chat(chat_id=PRIVATE_CHANNEL_ID)
-            channel_name = chat.title or "Закрытый канал Аскезы"
-            
-            # Создаем пригласительную ссылку
-            invite_link = await self.bot.create_chat_invite_link(
-                chat_id=PRIVATE_CHANNEL_ID,
-                member_limit=1,
-                expire_date=None
-            )
+            # Одноразовая ссылка из пула
+            invite_link = await self.invites.issue(self.bot, PRIVATE_CHANNEL_ID, user_id)
             
             # Отправляем приглашение пользователю
             invite_text = f"""
@@ -264,7 +231,7 @@ class ChannelManager:
 
 Для получения доступа к эксклюзивному контенту подпишитесь на наш закрытый канал:
 
-{invite_link.invite_link}
+{invite_link}
 
 После подписки нажмите кнопку "Проверить подписку" для подтверждения.
             """
@@ -290,19 +257,16 @@ class ChannelManager:
         except ImportError:
             return False
         
-        try:
-            member = await self.bot.get_chat_member(PRIVATE_CHAT_ID, user_id)
-            return member.status in ['member', 'administrator', 'creator']
-        except TelegramError:
-            return False
+        # Индекс участников; get_chat_member — только при промахе или устаревшей записи
+        return await self.members.is_member(self.bot, PRIVATE_CHAT_ID, user_id)
     
     async def grant_access_to_user(self, user_id: int, access_type: str) -> bool:
-        """Предоставление доступа пользователю"""
-        success = True
+        """Добавление пользователя в канал и чат.
         
-        # Добавляем в базу данных
-        if not self.db.grant_access(user_id, access_type):
-            success = False
+        Доступ в базе выдается отдельно (PaymentFulfiller или db.grant_access),
+        здесь только обращения к Telegram.
+        """
+        success = True
         
         # Добавляем в канал и чат
         if not await self.add_user_to_channel(user_id):
@@ -325,3 +289,94 @@ class ChannelManager:
             success = False
         
         return success
+    
+    async def _admin_chats(self) -> List[int]:
+        """Каналы и чаты, в которых бот может удалять участников"""
+        chat_ids = [PRIVATE_CHANNEL_ID]
+        try:
+            from config import PRIVATE_CHAT_ID
+            chat_ids.append(PRIVATE_CHAT_ID)
+        except ImportError:
+            pass
+        
+        admin_chats = []
+        for chat_id in filter(None, chat_ids):
+            info = await self.chat_info.get(self.bot, chat_id)
+            if info['is_admin']:
+                admin_chats.append(chat_id)
+            elif not info['error']:
+                logger.error(f"Бот не является администратором {chat_id}")
+        return admin_chats
+    
+    async def lift_bans(self, user_ids: Iterable[int]) -> int:
+        """Снятие бессрочных блокировок, оставшихся от удаления через ban без unban.
+
+        Выдача доступа блокировку не снимает (это лишний вызов API на каждое
+        приглашение); разовый проход выполняет unban_legacy_members.py.
+        Возвращает число пользователей, у которых ошибок не было.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return 0
+        
+        if not self.bot._initialized:
+            await self.bot.initialize()
+        
+        admin_chats = await self._admin_chats()
+        if not admin_chats:
+            logger.error("Нет каналов, где бот может снимать блокировки")
+            return 0
+        semaphore = asyncio.Semaphore(REVOKE_CONCURRENCY)
+        
+        async def lift(user_id: int) -> bool:
+            async with semaphore:
+                success = True
+                for chat_id in admin_chats:
+                    try:
+                        await self.bot.unban_chat_member(chat_id, user_id, only_if_banned=True)
+                    except TelegramError as e:
+                        logger.error(f"Не удалось снять блокировку пользователя {user_id} в {chat_id}: {e}")
+                        success = False
+                return success
+        
+        lifted = sum(await asyncio.gather(*(lift(user_id) for user_id in user_ids)))
+        logger.info(f"Блокировки сняты у {lifted}/{len(user_ids)} пользователей")
+        return lifted
+    
+    async def revoke_access_from_users(self, user_ids: Iterable[int], notify_text: str = None) -> Dict[int, bool]:
+        """Пакетный отзыв доступа: права бота проверяются один раз на пакет,
+        удаление и уведомления идут через один бот с ограниченным параллелизмом.
+        Возвращает результат по каждому пользователю: True — удален отовсюду без ошибок"""
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return {}
+        
+        # Инициализируем бота если нужно
+        if not self.bot._initialized:
+            await self.bot.initialize()
+        
+        admin_chats = await self._admin_chats()
+        if not admin_chats:
+            # Удалить некуда: бот потерял права или каналы недоступны — это ошибка, а не успех
+            logger.error(f"Нет каналов, где бот может удалять участников; доступ не отозван у {len(user_ids)} пользователей")
+        semaphore = asyncio.Semaphore(REVOKE_CONCURRENCY)
+        
+        async def revoke(user_id: int) -> bool:
+            async with semaphore:
+                success = bool(admin_chats)
+                for chat_id in admin_chats:
+                    try:
+                        await self._kick(chat_id, user_id)
+                    except TelegramError as e:
+                        logger.error(f"Ошибка при удалении пользователя {user_id} из {chat_id}: {e}")
+                        success = False
+                if notify_text:
+                    try:
+                        await self.bot.send_message(chat_id=user_id, text=notify_text)
+                    except TelegramError as e:
+                        logger.error(f"Не удалось уведомить пользователя {user_id}: {e}")
+                return success
+        
+        results = dict(zip(user_ids, await asyncio.gather(*(revoke(user_id) for user_id in user_ids))))
+        logger.info(f"Доступ отозван у {sum(results.values())}/{len(user_ids)} пользователей")
+        return results
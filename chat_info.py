@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional, List, Dict, Any, Iterable
+from telegram import Bot, Chat, ChatMember
+from telegram.error import TelegramError
+from config import PRIVATE_CHANNEL_ID, PRIVATE_CHAT_ID, CHAT_INFO_TTL
+
+logger = logging.getLogger(__name__)
+
+# Ошибку (бот не в чате, чат не найден) перепроверяем чаще, чем права
+ERROR_TTL = 60
+
+def bot_rights(member: ChatMember) -> Dict[str, bool]:
+    """Права бота в чате из его ChatMember"""
+    if member.status == ChatMember.OWNER:
+        return {"is_admin": True, "can_invite": True, "can_restrict": True}
+    if member.status == ChatMember.ADMINISTRATOR:
+        return {
+            "is_admin": True,
+            "can_invite": bool(member.can_invite_users),
+            "can_restrict": bool(member.can_restrict_members),
+        }
+    return {"is_admin": False, "can_invite": False, "can_restrict": False}
+
+class ChatInfoCache:
+    """Права бота и названия закрытых каналов и чатов с ограниченным сроком.
+
+    Вместо get_chat_member(бот) и get_chat на каждое добавление, удаление и
+    приглашение данные берутся из памяти и обновляются фоновой задачей чуть
+    раньше истечения ttl. Событие my_chat_member (боту выдали или забрали
+    права) сразу обновляет запись без обращения к API.
+    """
+
+    def __init__(self, ttl: float = CHAT_INFO_TTL, chat_ids: Iterable[str] = None):
+        self.ttl = ttl
+        chat_ids = chat_ids if chat_ids is not None else [PRIVATE_CHANNEL_ID, PRIVATE_CHAT_ID]
+        self.chat_ids = list(dict.fromkeys(str(chat_id) for chat_id in chat_ids if chat_id))
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, entry: Optional[Dict[str, Any]]) -> bool:
+        if entry is None:
+            return False
+        ttl = ERROR_TTL if entry["error"] else self.ttl
+        return time.monotonic() - entry["loaded_at"] < ttl
+
+    async def get(self, bot: Bot, chat_id) -> Dict[str, Any]:
+        """Права бота и название чата: {is_admin, can_invite, can_restrict, title, error}"""
+        chat_id = str(chat_id)
+        with self._lock:
+            entry = self._entries.get(chat_id)
+        if self._fresh(entry):
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        # Одновременные промахи по одному чату ждут одну загрузку
+        loading = self._loading.get(chat_id)
+        if loading is None or loading.get_loop() is not asyncio.get_running_loop():
+            loading = asyncio.ensure_future(self._load(bot, chat_id))
+            self._loading[chat_id] = loading
+
+            def done(future: asyncio.Future):
+                if self._loading.get(chat_id) is future:
+                    del self._loading[chat_id]
+
+            loading.add_done_callback(done)
+        return await asyncio.shield(loading)
+
+    async def _load(self, bot: Bot, chat_id: str) -> Dict[str, Any]:
+        if not bot._initialized:
+            await bot.initialize()
+        entry = {"is_admin": False, "can_invite": False, "can_restrict": False, "title": None, "error": None}
+        try:
+            member, chat = await asyncio.gather(bot.get_chat_member(chat_id, bot.id), bot.get_chat(chat_id))
+            entry.update(bot_rights(member), title=chat.title)
+        except TelegramError as e:
+            entry["error"] = str(e)
+            logger.error(f"Не удалось получить права бота в {chat_id}: {e}")
+        entry["loaded_at"] = time.monotonic()
+        with self._lock:
+            self._entries[chat_id] = entry
+        return entry
+
+    def _keys(self, chat: Chat) -> List[str]:
+        keys = [str(chat.id)]
+        if chat.username:
+            keys.append(f"@{chat.username}")
+        return keys
+
+    def update_bot_member(self, chat: Chat, member: ChatMember):
+        """Событие my_chat_member: права бота изменились"""
+        entry = dict(bot_rights(member), title=chat.title, error=None, loaded_at=time.monotonic())
+        with self._lock:
+            for key in self._keys(chat):
+                self._entries[key] = entry
+        logger.info(f"Права бота в {chat.id} изменились: {member.status}")
+
+    def invalidate(self, chat_id=None):
+        """Сброс записи (или всего кэша)"""
+        with self._lock:
+            if chat_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(chat_id), None)
+
+    async def refresh(self, bot: Bot):
+        """Перезагрузка всех известных чатов"""
+        await asyncio.gather(*(self._load(bot, chat_id) for chat_id in self.chat_ids))
+
+    async def run(self, bot: Bot):
+        # Обновляем заранее, чтобы обработчики не попадали на истекшую запись
+        while True:
+            try:
+                await self.refresh(bot)
+            except Exception as e:
+                logger.error(f"Ошибка при обновлении прав бота: {e}")
+            await asyncio.sleep(self.ttl * 0.8)
+
+    async def start(self, bot: Bot) -> asyncio.Task:
+        """Фоновое обновление в текущем event loop"""
+        self._task = asyncio.create_task(self.run(bot))
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "chats": len(self._entries)}
+
+_chat_info: Optional[ChatInfoCache] = None
+_chat_info_lock = threading.Lock()
+
+def get_chat_info_cache() -> ChatInfoCache:
+    """Общий кэш процесса"""
+    global _chat_info
+    if _chat_info is None:
+        with _chat_info_lock:
+            if _chat_info is None:
+                _chat_info = ChatInfoCache()
+    return _chat_info
@@ -6,8 +6,9 @@
 import sqlite3
 import asyncio
 from datetime import datetime, timedelta
-from config import DATABASE_PATH, BOT_TOKEN
-from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from config import DATABASE_PATH
+from telegram_transport import get_bot
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 def check_pending_payments():
     """Проверка pending платежей"""
@@ -73,7 +74,7 @@ async def send_notification_to_user(user_id: int):
     print(f"📧 Отправка уведомления пользователю {user_id}")
     
     try:
-        bot = Bot(token=BOT_TOKEN)
+        bot = get_bot()
         
         success_text = f"""
 ✅ Платеж успешно обработан!
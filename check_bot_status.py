@@ -6,8 +6,8 @@
 import sqlite3
 import asyncio
 from datetime import datetime, timedelta
-from config import DATABASE_PATH, BOT_TOKEN, PRIVATE_CHANNEL_ID
-from telegram import Bot
+from config import DATABASE_PATH, PRIVATE_CHANNEL_ID
+from telegram_transport import get_bot
 
 def check_recent_payments():
     """Проверка недавних платежей"""
@@ -75,7 +75,7 @@ async def test_bot_connection():
     print("=" * 50)
     
     try:
-        bot = Bot(token=BOT_TOKEN)
+        bot = get_bot()
         
         # Получаем информацию о боте
         bot_info = await bot.get_me()
@@ -96,9 +96,9 @@ async def send_test_notification():
     print("=" * 50)
     
     try:
-        from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+        from telegram import InlineKeyboardButton, InlineKeyboardMarkup
         
-        bot = Bot(token=BOT_TOKEN)
+        bot = get_bot()
         
         # Тестовое сообщение
         test_text = """
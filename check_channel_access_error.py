@@ -5,8 +5,8 @@
 
 import asyncio
 import logging
-from config import BOT_TOKEN, PRIVATE_CHANNEL_ID
-from telegram import Bot
+from config import PRIVATE_CHANNEL_ID
+from telegram_transport import get_bot
 from telegram.error import TelegramError
 
 # Настройка логирования
@@ -22,7 +22,7 @@ async def check_bot_permissions():
     print("=" * 50)
     
     try:
-        bot = Bot(token=BOT_TOKEN)
+        bot = get_bot()
         
         print(f"📺 Проверяем канал: {PRIVATE_CHANNEL_ID}")
         
@@ -85,7 +85,7 @@ async def test_user_access(user_id: int):
     print("=" * 50)
     
     try:
-        bot = Bot(token=BOT_TOKEN)
+        bot = get_bot()
         
         # Проверяем, есть ли пользователь в канале
         try:
@@ -120,7 +120,7 @@ async def test_adding_user_to_channel(user_id: int):
     print("=" * 50)
     
     try:
-        bot = Bot(token=BOT_TOKEN)
+        bot = get_bot()
         
         # Создаем пригласительную ссылку
         try:
@@ -5,9 +5,10 @@
 
 import sqlite3
 import asyncio
-from datetime import datetime, timedelta
-from config import DATABASE_PATH, BOT_TOKEN
-from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from config import DATABASE_PATH
+from telegram_transport import get_bot
+from database import get_database
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 def check_user_payments(user_id: int):
     """Проверка платежей пользователя"""
@@ -21,7 +22,7 @@ def check_user_payments(user_id: int):
         # Проверяем все платежи пользователя
         cursor.execute('''
             SELECT yookassa_payment_id, payment_type, amount, status, created_at, paid_at
-            FROM payments 
+            FROM all_payments 
             WHERE user_id = ?
             ORDER BY created_at DESC
         ''', (user_id,))
@@ -42,10 +43,10 @@ def check_user_payments(user_id: int):
         
         # Проверяем доступ пользователя
         cursor.execute('''
-            SELECT access_type, expires_at, is_active, created_at
-            FROM user_access 
+            SELECT access_type, expires_at, is_active, granted_at
+            FROM entitlements 
             WHERE user_id = ?
-            ORDER BY created_at DESC
+            ORDER BY granted_at DESC
         ''', (user_id,))
         user_access = cursor.fetchall()
         
@@ -55,7 +56,7 @@ def check_user_payments(user_id: int):
                 print(f"   • Type: {access[0]}")
                 print(f"     Expires: {access[1]}")
                 print(f"     Active: {access[2]}")
-                print(f"     Created: {access[3]}")
+                print(f"     Granted: {access[3]}")
                 print()
         else:
             print("❌ Доступа не найдено")
@@ -72,7 +73,7 @@ async def send_notification_to_user(user_id: int):
     print(f"📧 Отправка уведомления пользователю {user_id}")
     
     try:
-        bot = Bot(token=BOT_TOKEN)
+        bot = get_bot()
         
         success_text = f"""
 ✅ Платеж успешно обработан!
@@ -111,31 +112,17 @@ async def grant_access_to_user(user_id: int, payment_type: str):
     print(f"🔐 Предоставление доступа пользователю {user_id}")
     
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
+        db = get_database()
         
         # Проверяем, есть ли уже активный доступ
-        cursor.execute('''
-            SELECT id, access_type, is_active 
-            FROM user_access 
-            WHERE user_id = ? AND is_active = 1
-        ''', (user_id,))
-        existing_access = cursor.fetchone()
-        
+        existing_access = db.get_user_access(user_id)
         if existing_access:
-            print(f"✅ Активный доступ уже существует: {existing_access[1]}")
+            print(f"✅ Активный доступ уже существует: {existing_access[0]['access_type']}")
+        elif db.grant_access(user_id, payment_type):
+            print(f"✅ Доступ предоставлен до {db.get_user_access(user_id)[0]['expires_at']}")
         else:
-            # Создаем новый доступ
-            expires_at = datetime.now() + timedelta(days=30)
-            cursor.execute('''
-                INSERT INTO user_access (user_id, access_type, expires_at, is_active)
-                VALUES (?, ?, ?, ?)
-            ''', (user_id, payment_type, expires_at, 1))
-            
-            print(f"✅ Доступ предоставлен до {expires_at}")
-        
-        conn.commit()
-        conn.close()
+            print("❌ Не удалось записать доступ")
+            return False
         
         return True
         
@@ -34,7 +34,7 @@ def check_user_status():
         # Проверяем платежи
         cursor.execute('''
             SELECT yookassa_payment_id, payment_type, amount, status, created_at 
-            FROM payments 
+            FROM all_payments 
             WHERE user_id = ?
             ORDER BY created_at DESC
         ''', (760111270,))
@@ -46,10 +46,10 @@ def check_user_status():
         
         # Проверяем доступ
         cursor.execute('''
-            SELECT access_type, created_at, expires_at, is_active 
-            FROM user_access 
+            SELECT access_type, granted_at, expires_at, is_active 
+            FROM entitlements 
             WHERE user_id = ?
-            ORDER BY created_at DESC
+            ORDER BY granted_at DESC
         ''', (760111270,))
         access_records = cursor.fetchall()
         
@@ -19,3 +19,83 @@ NUMEROLOGY_PRICE = 2490  # Цена за нумерологический раз
 
 # Access duration (in days)
 ACCESS_DURATION = 30
+
+# Payments archive: terminal payments older than this (in days) move to payments_archive
+PAYMENT_ARCHIVE_AFTER_DAYS = int(os.getenv('PAYMENT_ARCHIVE_AFTER_DAYS', '90'))
+
+# YooKassa HTTP API (async client)
+YOOKASSA_API_URL = os.getenv('YOOKASSA_API_URL', 'https://api.yookassa.ru/v3')
+YOOKASSA_TIMEOUT = float(os.getenv('YOOKASSA_TIMEOUT', '10'))  # секунды на запрос
+YOOKASSA_CONNECT_TIMEOUT = float(os.getenv('YOOKASSA_CONNECT_TIMEOUT', '5'))
+YOOKASSA_MAX_CONCURRENCY = int(os.getenv('YOOKASSA_MAX_CONCURRENCY', '20'))  # одновременных запросов и соединений
+
+# Pending payments reconciliation
+PAYMENT_CHECK_INTERVAL = int(os.getenv('PAYMENT_CHECK_INTERVAL', '300'))  # секунды между проходами
+RECONCILE_CONCURRENCY = int(os.getenv('RECONCILE_CONCURRENCY', '10'))  # одновременных запросов к ЮKassa
+RECONCILE_DEADLINE = float(os.getenv('RECONCILE_DEADLINE', '120'))  # лимит времени одного прохода, секунды
+
+# Adaptive polling of pending payments (no-webhook mode)
+POLL_FAST_INTERVAL = float(os.getenv('POLL_FAST_INTERVAL', '3'))  # секунды между опросами свежего платежа
+POLL_FAST_WINDOW = int(os.getenv('POLL_FAST_WINDOW', '180'))  # сколько секунд опрашиваем часто
+POLL_DOUBLING_PERIOD = int(os.getenv('POLL_DOUBLING_PERIOD', '300'))  # интервал удваивается каждые N секунд возраста
+POLL_MAX_INTERVAL = int(os.getenv('POLL_MAX_INTERVAL', '900'))
+PAYMENT_CONFIRMATION_WINDOW = int(os.getenv('PAYMENT_CONFIRMATION_WINDOW', '3600'))  # после этого возраста pending -> expired
+
+# YooKassa webhook ingress queue
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', '4'))  # параллельных обработчиков событий
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', '5'))  # после этого событие уходит в dead letters
+WEBHOOK_RETRY_DELAY = float(os.getenv('WEBHOOK_RETRY_DELAY', '5'))  # базовая пауза перед повтором, секунды
+WEBHOOK_LEASE = float(os.getenv('WEBHOOK_LEASE', '300'))  # через сколько секунд незавершенная обработка возвращается в очередь
+
+# Payment fulfilment ledger
+FULFILMENT_LEASE = float(os.getenv('FULFILMENT_LEASE', '60'))  # через сколько секунд незавершенную выдачу можно продолжить
+FULFILMENT_RECOVERY_DAYS = int(os.getenv('FULFILMENT_RECOVERY_DAYS', '1'))  # за сколько дней сверка ищет оплаченные без выдачи
+
+# Async payment server (YooKassa webhook + /health in the bot's event loop)
+PAYMENT_SERVER_HOST = os.getenv('PAYMENT_SERVER_HOST', '0.0.0.0')
+PAYMENT_SERVER_PORT = int(os.getenv('PAYMENT_SERVER_PORT', '5000'))
+
+# Telegram updates: 'polling' or 'webhook'
+TELEGRAM_MODE = os.getenv('TELEGRAM_MODE', 'polling')
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org/bot')  # адрес Bot API (фейковый — для тестов)
+TELEGRAM_WEBHOOK_URL = os.getenv('TELEGRAM_WEBHOOK_URL')  # публичный https-адрес, регистрируемый в setWebhook
+TELEGRAM_WEBHOOK_SECRET = os.getenv('TELEGRAM_WEBHOOK_SECRET')  # secret_token; если не задан, генерируется при запуске
+TELEGRAM_WEBHOOK_HOST = os.getenv('TELEGRAM_WEBHOOK_HOST', '0.0.0.0')
+TELEGRAM_WEBHOOK_PORT = int(os.getenv('TELEGRAM_WEBHOOK_PORT', '8443'))
+TELEGRAM_WEBHOOK_PATH = os.getenv('TELEGRAM_WEBHOOK_PATH', '/webhook/telegram')
+TELEGRAM_WEBHOOK_WORKERS = int(os.getenv('TELEGRAM_WEBHOOK_WORKERS', '1'))  # процессов на одном порту (SO_REUSEPORT)
+
+# Single-use invite link pool (per private channel/chat)
+INVITE_POOL_SIZE = int(os.getenv('INVITE_POOL_SIZE', '20'))  # готовых ссылок на каждый канал и чат
+INVITE_LINK_TTL = int(os.getenv('INVITE_LINK_TTL', '86400'))  # срок жизни ссылки, секунды
+INVITE_POOL_INTERVAL = int(os.getenv('INVITE_POOL_INTERVAL', '300'))  # период пополнения и отзыва, секунды
+
+# Cached bot rights and chat titles for the private channel/chat
+CHAT_INFO_TTL = int(os.getenv('CHAT_INFO_TTL', '300'))  # секунды
+
+# Membership index (chat_member updates); older entries are re-checked via get_chat_member
+MEMBERSHIP_TTL = int(os.getenv('MEMBERSHIP_TTL', '21600'))  # секунды
+
+# Shared Telegram transport: rate limits and flood-wait retries (per process)
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))  # запросов в секунду на бота
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))  # сообщений в секунду в один личный чат
+TELEGRAM_GROUP_RATE = float(os.getenv('TELEGRAM_GROUP_RATE', '20'))  # сообщений в минуту в группу или канал
+TELEGRAM_CHAT_BURST = int(os.getenv('TELEGRAM_CHAT_BURST', '3'))  # сообщений подряд в один чат без ожидания
+TELEGRAM_NORMAL_SHARE = float(os.getenv('TELEGRAM_NORMAL_SHARE', '0.8'))  # доля глобального лимита для обычных ответов
+TELEGRAM_BULK_SHARE = float(os.getenv('TELEGRAM_BULK_SHARE', '0.5'))  # доля глобального лимита для рассылок
+TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', '3'))  # повторов после RetryAfter
+TELEGRAM_POOL_SIZE = int(os.getenv('TELEGRAM_POOL_SIZE', '64'))  # HTTP-соединений общего бота
+
+# Broadcast campaigns; the send rate is bounded by the transport's bulk lane (TELEGRAM_BULK_SHARE)
+BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', '20'))  # одновременных отправок
+BROADCAST_BATCH = int(os.getenv('BROADCAST_BATCH', '200'))  # получателей, захватываемых за раз
+BROADCAST_MAX_ATTEMPTS = int(os.getenv('BROADCAST_MAX_ATTEMPTS', '3'))  # попыток при сетевых ошибках
+
+# Notification outbox: invites and payment confirmations written with the access grant
+OUTBOX_BATCH = int(os.getenv('OUTBOX_BATCH', '50'))  # уведомлений за одну выборку
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '8'))  # после этого уведомление помечается failed
+OUTBOX_RETRY_DELAY = float(os.getenv('OUTBOX_RETRY_DELAY', '5'))  # базовая пауза перед повтором, секунды
+OUTBOX_LEASE = float(os.getenv('OUTBOX_LEASE', '300'))  # через сколько секунд незавершенная отправка возвращается в очередь
+
+# Bot update router: share of routed updates logged at INFO (route and user id only)
+ROUTER_LOG_SAMPLE = float(os.getenv('ROUTER_LOG_SAMPLE', '0.1'))  # 0 — не логировать, 1 — каждое обновление
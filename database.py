@@ -1,84 +1,340 @@
+import json
 import sqlite3
 import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
-from config import DATABASE_PATH
+from typing import Optional, List, Dict, Any, Iterator, Callable, Tuple
+from config import DATABASE_PATH, ACCESS_DURATION, FULFILMENT_LEASE
+from migrations import apply_migrations
+from access_cache import AccessCache, parse_timestamp
+from db_writer import DatabaseWriter
 
 logger = logging.getLogger(__name__)
 
+# Настройки, применяемые к каждому соединению пула
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",  # ~16 МБ страничного кэша
+    "PRAGMA mmap_size = 134217728",  # 128 МБ
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Сколько простаивающих соединений держим открытыми
+POOL_SIZE = 4
+# Сколько ждем снятия блокировки другим писателем (секунды)
+BUSY_TIMEOUT = 10
+
+# Горячие запросы; их планы проверяются в test_query_plans.py
+ACTIVE_ACCESS_QUERY = '''
+    SELECT * FROM entitlements 
+    WHERE is_active = TRUE AND expires_at > CURRENT_TIMESTAMP
+'''
+USER_ACCESS_QUERY = '''
+    SELECT * FROM entitlements 
+    WHERE user_id = ? AND is_active = TRUE AND expires_at > CURRENT_TIMESTAMP
+'''
+PAYMENT_HISTORY_QUERY = '''
+    SELECT yookassa_payment_id, payment_type, amount, status, created_at, paid_at
+    FROM payments 
+    WHERE user_id = ?
+    ORDER BY created_at DESC
+    LIMIT ?
+'''
+ARCHIVED_PAYMENT_HISTORY_QUERY = '''
+    SELECT yookassa_payment_id, payment_type, amount, status, created_at, paid_at
+    FROM payments_archive 
+    WHERE user_id = ?
+    ORDER BY created_at DESC
+    LIMIT ?
+'''
+PENDING_PAYMENTS_QUERY = '''
+    SELECT yookassa_payment_id, user_id, payment_type, created_at FROM payments 
+    WHERE status = 'pending'
+'''
+EXPIRED_USERS_QUERY = '''
+    SELECT user_id FROM entitlements 
+    WHERE expires_at <= CURRENT_TIMESTAMP AND is_active = TRUE
+'''
+REVOKE_EXPIRED_QUERY = '''
+    UPDATE entitlements 
+    SET is_active = FALSE 
+    WHERE expires_at <= CURRENT_TIMESTAMP AND is_active = TRUE
+'''
+ARCHIVE_CANDIDATES_QUERY = '''
+    SELECT id FROM payments 
+    WHERE status != 'pending' AND created_at < datetime('now', ?)
+    ORDER BY created_at
+    LIMIT ?
+'''
+EXPIRY_SCHEDULE_QUERY = '''
+    SELECT user_id, access_type, expires_at FROM entitlements 
+    WHERE is_active = TRUE
+    ORDER BY expires_at
+'''
+# Отзыв с проверкой срока: продленное за это время право не совпадет по expires_at
+REVOKE_ENTITLEMENT_QUERY = '''
+    UPDATE entitlements 
+    SET is_active = FALSE 
+    WHERE user_id = ? AND access_type = ? AND expires_at = ? AND is_active = TRUE
+'''
+# Оплаченные платежи без завершенной выдачи: нет строки в журнале
+# или обработчик не завершил выдачу за время аренды.
+# p.status != 'pending' повторяет условие частичного индекса
+# idx_payments_terminal_created: SQLite не выводит его из p.status = 'succeeded'
+# и без него просматривает всю таблицу payments (см. test_query_plans)
+UNFULFILLED_PAYMENTS_QUERY = '''
+    SELECT p.yookassa_payment_id, p.user_id, p.payment_type, p.created_at FROM payments p
+    LEFT JOIN payment_fulfilments f ON f.yookassa_payment_id = p.yookassa_payment_id
+    WHERE p.status != 'pending' AND p.status = 'succeeded' AND p.created_at >= datetime('now', ?)
+        AND (f.yookassa_payment_id IS NULL OR (f.state = 'granted' AND f.claimed_at <= ?))
+'''
+
+# Операции записи: выполняются в потоке DatabaseWriter внутри общей транзакции
+
+def _insert_user(conn: sqlite3.Connection, user_id: int, username: str, first_name: str, last_name: str) -> bool:
+    cursor = conn.execute('''
+        INSERT OR IGNORE INTO users (user_id, username, first_name, last_name)
+        VALUES (?, ?, ?, ?)
+    ''', (user_id, username, first_name, last_name))
+    return cursor.rowcount > 0
+
+def _insert_payment(conn: sqlite3.Connection, user_id: int, payment_type: str, amount: float, yookassa_payment_id: str) -> bool:
+    conn.execute('''
+        INSERT INTO payments (user_id, payment_type, amount, yookassa_payment_id)
+        VALUES (?, ?, ?, ?)
+    ''', (user_id, payment_type, amount, yookassa_payment_id))
+    return True
+
+def _update_payment_status(conn: sqlite3.Connection, yookassa_payment_id: str, status: str) -> bool:
+    cursor = conn.execute('''
+        UPDATE payments 
+        SET status = ?, paid_at = CURRENT_TIMESTAMP
+        WHERE yookassa_payment_id = ?
+    ''', (status, yookassa_payment_id))
+    return cursor.rowcount > 0
+
+def _update_pending_statuses(conn: sqlite3.Connection, updates: List[Tuple[str, str]]) -> List[str]:
+    # Меняем только платежи, которые все еще pending: webhook мог успеть раньше
+    return [
+        payment_id for payment_id, status in updates
+        if conn.execute('''
+            UPDATE payments 
+            SET status = ?, paid_at = CURRENT_TIMESTAMP
+            WHERE yookassa_payment_id = ? AND status = 'pending'
+        ''', (status, payment_id)).rowcount
+    ]
+
+def _upsert_entitlement(conn: sqlite3.Connection, user_id: int, access_type: str, now: datetime) -> Dict[str, Any]:
+    # Активный доступ продлевается от текущего срока, истекший — от текущего момента
+    row = conn.execute(
+        'SELECT expires_at, is_active FROM entitlements WHERE user_id = ? AND access_type = ?',
+        (user_id, access_type)
+    ).fetchone()
+    start = now
+    if row and row['is_active']:
+        current = parse_timestamp(row['expires_at'])
+        if current and current > now:
+            start = current
+    expires_at = start + timedelta(days=ACCESS_DURATION)
+    conn.execute('''
+        INSERT INTO entitlements (user_id, access_type, expires_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT (user_id, access_type) DO UPDATE SET
+            expires_at = excluded.expires_at,
+            is_active = TRUE
+    ''', (user_id, access_type, expires_at))
+    return dict(conn.execute(
+        'SELECT * FROM entitlements WHERE user_id = ? AND access_type = ?', (user_id, access_type)
+    ).fetchone())
+
+def _revoke_expired(conn: sqlite3.Connection) -> int:
+    return conn.execute(REVOKE_EXPIRED_QUERY).rowcount
+
+def _archive_payments(conn: sqlite3.Connection, age: str, batch_size: int) -> int:
+    ids = [row[0] for row in conn.execute(ARCHIVE_CANDIDATES_QUERY, (age, batch_size))]
+    if not ids:
+        return 0
+    placeholders = ", ".join("?" * len(ids))
+    conn.execute(f'''
+        INSERT OR IGNORE INTO payments_archive
+            (id, user_id, payment_type, amount, yookassa_payment_id, status, created_at, paid_at)
+        SELECT id, user_id, payment_type, amount, yookassa_payment_id, status, created_at, paid_at
+        FROM payments WHERE id IN ({placeholders})
+    ''', ids)
+    conn.execute(f'DELETE FROM payments WHERE id IN ({placeholders})', ids)
+    return len(ids)
+
+def _revoke_entitlements(conn: sqlite3.Connection, entitlements: List[Tuple[int, str, str]]) -> List[Tuple[int, str, str]]:
+    return [
+        entitlement for entitlement in entitlements
+        if conn.execute(REVOKE_ENTITLEMENT_QUERY, entitlement).rowcount
+    ]
+
+# Уведомления, которые ставятся в notification_outbox вместе с выдачей доступа по платежу;
+# приглашения в канал и в чат — отдельные строки, чтобы повторялись независимо
+PAYMENT_NOTIFICATIONS = ('invite_channel', 'invite_chat', 'payment_succeeded')
+
+def _enqueue_notification(conn: sqlite3.Connection, dedupe_key: str, kind: str, user_id: int,
+                          payload: Dict[str, Any], now: float) -> bool:
+    # Ключ уникален: повторная постановка того же уведомления ничего не добавляет
+    return conn.execute('''
+        INSERT OR IGNORE INTO notification_outbox (dedupe_key, kind, user_id, payload, created_at, available_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (dedupe_key, kind, user_id, json.dumps(payload, ensure_ascii=False), now, now)).rowcount > 0
+
+def _enqueue_payment_notifications(conn: sqlite3.Connection, payment: Dict[str, Any], now: float):
+    payload = {"payment_id": payment['yookassa_payment_id'], "payment_type": payment['payment_type']}
+    for kind in PAYMENT_NOTIFICATIONS:
+        _enqueue_notification(conn, f"{kind}:{payment['yookassa_payment_id']}", kind, payment['user_id'], payload, now)
+
+def _enqueue_revocations(conn: sqlite3.Connection, revocations: List[Tuple[int, str]], now: float) -> int:
+    # Повторное удаление из каналов: одна строка на пользователя и истекший срок
+    return sum(
+        _enqueue_notification(conn, f"revoke_access:{user_id}:{expires_at}", 'revoke_access', user_id,
+                              {"expires_at": str(expires_at)}, now)
+        for user_id, expires_at in revocations
+    )
+
+def _claim_fulfilment(conn: sqlite3.Connection, yookassa_payment_id: str, now: datetime,
+                      claimed_at: float, lease: float) -> Optional[Dict[str, Any]]:
+    # pending (или expired, если оплата пришла после окна подтверждения) -> succeeded
+    conn.execute('''
+        UPDATE payments 
+        SET status = 'succeeded', paid_at = CURRENT_TIMESTAMP
+        WHERE yookassa_payment_id = ? AND status IN ('pending', 'expired')
+    ''', (yookassa_payment_id,))
+    row = conn.execute(
+        'SELECT yookassa_payment_id, user_id, payment_type, status FROM all_payments WHERE yookassa_payment_id = ?',
+        (yookassa_payment_id,)
+    ).fetchone()
+    if row is None or row['status'] != 'succeeded':
+        return None
+
+    claim = dict(row, entitlement=None)
+    # succeeded -> granted: строка журнала, доступ, приглашения и уведомление
+    # в outbox фиксируются одной транзакцией
+    if conn.execute('''
+        INSERT OR IGNORE INTO payment_fulfilments (yookassa_payment_id, user_id, access_type, claimed_at)
+        VALUES (?, ?, ?, ?)
+    ''', (yookassa_payment_id, row['user_id'], row['payment_type'], claimed_at)).rowcount:
+        claim['entitlement'] = _upsert_entitlement(conn, row['user_id'], row['payment_type'], now)
+        _enqueue_payment_notifications(conn, row, claimed_at)
+        return claim
+    # Предыдущий обработчик выдал доступ, но не завершил выдачу за время аренды
+    # (в том числе выдачи, начатые до появления outbox)
+    if conn.execute('''
+        UPDATE payment_fulfilments SET claimed_at = ?
+        WHERE yookassa_payment_id = ? AND state = 'granted' AND claimed_at <= ?
+    ''', (claimed_at, yookassa_payment_id, claimed_at - lease)).rowcount:
+        _enqueue_payment_notifications(conn, row, claimed_at)
+        return claim
+    return None
+
+def _complete_fulfilment(conn: sqlite3.Connection, yookassa_payment_id: str, fulfilled_at: float) -> bool:
+    # granted -> fulfilled
+    return conn.execute('''
+        UPDATE payment_fulfilments SET state = 'fulfilled', fulfilled_at = ?
+        WHERE yookassa_payment_id = ? AND state = 'granted'
+    ''', (fulfilled_at, yookassa_payment_id)).rowcount > 0
+
 class Database:
-    def __init__(self):
-        self.db_path = DATABASE_PATH
+    def __init__(self, db_path: str = None, pool_size: int = POOL_SIZE):
+        self.db_path = db_path or DATABASE_PATH
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=pool_size)
+        self.access_cache = AccessCache()
+        self.writer = DatabaseWriter(self._open_connection)
+        # Подписчики на выдачу доступа (например, ExpiryScheduler)
+        self._grant_listeners: List[Callable[[Dict[str, Any]], None]] = []
         self.init_database()
+        self.load_access_cache()
+    
+    def _open_connection(self) -> sqlite3.Connection:
+        """Открытие нового соединения с настроенными PRAGMA"""
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Соединение из пула; блок выполняется в одной транзакции"""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._open_connection()
+        
+        try:
+            with conn:
+                yield conn
+        finally:
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+    
+    def close(self):
+        """Остановка потока записи и закрытие простаивающих соединений пула"""
+        self.writer.stop()
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+    
+    def _submit(self, operation: Callable, args: tuple, default: Any, error: str,
+                then: Callable[[Any], Any] = None) -> Future:
+        """Постановка записи в очередь DatabaseWriter.
+
+        Future завершается после COMMIT результатом операции (пропущенным через
+        then) или значением default, если запись не удалась.
+        """
+        result: Future = Future()
+        
+        def done(write: Future):
+            try:
+                value = write.result()
+                result.set_result(then(value) if then else value)
+            except Exception as e:
+                logger.error(f"{error}: {e}")
+                result.set_result(default)
+        
+        self.writer.submit(operation, *args).add_done_callback(done)
+        return result
     
     def init_database(self):
-        """Инициализация базы данных и создание таблиц"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Таблица пользователей
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY,
-                    username TEXT,
-                    first_name TEXT,
-                    last_name TEXT,
-                    joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_active BOOLEAN DEFAULT TRUE
-                )
-            ''')
-            
-            # Таблица платежей
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS payments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    payment_type TEXT, -- 'askeza' или 'numerology'
-                    amount REAL,
-                    yookassa_payment_id TEXT UNIQUE,
-                    status TEXT DEFAULT 'pending', -- 'pending', 'succeeded', 'canceled'
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    paid_at TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
-            
-            # Таблица доступа
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS access (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    access_type TEXT, -- 'askeza' или 'numerology'
-                    granted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    expires_at TIMESTAMP,
-                    is_active BOOLEAN DEFAULT TRUE,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
-            
-            conn.commit()
+        """Инициализация базы данных и применение миграций схемы"""
+        with self.connection() as conn:
+            apply_migrations(conn)
             logger.info("База данных инициализирована")
     
-    def add_user(self, user_id: int, username: str = None, first_name: str = None, last_name: str = None) -> bool:
-        """Добавление нового пользователя"""
+    def load_access_cache(self):
+        """Загрузка всех активных записей доступа в кэш"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT OR IGNORE INTO users (user_id, username, first_name, last_name)
-                    VALUES (?, ?, ?, ?)
-                ''', (user_id, username, first_name, last_name))
-                conn.commit()
-                return cursor.rowcount > 0
+            with self.connection() as conn:
+                rows = [dict(row) for row in conn.execute(ACTIVE_ACCESS_QUERY)]
+            self.access_cache.load(rows)
         except Exception as e:
-            logger.error(f"Ошибка при добавлении пользователя {user_id}: {e}")
-            return False
+            logger.error(f"Ошибка при загрузке кэша доступа: {e}")
+    
+    def submit_add_user(self, user_id: int, username: str = None, first_name: str = None, last_name: str = None) -> Future:
+        """Добавление пользователя без ожидания записи (Future[bool])"""
+        return self._submit(_insert_user, (user_id, username, first_name, last_name), False,
+                            f"Ошибка при добавлении пользователя {user_id}")
+    
+    def add_user(self, user_id: int, username: str = None, first_name: str = None, last_name: str = None) -> bool:
+        """Добавление нового пользователя"""
+        return self.submit_add_user(user_id, username, first_name, last_name).result()
     
     def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Получение информации о пользователе"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
                 row = cursor.fetchone()
@@ -87,108 +343,249 @@ class Database:
             logger.error(f"Ошибка при получении пользователя {user_id}: {e}")
             return None
     
+    def submit_create_payment(self, user_id: int, payment_type: str, amount: float, yookassa_payment_id: str) -> Future:
+        """Создание записи о платеже без ожидания записи (Future[bool])"""
+        return self._submit(_insert_payment, (user_id, payment_type, amount, yookassa_payment_id), False,
+                            "Ошибка при создании платежа")
+    
     def create_payment(self, user_id: int, payment_type: str, amount: float, yookassa_payment_id: str) -> bool:
         """Создание записи о платеже"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO payments (user_id, payment_type, amount, yookassa_payment_id)
-                    VALUES (?, ?, ?, ?)
-                ''', (user_id, payment_type, amount, yookassa_payment_id))
-                conn.commit()
-                return True
-        except Exception as e:
-            logger.error(f"Ошибка при создании платежа: {e}")
-            return False
+        return self.submit_create_payment(user_id, payment_type, amount, yookassa_payment_id).result()
+    
+    def submit_update_payment_status(self, yookassa_payment_id: str, status: str) -> Future:
+        """Обновление статуса платежа без ожидания записи (Future[bool])"""
+        return self._submit(_update_payment_status, (yookassa_payment_id, status), False,
+                            "Ошибка при обновлении статуса платежа")
     
     def update_payment_status(self, yookassa_payment_id: str, status: str) -> bool:
         """Обновление статуса платежа"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE payments 
-                    SET status = ?, paid_at = CURRENT_TIMESTAMP
-                    WHERE yookassa_payment_id = ?
-                ''', (status, yookassa_payment_id))
-                conn.commit()
-                return cursor.rowcount > 0
-        except Exception as e:
-            logger.error(f"Ошибка при обновлении статуса платежа: {e}")
-            return False
+        return self.submit_update_payment_status(yookassa_payment_id, status).result()
+    
+    def submit_update_pending_statuses(self, updates: List[Tuple[str, str]]) -> Future:
+        """Пакетное обновление статусов ожидающих платежей одной транзакцией.
+
+        Future[list] содержит id платежей, которые действительно сменили статус.
+        """
+        return self._submit(_update_pending_statuses, (list(updates),), [],
+                            "Ошибка при пакетном обновлении статусов платежей")
+    
+    def update_pending_statuses(self, updates: List[Tuple[str, str]]) -> List[str]:
+        """Пакетное обновление статусов ожидающих платежей"""
+        return self.submit_update_pending_statuses(updates).result()
     
     def get_payment(self, yookassa_payment_id: str) -> Optional[Dict[str, Any]]:
         """Получение информации о платеже"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute('SELECT * FROM payments WHERE yookassa_payment_id = ?', (yookassa_payment_id,))
                 row = cursor.fetchone()
+                if row is None:
+                    # Завершенные старые платежи лежат в архиве
+                    cursor.execute('SELECT * FROM payments_archive WHERE yookassa_payment_id = ?', (yookassa_payment_id,))
+                    row = cursor.fetchone()
                 return dict(row) if row else None
         except Exception as e:
             logger.error(f"Ошибка при получении платежа: {e}")
             return None
     
-    def grant_access(self, user_id: int, access_type: str) -> bool:
-        """Предоставление доступа пользователю"""
+    def get_payment_history(self, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        """Последние платежи пользователя"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connection() as conn:
                 cursor = conn.cursor()
-                expires_at = datetime.now() + timedelta(days=30)
-                cursor.execute('''
-                    INSERT INTO access (user_id, access_type, expires_at)
-                    VALUES (?, ?, ?)
-                ''', (user_id, access_type, expires_at))
-                conn.commit()
-                return True
+                cursor.execute(PAYMENT_HISTORY_QUERY, (user_id, limit))
+                history = [dict(row) for row in cursor.fetchall()]
+                if len(history) < limit:
+                    # Архив читаем, только если горячих платежей не хватило:
+                    # все архивные старше любого горячего
+                    cursor.execute(ARCHIVED_PAYMENT_HISTORY_QUERY, (user_id, limit - len(history)))
+                    history.extend(dict(row) for row in cursor.fetchall())
+                return history
         except Exception as e:
-            logger.error(f"Ошибка при предоставлении доступа: {e}")
-            return False
+            logger.error(f"Ошибка при получении истории платежей пользователя {user_id}: {e}")
+            return []
+    
+    def get_pending_payments(self) -> List[Dict[str, Any]]:
+        """Платежи, ожидающие подтверждения"""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(PENDING_PAYMENTS_QUERY)
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Ошибка при получении ожидающих платежей: {e}")
+            return []
+    
+    def add_grant_listener(self, listener: Callable[[Dict[str, Any]], None]):
+        """Подписка на зафиксированные выдачи доступа (вызывается в потоке записи)"""
+        self._grant_listeners.append(listener)
+    
+    def _cache_granted(self, row: Dict[str, Any]) -> bool:
+        """Запись выданного доступа в кэш после фиксации"""
+        self.access_cache.grant(row)
+        for listener in self._grant_listeners:
+            try:
+                listener(row)
+            except Exception as e:
+                logger.error(f"Ошибка в подписчике на выдачу доступа: {e}")
+        return True
+    
+    def submit_grant_access(self, user_id: int, access_type: str) -> Future:
+        """Предоставление доступа без ожидания записи (Future[bool])"""
+        return self._submit(_upsert_entitlement, (user_id, access_type, datetime.now()), False,
+                            "Ошибка при предоставлении доступа", then=self._cache_granted)
+    
+    def grant_access(self, user_id: int, access_type: str) -> bool:
+        """Предоставление или продление доступа пользователю"""
+        return self.submit_grant_access(user_id, access_type).result()
     
     def get_user_access(self, user_id: int) -> List[Dict[str, Any]]:
         """Получение активного доступа пользователя"""
+        cached = self.access_cache.get(user_id)
+        if cached is not None:
+            return cached
+        return self.query_user_access(user_id)
+    
+    def query_user_access(self, user_id: int) -> List[Dict[str, Any]]:
+        """Чтение активного доступа из базы с обновлением кэша"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT * FROM access 
-                    WHERE user_id = ? AND is_active = TRUE AND expires_at > CURRENT_TIMESTAMP
-                ''', (user_id,))
-                rows = cursor.fetchall()
-                return [dict(row) for row in rows]
+                cursor.execute(USER_ACCESS_QUERY, (user_id,))
+                rows = [dict(row) for row in cursor.fetchall()]
+            self.access_cache.put(user_id, rows)
+            return rows
         except Exception as e:
             logger.error(f"Ошибка при получении доступа пользователя: {e}")
             return []
     
+    def has_active_access(self, user_id: int) -> bool:
+        """Есть ли у пользователя активный доступ (из кэша, если возможно)"""
+        cached = self.access_cache.has_active_access(user_id)
+        if cached is not None:
+            return cached
+        return bool(self.query_user_access(user_id))
+    
+    def _cache_revoked(self, revoked: int) -> int:
+        """Удаление истекших записей из кэша после фиксации"""
+        self.access_cache.evict_expired()
+        return revoked
+    
+    def submit_revoke_expired_access(self) -> Future:
+        """Отзыв истекшего доступа без ожидания записи (Future[int])"""
+        return self._submit(_revoke_expired, (), 0,
+                            "Ошибка при отзыве истекшего доступа", then=self._cache_revoked)
+    
     def revoke_expired_access(self) -> int:
         """Отзыв истекшего доступа"""
+        return self.submit_revoke_expired_access().result()
+    
+    def _cache_entitlements_revoked(self, revoked: List[Tuple[int, str, str]]) -> List[Tuple[int, str, str]]:
+        """Удаление отозванных прав из кэша после фиксации"""
+        for user_id, access_type, _ in revoked:
+            self.access_cache.revoke(user_id, access_type)
+        return revoked
+    
+    def submit_revoke_entitlements(self, entitlements: List[Tuple[int, str, str]]) -> Future:
+        """Отзыв конкретных прав (user_id, access_type, expires_at) без ожидания записи.
+
+        Future[list] содержит только действительно отозванные права: если право
+        успели продлить, его expires_at уже другой и строка не меняется.
+        None — если запись не удалась.
+        """
+        return self._submit(_revoke_entitlements, (list(entitlements),), None,
+                            "Ошибка при отзыве прав доступа", then=self._cache_entitlements_revoked)
+    
+    def revoke_entitlements(self, entitlements: List[Tuple[int, str, str]]) -> Optional[List[Tuple[int, str, str]]]:
+        """Отзыв конкретных прав доступа"""
+        return self.submit_revoke_entitlements(entitlements).result()
+    
+    def submit_enqueue_revocations(self, revocations: List[Tuple[int, str]]) -> Future:
+        """Постановка неудавшихся удалений (user_id, expires_at) в notification_outbox
+        для повтора (Future[int] — число новых строк, None — ошибка записи)"""
+        return self._submit(_enqueue_revocations, (list(revocations), time.time()), None,
+                            "Ошибка при постановке отзыва доступа в outbox")
+    
+    def submit_archive_payments(self, older_than_days: int, batch_size: int) -> Future:
+        """Перенос пакета завершенных платежей в архив без ожидания (Future[int])"""
+        return self._submit(_archive_payments, (f'-{older_than_days} days', batch_size), 0,
+                            "Ошибка при архивации платежей")
+    
+    def archive_payments(self, older_than_days: int, batch_size: int) -> int:
+        """Перенос пакета завершенных платежей в архив; возвращает число перенесенных"""
+        return self.submit_archive_payments(older_than_days, batch_size).result()
+    
+    def _cache_claimed(self, claim: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Запись доступа, выданного при захвате платежа, в кэш"""
+        if claim and claim['entitlement']:
+            self._cache_granted(claim['entitlement'])
+        return claim
+    
+    def submit_claim_fulfilment(self, yookassa_payment_id: str, lease: float = FULFILMENT_LEASE) -> Future:
+        """Захват оплаченного платежа для выдачи доступа (compare-and-set).
+
+        Future содержит платеж с полем entitlement (выданный доступ или None,
+        если продолжается выдача с истекшей арендой), None — если платеж не
+        оплачен или его уже выдает другой обработчик, False — при ошибке записи.
+        """
+        return self._submit(_claim_fulfilment, (yookassa_payment_id, datetime.now(), time.time(), lease), False,
+                            f"Ошибка при захвате платежа {yookassa_payment_id}", then=self._cache_claimed)
+    
+    def claim_fulfilment(self, yookassa_payment_id: str, lease: float = FULFILMENT_LEASE) -> Any:
+        """Захват оплаченного платежа для выдачи доступа"""
+        return self.submit_claim_fulfilment(yookassa_payment_id, lease).result()
+    
+    def submit_complete_fulfilment(self, yookassa_payment_id: str) -> Future:
+        """Отметка о завершенной выдаче без ожидания записи (Future[bool])"""
+        return self._submit(_complete_fulfilment, (yookassa_payment_id, time.time()), False,
+                            f"Ошибка при завершении выдачи по платежу {yookassa_payment_id}")
+    
+    def complete_fulfilment(self, yookassa_payment_id: str) -> bool:
+        """Отметка о завершенной выдаче (приглашения и уведомление поставлены в outbox)"""
+        return self.submit_complete_fulfilment(yookassa_payment_id).result()
+    
+    def get_unfulfilled_payments(self, days: int, lease: float = FULFILMENT_LEASE) -> List[Dict[str, Any]]:
+        """Оплаченные за последние days дней платежи, выдача по которым не завершена"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE access 
-                    SET is_active = FALSE 
-                    WHERE expires_at <= CURRENT_TIMESTAMP AND is_active = TRUE
-                ''')
-                conn.commit()
-                return cursor.rowcount
+            with self.connection() as conn:
+                cursor = conn.execute(UNFULFILLED_PAYMENTS_QUERY, (f'-{days} days', time.time() - lease))
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Ошибка при получении невыданных платежей: {e}")
+            return []
+    
+    def get_active_expiries(self) -> List[Tuple[int, str, str]]:
+        """Все активные права в порядке истечения (по индексу expires_at)"""
+        try:
+            with self.connection() as conn:
+                return [tuple(row) for row in conn.execute(EXPIRY_SCHEDULE_QUERY)]
         except Exception as e:
-            logger.error(f"Ошибка при отзыве истекшего доступа: {e}")
-            return 0
+            logger.error(f"Ошибка при получении сроков доступа: {e}")
+            return []
     
     def get_expired_users(self) -> List[int]:
         """Получение пользователей с истекшим доступом"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT DISTINCT user_id FROM access 
-                    WHERE expires_at <= CURRENT_TIMESTAMP AND is_active = TRUE
-                ''')
-                return [row[0] for row in cursor.fetchall()]
+                cursor.execute(EXPIRED_USERS_QUERY)
+                # Дубликаты убираем здесь: DISTINCT в SQL заставляет SQLite
+                # обходить весь индекс вместо поиска по диапазону expires_at
+                return list(dict.fromkeys(row[0] for row in cursor.fetchall()))
         except Exception as e:
             logger.error(f"Ошибка при получении пользователей с истекшим доступом: {e}")
             return []
+
+
+_shared_database: Optional[Database] = None
+_shared_lock = threading.Lock()
+
+def get_database() -> Database:
+    """Общий экземпляр базы данных для всех модулей процесса"""
+    global _shared_database
+    if _shared_database is None:
+        with _shared_lock:
+            if _shared_database is None:
+                _shared_database = Database()
+    return _shared_database
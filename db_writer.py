@@ -0,0 +1,178 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Максимум операций в одной транзакции
+MAX_BATCH = 128
+# Сколько ждать (секунды) дополнительных операций после первой; 0 — не ждать,
+# пакет набирается только из того, что уже лежит в очереди
+MAX_BATCH_DELAY = 0.0
+
+Operation = Callable[..., Any]
+
+class DatabaseWriter:
+    """Единственный поток записи в SQLite.
+
+    Мутации из любых потоков и event loop'ов ставятся в очередь; поток записи
+    забирает их пачками и фиксирует одной транзакцией (group commit). Каждая
+    операция выполняется в своем SAVEPOINT, поэтому ошибка одной не откатывает
+    остальные. Future операции завершается только после COMMIT.
+    """
+
+    def __init__(self, open_connection: Callable[[], sqlite3.Connection],
+                 max_batch: int = MAX_BATCH, max_delay: float = MAX_BATCH_DELAY):
+        self._open_connection = open_connection
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: "queue.Queue[Optional[Tuple[Operation, tuple, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        # Ошибка открытия соединения: все операции, и поставленные, и новые, завершаются ею
+        self._error: Optional[BaseException] = None
+        self.operations = 0
+        self.failed_operations = 0
+        self.batches = 0
+        self.busy_time = 0.0
+
+    def start(self):
+        """Запуск потока записи (повторный вызов ничего не делает)"""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """Остановка после записи всего, что уже в очереди"""
+        with self._start_lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._queue.put(None)
+            thread.join(timeout)
+            self._thread = None
+
+    def submit(self, operation: Operation, *args) -> Future:
+        """Постановка операции operation(conn, *args) в очередь записи"""
+        future: Future = Future()
+        if self._error is not None:
+            future.set_exception(self._error)
+            return future
+        self.start()
+        self._queue.put((operation, args, future))
+        # Поток записи мог упасть между проверкой и постановкой: очередь никто не разберет
+        if self._error is not None:
+            self._fail_pending(self._error)
+        return future
+
+    def execute(self, operation: Operation, *args, timeout: float = None) -> Any:
+        """Синхронная запись: ждет фиксации и возвращает результат операции"""
+        return self.submit(operation, *args).result(timeout)
+
+    def queue_size(self) -> int:
+        """Число операций, ожидающих записи"""
+        return self._queue.qsize()
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики пропускной способности"""
+        with self._stats_lock:
+            return {
+                "operations": self.operations,
+                "failed_operations": self.failed_operations,
+                "batches": self.batches,
+                "avg_batch_size": self.operations / self.batches if self.batches else 0.0,
+                "ops_per_busy_second": self.operations / self.busy_time if self.busy_time else 0.0,
+                "queue_size": self.queue_size(),
+            }
+
+    def _collect_batch(self, first) -> Tuple[List[Tuple[Operation, tuple, Future]], bool]:
+        """Первая операция плюс все, что успело накопиться в очереди"""
+        batch = [first]
+        stop = False
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                remaining = deadline - time.monotonic()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+        return batch, stop
+
+    def _run(self):
+        """Основной цикл потока записи"""
+        try:
+            conn = self._open_connection()
+            conn.isolation_level = None  # транзакциями управляем сами
+        except Exception as e:
+            logger.error(f"Не удалось открыть соединение для записи: {e}")
+            self._error = e
+            self._fail_pending(e)
+            return
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                batch, stop = self._collect_batch(item)
+                self._write_batch(conn, batch)
+                if stop:
+                    break
+        finally:
+            conn.close()
+
+    def _fail_pending(self, error: BaseException):
+        """Завершение всех операций в очереди ошибкой"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                item[2].set_exception(error)
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: List[Tuple[Operation, tuple, Future]]):
+        """Выполнение пачки операций в одной транзакции"""
+        started = time.perf_counter()
+        outcomes: List[Tuple[Future, bool, Any]] = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for operation, args, future in batch:
+                conn.execute("SAVEPOINT operation")
+                try:
+                    result = operation(conn, *args)
+                    conn.execute("RELEASE operation")
+                    outcomes.append((future, True, result))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO operation")
+                    conn.execute("RELEASE operation")
+                    outcomes.append((future, False, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"Ошибка при фиксации пакета из {len(batch)} операций: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            outcomes = [(future, False, e) for _, _, future in batch]
+
+        failed = sum(1 for _, ok, _ in outcomes if not ok)
+        with self._stats_lock:
+            self.operations += len(batch)
+            self.failed_operations += failed
+            self.batches += 1
+            self.busy_time += time.perf_counter() - started
+
+        # Результаты отдаем только после COMMIT — это и есть подтверждение записи
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
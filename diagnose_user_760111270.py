@@ -9,7 +9,8 @@ import logging
 from datetime import datetime
 from database import Database
 from channel_manager import ChannelManager
-from config import BOT_TOKEN, PRIVATE_CHANNEL_ID, PRIVATE_CHAT_ID
+from config import PRIVATE_CHANNEL_ID, PRIVATE_CHAT_ID
+from telegram_transport import get_bot
 
 # Настройка логирования
 logging.basicConfig(
@@ -134,9 +135,9 @@ async def simulate_payment_notification(user_id: int):
     print("=" * 50)
     
     try:
-        from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+        from telegram import InlineKeyboardButton, InlineKeyboardMarkup
         
-        bot = Bot(token=BOT_TOKEN)
+        bot = get_bot()
         
         success_text = f"""
 ✅ Платеж успешно обработан!
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Потоковый перенос прав доступа из устаревших таблиц access и user_access
+в единую таблицу entitlements
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from typing import Optional, List, Dict, Any
+from database import Database, get_database
+
+logger = logging.getLogger(__name__)
+
+# Устаревшие таблицы в порядке переноса
+LEGACY_SOURCES = ("access", "user_access")
+# Строк за одну транзакцию
+BATCH_SIZE = 500
+# Пауза между пакетами (секунды), чтобы запись бота не ждала переноса
+BATCH_PAUSE = 0.05
+
+# Возможные имена колонок в разных версиях устаревших таблиц
+COLUMN_ALIASES = {
+    "access_type": ("access_type", "payment_type"),
+    "expires_at": ("expires_at", "end_date"),
+    "granted_at": ("granted_at", "created_at", "start_date"),
+    "is_active": ("is_active",),
+}
+
+def _merge_batch(conn: sqlite3.Connection, source: str, rows: List[Dict[str, Any]], last_id: int) -> int:
+    """Слияние пакета строк в entitlements и запись прогресса (поток DatabaseWriter)"""
+    conn.executemany('''
+        INSERT INTO entitlements (user_id, access_type, granted_at, expires_at, is_active)
+        VALUES (:user_id, :access_type, COALESCE(:granted_at, CURRENT_TIMESTAMP), :expires_at, :is_active)
+        ON CONFLICT (user_id, access_type) DO UPDATE SET
+            granted_at = MIN(entitlements.granted_at, excluded.granted_at),
+            expires_at = MAX(entitlements.expires_at, excluded.expires_at),
+            -- Право, уже отозванное планировщиком, оживляет только более поздний срок
+            is_active = CASE WHEN excluded.expires_at > entitlements.expires_at
+                             THEN entitlements.is_active OR excluded.is_active
+                             ELSE entitlements.is_active END
+    ''', rows)
+    conn.execute('''
+        INSERT INTO entitlement_migration (source, last_id) VALUES (?, ?)
+        ON CONFLICT (source) DO UPDATE SET last_id = excluded.last_id
+    ''', (source, last_id))
+    return len(rows)
+
+class EntitlementMigrator:
+    """Перенос пакетами: каждое чтение и каждая запись — короткая транзакция,
+    прогресс хранится в entitlement_migration, поэтому перенос можно прервать
+    и продолжить, а живой бот продолжает писать между пакетами"""
+
+    def __init__(self, db: Database = None, batch_size: int = BATCH_SIZE, pause: float = BATCH_PAUSE):
+        self.db = db or get_database()
+        self.batch_size = batch_size
+        self.pause = pause
+        self.migrated = 0
+
+    def _select_list(self, conn: sqlite3.Connection, source: str) -> Optional[str]:
+        """Колонки источника в терминах entitlements или None, если таблицы нет"""
+        columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({source})")}
+        if not {"id", "user_id"} <= columns:
+            return None
+
+        selected = ["id", "user_id"]
+        for target, aliases in COLUMN_ALIASES.items():
+            found = next((alias for alias in aliases if alias in columns), None)
+            if found:
+                selected.append(f"{found} AS {target}")
+            elif target == "is_active":
+                selected.append("1 AS is_active")
+            elif target == "granted_at":
+                selected.append("NULL AS granted_at")
+            else:
+                logger.warning(f"В таблице {source} нет колонки {target}, перенос пропущен")
+                return None
+        return ", ".join(selected)
+
+    def migrate_batch(self, source: str) -> int:
+        """Перенос следующего пакета из source; 0 — источник исчерпан"""
+        with self.db.connection() as conn:
+            select_list = self._select_list(conn, source)
+            if select_list is None:
+                return 0
+            progress = conn.execute(
+                'SELECT last_id FROM entitlement_migration WHERE source = ?', (source,)
+            ).fetchone()
+            last_id = progress["last_id"] if progress else 0
+            rows = [dict(row) for row in conn.execute(
+                f'SELECT {select_list} FROM {source} WHERE id > ? ORDER BY id LIMIT ?',
+                (last_id, self.batch_size)
+            )]
+
+        if not rows:
+            return 0
+
+        batch_last_id = rows[-1]["id"]
+        valid = [row for row in rows if row["user_id"] is not None and row["access_type"] and row["expires_at"]]
+        self.db.writer.execute(_merge_batch, source, valid, batch_last_id)
+        return len(rows)
+
+    def run(self) -> int:
+        """Перенос всех источников до конца; возвращает число строк"""
+        migrated = 0
+        for source in LEGACY_SOURCES:
+            while True:
+                count = self.migrate_batch(source)
+                if not count:
+                    break
+                migrated += count
+                time.sleep(self.pause)
+
+        if migrated:
+            # Перенесенные права должны сразу быть видны через кэш
+            self.db.load_access_cache()
+            logger.info(f"Перенесено {migrated} записей доступа в entitlements")
+        self.migrated += migrated
+        return migrated
+
+    def start(self) -> threading.Thread:
+        """Запуск переноса в фоновом потоке"""
+        def worker():
+            try:
+                self.run()
+            except Exception as e:
+                logger.error(f"Ошибка при переносе прав доступа: {e}")
+
+        thread = threading.Thread(target=worker, name="entitlement-migration", daemon=True)
+        thread.start()
+        return thread
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    print("🔄 Перенос прав доступа в entitlements")
+    print("=" * 50)
+    migrated = EntitlementMigrator().run()
+    print(f"✅ Перенесено записей: {migrated}")
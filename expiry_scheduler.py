@@ -0,0 +1,245 @@
+import asyncio
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Tuple
+from access_cache import parse_timestamp
+from async_database import AsyncDatabase, get_async_database
+
+logger = logging.getLogger(__name__)
+
+# Прав, отзываемых одной транзакцией
+MAX_BATCH = 256
+# Максимальный сон планировщика (секунды): страховка от перевода системных часов
+MAX_SLEEP = 3600
+# Период повторной загрузки сроков из базы (секунды): доступ, выданный другим
+# процессом (Flask-сервер, опрос платежей, воркеры webhook), не проходит через
+# подписку на Database этого процесса
+RESCAN_INTERVAL = 300
+# Первая пауза после неудачной записи отзыва (секунды); удваивается до MAX_SLEEP
+RETRY_DELAY = 5
+
+EXPIRED_TEXT = "⏰ Ваш доступ к материалам Аскезы истек. Для продления обратитесь к боту."
+
+class ExpiryScheduler:
+    """Отзыв доступа точно в момент истечения.
+
+    Сроки лежат в min-куче (expires_at, user_id, access_type); при старте куча
+    заполняется из индекса idx_entitlements_active_expiry, новые выдачи доступа
+    добавляются через подписку на Database, а выданные другими процессами —
+    при повторной загрузке раз в rescan_interval. Продление не удаляет старую
+    запись из кучи: при ее срабатывании отзыв по (user_id, access_type,
+    expires_at) просто не найдет строку, потому что expires_at уже другой.
+    Отзыв — compare-and-set, поэтому планировщики нескольких процессов над
+    одной базой не отзывают одно право дважды. Пользователи, которых не
+    удалось удалить из каналов, передаются на повтор в notification_outbox.
+    """
+
+    def __init__(self, db: AsyncDatabase = None, channel_manager=None, max_batch: int = MAX_BATCH,
+                 rescan_interval: float = RESCAN_INTERVAL):
+        self.db = db or get_async_database()
+        self.channel_manager = channel_manager
+        self.max_batch = max_batch
+        self.rescan_interval = rescan_interval
+        self._heap: List[Tuple[datetime, int, str, str]] = []
+        # Сроки, уже лежащие в куче: повторная загрузка не создает дубликатов
+        self._scheduled = set()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._rescanned_at = 0.0
+        # Пауза перед повтором после неудачной записи отзыва (0 — ошибок не было)
+        self._retry_delay = 0.0
+        self.revoked = 0
+        self.batches = 0
+        self.failures = 0
+        # Удалений из каналов, переданных на повтор в notification_outbox
+        self.requeued = 0
+
+    def schedule(self, user_id: int, access_type: str, expires_at) -> bool:
+        """Добавление срока в кучу; False, если он уже там. Безопасно вызывать из любого потока"""
+        expires = parse_timestamp(expires_at)
+        if expires is None:
+            return False
+
+        with self._lock:
+            key = (expires, user_id, access_type)
+            if key in self._scheduled:
+                return False
+            self._scheduled.add(key)
+            earliest = self._heap[0][0] if self._heap else None
+            heapq.heappush(self._heap, (expires, user_id, access_type, str(expires_at)))
+
+        # Будим цикл, только если новый срок наступает раньше ожидаемого
+        if self._loop is not None and (earliest is None or expires < earliest):
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return True
+
+    def _on_grant(self, row: Dict[str, Any]):
+        """Подписчик Database: выдача или продление доступа"""
+        self.schedule(row["user_id"], row["access_type"], row["expires_at"])
+
+    async def rehydrate(self) -> int:
+        """Заполнение кучи активными правами из базы; возвращает число новых сроков"""
+        self._rescanned_at = time.monotonic()
+        expiries = await self.db.get_active_expiries()
+        added = sum(self.schedule(user_id, access_type, expires_at) for user_id, access_type, expires_at in expiries)
+        logger.info(f"Планировщик истечения доступа загружен: {len(expiries)} записей, новых: {added}")
+        return added
+
+    def pending(self) -> int:
+        """Число сроков в куче"""
+        with self._lock:
+            return len(self._heap)
+
+    def next_expiry(self) -> Optional[datetime]:
+        """Ближайший срок истечения"""
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def _pop_due(self, now: datetime) -> List[Tuple[int, str, str]]:
+        """Извлечение наступивших сроков (не больше max_batch)"""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(due) < self.max_batch:
+                expires, user_id, access_type, expires_at = heapq.heappop(self._heap)
+                self._scheduled.discard((expires, user_id, access_type))
+                due.append((user_id, access_type, expires_at))
+        return due
+
+    def _push_back(self, due: List[Tuple[int, str, str]]):
+        """Возврат сроков в кучу после неудачного отзыва"""
+        for user_id, access_type, expires_at in due:
+            self.schedule(user_id, access_type, expires_at)
+
+    async def run_due(self, now: datetime = None) -> int:
+        """Отзыв всех наступивших сроков; возвращает число отозванных прав"""
+        revoked_total = 0
+        while True:
+            due = self._pop_due(now or datetime.now())
+            if not due:
+                return revoked_total
+
+            revoked = await self.db.revoke_entitlements(due)
+            if revoked is None:
+                # Запись не удалась: сроки возвращаются в кучу, повтор — после паузы
+                self._push_back(due)
+                self.failures += 1
+                self._retry_delay = min(MAX_SLEEP, self._retry_delay * 2 or RETRY_DELAY)
+                logger.warning(f"Отзыв {len(due)} прав не записан, повтор через {self._retry_delay:.0f} с")
+                return revoked_total
+
+            self._retry_delay = 0.0
+            self.batches += 1
+            self.revoked += len(revoked)
+            revoked_total += len(revoked)
+            if not revoked:
+                continue
+
+            # Из каналов удаляем только тех, у кого не осталось другого активного доступа
+            user_ids = list(dict.fromkeys(user_id for user_id, _, _ in revoked))
+            expired_users = [
+                user_id for user_id in user_ids
+                if not await self.db.has_active_access(user_id)
+            ]
+            logger.info(f"Отозвано прав: {len(revoked)}, без доступа осталось пользователей: {len(expired_users)}")
+
+            if expired_users and self.channel_manager is not None:
+                await self._remove_from_channels(expired_users, revoked)
+
+    async def _remove_from_channels(self, user_ids: List[int], revoked: List[Tuple[int, str, str]]):
+        """Удаление из каналов; неудавшиеся удаления ставятся в notification_outbox.
+
+        Право в базе уже отозвано, поэтому удаление, не прошедшее сейчас (flood
+        wait, сеть, бот потерял права администратора), должно пережить процесс:
+        NotificationDispatcher повторит его с паузой.
+        """
+        try:
+            results = await self.channel_manager.revoke_access_from_users(user_ids, EXPIRED_TEXT)
+        except Exception as e:
+            logger.error(f"Ошибка при удалении пользователей из каналов: {e}")
+            results = {}
+        failed = [user_id for user_id in user_ids if not results.get(user_id)]
+        if not failed:
+            return
+        expires = {}
+        for user_id, _, expires_at in revoked:
+            expires[user_id] = max(expires.get(user_id, expires_at), expires_at)
+        queued = await self.db.enqueue_revocations([(user_id, expires[user_id]) for user_id in failed])
+        if queued is None:
+            logger.error(f"Не удалось поставить в очередь удаление {len(failed)} пользователей из каналов")
+        else:
+            self.requeued += len(failed)
+            logger.warning(f"Удаление {len(failed)} пользователей из каналов не удалось, поставлено на повтор")
+
+    async def run(self):
+        """Основной цикл: сон до ближайшего срока, нового более раннего или повторной загрузки"""
+        while True:
+            self._wakeup.clear()
+            try:
+                if time.monotonic() - self._rescanned_at >= self.rescan_interval:
+                    await self.rehydrate()
+                await self.run_due()
+            except Exception as e:
+                logger.error(f"Ошибка при отзыве истекшего доступа: {e}")
+
+            next_expiry = self.next_expiry()
+            timeout = MAX_SLEEP
+            if self._retry_delay:
+                timeout = self._retry_delay
+            elif next_expiry is not None:
+                timeout = min(MAX_SLEEP, max(0.0, (next_expiry - datetime.now()).total_seconds()))
+            timeout = min(timeout, max(0.0, self._rescanned_at + self.rescan_interval - time.monotonic()))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> asyncio.Task:
+        """Загрузка сроков и запуск цикла в текущем event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        # Подписываемся до загрузки, чтобы не потерять выдачи между чтением и запуском
+        self.db.db.add_grant_listener(self._on_grant)
+        await self.rehydrate()
+        self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        """Остановка цикла"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_forever(self):
+        """Запуск и ожидание (для отдельного потока с asyncio.run)"""
+        await self.start()
+        await self._task
+
+    def start_in_thread(self) -> threading.Thread:
+        """Планировщик в отдельном потоке со своим event loop (для Flask-процессов).
+
+        Бот менеджера каналов должен быть создан для этого потока (create_bot()).
+        """
+        thread = threading.Thread(target=lambda: asyncio.run(self.run_forever()), name="expiry-scheduler", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики планировщика"""
+        next_expiry = self.next_expiry()
+        return {
+            "pending": self.pending(),
+            "next_expiry": next_expiry.isoformat() if next_expiry else None,
+            "revoked": self.revoked,
+            "batches": self.batches,
+            "failures": self.failures,
+            "requeued": self.requeued,
+        }
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Локальный фейковый сервер Telegram Bot API для тестов и бенчмарков.
+
+Принимает вызовы /bot<token>/<метод> (JSON, form-urlencoded и multipart, как
+их отправляет python-telegram-bot), запоминает их и отвечает правдоподобными
+объектами. Зарегистрированному через setWebhook адресу можно доставлять
+обновления с секретным заголовком — так же, как это делает Telegram.
+"""
+
+import itertools
+import json
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import parse_qs
+import httpx
+from fake_yookassa import _QuietServer
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+MEDIA_FIELDS = ("video", "photo", "animation", "document", "audio")
+ADMIN_RIGHTS = (
+    "can_manage_chat", "can_delete_messages", "can_manage_video_chats", "can_restrict_members",
+    "can_promote_members", "can_change_info", "can_invite_users", "can_post_stories",
+    "can_edit_stories", "can_delete_stories",
+)
+
+def parse_params(content_type: str, raw: bytes) -> Dict[str, Any]:
+    """Параметры вызова; у файлов сохраняется только размер"""
+    if not raw:
+        return {}
+    if content_type.startswith("application/json"):
+        return json.loads(raw)
+    if content_type.startswith("multipart/form-data"):
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + raw
+        )
+        params = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            payload = part.get_payload(decode=True)
+            params[name] = {"size": len(payload)} if part.get_filename() else payload.decode()
+        return params
+    return {key: values[-1] for key, values in parse_qs(raw.decode()).items()}
+
+class FakeBotAPI:
+    """Фейковый Bot API в фоновом потоке: with FakeBotAPI(token) as fake: fake.base_url"""
+
+    def __init__(self, token: str = "123456:fake-token", delay: float = 0.0):
+        self.token = token
+        self.delay = delay
+        self.calls: List[Tuple[str, Dict[str, Any]]] = []
+        self.webhook_url: Optional[str] = None
+        self.webhook_secret: Optional[str] = None
+        # Права бота-администратора во всех чатах (getChatMember для id бота)
+        self.bot_rights = {field: True for field in ADMIN_RIGHTS}
+        self.bot_rights.update(can_be_edited=False, is_anonymous=False)
+        # Выданные file_id; отправка по неизвестному id отклоняется, как в Telegram
+        self.files = set()
+        self._errors: Dict[str, List[Dict[str, Any]]] = {}
+        self._message_ids = itertools.count(1)
+        self._link_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server: Optional[_QuietServer] = None
+
+    @property
+    def base_url(self) -> str:
+        """Значение для Application.builder().base_url(...)"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    @property
+    def bot_id(self) -> int:
+        return int(self.token.split(":", 1)[0])
+
+    def methods(self) -> List[str]:
+        """Вызванные методы по порядку"""
+        with self._lock:
+            return [method for method, _ in self.calls]
+
+    def calls_to(self, method: str) -> List[Dict[str, Any]]:
+        """Параметры всех вызовов метода"""
+        with self._lock:
+            return [params for name, params in self.calls if name == method]
+
+    def fail_next(self, method: str, error_code: int = 400, description: str = "Bad Request",
+                  retry_after: Optional[int] = None):
+        """Следующий вызов метода вернет ошибку (retry_after — как при флуд-контроле)"""
+        error = {"ok": False, "error_code": error_code, "description": description}
+        if retry_after is not None:
+            error["parameters"] = {"retry_after": retry_after}
+        with self._lock:
+            self._errors.setdefault(method, []).append(error)
+
+    def _message(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        chat_id = params.get("chat_id", 0)
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id) if str(chat_id).lstrip("-").isdigit() else 0, "type": "private"},
+            "from": {"id": self.bot_id, "is_bot": True, "first_name": "Fake"},
+        }
+        if "text" in params:
+            message["text"] = params["text"]
+        for field in MEDIA_FIELDS:
+            if field in params:
+                value = params[field]
+                # Загруженный файл получает новый id, отправленный по id — тот же
+                file_id = value if isinstance(value, str) else f"{field}-{message['message_id']}"
+                self.files.add(file_id)
+                media = {"file_id": file_id, "file_unique_id": f"u-{file_id}", "width": 1, "height": 1, "duration": 1}
+                message[field] = [media] if field == "photo" else media
+        return message
+
+    def _invite_link(self, invite_link: str, params: Dict[str, Any], revoked: bool = False) -> Dict[str, Any]:
+        link = {"invite_link": invite_link, "creator": {"id": self.bot_id, "is_bot": True, "first_name": "Fake"},
+                "creates_join_request": False, "is_primary": False, "is_revoked": revoked}
+        for field in ("member_limit", "expire_date"):
+            if field in params:
+                link[field] = int(params[field])
+        return link
+
+    def _unknown_file(self, params: Dict[str, Any]) -> bool:
+        with self._lock:
+            return any(isinstance(params.get(field), str) and params[field] not in self.files
+                       for field in MEDIA_FIELDS)
+
+    def _result(self, method: str, params: Dict[str, Any]) -> Any:
+        if method == "getMe":
+            return {"id": self.bot_id, "is_bot": True, "first_name": "Fake", "username": "fake_bot",
+                    "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": False}
+        if method == "setWebhook":
+            self.webhook_url = params.get("url")
+            self.webhook_secret = params.get("secret_token")
+            return True
+        if method == "deleteWebhook":
+            self.webhook_url = self.webhook_secret = None
+            return True
+        if method == "getWebhookInfo":
+            return {"url": self.webhook_url or "", "has_custom_certificate": False, "pending_update_count": 0}
+        if method in ("sendMessage", "sendVideo", "sendPhoto", "sendAnimation", "sendDocument", "sendAudio", "editMessageText"):
+            return self._message(params)
+        if method == "getChat":
+            return {"id": int(params.get("chat_id", 0)), "type": "supergroup", "title": f"Chat {params.get('chat_id')}"}
+        if method == "getChatMember":
+            user_id = int(params.get("user_id", 0))
+            if user_id == self.bot_id:
+                return dict(self.bot_rights, status="administrator",
+                            user={"id": user_id, "is_bot": True, "first_name": "Fake"})
+            return {"status": "member", "user": {"id": user_id, "is_bot": False, "first_name": "User"}}
+        if method == "createChatInviteLink":
+            return self._invite_link(f"https://t.me/+fake{next(self._link_ids)}", params)
+        if method == "revokeChatInviteLink":
+            return self._invite_link(params["invite_link"], params, revoked=True)
+        return True
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, code: int, payload: Dict[str, Any]):
+                body = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                if fake.delay:
+                    time.sleep(fake.delay)
+
+                prefix, _, method = self.path.split("?", 1)[0].rpartition("/")
+                if prefix != f"/bot{fake.token}":
+                    return self._reply(401, {"ok": False, "error_code": 401, "description": "Unauthorized"})
+                params = parse_params(self.headers.get("Content-Type", ""), raw)
+                with fake._lock:
+                    fake.calls.append((method, params))
+                    errors = fake._errors.get(method)
+                    error = errors.pop(0) if errors else None
+                if error is None and fake._unknown_file(params):
+                    error = {"ok": False, "error_code": 400,
+                             "description": "Bad Request: wrong file identifier/HTTP URL specified"}
+                if error:
+                    return self._reply(error["error_code"], error)
+                with fake._lock:
+                    result = fake._result(method, params)
+                self._reply(200, {"ok": True, "result": result})
+
+            def do_POST(self):
+                self._handle()
+
+            def do_GET(self):
+                self._handle()
+
+        return Handler
+
+    async def deliver(self, update: Dict[str, Any], secret: Optional[str] = None) -> int:
+        """Доставка обновления на адрес из setWebhook; возвращает HTTP-статус ответа"""
+        headers = {SECRET_HEADER: secret if secret is not None else (self.webhook_secret or "")}
+        async with httpx.AsyncClient() as client:
+            response = await client.post(self.webhook_url, json=update, headers=headers)
+        return response.status_code
+
+    def start(self) -> "FakeBotAPI":
+        self._server = _QuietServer(("127.0.0.1", 0), self._handler())
+        threading.Thread(target=self._server.serve_forever, name="fake-bot-api", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self) -> "FakeBotAPI":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+if __name__ == "__main__":
+    with FakeBotAPI() as fake:
+        print(f"🧪 Фейковый Bot API: {fake.base_url} (token={fake.token})")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Локальный фейковый сервер HTTP API ЮKassa для тестов и бенчмарков.
+
+Поддерживает POST /v3/payments и GET /v3/payments/<id> с Basic-авторизацией;
+повторное создание с тем же Idempotence-Key возвращает тот же платеж.
+Задержку ответа, статус платежей и потерю ответов можно менять из теста.
+"""
+
+import base64
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Очередь listen() побольше: при всплеске параллельных соединений
+    # стандартные 5 приводят к повторным SYN и секундным задержкам
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # Клиент, ушедший по таймауту, — ожидаемый сценарий в тестах
+        pass
+
+class FakeYooKassa:
+    """Фейковая ЮKassa в фоновом потоке: with FakeYooKassa() as fake: fake.base_url"""
+
+    def __init__(self, shop_id: str = "test-shop", secret_key: str = "test-secret", delay: float = 0.0):
+        self.shop_id = shop_id
+        self.secret_key = secret_key
+        self.delay = delay
+        self.payments: Dict[str, Dict[str, Any]] = {}
+        # Idempotence-Key -> id платежа
+        self.idempotence_keys: Dict[str, str] = {}
+        # Сколько следующих созданий ответят 500, хотя платеж создан (ответ «потерян»)
+        self.lost_responses = 0
+        self.requests = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v3"
+
+    def set_status(self, payment_id: str, status: str):
+        """Смена статуса платежа, как будто пользователь оплатил или отменил"""
+        with self._lock:
+            self.payments[payment_id]["status"] = status
+            self.payments[payment_id]["paid"] = status == "succeeded"
+
+    def _create(self, body: Dict[str, Any], idempotence_key: Optional[str]) -> Dict[str, Any]:
+        with self._lock:
+            if idempotence_key in self.idempotence_keys:
+                return self.payments[self.idempotence_keys[idempotence_key]]
+        payment_id = str(uuid.uuid4())
+        payment = {
+            "id": payment_id,
+            "status": "pending",
+            "paid": False,
+            "amount": body["amount"],
+            "description": body.get("description"),
+            "metadata": body.get("metadata", {}),
+            "confirmation": {
+                "type": "redirect",
+                "confirmation_url": f"https://yoomoney.example/checkout/{payment_id}",
+            },
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+        }
+        with self._lock:
+            self.payments[payment_id] = payment
+            if idempotence_key:
+                self.idempotence_keys[idempotence_key] = payment_id
+        return payment
+
+    def _response_lost(self) -> bool:
+        with self._lock:
+            if self.lost_responses:
+                self.lost_responses -= 1
+                return True
+            return False
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, code: int, payload: Dict[str, Any]):
+                body = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _authorized(self) -> bool:
+                expected = base64.b64encode(f"{fake.shop_id}:{fake.secret_key}".encode()).decode()
+                return self.headers.get("Authorization") == f"Basic {expected}"
+
+            def _handle(self, method: str):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                with fake._lock:
+                    fake.requests += 1
+                    fake._in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake._in_flight)
+                try:
+                    if fake.delay:
+                        time.sleep(fake.delay)
+                    if not self._authorized():
+                        return self._reply(401, {"type": "error", "code": "invalid_credentials",
+                                                 "description": "Authentication failed"})
+                    if method == "POST" and self.path == "/v3/payments":
+                        payment = fake._create(json.loads(raw), self.headers.get("Idempotence-Key"))
+                        if fake._response_lost():
+                            return self._reply(500, {"type": "error", "code": "internal_server_error",
+                                                     "description": "Internal Server Error"})
+                        return self._reply(200, payment)
+                    if method == "GET" and self.path.startswith("/v3/payments/"):
+                        payment = fake.payments.get(self.path.rsplit("/", 1)[1])
+                        if payment:
+                            return self._reply(200, payment)
+                    self._reply(404, {"type": "error", "code": "not_found", "description": "Payment not found"})
+                finally:
+                    with fake._lock:
+                        fake._in_flight -= 1
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def do_GET(self):
+                self._handle("GET")
+
+        return Handler
+
+    def start(self) -> "FakeYooKassa":
+        self._server = _QuietServer(("127.0.0.1", 0), self._handler())
+        threading.Thread(target=self._server.serve_forever, name="fake-yookassa", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self) -> "FakeYooKassa":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+if __name__ == "__main__":
+    with FakeYooKassa() as fake:
+        print(f"🧪 Фейковая ЮKassa: {fake.base_url} (shop_id={fake.shop_id}, secret_key={fake.secret_key})")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
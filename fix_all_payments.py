@@ -5,9 +5,9 @@
 
 import sqlite3
 import asyncio
-from datetime import datetime, timedelta
-from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
-from config import BOT_TOKEN
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram_transport import get_bot
+from database import get_database
 
 def get_payments_without_access():
     """Получение платежей без доступа"""
@@ -22,8 +22,8 @@ def get_payments_without_access():
         cursor.execute('''
             SELECT p.user_id, p.yookassa_payment_id, p.payment_type, p.amount, p.created_at
             FROM payments p
-            LEFT JOIN user_access ua ON p.user_id = ua.user_id AND ua.is_active = 1
-            WHERE p.status = 'succeeded' AND ua.user_id IS NULL
+            LEFT JOIN entitlements e ON p.user_id = e.user_id AND e.is_active = 1
+            WHERE p.status = 'succeeded' AND e.user_id IS NULL
             ORDER BY p.created_at DESC
         ''')
         payments_without_access = cursor.fetchall()
@@ -49,33 +49,20 @@ def grant_access_to_user(user_id: int, payment_type: str):
     print(f"🔐 Предоставление доступа пользователю {user_id}")
     
     try:
-        conn = sqlite3.connect('askeza_bot.db')
-        cursor = conn.cursor()
+        db = get_database()
         
         # Проверяем, есть ли уже активный доступ
-        cursor.execute('''
-            SELECT id, access_type, is_active 
-            FROM user_access 
-            WHERE user_id = ? AND is_active = 1
-        ''', (user_id,))
-        existing_access = cursor.fetchone()
-        
+        existing_access = db.get_user_access(user_id)
         if existing_access:
-            print(f"✅ Активный доступ уже существует: {existing_access[1]}")
-            conn.close()
+            print(f"✅ Активный доступ уже существует: {existing_access[0]['access_type']}")
             return True
         
         # Создаем новый доступ
-        expires_at = datetime.now() + timedelta(days=30)
-        cursor.execute('''
-            INSERT INTO user_access (user_id, access_type, expires_at, is_active)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, payment_type, expires_at, 1))
-        
-        print(f"✅ Доступ предоставлен до {expires_at}")
+        if not db.grant_access(user_id, payment_type):
+            print("❌ Не удалось записать доступ")
+            return False
         
-        conn.commit()
-        conn.close()
+        print(f"✅ Доступ предоставлен до {db.get_user_access(user_id)[0]['expires_at']}")
         return True
         
     except Exception as e:
@@ -87,7 +74,7 @@ async def send_notification_to_user(user_id: int):
     print(f"📧 Отправка уведомления пользователю {user_id}")
     
     try:
-        bot = Bot(token=BOT_TOKEN)
+        bot = get_bot()
         
         success_text = f"""
 ✅ Платеж успешно обработан!
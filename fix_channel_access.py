@@ -5,8 +5,8 @@
 
 import asyncio
 import logging
-from config import BOT_TOKEN, PRIVATE_CHANNEL_ID
-from telegram import Bot
+from config import PRIVATE_CHANNEL_ID
+from telegram_transport import get_bot
 from telegram.error import TelegramError
 
 # Настройка логирования
@@ -22,7 +22,7 @@ async def check_and_fix_channel_access():
     print("=" * 50)
     
     try:
-        bot = Bot(token=BOT_TOKEN)
+        bot = get_bot()
         await bot.initialize()
         
         print(f"📺 Проверяем канал: {PRIVATE_CHANNEL_ID}")
@@ -119,7 +119,7 @@ async def test_channel_access_after_setup():
     print("=" * 50)
     
     try:
-        bot = Bot(token=BOT_TOKEN)
+        bot = get_bot()
         await bot.initialize()
         
         # Тестируем создание пригласительной ссылки
@@ -4,6 +4,7 @@
 """
 
 import sqlite3
+from telegram_transport import get_bot
 from datetime import datetime, timedelta
 
 def check_database_structure():
@@ -121,10 +122,9 @@ def send_notification_to_user(user_id: int):
     print("=" * 50)
     
     try:
-        from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
-        from config import BOT_TOKEN
+        from telegram import InlineKeyboardButton, InlineKeyboardMarkup
         
-        bot = Bot(token=BOT_TOKEN)
+        bot = get_bot()
         
         success_text = f"""
 ✅ Платеж успешно обработан!
@@ -0,0 +1,70 @@
+import logging
+from typing import Dict, Any
+from async_database import AsyncDatabase, get_async_database
+
+logger = logging.getLogger(__name__)
+
+class PaymentFulfiller:
+    """Выдача доступа по оплаченному платежу ровно один раз.
+
+    Webhook, сверка с API и история платежей могут одновременно увидеть одну
+    оплату. Платеж проходит состояния pending -> succeeded -> granted ->
+    fulfilled; каждый переход — compare-and-set в базе, поэтому доступ достается
+    только обработчику, выигравшему захват. Приглашения и уведомление об оплате
+    записываются в notification_outbox той же транзакцией, что и доступ, и
+    отправляются NotificationDispatcher: выдача доступа не ждет Telegram.
+
+    Тело webhook ЮKassa не подписано, поэтому уведомление — только повод
+    запросить статус платежа в API: доступ выдается и отмена записывается
+    по статусу, который вернула сама ЮKassa.
+    """
+
+    def __init__(self, db: AsyncDatabase = None):
+        self.db = db or get_async_database()
+        self.fulfilled = 0
+        self.duplicates = 0
+
+    async def fulfil(self, payment_id: str, source: str = "unknown") -> bool:
+        """Выдача доступа по платежу; True, если доступ выдан этим или другим обработчиком"""
+        claim = await self.db.claim_fulfilment(payment_id)
+        if claim is False:
+            logger.error(f"❌ {source}: Не удалось захватить платеж {payment_id}")
+            return False
+        if claim is None:
+            self.duplicates += 1
+            logger.info(f"{source}: Платеж {payment_id} уже обработан или не оплачен")
+            return True
+
+        if claim["entitlement"]:
+            logger.info(f"✅ {source}: Доступ по платежу {payment_id} предоставлен пользователю {claim['user_id']}")
+        else:
+            logger.info(f"{source}: Продолжаем незавершенную выдачу по платежу {payment_id}")
+
+        await self.db.complete_fulfilment(payment_id)
+        self.fulfilled += 1
+        return True
+
+    async def apply_notification(self, webhook_data: Dict[str, Any], yookassa, source: str = "Webhook"):
+        """Применение уведомления ЮKassa (AsyncYooKassaClient); исключение — повтор позже"""
+        event = yookassa.process_webhook(webhook_data)
+        if not event["success"]:
+            return
+
+        payment_id = event["payment_id"]
+        # Платеж мог еще не успеть записаться в БД: повторим позже
+        if not await self.db.get_payment(payment_id):
+            raise LookupError(f"Платеж {payment_id} не найден в БД")
+
+        verified = await yookassa.get_payment_status(payment_id)
+        if not verified["success"]:
+            raise RuntimeError(f"Не удалось проверить статус платежа {payment_id}: {verified['error']}")
+
+        status = verified["status"]
+        if status != event.get("status"):
+            logger.warning(f"{source}: Платеж {payment_id} в уведомлении {event.get('status')}, в ЮKassa {status}")
+        if status == "succeeded":
+            if not await self.fulfil(payment_id, source):
+                raise RuntimeError(f"Не удалось выдать доступ по платежу {payment_id}")
+        elif status == "canceled":
+            if await self.db.update_pending_statuses([(payment_id, "canceled")]):
+                logger.info(f"{source}: Платеж {payment_id} отменен")
@@ -0,0 +1,271 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from typing import Optional, List, Dict, Any, Iterable
+from telegram import Bot
+from telegram.error import TelegramError
+from config import PRIVATE_CHANNEL_ID, PRIVATE_CHAT_ID, INVITE_POOL_SIZE, INVITE_LINK_TTL, INVITE_POOL_INTERVAL
+from chat_info import ChatInfoCache, get_chat_info_cache
+from database import Database, get_database
+
+logger = logging.getLogger(__name__)
+
+# Ссылок, отзываемых за один проход обслуживания
+REVOKE_BATCH = 100
+
+# Ссылка, уже выданная пользователю и еще действующая (idx_invite_links_issued_user)
+ISSUED_LINK_QUERY = '''
+    SELECT invite_link FROM invite_links
+    WHERE status = 'issued' AND user_id = ? AND chat_id = ? AND expires_at > ?
+    LIMIT 1
+'''
+
+# Захват самой старой свежей ссылки пула (idx_invite_links_available).
+# Один оператор: две выдачи, даже из разных процессов, не получат одну ссылку
+TAKE_LINK_QUERY = '''
+    UPDATE invite_links SET status = 'issued', user_id = ?, issued_at = ?
+    WHERE invite_link = (
+        SELECT invite_link FROM invite_links
+        WHERE status = 'available' AND chat_id = ? AND created_at > ?
+        ORDER BY created_at
+        LIMIT 1
+    )
+    RETURNING invite_link
+'''
+
+AVAILABLE_COUNT_QUERY = '''
+    SELECT COUNT(*) AS available FROM invite_links
+    WHERE status = 'available' AND chat_id = ? AND created_at > ?
+'''
+
+# Свободные ссылки, у которых осталось меньше половины срока
+RETIRED_LINKS_QUERY = '''
+    SELECT invite_link, chat_id FROM invite_links
+    WHERE status = 'available' AND chat_id = ? AND created_at <= ?
+    LIMIT ?
+'''
+
+# Выданные, но так и не использованные до истечения (idx_invite_links_issued_expiry)
+EXPIRED_LINKS_QUERY = '''
+    SELECT invite_link, chat_id FROM invite_links
+    WHERE status = 'issued' AND expires_at <= ?
+    LIMIT ?
+'''
+
+# Операции записи: выполняются в потоке DatabaseWriter
+
+def _add(conn: sqlite3.Connection, invite_link: str, chat_id: str, created_at: float, expires_at: float):
+    conn.execute(
+        'INSERT OR IGNORE INTO invite_links (invite_link, chat_id, created_at, expires_at) VALUES (?, ?, ?, ?)',
+        (invite_link, chat_id, created_at, expires_at)
+    )
+
+def _issue(conn: sqlite3.Connection, chat_id: str, user_id: int, now: float, fresh_after: float) -> Optional[str]:
+    row = conn.execute(ISSUED_LINK_QUERY, (user_id, chat_id, now)).fetchone()
+    if row:
+        return row["invite_link"]
+    row = conn.execute(TAKE_LINK_QUERY, (user_id, now, chat_id, fresh_after)).fetchone()
+    return row["invite_link"] if row else None
+
+def _add_issued(conn: sqlite3.Connection, invite_link: str, chat_id: str, user_id: int,
+                created_at: float, expires_at: float):
+    conn.execute('''
+        INSERT OR IGNORE INTO invite_links (invite_link, chat_id, status, user_id, created_at, expires_at, issued_at)
+        VALUES (?, ?, 'issued', ?, ?, ?, ?)
+    ''', (invite_link, chat_id, user_id, created_at, expires_at, created_at))
+
+def _mark_used(conn: sqlite3.Connection, invite_link: str, user_id: int, now: float) -> Optional[str]:
+    row = conn.execute('''
+        UPDATE invite_links SET status = 'used', used_at = ?, user_id = COALESCE(user_id, ?)
+        WHERE invite_link = ? AND status IN ('available', 'issued')
+        RETURNING chat_id
+    ''', (now, user_id, invite_link)).fetchone()
+    return row["chat_id"] if row else None
+
+def _mark_revoked(conn: sqlite3.Connection, invite_links: List[str]):
+    conn.executemany(
+        "UPDATE invite_links SET status = 'revoked' WHERE invite_link = ? AND status != 'used'",
+        [(invite_link,) for invite_link in invite_links]
+    )
+
+def pool_chat_ids() -> List[str]:
+    """Закрытые канал и чат из настроек (без повторов, если это один чат)"""
+    return list(dict.fromkeys(filter(None, [PRIVATE_CHANNEL_ID, PRIVATE_CHAT_ID])))
+
+class InviteLinkPool:
+    """Пул заранее созданных одноразовых пригласительных ссылок.
+
+    Ссылки (member_limit=1, expire_date через ttl) создаются в фоне, пока в
+    пуле каждого чата не наберется size свежих. Выдача после оплаты — одна
+    операция в базе без обращений к Telegram; пользователь, которому ссылка
+    уже выдана, получает ту же. Использованная ссылка (событие chat_member)
+    и выданная, но истекшая, отзываются; свободные ссылки с остатком срока
+    меньше половины ttl заменяются новыми.
+    """
+
+    def __init__(self, db: Database = None, chat_ids: Iterable[str] = None, size: int = INVITE_POOL_SIZE,
+                 ttl: float = INVITE_LINK_TTL, interval: float = INVITE_POOL_INTERVAL,
+                 chat_info: ChatInfoCache = None):
+        self.db = db or get_database()
+        self.chat_info = chat_info or get_chat_info_cache()
+        self.chat_ids = [str(chat_id) for chat_id in (chat_ids if chat_ids is not None else pool_chat_ids())]
+        self.size = size
+        self.ttl = ttl
+        self.interval = interval
+        self._bot: Optional[Bot] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.issued = 0
+        self.misses = 0
+        self.created = 0
+        self.used = 0
+        self.revoked = 0
+
+    async def _write(self, operation, *args):
+        return await asyncio.wrap_future(self.db.writer.submit(operation, *args))
+
+    async def _read(self, query: str, params: tuple) -> List[Dict[str, Any]]:
+        def read():
+            with self.db.connection() as conn:
+                return [dict(row) for row in conn.execute(query, params)]
+        return await asyncio.get_running_loop().run_in_executor(None, read)
+
+    async def _create(self, bot: Bot, chat_id: str) -> tuple:
+        """Новая одноразовая ссылка в Telegram: (ссылка, created_at, expires_at)"""
+        created_at = time.time()
+        expires_at = created_at + self.ttl
+        link = await bot.create_chat_invite_link(chat_id=chat_id, member_limit=1, expire_date=int(expires_at))
+        self.created += 1
+        return link.invite_link, created_at, expires_at
+
+    async def issue(self, bot: Bot, chat_id, user_id: int) -> str:
+        """Одноразовая ссылка для пользователя: из пула, а если он пуст — созданная сразу"""
+        chat_id = str(chat_id)
+        now = time.time()
+        invite_link = await self._write(_issue, chat_id, user_id, now, now - self.ttl / 2)
+        if invite_link:
+            self.issued += 1
+            self.wake()
+            return invite_link
+
+        # Пул пуст (первый запуск или всплеск оплат): ссылка создается синхронно
+        self.misses += 1
+        logger.warning(f"Пул пригласительных ссылок {chat_id} пуст, создаем ссылку для пользователя {user_id}")
+        invite_link, created_at, expires_at = await self._create(bot, chat_id)
+        await self._write(_add_issued, invite_link, chat_id, user_id, created_at, expires_at)
+        self.issued += 1
+        self.wake()
+        return invite_link
+
+    async def mark_used(self, bot: Bot, invite_link: str, user_id: int) -> bool:
+        """Вступление по ссылке: отметка в базе и отзыв ссылки в Telegram"""
+        chat_id = await self._write(_mark_used, invite_link, user_id, time.time())
+        if chat_id is None:
+            return False
+        self.used += 1
+        logger.info(f"Пользователь {user_id} вступил в {chat_id} по одноразовой ссылке")
+        await self._revoke(bot, [{"invite_link": invite_link, "chat_id": chat_id}])
+        return True
+
+    async def _revoke(self, bot: Bot, links: List[Dict[str, Any]]):
+        for link in links:
+            try:
+                await bot.revoke_chat_invite_link(chat_id=link["chat_id"], invite_link=link["invite_link"])
+            except TelegramError as e:
+                # Истекшую ссылку Telegram может уже не знать: в базе все равно закрываем
+                logger.warning(f"Не удалось отозвать ссылку в {link['chat_id']}: {e}")
+        await self._write(_mark_revoked, [link["invite_link"] for link in links])
+        self.revoked += len(links)
+
+    async def refill(self, bot: Bot) -> int:
+        """Досоздание ссылок до size в каждом чате; возвращает число созданных"""
+        created = 0
+        for chat_id in self.chat_ids:
+            if not (await self.chat_info.get(bot, chat_id))["can_invite"]:
+                logger.error(f"У бота нет права приглашать в {chat_id}, пул ссылок не пополняется")
+                continue
+            fresh_after = time.time() - self.ttl / 2
+            available = (await self._read(AVAILABLE_COUNT_QUERY, (chat_id, fresh_after)))[0]["available"]
+            for _ in range(self.size - available):
+                try:
+                    invite_link, created_at, expires_at = await self._create(bot, chat_id)
+                except TelegramError as e:
+                    logger.error(f"Не удалось пополнить пул ссылок {chat_id}: {e}")
+                    if "Not enough rights" in str(e) or "CHAT_ADMIN_REQUIRED" in str(e):
+                        logger.error("Бот не имеет прав на создание пригласительных ссылок")
+                    break
+                await self._write(_add, invite_link, chat_id, created_at, expires_at)
+                created += 1
+        return created
+
+    async def revoke_stale(self, bot: Bot) -> int:
+        """Отзыв выданных истекших ссылок и свободных с малым остатком срока"""
+        now = time.time()
+        stale = await self._read(EXPIRED_LINKS_QUERY, (now, REVOKE_BATCH))
+        for chat_id in self.chat_ids:
+            stale += await self._read(RETIRED_LINKS_QUERY, (chat_id, now - self.ttl / 2, REVOKE_BATCH))
+        if stale:
+            await self._revoke(bot, stale)
+            logger.info(f"Отозвано устаревших пригласительных ссылок: {len(stale)}")
+        return len(stale)
+
+    async def maintain(self, bot: Bot):
+        """Один проход обслуживания: отзыв, затем пополнение"""
+        await self.revoke_stale(bot)
+        await self.refill(bot)
+
+    def wake(self):
+        """Внеочередное обслуживание после выдачи ссылки; безопасно из любого потока"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                await self.maintain(self._bot)
+            except Exception as e:
+                logger.error(f"Ошибка при обслуживании пула пригласительных ссылок: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self, bot: Bot) -> asyncio.Task:
+        """Фоновое обслуживание пула в текущем event loop"""
+        self._bot = bot
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "issued": self.issued, "misses": self.misses, "created": self.created,
+            "used": self.used, "revoked": self.revoked,
+        }
+
+_invite_pool: Optional[InviteLinkPool] = None
+_invite_pool_lock = threading.Lock()
+
+def get_invite_pool() -> InviteLinkPool:
+    """Общий пул ссылок процесса"""
+    global _invite_pool
+    if _invite_pool is None:
+        with _invite_pool_lock:
+            if _invite_pool is None:
+                _invite_pool = InviteLinkPool()
+    return _invite_pool
@@ -7,12 +7,20 @@ import asyncio
 import logging
 import threading
 import time
-from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
 from yookassa_client import YooKassaClient
-from database import Database
+from database import get_database
+from async_database import get_async_database
+from payment_reconciler import PaymentReconciler
+from payment_polling import AdaptivePaymentPoller
+from entitlement_migration import EntitlementMigrator
+from payment_archive import PaymentArchiver
+from expiry_scheduler import ExpiryScheduler
 from channel_manager import ChannelManager
-from config import BOT_TOKEN, YOOKASSA_SECRET_KEY
-import sqlite3
+from fulfilment import PaymentFulfiller
+from notification_outbox import NotificationDispatcher
+from telegram_transport import get_bot, create_bot
+from config import YOOKASSA_SECRET_KEY
 
 # Настройка логирования
 logging.basicConfig(
@@ -23,173 +31,48 @@ logger = logging.getLogger(__name__)
 
 # Инициализация компонентов
 yookassa_client = YooKassaClient()
-db = Database()
-channel_manager = ChannelManager()
-bot = Bot(token=BOT_TOKEN)
+db = get_database()
+adb = get_async_database()
+fulfiller = PaymentFulfiller(adb)
+# Сверка платежей и отправка уведомлений из outbox работают в своем event loop:
+# отдельный HTTP-клиент, общий лимит
+bot = create_bot()
+channel_manager = ChannelManager(bot)
+dispatcher = NotificationDispatcher(db, channel_manager)
+# Отзыв доступа, выданного при сверке платежей и обработчиками бота
+expiry_scheduler = ExpiryScheduler(adb, channel_manager)
 
 # Импортируем обработчики из handlers.py
 from handlers import BotHandlers
 handlers = BotHandlers()
 
-def process_successful_payment(payment_id: str, user_id: int, payment_type: str, source: str = "API Check"):
-    """Обработка успешного платежа"""
-    try:
-        logger.info(f"✅ {source}: Обрабатываем успешный платеж {payment_id} для пользователя {user_id}")
-        
-        # Предоставляем доступ
-        if db.grant_access(user_id, payment_type):
-            logger.info(f"✅ {source}: Доступ предоставлен пользователю {user_id}")
-            
-            # Добавляем пользователя в каналы
-            try:
-                import asyncio
-                
-                # Создаем новый event loop для этого потока
-                try:
-                    loop = asyncio.get_event_loop()
-                except RuntimeError:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                
-                success = loop.run_until_complete(
-                    channel_manager.grant_access_to_user(user_id, payment_type)
-                )
-                
-                if success:
-                    logger.info(f"✅ {source}: Пользователь {user_id} добавлен в каналы")
-                else:
-                    logger.warning(f"⚠️ {source}: Не удалось добавить пользователя {user_id} в каналы")
-                    
-            except Exception as e:
-                logger.error(f"❌ {source}: Ошибка при добавлении пользователя {user_id} в каналы: {e}")
-            
-            # Уведомляем пользователя
-            try:
-                success_text = f"""
-✅ Платеж успешно обработан!
+async def fulfil_paid_payment(payment: dict) -> bool:
+    """Выдача доступа по платежу, оплата которого найдена при сверке"""
+    return await fulfiller.fulfil(payment['yookassa_payment_id'], "API Check")
 
-🎉 Поздравляем! Вам предоставлен доступ к {payment_type}.
+async def run_payment_tasks():
+    """Опрос платежей, уведомления об оплате и отзыв истекшего доступа в одном event loop"""
+    poller = AdaptivePaymentPoller(PaymentReconciler(on_succeeded=fulfil_paid_payment))
+    await dispatcher.start()
+    await expiry_scheduler.start()
+    await poller.run_forever()
 
-Теперь вы можете:
-• Получать эксклюзивные материалы
-• Участвовать в закрытых обсуждениях
-• Получать персональные консультации
-                """
-                
-                keyboard = [
-                    [InlineKeyboardButton("📺 Закрытый канал", callback_data="private_channel")],
-                    [InlineKeyboardButton("💬 Закрытый чат", callback_data="private_chat")],
-                    [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_main")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                # Создаем новый event loop для отправки сообщения
-                try:
-                    loop = asyncio.get_event_loop()
-                except RuntimeError:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                
-                loop.run_until_complete(bot.send_message(
-                    chat_id=user_id,
-                    text=success_text,
-                    reply_markup=reply_markup
-                ))
-                logger.info(f"✅ {source}: Уведомление отправлено пользователю {user_id}")
-                
-            except Exception as e:
-                logger.error(f"❌ {source}: Ошибка при отправке уведомления пользователю {user_id}: {e}")
-            
-            return True
-        else:
-            logger.error(f"❌ {source}: Не удалось предоставить доступ пользователю {user_id}")
-            return False
-            
-    except Exception as e:
-        logger.error(f"❌ {source}: Критическая ошибка при обработке платежа {payment_id}: {e}")
-        return False
+def periodic_payment_check():
+    """Опрос ожидающих платежей по адаптивному расписанию в собственном event loop"""
+    logger.info("🔄 Запуск адаптивного опроса платежей")
+    asyncio.run(run_payment_tasks())
 
-def check_and_update_payments():
-    """Проверка и обновление статуса платежей через API"""
-    try:
-        logger.info("🔍 Начинаем проверку статуса платежей...")
-        
-        # Получаем все pending платежи
-        with sqlite3.connect(db.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT yookassa_payment_id, user_id, payment_type FROM payments 
-                WHERE status = 'pending'
-            ''')
-            pending_payments = cursor.fetchall()
-        
-        if not pending_payments:
-            logger.info("Нет pending платежей для проверки")
-            return
-        
-        logger.info(f"Найдено {len(pending_payments)} pending платежей")
-        updated_count = 0
-        
-        for payment_row in pending_payments:
-            payment_id = payment_row['yookassa_payment_id']
-            user_id = payment_row['user_id']
-            payment_type = payment_row['payment_type']
-            
-            try:
-                logger.info(f"Проверяем платеж {payment_id} для пользователя {user_id}")
-                
-                # Проверяем статус через API
-                status_result = yookassa_client.get_payment_status(payment_id)
-                
-                if status_result["success"]:
-                    status = status_result["status"]
-                    logger.info(f"Статус платежа {payment_id}: {status}")
-                    
-                    if status == "succeeded":
-                        logger.info(f"✅ Платеж {payment_id} успешно оплачен!")
-                        
-                        # Обновляем статус в БД
-                        if db.update_payment_status(payment_id, "succeeded"):
-                            logger.info(f"Статус платежа {payment_id} обновлен в БД")
-                            
-                            # Обрабатываем успешный платеж
-                            if process_successful_payment(payment_id, user_id, payment_type, "API Check"):
-                                updated_count += 1
-                                logger.info(f"✅ Платеж {payment_id} успешно обработан")
-                            else:
-                                logger.error(f"❌ Ошибка при обработке платежа {payment_id}")
-                        else:
-                            logger.error(f"❌ Не удалось обновить статус платежа {payment_id}")
-                    
-                    elif status in ["canceled", "failed"]:
-                        logger.info(f"Платеж {payment_id} отменен или неуспешен: {status}")
-                        db.update_payment_status(payment_id, status)
-                    
-                    else:
-                        logger.info(f"Платеж {payment_id} все еще в процессе: {status}")
-                
-                else:
-                    logger.warning(f"Не удалось получить статус платежа {payment_id}: {status_result.get('error', 'Unknown error')}")
-                
-            except Exception as e:
-                logger.error(f"Ошибка при проверке платежа {payment_id}: {e}")
-        
-        if updated_count > 0:
-            logger.info(f"✅ Обновлено {updated_count} платежей")
-        
-    except Exception as e:
-        logger.error(f"Ошибка при проверке платежей: {e}")
+async def post_init(application):
+    """Фоновые задачи бота в его event loop (как в AskezaBot.post_init)"""
+    # Права бота и названия каналов обновляются в фоне
+    await handlers.channel_manager.chat_info.start(application.bot)
+    # Пополнение пула одноразовых ссылок и отзыв использованных/истекших
+    await handlers.channel_manager.invites.start(application.bot)
 
-def periodic_payment_check():
-    """Периодическая проверка платежей"""
-    while True:
-        try:
-            check_and_update_payments()
-            time.sleep(300)  # Проверяем каждые 5 минут
-        except Exception as e:
-            logger.error(f"Ошибка в периодической проверке платежей: {e}")
-            time.sleep(60)  # При ошибке ждем 1 минуту
+async def post_shutdown(application):
+    """Остановка фоновых задач бота"""
+    await handlers.channel_manager.invites.stop()
+    await handlers.channel_manager.chat_info.stop()
 
 def run_bot_sync():
     """Синхронный запуск Telegram бота"""
@@ -201,20 +84,24 @@ def run_bot_sync():
         asyncio.set_event_loop(loop)
         
         # Создаем приложение
-        from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
-        
-        application = Application.builder().token(BOT_TOKEN).build()
+        from telegram.ext import Application
         
-        # Добавляем обработчики
-        application.add_handler(CommandHandler("start", handlers.start_command))
-        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handlers.handle_message))
-        application.add_handler(CallbackQueryHandler(handlers.button_callback))
+        application = (
+            Application.builder()
+            .bot(get_bot())
+            .post_init(post_init)
+            .post_shutdown(post_shutdown)
+            .build()
+        )
         
-        logger.info("✅ Обработчики зарегистрированы")
+        # Те же обработчики, что у AskezaBot
+        handlers.register(application)
         
         # Запускаем бота в event loop
         logger.info("🚀 Бот запущен (без webhook)")
-        loop.run_until_complete(application.run_polling())
+        # run_polling сам работает в event loop потока; сигналы в неглавном потоке
+        # не перехватить, а chat_member и my_chat_member приходят только если запрошены явно
+        application.run_polling(allowed_updates=Update.ALL_TYPES, stop_signals=None, close_loop=False)
         
     except Exception as e:
         logger.error(f"Ошибка при запуске бота: {e}")
@@ -229,6 +116,12 @@ def main():
         logger.info("🚀 Запускаем систему БЕЗ webhook (только API проверка)")
         logger.info("=" * 60)
         
+        # Переносим права из устаревших таблиц доступа небольшими пакетами
+        EntitlementMigrator(db).start()
+        
+        # Переносим старые завершенные платежи в архив
+        PaymentArchiver(db).start()
+        
         # Запускаем периодическую проверку платежей в отдельном потоке
         logger.info("⏰ Запускаем периодическую проверку платежей...")
         payment_thread = threading.Thread(target=periodic_payment_check, daemon=True)
@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from typing import Optional, Dict, Any, Tuple
+from telegram import Bot, Message
+from telegram.error import BadRequest
+from database import Database, get_database
+
+logger = logging.getLogger(__name__)
+
+# Метод отправки для каждого типа медиа
+SENDERS = {
+    "video": "send_video",
+    "photo": "send_photo",
+    "animation": "send_animation",
+    "document": "send_document",
+    "audio": "send_audio",
+}
+
+# Фрагменты текста BadRequest, означающие, что Telegram не принял file_id
+REJECTED_FILE_ID = ("file identifier", "file_id", "file reference", "remote file", "wrong type of the web page")
+
+# Операции записи: выполняются в потоке DatabaseWriter
+
+def _save(conn: sqlite3.Connection, content_hash: str, media_type: str, bot_id: int, file_id: str,
+          file_unique_id: Optional[str], file_name: str, size: int, now: float):
+    conn.execute('''
+        INSERT OR REPLACE INTO media_assets
+            (content_hash, media_type, bot_id, file_id, file_unique_id, file_name, size, uploaded_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (content_hash, media_type, bot_id, file_id, file_unique_id, file_name, size, now))
+
+def _forget(conn: sqlite3.Connection, content_hash: str, media_type: str, bot_id: int, file_id: str):
+    # Удаляем только отклоненный id: другой процесс мог уже сохранить новый
+    conn.execute(
+        'DELETE FROM media_assets WHERE content_hash = ? AND media_type = ? AND bot_id = ? AND file_id = ?',
+        (content_hash, media_type, bot_id, file_id)
+    )
+
+def bot_id(bot: Bot) -> int:
+    """id бота из токена: доступен и до initialize()"""
+    return int(bot.token.split(":", 1)[0])
+
+def uploaded_file(message: Message, media_type: str):
+    """Объект файла из ответа Telegram (для фото — самый большой размер)"""
+    if media_type == "photo":
+        return message.photo[-1]
+    return getattr(message, media_type)
+
+class MediaRegistry:
+    """Реестр медиафайлов, уже загруженных в Telegram.
+
+    Файл загружается один раз; полученный file_id сохраняется в media_assets
+    по хэшу содержимого, и дальше отправляется только id. Изменился файл —
+    изменился хэш, и он загрузится заново. Если Telegram отклонил сохраненный
+    id, файл загружается повторно, а id заменяется.
+    """
+
+    def __init__(self, db: Database = None):
+        self.db = db or get_database()
+        # (путь, размер, mtime) -> хэш: файл не перечитывается на каждую отправку
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+        self._file_ids: Dict[Tuple[str, str, int], str] = {}
+        self._upload_locks: Dict[Tuple[str, str, int], asyncio.Lock] = {}
+        self.uploads = 0
+        self.cached_sends = 0
+        self.rejected = 0
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    async def content_hash(self, path: str) -> str:
+        """SHA-256 содержимого файла (считается в пуле потоков и кэшируется)"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        content_hash = self._hashes.get(key)
+        if content_hash is None:
+            content_hash = await asyncio.get_running_loop().run_in_executor(None, self._hash_file, path)
+            self._hashes[key] = content_hash
+        return content_hash
+
+    def _load(self, key: Tuple[str, str, int]) -> Optional[str]:
+        with self.db.connection() as conn:
+            row = conn.execute(
+                'SELECT file_id FROM media_assets WHERE content_hash = ? AND media_type = ? AND bot_id = ?', key
+            ).fetchone()
+        return row["file_id"] if row else None
+
+    async def file_id(self, key: Tuple[str, str, int]) -> Optional[str]:
+        """Сохраненный file_id (память, затем база)"""
+        file_id = self._file_ids.get(key)
+        if file_id is None:
+            file_id = await asyncio.get_running_loop().run_in_executor(None, self._load, key)
+            if file_id:
+                self._file_ids[key] = file_id
+        return file_id
+
+    async def send(self, bot: Bot, chat_id, path: str, media_type: str = "video", **kwargs) -> Message:
+        """Отправка медиа в чат или канал по file_id, с загрузкой файла только при необходимости"""
+        sender = getattr(bot, SENDERS[media_type])
+        key = (await self.content_hash(path), media_type, bot_id(bot))
+
+        file_id = await self.file_id(key)
+        if file_id:
+            try:
+                message = await sender(chat_id, file_id, **kwargs)
+                self.cached_sends += 1
+                return message
+            except BadRequest as e:
+                if not any(marker in str(e).lower() for marker in REJECTED_FILE_ID):
+                    raise
+                self.rejected += 1
+                logger.warning(f"Telegram отклонил file_id для {path}: {e}; загружаем файл заново")
+                await self._forget(key, file_id)
+
+        # Один одновременный upload на файл: остальные ждут и отправляют по id
+        lock = self._upload_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            file_id = self._file_ids.get(key)
+            if file_id:
+                message = await sender(chat_id, file_id, **kwargs)
+                self.cached_sends += 1
+                return message
+            return await self._upload(bot, sender, chat_id, path, key, **kwargs)
+
+    async def _upload(self, bot: Bot, sender, chat_id, path: str, key: Tuple[str, str, int], **kwargs) -> Message:
+        started = time.monotonic()
+        with open(path, 'rb') as f:
+            message = await sender(chat_id, f, filename=os.path.basename(path), **kwargs)
+        self.uploads += 1
+
+        uploaded = uploaded_file(message, key[1])
+        self._file_ids[key] = uploaded.file_id
+        await asyncio.wrap_future(self.db.writer.submit(
+            _save, *key, uploaded.file_id, uploaded.file_unique_id, os.path.basename(path),
+            os.path.getsize(path), time.time()
+        ))
+        logger.info(f"Файл {path} загружен в Telegram за {time.monotonic() - started:.1f} с, file_id сохранен")
+        return message
+
+    async def _forget(self, key: Tuple[str, str, int], file_id: str):
+        if self._file_ids.get(key) == file_id:
+            del self._file_ids[key]
+        await asyncio.wrap_future(self.db.writer.submit(_forget, *key, file_id))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"uploads": self.uploads, "cached_sends": self.cached_sends, "rejected": self.rejected}
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from typing import Optional, Dict, Any, List
+from telegram import Bot, Chat
+from telegram.error import TelegramError
+from config import MEMBERSHIP_TTL
+from database import Database, get_database
+
+logger = logging.getLogger(__name__)
+
+# Статусы, при которых пользователь считается участником
+MEMBER_STATUSES = ('member', 'administrator', 'creator')
+
+# Статус пользователя в чате (PRIMARY KEY)
+MEMBER_QUERY = '''
+    SELECT status, updated_at FROM chat_members
+    WHERE chat_id = ? AND user_id = ?
+'''
+
+# Операции записи: выполняются в потоке DatabaseWriter
+
+def _record(conn: sqlite3.Connection, chat_ids: List[str], user_id: int, status: str, updated_at: float):
+    # Событие, пришедшее позже более нового, статус не откатывает
+    conn.executemany('''
+        INSERT INTO chat_members (chat_id, user_id, status, updated_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT (chat_id, user_id) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at
+        WHERE excluded.updated_at >= chat_members.updated_at
+    ''', [(chat_id, user_id, status, updated_at) for chat_id in chat_ids])
+
+def chat_keys(chat: Chat) -> List[str]:
+    """Ключи чата: числовой id и @username (в настройках может быть любой)"""
+    keys = [str(chat.id)]
+    if chat.username:
+        keys.append(f"@{chat.username}")
+    return keys
+
+class MembershipIndex:
+    """Участники закрытых канала и чата по событиям chat_member.
+
+    Каждое вступление, выход и удаление записывается в chat_members, и
+    проверка «состоит ли пользователь в канале» отвечается из базы. Telegram
+    спрашиваем только если записи нет или она старше ttl (например, бот был
+    выключен и пропустил события). Чтение идет в базу, а не в память
+    процесса, поэтому все воркеры webhook видят одни и те же данные.
+    """
+
+    def __init__(self, db: Database = None, ttl: float = MEMBERSHIP_TTL):
+        self.db = db or get_database()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, chat_id: str, user_id: int) -> Optional[Dict[str, Any]]:
+        with self.db.connection() as conn:
+            row = conn.execute(MEMBER_QUERY, (chat_id, user_id)).fetchone()
+        return dict(row) if row else None
+
+    async def status(self, chat_id, user_id: int) -> Optional[Dict[str, Any]]:
+        """Запись индекса {status, updated_at} или None"""
+        return await asyncio.get_running_loop().run_in_executor(None, self._lookup, str(chat_id), user_id)
+
+    async def record(self, chat_ids, user_id: int, status: str, updated_at: float = None):
+        """Запись статуса пользователя (chat_ids — ключ или список ключей чата)"""
+        if isinstance(chat_ids, (str, int)):
+            chat_ids = [chat_ids]
+        await asyncio.wrap_future(self.db.writer.submit(
+            _record, [str(chat_id) for chat_id in chat_ids], user_id, status, updated_at or time.time()
+        ))
+
+    async def record_update(self, chat: Chat, user_id: int, status: str, date=None):
+        """Событие chat_member"""
+        await self.record(chat_keys(chat), user_id, status, date.timestamp() if date else None)
+
+    async def is_member(self, bot: Bot, chat_id, user_id: int) -> bool:
+        """Состоит ли пользователь в чате: из индекса, при промахе или устаревании — из API"""
+        entry = await self.status(chat_id, user_id)
+        if entry is not None and time.time() - entry["updated_at"] < self.ttl:
+            self.hits += 1
+            return entry["status"] in MEMBER_STATUSES
+
+        self.misses += 1
+        try:
+            member = await bot.get_chat_member(chat_id, user_id)
+        except TelegramError as e:
+            logger.warning(f"Не удалось проверить участника {user_id} в {chat_id}: {e}")
+            # Устаревшая запись лучше, чем ничего
+            return entry is not None and entry["status"] in MEMBER_STATUSES
+        await self.record(chat_id, user_id, member.status)
+        return member.status in MEMBER_STATUSES
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses}
+
+_membership_index: Optional[MembershipIndex] = None
+_membership_index_lock = threading.Lock()
+
+def get_membership_index() -> MembershipIndex:
+    """Общий индекс процесса"""
+    global _membership_index
+    if _membership_index is None:
+        with _membership_index_lock:
+            if _membership_index is None:
+                _membership_index = MembershipIndex()
+    return _membership_index
@@ -0,0 +1,326 @@
+import logging
+import sqlite3
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Упорядоченный список миграций: (версия, описание, SQL-операторы).
+# Уже примененные миграции не меняем — только добавляем новые в конец.
+MIGRATIONS: List[Tuple[int, str, Tuple[str, ...]]] = [
+    (1, "Базовые таблицы", (
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            last_name TEXT,
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT TRUE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS payments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            payment_type TEXT, -- 'askeza' или 'numerology'
+            amount REAL,
+            yookassa_payment_id TEXT UNIQUE,
+            status TEXT DEFAULT 'pending', -- 'pending', 'succeeded', 'canceled'
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            paid_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS access (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            access_type TEXT, -- 'askeza' или 'numerology'
+            granted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP,
+            is_active BOOLEAN DEFAULT TRUE,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+        ''',
+    )),
+    (2, "Индексы для горячих запросов", (
+        # История платежей пользователя: WHERE user_id = ? ORDER BY created_at DESC
+        'CREATE INDEX IF NOT EXISTS idx_payments_user_created ON payments (user_id, created_at)',
+        # Периодическая проверка: WHERE status = 'pending'
+        "CREATE INDEX IF NOT EXISTS idx_payments_pending ON payments (created_at) WHERE status = 'pending'",
+        # Проверка доступа: WHERE user_id = ? AND is_active = TRUE AND expires_at > ?
+        'CREATE INDEX IF NOT EXISTS idx_access_user_active ON access (user_id, expires_at) WHERE is_active = TRUE',
+        # Отзыв истекшего доступа: WHERE expires_at <= ? AND is_active = TRUE
+        'CREATE INDEX IF NOT EXISTS idx_access_active_expiry ON access (expires_at) WHERE is_active = TRUE',
+    )),
+    (3, "Единая таблица прав доступа", (
+        # Одна строка на (пользователь, тип доступа): продление сдвигает expires_at,
+        # а не добавляет строку. WITHOUT ROWID — строки лежат прямо в B-дереве ключа
+        '''
+        CREATE TABLE IF NOT EXISTS entitlements (
+            user_id INTEGER NOT NULL,
+            access_type TEXT NOT NULL, -- 'askeza' или 'numerology'
+            granted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP NOT NULL,
+            is_active BOOLEAN DEFAULT TRUE,
+            PRIMARY KEY (user_id, access_type)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_entitlements_active_expiry ON entitlements (expires_at) WHERE is_active = TRUE',
+        # Прогресс переноса из устаревших таблиц access и user_access
+        '''
+        CREATE TABLE IF NOT EXISTS entitlement_migration (
+            source TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+    )),
+    (4, "Архив завершенных платежей", (
+        # Та же структура, что у payments; id сохраняется из горячей таблицы
+        '''
+        CREATE TABLE IF NOT EXISTS payments_archive (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            payment_type TEXT,
+            amount REAL,
+            yookassa_payment_id TEXT UNIQUE,
+            status TEXT,
+            created_at TIMESTAMP,
+            paid_at TIMESTAMP,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_payments_archive_user_created ON payments_archive (user_id, created_at)',
+        # Кандидаты на перенос: WHERE status != 'pending' AND created_at < ?
+        "CREATE INDEX IF NOT EXISTS idx_payments_terminal_created ON payments (created_at) WHERE status != 'pending'",
+        # Единое чтение для отчетов и служебных скриптов
+        '''
+        CREATE VIEW IF NOT EXISTS all_payments AS
+            SELECT id, user_id, payment_type, amount, yookassa_payment_id, status, created_at, paid_at
+            FROM payments
+            UNION ALL
+            SELECT id, user_id, payment_type, amount, yookassa_payment_id, status, created_at, paid_at
+            FROM payments_archive
+        ''',
+    )),
+    (5, "Очередь входящих webhook ЮKassa", (
+        # Время в секундах эпохи: по нему считаются задержка и повторы
+        '''
+        CREATE TABLE IF NOT EXISTS webhook_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event TEXT,
+            payment_id TEXT,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued', -- 'queued', 'processing'; обработанные удаляются
+            attempts INTEGER NOT NULL DEFAULT 0,
+            received_at REAL NOT NULL,
+            available_at REAL NOT NULL,
+            last_error TEXT
+        )
+        ''',
+        # Выборка следующих событий: WHERE status = 'queued' AND available_at <= ?
+        "CREATE INDEX IF NOT EXISTS idx_webhook_events_queued ON webhook_events (available_at) WHERE status = 'queued'",
+        '''
+        CREATE TABLE IF NOT EXISTS webhook_dead_letters (
+            id INTEGER PRIMARY KEY,
+            event TEXT,
+            payment_id TEXT,
+            payload TEXT NOT NULL,
+            attempts INTEGER NOT NULL,
+            last_error TEXT,
+            received_at REAL NOT NULL,
+            failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    )),
+    (6, "Журнал выдачи оплаченного доступа", (
+        # Одна строка на платеж: строка вставляется в одной транзакции с выдачей
+        # доступа, поэтому доступ по платежу выдается ровно один раз.
+        # Время в секундах эпохи: по claimed_at проверяется аренда обработчика
+        '''
+        CREATE TABLE IF NOT EXISTS payment_fulfilments (
+            yookassa_payment_id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            access_type TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'granted', -- 'granted' (доступ выдан), 'fulfilled' (приглашения и уведомление отправлены)
+            claimed_at REAL NOT NULL,
+            fulfilled_at REAL
+        ) WITHOUT ROWID
+        ''',
+        # Незавершенные выдачи с истекшей арендой: WHERE state = 'granted' AND claimed_at <= ?
+        "CREATE INDEX IF NOT EXISTS idx_payment_fulfilments_granted ON payment_fulfilments (claimed_at) WHERE state = 'granted'",
+        # Уже оплаченные платежи считаем выполненными, чтобы не выдать доступ повторно
+        '''
+        INSERT OR IGNORE INTO payment_fulfilments (yookassa_payment_id, user_id, access_type, state, claimed_at, fulfilled_at)
+        SELECT yookassa_payment_id, user_id, payment_type, 'fulfilled',
+               COALESCE(CAST(strftime('%s', paid_at) AS REAL), 0), CAST(strftime('%s', paid_at) AS REAL)
+        FROM all_payments
+        WHERE status = 'succeeded' AND yookassa_payment_id IS NOT NULL
+        ''',
+    )),
+    (7, "Реестр загруженных в Telegram медиафайлов", (
+        # file_id действителен только для бота, который его получил, поэтому
+        # ключ — хэш содержимого, тип медиа и id бота
+        '''
+        CREATE TABLE IF NOT EXISTS media_assets (
+            content_hash TEXT NOT NULL,
+            media_type TEXT NOT NULL, -- 'video', 'photo', 'document', ...
+            bot_id INTEGER NOT NULL,
+            file_id TEXT NOT NULL,
+            file_unique_id TEXT,
+            file_name TEXT,
+            size INTEGER,
+            uploaded_at REAL NOT NULL,
+            PRIMARY KEY (content_hash, media_type, bot_id)
+        ) WITHOUT ROWID
+        ''',
+    )),
+    (8, "Пул одноразовых пригласительных ссылок", (
+        # Время в секундах эпохи; expires_at совпадает с expire_date ссылки в Telegram
+        '''
+        CREATE TABLE IF NOT EXISTS invite_links (
+            invite_link TEXT PRIMARY KEY,
+            chat_id TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'available', -- 'available', 'issued', 'used', 'revoked'
+            user_id INTEGER,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            issued_at REAL,
+            used_at REAL
+        ) WITHOUT ROWID
+        ''',
+        # Выдача из пула: WHERE status = 'available' AND chat_id = ? AND created_at > ?
+        "CREATE INDEX IF NOT EXISTS idx_invite_links_available ON invite_links (chat_id, created_at) WHERE status = 'available'",
+        # Повторная выдача той же ссылки: WHERE status = 'issued' AND user_id = ? AND chat_id = ?
+        "CREATE INDEX IF NOT EXISTS idx_invite_links_issued_user ON invite_links (user_id, chat_id) WHERE status = 'issued'",
+        # Отзыв истекших выданных ссылок: WHERE status = 'issued' AND expires_at <= ?
+        "CREATE INDEX IF NOT EXISTS idx_invite_links_issued_expiry ON invite_links (expires_at) WHERE status = 'issued'",
+    )),
+    (9, "Индекс участников закрытых канала и чата", (
+        # Последний известный статус из событий chat_member или get_chat_member;
+        # updated_at — время события в секундах эпохи
+        '''
+        CREATE TABLE IF NOT EXISTS chat_members (
+            chat_id TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            status TEXT NOT NULL, -- 'member', 'administrator', 'creator', 'restricted', 'left', 'kicked'
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (chat_id, user_id)
+        ) WITHOUT ROWID
+        ''',
+    )),
+    (10, "Рассылки с сохранением прогресса", (
+        # Имя уникально: повторный запуск той же рассылки продолжает кампанию
+        '''
+        CREATE TABLE IF NOT EXISTS broadcast_campaigns (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            segment TEXT NOT NULL,
+            text TEXT NOT NULL,
+            reply_markup TEXT, -- JSON InlineKeyboardMarkup
+            status TEXT NOT NULL DEFAULT 'running', -- 'running', 'done'
+            created_at REAL NOT NULL,
+            finished_at REAL
+        )
+        ''',
+        # Одна строка на получателя: аудитория фиксируется при создании кампании
+        '''
+        CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+            campaign_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending', -- 'pending', 'sending', 'sent', 'blocked', 'failed', 'unknown'
+            attempts INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL,
+            error TEXT,
+            PRIMARY KEY (campaign_id, user_id)
+        ) WITHOUT ROWID
+        ''',
+        # Следующие получатели (WHERE campaign_id = ? AND status = 'pending' ORDER BY user_id)
+        # и прогресс (GROUP BY status) без просмотра уже отправленных строк
+        'CREATE INDEX IF NOT EXISTS idx_broadcast_deliveries_status ON broadcast_deliveries (campaign_id, status, user_id)',
+        # Сегмент «оплатившие»: DISTINCT user_id журнала выдачи, включая архивные платежи
+        'CREATE INDEX IF NOT EXISTS idx_payment_fulfilments_user ON payment_fulfilments (user_id)',
+    )),
+    (11, "Исходящие уведомления пользователям (outbox)", (
+        # Строки вставляются в одной транзакции с выдачей доступа; dedupe_key
+        # (например, 'payment_succeeded:<id платежа>') не дает поставить
+        # уведомление дважды. Отправленные остаются со статусом 'sent'
+        '''
+        CREATE TABLE IF NOT EXISTS notification_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            dedupe_key TEXT NOT NULL UNIQUE,
+            kind TEXT NOT NULL, -- 'invite_channel', 'invite_chat', 'payment_succeeded' ('access_invites' — до разделения)
+            user_id INTEGER NOT NULL,
+            payload TEXT NOT NULL, -- JSON
+            status TEXT NOT NULL DEFAULT 'queued', -- 'queued', 'sending', 'sent', 'failed'
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            available_at REAL NOT NULL,
+            sent_at REAL,
+            last_error TEXT
+        )
+        ''',
+        # Выборка к отправке: WHERE status = 'queued' AND available_at <= ?
+        "CREATE INDEX IF NOT EXISTS idx_notification_outbox_queued ON notification_outbox (available_at) WHERE status = 'queued'",
+    )),
+    (12, "Аренда отправки уведомлений из outbox", (
+        # Время захвата строки диспетчером: в очередь возвращаются только строки
+        # с истекшей арендой, а не те, что сейчас отправляет другой процесс
+        "ALTER TABLE notification_outbox ADD COLUMN claimed_at REAL",
+        # Захваченные до миграции считаем прерванными
+        "UPDATE notification_outbox SET claimed_at = 0 WHERE status = 'sending'",
+        # Возврат прерванных: WHERE status = 'sending' AND claimed_at <= ?
+        "CREATE INDEX IF NOT EXISTS idx_notification_outbox_sending ON notification_outbox (claimed_at) WHERE status = 'sending'",
+    )),
+    (13, "Аренда обработки webhook-событий", (
+        # Время захвата события воркером: в очередь возвращаются только события
+        # с истекшей арендой, а не те, что сейчас обрабатывает другой процесс
+        "ALTER TABLE webhook_events ADD COLUMN claimed_at REAL",
+        # Захваченные до миграции считаем прерванными
+        "UPDATE webhook_events SET claimed_at = 0 WHERE status = 'processing'",
+        # Возврат прерванных: WHERE status = 'processing' AND claimed_at <= ?
+        "CREATE INDEX IF NOT EXISTS idx_webhook_events_processing ON webhook_events (claimed_at) WHERE status = 'processing'",
+    )),
+]
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Текущая версия схемы (0 для новой базы)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+def apply_migrations(conn: sqlite3.Connection) -> int:
+    """Применение недостающих миграций; возвращает число примененных"""
+    applied = 0
+    for version, description, statements in MIGRATIONS:
+        if version <= get_schema_version(conn):
+            continue
+
+        # BEGIN IMMEDIATE сразу берет блокировку записи, поэтому два процесса,
+        # стартующих одновременно, не применят одну миграцию дважды
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if version <= get_schema_version(conn):
+                conn.rollback()
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(
+                'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                (version, description)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error(f"Не удалось применить миграцию {version}: {description}")
+            raise
+
+        applied += 1
+        logger.info(f"Применена миграция {version}: {description}")
+    return applied
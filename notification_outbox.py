@@ -0,0 +1,234 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Optional, List, Dict, Any, Callable, Awaitable, Tuple
+from telegram.error import Forbidden, BadRequest
+from config import OUTBOX_BATCH, OUTBOX_MAX_ATTEMPTS, OUTBOX_RETRY_DELAY, OUTBOX_LEASE
+from channel_manager import ChannelManager
+from database import Database, get_database
+from telegram_transport import priority, PRIORITY_HIGH
+import views
+
+logger = logging.getLogger(__name__)
+
+# Максимальная пауза перед повтором (секунды)
+MAX_RETRY_DELAY = 600
+
+# Захват уведомлений к отправке (idx_notification_outbox_queued)
+CLAIM_QUERY = '''
+    UPDATE notification_outbox SET status = 'sending', attempts = attempts + 1, claimed_at = ?
+    WHERE id IN (
+        SELECT id FROM notification_outbox
+        WHERE status = 'queued' AND available_at <= ?
+        ORDER BY available_at
+        LIMIT ?
+    )
+    RETURNING id, kind, user_id, payload, attempts, created_at
+'''
+
+# Возврат в очередь уведомлений с истекшей арендой (idx_notification_outbox_sending)
+RECOVER_QUERY = '''
+    UPDATE notification_outbox SET status = 'queued'
+    WHERE status = 'sending' AND claimed_at <= ?
+'''
+
+# Операции записи: выполняются в потоке DatabaseWriter
+
+def _claim(conn: sqlite3.Connection, now: float, limit: int) -> List[Dict[str, Any]]:
+    return [dict(row) for row in conn.execute(CLAIM_QUERY, (now, now, limit))]
+
+def _record(conn: sqlite3.Connection, results: List[Tuple[int, str, Optional[str], float, Optional[float]]]):
+    conn.executemany('''
+        UPDATE notification_outbox SET status = ?, last_error = ?, available_at = ?, sent_at = ?
+        WHERE id = ?
+    ''', [(status, error, available_at, sent_at, outbox_id) for outbox_id, status, error, available_at, sent_at in results])
+
+def _recover(conn: sqlite3.Connection, claimed_before: float) -> int:
+    # Уведомления, которые отправлялись в момент остановки процесса
+    return conn.execute(RECOVER_QUERY, (claimed_before,)).rowcount
+
+class NotificationDispatcher:
+    """Отправка уведомлений из notification_outbox.
+
+    Выдача доступа по платежу только записывает приглашения и уведомление в
+    outbox (той же транзакцией, что и доступ) и не ждет Telegram. Диспетчер
+    забирает пачку готовых строк, отправляет их параллельно в полосе высокого
+    приоритета и записывает результаты одной транзакцией. Временные ошибки
+    повторяются с экспоненциальной паузой до max_attempts; пользователь,
+    заблокировавший бота, и отклоненный Telegram запрос не повторяются.
+    Отправка «хотя бы один раз»: строки, прерванные остановкой, возвращаются
+    в очередь, когда истекает их аренда (lease). Отправляемые сейчас другим
+    процессом (webhook_server и бот работают с одной базой) не трогаются.
+    """
+
+    def __init__(self, db: Database = None, channel_manager: ChannelManager = None,
+                 batch_size: int = OUTBOX_BATCH, max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+                 retry_delay: float = OUTBOX_RETRY_DELAY, lease: float = OUTBOX_LEASE, idle_poll: float = 1.0):
+        self.db = db or get_database()
+        self.channel_manager = channel_manager or ChannelManager()
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease = lease
+        self.idle_poll = idle_poll
+        self.handlers: Dict[str, Callable[[int, Dict[str, Any]], Awaitable[None]]] = {
+            'invite_channel': self.send_channel_invite,
+            'invite_chat': self.send_chat_invite,
+            # Строки, поставленные до разделения приглашений
+            'access_invites': self.send_invites,
+            'payment_succeeded': self.send_payment_succeeded,
+            'revoke_access': self.revoke_access,
+        }
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._recovered_at = 0.0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        # Новая выдача доступа — сразу проверяем outbox, не дожидаясь опроса
+        self.db.add_grant_listener(lambda row: self.wake())
+
+    def wake(self):
+        """Пробуждение диспетчера; безопасно вызывать из любого потока"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _write(self, operation, *args):
+        return await asyncio.wrap_future(self.db.writer.submit(operation, *args))
+
+    async def send_channel_invite(self, user_id: int, payload: Dict[str, Any]):
+        """Приглашение в закрытый канал"""
+        if not await self.channel_manager.add_user_to_channel(user_id, raise_rejected=True):
+            raise RuntimeError(f"Не удалось отправить приглашение в канал пользователю {user_id}")
+
+    async def send_chat_invite(self, user_id: int, payload: Dict[str, Any]):
+        """Приглашение в закрытый чат"""
+        if not await self.channel_manager.add_user_to_chat(user_id, raise_rejected=True):
+            raise RuntimeError(f"Не удалось отправить приглашение в чат пользователю {user_id}")
+
+    async def send_invites(self, user_id: int, payload: Dict[str, Any]):
+        """Приглашения в закрытые канал и чат одной строкой"""
+        if not await self.channel_manager.grant_access_to_user(user_id, payload["payment_type"]):
+            raise RuntimeError(f"Не удалось отправить приглашения пользователю {user_id}")
+
+    async def send_payment_succeeded(self, user_id: int, payload: Dict[str, Any]):
+        """Уведомление об успешной оплате с кнопками доступа"""
+        screen = views.PAYMENT_SUCCEEDED.format(payment_type=payload["payment_type"])
+        await self.channel_manager.bot.send_message(chat_id=user_id, text=screen.text, reply_markup=screen.reply_markup)
+
+    async def revoke_access(self, user_id: int, payload: Dict[str, Any]):
+        """Повтор удаления из каналов, не удавшегося у ExpiryScheduler"""
+        # Доступ успели продлить — удалять уже не нужно
+        if await asyncio.get_running_loop().run_in_executor(None, self.db.has_active_access, user_id):
+            return
+        results = await self.channel_manager.revoke_access_from_users([user_id])
+        if not results.get(user_id):
+            raise RuntimeError(f"Не удалось удалить пользователя {user_id} из каналов")
+
+    async def recover(self) -> int:
+        """Возврат в очередь уведомлений, аренда которых истекла"""
+        self._recovered_at = time.monotonic()
+        recovered = await self._write(_recover, time.time() - self.lease)
+        if recovered:
+            logger.info(f"Возвращено в outbox {recovered} прерванных уведомлений")
+        return recovered
+
+    async def _process(self, row: Dict[str, Any]) -> Tuple[int, str, Optional[str], float, Optional[float]]:
+        now = time.time()
+        try:
+            handler = self.handlers[row["kind"]]
+            await handler(row["user_id"], json.loads(row["payload"]))
+        except (Forbidden, BadRequest, KeyError) as e:
+            # Повтор не поможет: бот заблокирован, запрос отклонен или тип неизвестен
+            self.failed += 1
+            logger.error(f"Уведомление {row['id']} ({row['kind']}) пользователю {row['user_id']} не отправлено: {e}")
+            return row["id"], 'failed', f"{type(e).__name__}: {e}", now, None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if row["attempts"] >= self.max_attempts:
+                self.failed += 1
+                logger.error(f"Уведомление {row['id']} ({row['kind']}) исчерпало {row['attempts']} попыток: {error}")
+                return row["id"], 'failed', error, now, None
+            self.retried += 1
+            delay = min(MAX_RETRY_DELAY, self.retry_delay * 2 ** (row["attempts"] - 1))
+            logger.warning(f"Уведомление {row['id']} ({row['kind']}) не отправлено (попытка {row['attempts']}), "
+                           f"повтор через {delay:.0f} с: {error}")
+            return row["id"], 'queued', error, now + delay, None
+        self.sent += 1
+        return row["id"], 'sent', None, now, time.time()
+
+    async def dispatch_once(self) -> int:
+        """Отправка одной пачки готовых уведомлений; возвращает размер пачки"""
+        rows = await self._write(_claim, time.time(), self.batch_size)
+        if not rows:
+            return 0
+        # Подтверждения оплат идут впереди рассылок и обычных ответов
+        with priority(PRIORITY_HIGH):
+            results = await asyncio.gather(*(self._process(row) for row in rows))
+        await self._write(_record, results)
+        return len(rows)
+
+    async def _run(self):
+        while True:
+            # Сбрасываем до выборки, чтобы не пропустить строку, записанную во время claim
+            self._wakeup.clear()
+            try:
+                # Строки, брошенные остановленным процессом, — не чаще раза за аренду
+                if time.monotonic() - self._recovered_at >= self.lease:
+                    await self.recover()
+                dispatched = await self.dispatch_once()
+            except Exception as e:
+                logger.error(f"Ошибка при отправке уведомлений из outbox: {e}")
+                dispatched = 0
+            if not dispatched:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.idle_poll)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def start(self):
+        """Запуск диспетчера в текущем event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        await self.recover()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Запущена отправка уведомлений из outbox")
+
+    async def stop(self):
+        """Остановка диспетчера"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def run_forever(self):
+        """Запуск и ожидание (для отдельного потока с asyncio.run)"""
+        await self.start()
+        await self._task
+
+    def start_in_thread(self) -> threading.Thread:
+        """Диспетчер в отдельном потоке со своим event loop (для Flask-процессов).
+
+        Бот менеджера каналов должен быть создан для этого потока (create_bot()).
+        """
+        thread = threading.Thread(target=lambda: asyncio.run(self.run_forever()), name="notification-outbox", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> Dict[str, Any]:
+        """Глубина outbox и счетчики отправки"""
+        with self.db.connection() as conn:
+            queued, oldest = conn.execute(
+                "SELECT COUNT(*), MIN(created_at) FROM notification_outbox WHERE status = 'queued'"
+            ).fetchone()
+        return {
+            "queued": queued,
+            "oldest_queued_age": round(time.time() - oldest, 3) if oldest else 0.0,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Фоновый перенос завершенных платежей в payments_archive
+"""
+
+import logging
+import threading
+import time
+from config import PAYMENT_ARCHIVE_AFTER_DAYS
+from database import Database, get_database
+
+logger = logging.getLogger(__name__)
+
+# Платежей за одну транзакцию (меньше лимита параметров SQLite)
+BATCH_SIZE = 500
+# Пауза между пакетами (секунды), чтобы запись бота не ждала архивации
+BATCH_PAUSE = 0.05
+# Интервал между проходами в фоне (секунды)
+ARCHIVE_INTERVAL = 3600
+
+class PaymentArchiver:
+    """Инкрементальная архивация: каждый пакет — короткая транзакция в потоке
+    DatabaseWriter; в горячей таблице payments остаются ожидающие и свежие
+    платежи, поэтому опрос ожидающих и история не зависят от общего объема"""
+
+    def __init__(self, db: Database = None, older_than_days: int = PAYMENT_ARCHIVE_AFTER_DAYS,
+                 batch_size: int = BATCH_SIZE, pause: float = BATCH_PAUSE, interval: float = ARCHIVE_INTERVAL):
+        self.db = db or get_database()
+        self.older_than_days = older_than_days
+        self.batch_size = batch_size
+        self.pause = pause
+        self.interval = interval
+        self.archived = 0
+
+    def run_once(self) -> int:
+        """Один проход до исчерпания кандидатов; возвращает число перенесенных"""
+        archived = 0
+        while True:
+            count = self.db.archive_payments(self.older_than_days, self.batch_size)
+            archived += count
+            if count < self.batch_size:
+                break
+            time.sleep(self.pause)
+
+        if archived:
+            logger.info(f"В архив перенесено {archived} платежей старше {self.older_than_days} дней")
+        self.archived += archived
+        return archived
+
+    def start(self) -> threading.Thread:
+        """Периодическая архивация в фоновом потоке"""
+        def worker():
+            while True:
+                try:
+                    self.run_once()
+                except Exception as e:
+                    logger.error(f"Ошибка при архивации платежей: {e}")
+                time.sleep(self.interval)
+
+        thread = threading.Thread(target=worker, name="payment-archive", daemon=True)
+        thread.start()
+        return thread
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    print(f"📦 Архивация платежей старше {PAYMENT_ARCHIVE_AFTER_DAYS} дней")
+    print("=" * 50)
+    archived = PaymentArchiver().run_once()
+    print(f"✅ Перенесено платежей: {archived}")
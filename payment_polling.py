@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+from datetime import timezone
+from typing import Dict, Any
+from config import (
+    POLL_FAST_INTERVAL, POLL_FAST_WINDOW, POLL_DOUBLING_PERIOD,
+    POLL_MAX_INTERVAL, PAYMENT_CONFIRMATION_WINDOW, PAYMENT_CHECK_INTERVAL,
+)
+from access_cache import parse_timestamp
+from payment_reconciler import PaymentReconciler
+
+logger = logging.getLogger(__name__)
+
+def poll_interval(age: float, fast_interval: float = POLL_FAST_INTERVAL, fast_window: float = POLL_FAST_WINDOW,
+                  doubling_period: float = POLL_DOUBLING_PERIOD, max_interval: float = POLL_MAX_INTERVAL) -> float:
+    """Пауза до следующего опроса платежа возрастом age секунд.
+
+    Первые fast_window секунд — каждые fast_interval, дальше интервал
+    удваивается каждые doubling_period секунд возраста, но не больше max_interval.
+    """
+    if age < fast_window:
+        return fast_interval
+    return min(max_interval, fast_interval * 2 ** ((age - fast_window) / doubling_period))
+
+class AdaptivePaymentPoller:
+    """Опрос ожидающих платежей по индивидуальному расписанию.
+
+    Свежий платеж проверяется каждые несколько секунд, чтобы доступ выдавался
+    почти сразу после оплаты; старые — все реже. Платеж, который остался
+    pending после окна подтверждения, проверяется последний раз и
+    помечается expired, после чего больше не опрашивается. Раз в
+    recovery_interval секунд повторяется выдача по оплаченным платежам,
+    выдача по которым не завершилась.
+    """
+
+    def __init__(self, reconciler: PaymentReconciler = None,
+                 confirmation_window: float = PAYMENT_CONFIRMATION_WINDOW,
+                 recovery_interval: float = PAYMENT_CHECK_INTERVAL, **schedule):
+        self.reconciler = reconciler or PaymentReconciler()
+        self.db = self.reconciler.db
+        self.confirmation_window = confirmation_window
+        self.recovery_interval = recovery_interval
+        self._next_recovery = 0.0
+        self.schedule = schedule
+        self.fast_interval = schedule.get("fast_interval", POLL_FAST_INTERVAL)
+        self._next_poll: Dict[str, float] = {}
+        self.polls = 0
+        self.expired = 0
+
+    @staticmethod
+    def _created(payment: Dict[str, Any]) -> float:
+        """Время создания платежа (created_at хранится в UTC)"""
+        created = parse_timestamp(payment["created_at"])
+        return created.replace(tzinfo=timezone.utc).timestamp() if created else time.time()
+
+    async def tick(self, now: float = None) -> float:
+        """Проверка наступивших платежей; возвращает время следующего вызова"""
+        now = now or time.time()
+        pending = {payment["yookassa_payment_id"]: payment for payment in await self.db.get_pending_payments()}
+
+        # Платежи, ушедшие из pending (webhook, обработчики), забываем
+        for payment_id in set(self._next_poll) - set(pending):
+            del self._next_poll[payment_id]
+        # Новые платежи: первая проверка через fast_interval после создания
+        for payment_id, payment in pending.items():
+            self._next_poll.setdefault(payment_id, self._created(payment) + self.fast_interval)
+
+        due = [payment for payment_id, payment in pending.items() if self._next_poll[payment_id] <= now]
+        if due:
+            self.polls += len(due)
+            await self.reconciler.sweep(due)
+            still_pending = {payment["yookassa_payment_id"] for payment in await self.db.get_pending_payments()}
+
+            expired = []
+            for payment in due:
+                payment_id = payment["yookassa_payment_id"]
+                if payment_id not in still_pending:
+                    self._next_poll.pop(payment_id, None)
+                    continue
+                age = now - self._created(payment)
+                if age >= self.confirmation_window:
+                    expired.append((payment_id, "expired"))
+                    self._next_poll.pop(payment_id, None)
+                else:
+                    self._next_poll[payment_id] = now + poll_interval(age, **self.schedule)
+
+            if expired:
+                changed = await self.db.update_pending_statuses(expired)
+                self.expired += len(changed)
+                logger.info(f"Истекло окно подтверждения у {len(changed)} платежей, опрос остановлен")
+
+        if now >= self._next_recovery:
+            self._next_recovery = now + self.recovery_interval
+            await self.reconciler.recover()
+
+        # Новые платежи ищем не реже чем раз в fast_interval
+        return min([now + self.fast_interval, *self._next_poll.values()])
+
+    async def run_forever(self):
+        """Опрос в текущем event loop"""
+        while True:
+            try:
+                next_at = await self.tick()
+            except Exception as e:
+                logger.error(f"Ошибка при опросе платежей: {e}")
+                next_at = time.time() + self.fast_interval
+            await asyncio.sleep(max(0.0, next_at - time.time()))
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики опроса"""
+        return {
+            "tracked": len(self._next_poll),
+            "polls": self.polls,
+            "expired": self.expired,
+            "last_sweep": self.reconciler.last_sweep,
+        }
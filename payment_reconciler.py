@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import time
+from typing import Optional, List, Dict, Any, Callable, Awaitable
+from config import PAYMENT_CHECK_INTERVAL, RECONCILE_CONCURRENCY, RECONCILE_DEADLINE, FULFILMENT_RECOVERY_DAYS
+from async_database import AsyncDatabase, get_async_database
+from async_yookassa_client import AsyncYooKassaClient, get_async_yookassa_client
+
+logger = logging.getLogger(__name__)
+
+# Статусы ЮKassa, после которых платеж больше не опрашиваем
+FINAL_STATUSES = ("succeeded", "canceled", "failed")
+
+class PaymentReconciler:
+    """Сверка ожидающих платежей с ЮKassa.
+
+    Статусы запрашиваются параллельно (не больше concurrency запросов),
+    проход ограничен deadline секундами: не успевшие запросы отменяются и
+    будут проверены в следующий раз. Изменившиеся статусы записываются одной
+    транзакцией, затем для оплаченных вызывается on_succeeded(payment).
+    Полный проход также повторяет on_succeeded для оплаченных платежей, выдача
+    по которым не завершилась (процесс упал между сменой статуса и выдачей).
+    """
+
+    def __init__(self, db: AsyncDatabase = None, yookassa: AsyncYooKassaClient = None,
+                 on_succeeded: Callable[[Dict[str, Any]], Awaitable[Any]] = None,
+                 concurrency: int = RECONCILE_CONCURRENCY, deadline: float = RECONCILE_DEADLINE):
+        self.db = db or get_async_database()
+        self.yookassa = yookassa or get_async_yookassa_client()
+        self.on_succeeded = on_succeeded
+        self.concurrency = concurrency
+        self.deadline = deadline
+        self.last_sweep: Optional[Dict[str, Any]] = None
+
+    async def _check(self, semaphore: asyncio.Semaphore, payment: Dict[str, Any]) -> Optional[str]:
+        """Статус платежа в ЮKassa или None при ошибке"""
+        async with semaphore:
+            result = await self.yookassa.get_payment_status(payment["yookassa_payment_id"])
+        if not result["success"]:
+            logger.warning(f"Не удалось получить статус платежа {payment['yookassa_payment_id']}: {result.get('error')}")
+            return None
+        return result["status"]
+
+    async def _fulfil(self, payments: List[Dict[str, Any]]) -> int:
+        """on_succeeded для оплаченных платежей; возвращает число успешных выдач"""
+        results = await asyncio.gather(
+            *(self.on_succeeded(payment) for payment in payments), return_exceptions=True
+        )
+        fulfilled = 0
+        for payment, result in zip(payments, results):
+            if isinstance(result, Exception):
+                logger.error(f"Ошибка при обработке оплаченного платежа {payment['yookassa_payment_id']}: {result}")
+            elif result:
+                fulfilled += 1
+        return fulfilled
+
+    async def recover(self) -> int:
+        """Повтор выдачи по оплаченным платежам без завершенной выдачи"""
+        if not self.on_succeeded:
+            return 0
+        unfulfilled = await self.db.get_unfulfilled_payments(FULFILMENT_RECOVERY_DAYS)
+        if not unfulfilled:
+            return 0
+        logger.warning(f"Найдено {len(unfulfilled)} оплаченных платежей без завершенной выдачи доступа")
+        return await self._fulfil(unfulfilled)
+
+    async def sweep(self, payments: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Один проход сверки; возвращает метрики прохода"""
+        started = time.perf_counter()
+        full = payments is None
+        if full:
+            payments = await self.db.get_pending_payments()
+
+        metrics = {
+            "pending": len(payments), "checked": 0, "errors": 0, "timed_out": 0,
+            "succeeded": 0, "canceled": 0, "failed": 0, "fulfilled": 0, "recovered": 0,
+        }
+        statuses: Dict[str, str] = {}
+
+        if payments:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            tasks = {asyncio.create_task(self._check(semaphore, payment)): payment for payment in payments}
+            done, not_done = await asyncio.wait(tasks, timeout=self.deadline)
+            for task in not_done:
+                task.cancel()
+            metrics["timed_out"] = len(not_done)
+
+            for task in done:
+                payment = tasks[task]
+                status = None if task.exception() else task.result()
+                if status is None:
+                    metrics["errors"] += 1
+                    continue
+                metrics["checked"] += 1
+                if status in FINAL_STATUSES:
+                    statuses[payment["yookassa_payment_id"]] = status
+
+        if statuses:
+            changed = set(await self.db.update_pending_statuses(list(statuses.items())))
+            for status in FINAL_STATUSES:
+                metrics[status] = sum(1 for payment_id in changed if statuses[payment_id] == status)
+
+            paid = [
+                payment for payment in payments
+                if payment["yookassa_payment_id"] in changed
+                and statuses[payment["yookassa_payment_id"]] == "succeeded"
+            ]
+            if paid and self.on_succeeded:
+                metrics["fulfilled"] = await self._fulfil(paid)
+
+        if full:
+            metrics["recovered"] = await self.recover()
+
+        duration = time.perf_counter() - started
+        metrics["duration"] = round(duration, 3)
+        metrics["throughput"] = round(metrics["checked"] / duration, 1) if duration else 0.0
+        self.last_sweep = metrics
+
+        if payments:
+            logger.info(
+                f"Сверка платежей: {metrics['checked']}/{metrics['pending']} проверено за {metrics['duration']} с "
+                f"({metrics['throughput']} пл/с), оплачено {metrics['succeeded']}, отменено {metrics['canceled']}, "
+                f"не прошло {metrics['failed']}, ошибок {metrics['errors']}, не успели {metrics['timed_out']}"
+            )
+        return metrics
+
+    async def run_forever(self, interval: float = PAYMENT_CHECK_INTERVAL):
+        """Периодическая сверка в текущем event loop"""
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Ошибка при сверке платежей: {e}")
+            await asyncio.sleep(interval)
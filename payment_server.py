@@ -0,0 +1,83 @@
+import asyncio
+import logging
+from typing import Optional, Dict, Any
+from config import PAYMENT_SERVER_HOST, PAYMENT_SERVER_PORT, PAYMENT_CHECK_INTERVAL, WEBHOOK_WORKERS
+from async_database import AsyncDatabase, get_async_database
+from async_yookassa_client import AsyncYooKassaClient, get_async_yookassa_client
+from async_http import AsyncHTTPServer, Request, Response, json_response
+from fulfilment import PaymentFulfiller
+from payment_reconciler import PaymentReconciler
+from webhook_queue import WebhookQueue, WebhookWorkerPool, validate_notification
+
+logger = logging.getLogger(__name__)
+
+class PaymentServer:
+    """Прием платежей в event loop бота.
+
+    HTTP-эндпоинты /webhook/yookassa и /health, обработчики очереди webhook и
+    периодическая сверка работают как задачи того же loop, что и Application
+    python-telegram-bot: отдельные потоки и event loop не нужны. Приглашения и
+    уведомления об оплате уходят через notification_outbox, их отправляет
+    NotificationDispatcher приложения.
+    """
+
+    def __init__(self, db: AsyncDatabase = None, yookassa: AsyncYooKassaClient = None,
+                 host: str = PAYMENT_SERVER_HOST, port: int = PAYMENT_SERVER_PORT,
+                 workers: int = WEBHOOK_WORKERS, reconcile_interval: Optional[float] = PAYMENT_CHECK_INTERVAL):
+        self.db = db or get_async_database()
+        self.yookassa = yookassa or get_async_yookassa_client()
+        self.fulfiller = PaymentFulfiller(self.db)
+        self.queue = WebhookQueue(self.db.db)
+        self.workers = WebhookWorkerPool(self.queue, self.handle_event, workers=workers)
+        self.reconciler = PaymentReconciler(self.db, self.yookassa, self.fulfil_paid)
+        self.reconcile_interval = reconcile_interval
+        self._reconcile_task: Optional[asyncio.Task] = None
+
+        self.http = AsyncHTTPServer(host, port)
+        self.http.route("POST", "/webhook/yookassa", self.yookassa_webhook)
+        self.http.route("GET", "/health", self.health)
+
+    async def yookassa_webhook(self, request: Request) -> Response:
+        """Прием webhook от ЮKassa: проверка и сохранение в очередь"""
+        webhook_data = request.json()
+        error = validate_notification(webhook_data)
+        if error:
+            logger.error(f"Некорректный webhook: {error}")
+            return json_response({"error": error}, 400)
+
+        try:
+            await self.queue.enqueue_async(webhook_data)
+        except Exception as e:
+            # ЮKassa повторит уведомление, если ответ не 200
+            logger.error(f"Не удалось сохранить webhook в очередь: {e}")
+            return json_response({"error": "Queue unavailable"}, 500)
+        return json_response({"status": "queued"})
+
+    async def health(self, request: Request) -> Response:
+        """Проверка здоровья сервера"""
+        stats = await asyncio.get_running_loop().run_in_executor(None, self.queue.stats)
+        return json_response({"status": "healthy", "webhook_queue": stats, "http_requests": self.http.requests})
+
+    async def handle_event(self, webhook_data: Dict[str, Any]):
+        """Обработка события из очереди webhook по статусу из API; исключение — повтор позже"""
+        await self.fulfiller.apply_notification(webhook_data, self.yookassa)
+
+    async def fulfil_paid(self, payment: Dict[str, Any]) -> bool:
+        """Выдача доступа по платежу, оплата которого найдена при сверке"""
+        return await self.fulfiller.fulfil(payment["yookassa_payment_id"], "API Check")
+
+    async def start(self):
+        """Запуск сервера, обработчиков очереди и сверки в текущем event loop"""
+        await self.workers.start()
+        if self.reconcile_interval:
+            self._reconcile_task = asyncio.create_task(self.reconciler.run_forever(self.reconcile_interval))
+        await self.http.start()
+        logger.info(f"📡 Webhook URL: http://{self.http.host}:{self.http.port}/webhook/yookassa")
+
+    async def stop(self):
+        """Остановка приема и фоновых задач"""
+        await self.http.stop()
+        if self._reconcile_task:
+            self._reconcile_task.cancel()
+            await asyncio.gather(self._reconcile_task, return_exceptions=True)
+        await self.workers.stop()
@@ -4,8 +4,7 @@
 """
 
 import logging
-from integrated_bot import IntegratedBot, start_webhook_server, periodic_payment_check
-import threading
+from integrated_bot import IntegratedBot
 
 # Настройка логирования
 logging.basicConfig(
@@ -17,16 +16,6 @@ logger = logging.getLogger(__name__)
 if __name__ == "__main__":
     logger.info("🚀 Запуск интегрированной программы")
     
-    # Запускаем периодическую проверку платежей в отдельном потоке
-    payment_check_thread = threading.Thread(target=periodic_payment_check, daemon=True)
-    payment_check_thread.start()
-    logger.info("✅ Запущена периодическая проверка платежей")
-    
-    # Запускаем webhook сервер в отдельном потоке
-    webhook_thread = threading.Thread(target=start_webhook_server, daemon=True)
-    webhook_thread.start()
-    logger.info("✅ Запущен webhook сервер")
-    
-    # Запускаем интегрированный бот в основном потоке
+    # Бот, webhook сервер и сверка платежей — в одном event loop
     integrated_bot = IntegratedBot()
     integrated_bot.run()
@@ -1,132 +1,60 @@
 #!/usr/bin/env python3
 """
 Отправка уведомлений всем пользователям с успешными платежами
+
+Рассылка идет через BroadcastEngine: кто уже получил сообщение, хранится в
+базе, поэтому повторный запуск (например, после сбоя) продолжает ту же
+кампанию и никому не отправляет сообщение дважды.
 """
 
-import sqlite3
+import argparse
 import asyncio
-from datetime import datetime, timedelta
-from config import DATABASE_PATH, BOT_TOKEN
-from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+import logging
+from broadcast import BroadcastEngine, SEGMENTS
+import views
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
 
-async def send_notification_to_user(user_id: int, payment_type: str):
-    """Отправка уведомления пользователю"""
-    print(f"📧 Отправка уведомления пользователю {user_id}")
-    
-    try:
-        bot = Bot(token=BOT_TOKEN)
-        
-        success_text = f"""
+NOTIFICATION_TEXT = """
 ✅ Платеж успешно обработан!
 
-🎉 Поздравляем! Вам предоставлен доступ к {payment_type}.
+🎉 Поздравляем! Вам предоставлен доступ к закрытым каналу и чату.
 
 Теперь вы можете:
 • Получать эксклюзивные материалы
 • Участвовать в закрытых обсуждениях
 • Получать персональные консультации
-        """
-        
-        # Создаем кнопки для доступа
-        keyboard = [
-            [InlineKeyboardButton("📺 Закрытый канал", callback_data="private_channel")],
-            [InlineKeyboardButton("💬 Закрытый чат", callback_data="private_chat")],
-            [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_main")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await bot.send_message(
-            chat_id=user_id,
-            text=success_text,
-            reply_markup=reply_markup
-        )
-        
-        print(f"✅ Уведомление с кнопками отправлено пользователю {user_id}")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Ошибка при отправке уведомления пользователю {user_id}: {e}")
-        return False
+"""
 
-async def send_notifications_to_all():
-    """Отправка уведомлений всем пользователям с успешными платежами"""
-    print("📧 Отправка уведомлений всем пользователям с успешными платежами")
-    print("=" * 50)
-    
-    try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        # Получаем всех пользователей с успешными платежами
-        cursor.execute('''
-            SELECT DISTINCT p.user_id, p.payment_type, p.amount, p.created_at
-            FROM payments p
-            WHERE p.status = 'succeeded'
-            ORDER BY p.created_at DESC
-        ''')
-        users_with_payments = cursor.fetchall()
-        
-        if not users_with_payments:
-            print("❌ Пользователей с успешными платежами не найдено")
-            return
-        
-        print(f"📋 Найдено {len(users_with_payments)} пользователей с успешными платежами:")
-        for user in users_with_payments:
-            print(f"   • User: {user[0]}")
-            print(f"     Type: {user[1]}")
-            print(f"     Amount: {user[2]}₽")
-            print(f"     Created: {user[3]}")
-            print()
-        
-        # Отправляем уведомления
-        success_count = 0
-        error_count = 0
-        
-        for user in users_with_payments:
-            user_id, payment_type, amount, created_at = user
-            
-            try:
-                success = await send_notification_to_user(user_id, payment_type)
-                if success:
-                    success_count += 1
-                else:
-                    error_count += 1
-                    
-                # Небольшая задержка между отправками
-                await asyncio.sleep(1)
-                
-            except Exception as e:
-                print(f"❌ Ошибка при отправке уведомления пользователю {user_id}: {e}")
-                error_count += 1
-        
-        print(f"\n📊 Результат отправки уведомлений:")
-        print(f"   • Всего пользователей: {len(users_with_payments)}")
-        print(f"   • Успешно отправлено: {success_count}")
-        print(f"   • Ошибок: {error_count}")
-        
-        if success_count > 0:
-            print(f"\n🎉 {success_count} пользователей получили кнопки доступа!")
-        else:
-            print("\n❌ Не удалось отправить ни одного уведомления")
-            print("Проверьте настройки бота и логи")
-        
-        conn.close()
-        
-    except Exception as e:
-        print(f"❌ Ошибка при отправке уведомлений: {e}")
+def print_progress(progress: dict):
+    print(f"   • Отправлено: {progress.get('sent', 0)} из {progress['total']}, "
+          f"осталось: {progress.get('pending', 0)}, {progress['rate']:.1f} сообщений/с")
 
-async def main():
-    """Основная функция"""
-    print("🚀 Отправка уведомлений всем пользователям")
+async def send_notifications_to_all(name: str, segment: str):
+    """Отправка уведомлений всем пользователям сегмента"""
+    print(f"📧 Рассылка «{name}» сегменту {segment}")
     print("=" * 50)
-    
-    # Отправляем уведомления
-    await send_notifications_to_all()
-    
-    print("\n💡 Рекомендации:")
-    print("1. Запустите бота: python run_no_webhook.py")
-    print("2. Проверьте логи на ошибки")
-    print("3. Убедитесь, что периодическая проверка работает")
+
+    engine = BroadcastEngine()
+    async with engine.bot:
+        campaign_id = await engine.create(name, segment, NOTIFICATION_TEXT, views.PAYMENT_SUCCEEDED.reply_markup)
+        progress = await engine.run(campaign_id, on_progress=print_progress)
+
+    print(f"\n📊 Результат рассылки {campaign_id}:")
+    print(f"   • Всего получателей: {progress['total']}")
+    print(f"   • Успешно отправлено: {progress.get('sent', 0)}")
+    print(f"   • Заблокировали бота: {progress.get('blocked', 0)}")
+    print(f"   • Ошибок: {progress.get('failed', 0)}")
+    print(f"   • Неизвестно (прервано): {progress.get('unknown', 0)}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--name", default="payment_access_buttons",
+                        help="имя кампании; тот же запуск продолжает начатую рассылку")
+    parser.add_argument("--segment", default="paid", choices=sorted(SEGMENTS))
+    args = parser.parse_args()
+    asyncio.run(send_notifications_to_all(args.name, args.segment))
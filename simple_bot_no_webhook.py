@@ -13,6 +13,7 @@ from yookassa_client import YooKassaClient
 from database import Database
 from channel_manager import ChannelManager
 from config import BOT_TOKEN
+from telegram_transport import get_bot
 from handlers import BotHandlers
 
 # Настройка логирования
@@ -46,8 +47,8 @@ def process_successful_payment_simple(payment_id: str, user_id: int, payment_typ
             
             # Уведомляем пользователя с кнопками
             try:
-                from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
-                bot = Bot(token=BOT_TOKEN)
+                from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+                bot = get_bot()
                 
                 success_text = f"""
 ✅ Платеж успешно обработан!
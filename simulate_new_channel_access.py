@@ -9,8 +9,9 @@ import logging
 from datetime import datetime
 from database import Database
 from channel_manager import ChannelManager
-from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
-from config import BOT_TOKEN, PRIVATE_CHANNEL_ID
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from config import PRIVATE_CHANNEL_ID
+from telegram_transport import get_bot
 
 # Настройка логирования
 logging.basicConfig(
@@ -29,7 +30,7 @@ async def simulate_successful_payment_new_channel(user_id: int, payment_type: st
         # Инициализируем компоненты
         db = Database()
         channel_manager = ChannelManager()
-        bot = Bot(token=BOT_TOKEN)
+        bot = get_bot()
         
         print("✅ Компоненты инициализированы")
         
@@ -8,8 +8,8 @@ import logging
 from datetime import datetime
 from database import Database
 from channel_manager import ChannelManager
-from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
-from config import BOT_TOKEN
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram_transport import get_bot
 
 # Настройка логирования
 logging.basicConfig(
@@ -27,7 +27,7 @@ async def simulate_successful_payment_with_buttons(user_id: int, payment_type: s
         # Инициализируем компоненты
         db = Database()
         channel_manager = ChannelManager()
-        bot = Bot(token=BOT_TOKEN)
+        bot = get_bot()
         
         print("✅ Компоненты инициализированы")
         
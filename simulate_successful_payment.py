@@ -8,8 +8,9 @@ import logging
 from datetime import datetime
 from database import Database
 from channel_manager import ChannelManager
-from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from config import BOT_TOKEN, PRIVATE_CHANNEL_ID, PRIVATE_CHAT_ID
+from telegram_transport import get_bot
 
 # Настройка логирования
 logging.basicConfig(
@@ -27,7 +28,7 @@ async def simulate_successful_payment(user_id: int, payment_type: str = "askeza"
         # Инициализируем компоненты
         db = Database()
         channel_manager = ChannelManager()
-        bot = Bot(token=BOT_TOKEN)
+        bot = get_bot()
         
         print("✅ Компоненты инициализированы")
         
@@ -114,7 +115,7 @@ async def test_callback_handling(user_id: int):
     print("=" * 50)
     
     try:
-        bot = Bot(token=BOT_TOKEN)
+        bot = get_bot()
         
         # Отправляем тестовое сообщение с кнопками
         test_text = """
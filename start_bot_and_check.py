@@ -11,7 +11,8 @@ from datetime import datetime
 from database import Database
 from channel_manager import ChannelManager
 from yookassa_client import YooKassaClient
-from config import BOT_TOKEN, PRIVATE_CHANNEL_ID
+from config import PRIVATE_CHANNEL_ID
+from telegram_transport import create_bot
 
 # Настройка логирования
 logging.basicConfig(
@@ -85,7 +86,9 @@ async def process_successful_payment(user_id: int, payment_id: str, payment_type
     
     try:
         db = Database()
-        channel_manager = ChannelManager()
+        # Каждая проверка идет в новом event loop: свой HTTP-клиент, общий лимит частоты
+        bot = create_bot()
+        channel_manager = ChannelManager(bot)
         
         # Предоставляем доступ
         if db.grant_access(user_id, payment_type):
@@ -106,9 +109,7 @@ async def process_successful_payment(user_id: int, payment_id: str, payment_type
         
         # Отправляем уведомление
         try:
-            from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
-            
-            bot = Bot(token=BOT_TOKEN)
+            from telegram import InlineKeyboardButton, InlineKeyboardMarkup
             
             success_text = f"""
 ✅ Платеж успешно обработан!
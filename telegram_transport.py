@@ -0,0 +1,225 @@
+import asyncio
+import contextvars
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Callable, Coroutine
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter, ExtBot
+from telegram.request import HTTPXRequest
+from config import (
+    BOT_TOKEN, TELEGRAM_MODE, TELEGRAM_API_URL, TELEGRAM_WEBHOOK_WORKERS, TELEGRAM_GLOBAL_RATE,
+    TELEGRAM_CHAT_RATE, TELEGRAM_GROUP_RATE, TELEGRAM_CHAT_BURST, TELEGRAM_NORMAL_SHARE,
+    TELEGRAM_BULK_SHARE, TELEGRAM_MAX_RETRIES, TELEGRAM_POOL_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+# Полосы приоритета: подтверждения оплат, ответы пользователям, рассылки.
+# Ноль ExtBot считает «без аргументов», поэтому полосы начинаются с 1
+PRIORITY_HIGH = 1
+PRIORITY_NORMAL = 2
+PRIORITY_BULK = 3
+
+# Методы, на которые действует лимит сообщений в один чат
+CHAT_LIMITED_PREFIXES = ("send", "copyMessage", "forwardMessage")
+
+# Ведра простаивающих чатов удаляем не чаще раза в минуту
+PRUNE_INTERVAL = 60
+
+_lane: contextvars.ContextVar[int] = contextvars.ContextVar("telegram_lane", default=PRIORITY_NORMAL)
+
+@contextmanager
+def priority(lane: int):
+    """Полоса приоритета для всех запросов к Telegram внутри блока"""
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+class TokenBucket:
+    """Ведро токенов: rate запросов в секунду, до burst подряд (GCRA).
+
+    reserve() сам не ждет, а резервирует слот и возвращает задержку до него,
+    поэтому ведро не привязано к event loop и годится для нескольких потоков.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.interval = 1.0 / rate
+        self.tolerance = self.interval * (max(int(burst), 1) - 1)
+        self._tat = 0.0  # теоретическое время следующего слота
+        self._lock = threading.Lock()
+
+    def reserve(self, now: float = None) -> float:
+        """Задержка (секунды) до зарезервированного слота"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            start = max(now, self._tat - self.tolerance)
+            self._tat = max(self._tat, now) + self.interval
+        return start - now
+
+    def idle(self, now: float) -> bool:
+        """Ведро полное: его можно удалить без потери ограничения"""
+        return self._tat <= now
+
+class TelegramRateLimiter(BaseRateLimiter[int]):
+    """Общий ограничитель запросов бота к Telegram.
+
+    Каждый запрос проходит ведро своей полосы (обычные ответы и рассылки
+    получают только долю общего лимита, поэтому подтверждению оплаты всегда
+    остается запас), ведро чата для отправки сообщений и общее ведро бота.
+    RetryAfter приостанавливает все запросы на указанное Telegram время, после
+    чего запрос повторяется до max_retries раз. По методам считаются вызовы,
+    ошибки, повторы, ожидание и задержка ответа.
+    """
+
+    def __init__(self, global_rate: float = TELEGRAM_GLOBAL_RATE, chat_rate: float = TELEGRAM_CHAT_RATE,
+                 group_rate: float = TELEGRAM_GROUP_RATE, chat_burst: int = TELEGRAM_CHAT_BURST,
+                 normal_share: float = TELEGRAM_NORMAL_SHARE, bulk_share: float = TELEGRAM_BULK_SHARE,
+                 max_retries: int = TELEGRAM_MAX_RETRIES):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self._lanes = {
+            PRIORITY_NORMAL: TokenBucket(global_rate * normal_share, global_rate * normal_share),
+            PRIORITY_BULK: TokenBucket(global_rate * bulk_share, global_rate * bulk_share),
+        }
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate / 60
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._chats: Dict[str, TokenBucket] = {}
+        self._chats_lock = threading.Lock()
+        self._prune_at = 0.0
+        self._paused_until = 0.0
+        self._methods: Dict[str, Dict[str, float]] = {}
+        self.flood_waits = 0
+
+    async def initialize(self) -> None:
+        """Ограничитель общий для всех ботов процесса: ресурсов не держит"""
+
+    async def shutdown(self) -> None:
+        """Ограничитель общий для всех ботов процесса: ресурсов не держит"""
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        key = str(chat_id)
+        now = time.monotonic()
+        with self._chats_lock:
+            if now >= self._prune_at:
+                self._chats = {chat: bucket for chat, bucket in self._chats.items() if not bucket.idle(now)}
+                self._prune_at = now + PRUNE_INTERVAL
+            bucket = self._chats.get(key)
+            if bucket is None:
+                # Группы и каналы (отрицательный id или @username) ограничены строже личных чатов
+                rate = self.group_rate if key.startswith(("-", "@")) else self.chat_rate
+                bucket = self._chats[key] = TokenBucket(rate, self.chat_burst)
+        return bucket
+
+    def _counters(self, endpoint: str) -> Dict[str, float]:
+        counters = self._methods.get(endpoint)
+        if counters is None:
+            counters = self._methods.setdefault(endpoint, {
+                "calls": 0, "attempts": 0, "errors": 0, "retries": 0,
+                "waited": 0.0, "latency": 0.0, "max_latency": 0.0,
+            })
+        return counters
+
+    def _pause(self, retry_after: float):
+        """Флуд-контроль действует на весь бот, а не на один запрос"""
+        with self._chats_lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            self.flood_waits += 1
+
+    async def _acquire(self, lane: int, chat_id, counters: Dict[str, float]):
+        started = time.monotonic()
+        while self._paused_until > time.monotonic():
+            await asyncio.sleep(self._paused_until - time.monotonic())
+        buckets = [self._lanes.get(lane), self._chat_bucket(chat_id) if chat_id is not None else None,
+                   self.global_bucket]
+        for bucket in buckets:
+            if bucket is not None:
+                delay = bucket.reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+        counters["waited"] += time.monotonic() - started
+
+    async def process_request(self, callback: Callable[..., Coroutine[Any, Any, Any]], args: Any,
+                              kwargs: Dict[str, Any], endpoint: str, data: Dict[str, Any],
+                              rate_limit_args: Optional[int]) -> Any:
+        lane = rate_limit_args or _lane.get()
+        chat_id = data.get("chat_id") if endpoint.startswith(CHAT_LIMITED_PREFIXES) else None
+        counters = self._counters(endpoint)
+        counters["calls"] += 1
+        for attempt in itertools.count():
+            await self._acquire(lane, chat_id, counters)
+            started = time.monotonic()
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                self._pause(e.retry_after)
+                if attempt >= self.max_retries:
+                    counters["errors"] += 1
+                    raise
+                counters["retries"] += 1
+                logger.warning(f"Флуд-контроль Telegram на {endpoint}: повтор через {e.retry_after} с")
+            except Exception:
+                counters["errors"] += 1
+                raise
+            finally:
+                latency = time.monotonic() - started
+                counters["attempts"] += 1
+                counters["latency"] += latency
+                counters["max_latency"] = max(counters["max_latency"], latency)
+
+    def stats(self) -> Dict[str, Any]:
+        methods = {}
+        for endpoint, counters in list(self._methods.items()):
+            methods[endpoint] = dict(counters)
+            methods[endpoint]["avg_latency"] = counters["latency"] / counters["attempts"] if counters["attempts"] else 0.0
+        return {
+            "flood_waits": self.flood_waits,
+            "paused_for": max(self._paused_until - time.monotonic(), 0.0),
+            "chats": len(self._chats),
+            "methods": methods,
+        }
+
+def create_bot(token: str = BOT_TOKEN, base_url: str = TELEGRAM_API_URL,
+               rate_limiter: TelegramRateLimiter = None) -> ExtBot:
+    """Бот с общим ограничителем и собственным пулом HTTP-соединений.
+
+    Нужен, когда бот работает в отдельном event loop (HTTP-клиент к нему
+    привязан); в остальных случаях используйте get_bot().
+    """
+    return ExtBot(
+        token,
+        base_url=base_url,
+        request=HTTPXRequest(connection_pool_size=TELEGRAM_POOL_SIZE),
+        rate_limiter=rate_limiter or get_rate_limiter(),
+    )
+
+_rate_limiter: Optional[TelegramRateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> TelegramRateLimiter:
+    """Общий ограничитель процесса"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                # Воркеры webhook отправляют независимо: лимит бота делится между ними
+                workers = TELEGRAM_WEBHOOK_WORKERS if TELEGRAM_MODE == 'webhook' else 1
+                _rate_limiter = TelegramRateLimiter(global_rate=TELEGRAM_GLOBAL_RATE / max(workers, 1))
+    return _rate_limiter
+
+_bot: Optional[ExtBot] = None
+_bot_lock = threading.Lock()
+
+def get_bot() -> ExtBot:
+    """Общий бот процесса: его использует Application и все модули, отправляющие в Telegram"""
+    global _bot
+    if _bot is None:
+        with _bot_lock:
+            if _bot is None:
+                _bot = create_bot()
+    return _bot
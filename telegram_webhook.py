@@ -0,0 +1,110 @@
+import asyncio
+import hmac
+import logging
+import os
+import signal
+from typing import Optional
+from telegram import Update
+from telegram.ext import Application
+from async_http import AsyncHTTPServer, Request, Response, json_response
+
+logger = logging.getLogger(__name__)
+
+# Заголовок, в котором Telegram присылает secret_token из setWebhook
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+class TelegramWebhookServer:
+    """Прием обновлений Telegram по webhook в event loop Application.
+
+    Запрос без верного секретного заголовка отклоняется с 403 до разбора
+    тела. Принятое обновление кладется в update_queue приложения и
+    обрабатывается теми же обработчиками, что и при polling; Telegram
+    получает 200 сразу, не дожидаясь обработки.
+    """
+
+    def __init__(self, application: Application, secret_token: str, host: str = "0.0.0.0",
+                 port: int = 0, path: str = "/webhook/telegram", reuse_port: bool = False):
+        if not secret_token:
+            raise ValueError("Для webhook Telegram нужен secret_token")
+        self.application = application
+        self.secret_token = secret_token.encode()
+        self.path = path
+        self.http = AsyncHTTPServer(host, port, reuse_port=reuse_port)
+        self.http.route("POST", path, self.handle_update)
+        self.http.route("GET", "/health", self.health)
+        self.received = 0
+        self.rejected = 0
+
+    async def handle_update(self, request: Request) -> Response:
+        """POST от Telegram: проверка секрета и передача обновления в Application"""
+        secret = request.headers.get(SECRET_HEADER, "").encode()
+        if not hmac.compare_digest(secret, self.secret_token):
+            self.rejected += 1
+            logger.warning("Отклонен запрос к webhook Telegram с неверным секретным токеном")
+            return json_response({"error": "Forbidden"}, 403)
+
+        data = request.json()
+        if not isinstance(data, dict) or "update_id" not in data:
+            return json_response({"error": "Invalid update"}, 400)
+
+        await self.application.update_queue.put(Update.de_json(data, self.application.bot))
+        self.received += 1
+        return Response(200)
+
+    async def health(self, request: Request) -> Response:
+        return json_response({
+            "status": "healthy",
+            "pid": os.getpid(),
+            "updates_received": self.received,
+            "updates_rejected": self.rejected,
+            "update_queue": self.application.update_queue.qsize(),
+        })
+
+    async def start(self):
+        await self.http.start()
+
+    async def stop(self):
+        await self.http.stop()
+
+async def serve_webhook(application: Application, secret_token: str, host: str = "0.0.0.0", port: int = 0,
+                        path: str = "/webhook/telegram", webhook_url: Optional[str] = None,
+                        reuse_port: bool = False, stop_event: Optional[asyncio.Event] = None,
+                        server_ready: Optional[asyncio.Future] = None):
+    """Жизненный цикл Application в режиме webhook.
+
+    Повторяет порядок run_polling (initialize, post_init, start ... stop,
+    post_stop, shutdown, post_shutdown), только обновления приходят в
+    TelegramWebhookServer. webhook_url регистрируется в Telegram после
+    запуска сервера; None — адрес уже зарегистрирован другим процессом.
+    Работает до stop_event или SIGINT/SIGTERM.
+    """
+    if stop_event is None:
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+
+    server = TelegramWebhookServer(application, secret_token, host, port, path, reuse_port)
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        await server.start()
+        if webhook_url:
+            await application.bot.set_webhook(
+                webhook_url, secret_token=secret_token, allowed_updates=Update.ALL_TYPES
+            )
+            logger.info(f"Webhook Telegram зарегистрирован: {webhook_url}")
+        if server_ready is not None:
+            server_ready.set_result(server)
+        await stop_event.wait()
+    finally:
+        await server.stop()
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Тесты кэша активного доступа
+"""
+
+import time
+from datetime import datetime, timedelta
+import pytest
+from access_cache import AccessCache
+from database import Database
+
+@pytest.fixture
+def db(tmp_path):
+    instance = Database(str(tmp_path / "test.db"))
+    yield instance
+    instance.close()
+
+def count_queries(db: Database) -> list:
+    """Подсчет SQL-запросов через трассировку соединений пула"""
+    statements = []
+    db.close()
+    original = db._open_connection
+
+    def traced():
+        conn = original()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    db._open_connection = traced
+    return statements
+
+def test_grant_is_written_through(db):
+    """После выдачи доступа меню не обращается к базе"""
+    db.grant_access(1, "askeza")
+    statements = count_queries(db)
+
+    assert db.has_active_access(1)
+    assert db.get_user_access(1)[0]["access_type"] == "askeza"
+    assert statements == []
+    assert db.access_cache.stats()["hits"] == 2
+
+def test_startup_load(tmp_path):
+    """Активный доступ загружается в кэш при старте"""
+    first = Database(str(tmp_path / "test.db"))
+    first.grant_access(7, "askeza")
+    first.close()
+
+    second = Database(str(tmp_path / "test.db"))
+    statements = count_queries(second)
+    assert second.has_active_access(7)
+    assert statements == []
+    second.close()
+
+def test_miss_goes_to_database(db):
+    """Неизвестный пользователь проверяется в базе, затем кэшируется"""
+    assert not db.has_active_access(42)
+    assert not db.has_active_access(42)
+    stats = db.access_cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+
+def test_expiry_by_time():
+    """Запись перестает быть активной по истечении срока"""
+    cache = AccessCache(negative_ttl=0)
+    expires_at = datetime.now() + timedelta(milliseconds=50)
+    cache.grant({"id": 1, "user_id": 1, "access_type": "askeza", "expires_at": str(expires_at)})
+
+    assert cache.has_active_access(1) is True
+    time.sleep(0.06)
+    assert cache.has_active_access(1) is None
+
+def test_revoke_expired_evicts(db):
+    """revoke_expired_access убирает истекшие записи из кэша"""
+    db.grant_access(1, "askeza")
+    # Срок истек: переносим его в прошлое и в базе, и в кэше
+    with db.connection() as conn:
+        conn.execute("UPDATE entitlements SET expires_at = '2000-01-01 00:00:00'")
+        rows = [dict(row) for row in conn.execute("SELECT * FROM entitlements")]
+    db.access_cache.put(1, rows)
+
+    assert db.revoke_expired_access() == 1
+    assert not db.has_active_access(1)
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
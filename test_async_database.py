@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Тесты асинхронного доступа к базе данных
+"""
+
+import asyncio
+import time
+import pytest
+from async_database import AsyncDatabase
+from database import Database
+
+@pytest.fixture
+def adb(tmp_path):
+    instance = AsyncDatabase(Database(str(tmp_path / "test.db")))
+    yield instance
+    instance.shutdown()
+    instance.db.close()
+
+def test_payment_history(adb):
+    """История платежей возвращается от новых к старым"""
+    async def scenario():
+        await adb.add_user(1, "user")
+        for i in range(12):
+            await adb.create_payment(1, "askeza", 990, f"payment-{i}")
+        with adb.db.connection() as conn:
+            conn.execute("UPDATE payments SET created_at = datetime('now', '-' || id || ' minutes')")
+        return await adb.get_payment_history(1)
+
+    history = asyncio.run(scenario())
+    assert len(history) == 10
+    assert history[0]["yookassa_payment_id"] == "payment-0"
+
+def test_event_loop_not_blocked(adb):
+    """Медленный запрос не останавливает другие корутины"""
+    def slow_query():
+        time.sleep(0.3)
+        return "done"
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        result = await adb._run(slow_query)
+        task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(scenario())
+    assert result == "done"
+    assert ticks >= 10
+
+def test_concurrent_access_checks(adb):
+    """Параллельные проверки доступа выполняются корректно"""
+    async def scenario():
+        for user_id in range(20):
+            await adb.add_user(user_id)
+            if user_id % 2 == 0:
+                await adb.grant_access(user_id, "askeza")
+        return await asyncio.gather(*(adb.get_user_access(user_id) for user_id in range(20)))
+
+    results = asyncio.run(scenario())
+    assert [bool(access) for access in results] == [user_id % 2 == 0 for user_id in range(20)]
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Тесты асинхронного клиента ЮKassa на фейковом HTTP-сервере
+"""
+
+import asyncio
+import time
+import pytest
+import async_yookassa_client
+from async_yookassa_client import AsyncYooKassaClient, idempotence_key
+from fake_yookassa import FakeYooKassa
+
+@pytest.fixture
+def fake():
+    with FakeYooKassa() as server:
+        yield server
+
+def make_client(fake: FakeYooKassa, **kwargs) -> AsyncYooKassaClient:
+    return AsyncYooKassaClient(fake.shop_id, fake.secret_key, fake.base_url, **kwargs)
+
+def test_create_and_check_payment(fake):
+    """Контракт результата совпадает с синхронным клиентом"""
+    client = make_client(fake)
+
+    async def scenario():
+        created = await client.create_payment(990, "Доступ к Аскезе на 30 дней")
+        before = await client.get_payment_status(created["payment_id"])
+        fake.set_status(created["payment_id"], "succeeded")
+        after = await client.get_payment_status(created["payment_id"])
+        await client.close()
+        return created, before, after
+
+    created, before, after = asyncio.run(scenario())
+    assert created["success"] and created["status"] == "pending"
+    assert created["confirmation_url"].endswith(created["payment_id"])
+    assert fake.payments[created["payment_id"]]["amount"] == {"value": "990.00", "currency": "RUB"}
+    assert before == {"success": True, "status": "pending", "paid": False}
+    assert after == {"success": True, "status": "succeeded", "paid": True}
+
+def test_errors_are_returned_not_raised(fake):
+    """Ошибки API и авторизации возвращаются как success=False"""
+    client = make_client(fake)
+    wrong_auth = AsyncYooKassaClient(fake.shop_id, "wrong", fake.base_url)
+
+    async def scenario():
+        missing = await client.get_payment_status("missing")
+        denied = await wrong_auth.create_payment(990, "test")
+        await client.close()
+        await wrong_auth.close()
+        return missing, denied
+
+    missing, denied = asyncio.run(scenario())
+    assert not missing["success"] and "404" in missing["error"]
+    assert not denied["success"] and "401" in denied["error"]
+
+def test_requests_run_concurrently_within_limit(fake):
+    """Медленные запросы идут параллельно, но не больше max_concurrency"""
+    fake.delay = 0.2
+    client = make_client(fake, max_concurrency=3)
+
+    async def scenario():
+        started = time.perf_counter()
+        results = await asyncio.gather(*(client.create_payment(990, "test") for _ in range(6)))
+        elapsed = time.perf_counter() - started
+        await client.close()
+        return results, elapsed
+
+    results, elapsed = asyncio.run(scenario())
+    assert all(result["success"] for result in results)
+    assert fake.max_in_flight == 3
+    assert elapsed < 1.0
+
+def test_timeout(fake):
+    """Зависший запрос завершается по таймауту с success=False"""
+    fake.delay = 0.5
+    client = make_client(fake, timeout=0.1)
+
+    async def scenario():
+        result = await client.get_payment_status("any")
+        await client.close()
+        return result
+
+    result = asyncio.run(scenario())
+    assert not result["success"]
+
+def test_retries_reuse_idempotence_key(fake, monkeypatch):
+    """Потерянный ответ повторяется с тем же ключом: один платеж в ЮKassa"""
+    monkeypatch.setattr(async_yookassa_client, "CREATE_RETRY_DELAY", 0.01)
+    fake.lost_responses = 1
+    client = make_client(fake)
+    key = idempotence_key(1, "askeza", "query-1")
+
+    async def scenario():
+        created = await client.create_payment(990, "test", idempotence_key=key)
+        # Повторная доставка того же нажатия
+        again = await client.create_payment(990, "test", idempotence_key=idempotence_key(1, "askeza", "query-1"))
+        other = await client.create_payment(990, "test", idempotence_key=idempotence_key(1, "askeza", "query-2"))
+        await client.close()
+        return created, again, other
+
+    created, again, other = asyncio.run(scenario())
+    assert created["success"] and again["payment_id"] == created["payment_id"]
+    assert other["payment_id"] != created["payment_id"]
+    assert len(fake.payments) == 2
+    assert fake.payments[created["payment_id"]]["metadata"] == {"payment_id": key}
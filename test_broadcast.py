@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Тесты рассылок с сохранением прогресса
+"""
+
+import asyncio
+import time
+import pytest
+from broadcast import BroadcastEngine
+from database import Database
+from fake_telegram import FakeBotAPI
+from telegram_transport import TelegramRateLimiter, create_bot
+from views import PAYMENT_SUCCEEDED
+
+@pytest.fixture
+def db(tmp_path):
+    instance = Database(str(tmp_path / "test.db"))
+    with instance.connection() as conn:
+        conn.executemany(
+            "INSERT INTO payment_fulfilments (yookassa_payment_id, user_id, access_type, state, claimed_at) VALUES (?, ?, 'askeza', 'fulfilled', ?)",
+            [(f"pay-{user_id}-{n}", user_id, time.time()) for user_id in range(1, 21) for n in range(2)]
+        )
+        conn.executemany(
+            "INSERT INTO entitlements (user_id, access_type, expires_at) VALUES (?, 'askeza', ?)",
+            [(1, "2099-01-01 00:00:00"), (2, "2000-01-01 00:00:00")]
+        )
+        conn.commit()
+    yield instance
+    instance.close()
+
+@pytest.fixture
+def fake():
+    with FakeBotAPI() as instance:
+        yield instance
+
+def run(fake: FakeBotAPI, db: Database, scenario):
+    async def main():
+        limiter = TelegramRateLimiter(global_rate=1000, chat_rate=1000)
+        async with create_bot(fake.token, fake.base_url, limiter) as bot:
+            return await scenario(BroadcastEngine(db, bot, concurrency=5, batch_size=4))
+    return asyncio.run(main())
+
+def deliveries(db: Database, campaign_id: int):
+    with db.connection() as conn:
+        return {row["user_id"]: row["status"] for row in conn.execute(
+            "SELECT user_id, status FROM broadcast_deliveries WHERE campaign_id = ?", (campaign_id,))}
+
+def test_campaign_sends_once_per_recipient(fake, db):
+    """Каждый оплативший получает одно сообщение; заблокировавший учтен; повторный запуск ничего не шлет"""
+    fake.fail_next("sendMessage", 403, "Forbidden: bot was blocked by the user")
+
+    async def scenario(engine):
+        campaign_id = await engine.create("spring", "paid", "Новости", PAYMENT_SUCCEEDED.reply_markup)
+        reports = []
+        first = await engine.run(campaign_id, on_progress=reports.append)
+        # То же имя — та же кампания, отправлять больше некому
+        again = await engine.create("spring", "paid", "Новости")
+        second = await engine.run(again)
+        return campaign_id, again, first, second, reports
+
+    campaign_id, again, first, second, reports = run(fake, db, scenario)
+    assert again == campaign_id
+    assert first == {"sent": 19, "blocked": 1, "total": 20}
+    assert second == first
+    assert len(reports) == 5 and reports[-1]["sent"] == 19
+    calls = fake.calls_to("sendMessage")
+    assert len(calls) == 20
+    assert len({params["chat_id"] for params in calls}) == 20
+    assert "reply_markup" in calls[0]
+
+def test_resume_skips_sent_and_interrupted(fake, db):
+    """После сбоя: отправленные не повторяются, прерванные на лету помечаются unknown"""
+    async def prepare(engine):
+        return await engine.create("resume", "paid", "Новости")
+
+    campaign_id = run(fake, db, prepare)
+    with db.connection() as conn:
+        conn.execute("UPDATE broadcast_deliveries SET status = 'sent' WHERE campaign_id = ? AND user_id <= 10", (campaign_id,))
+        conn.execute("UPDATE broadcast_deliveries SET status = 'sending' WHERE campaign_id = ? AND user_id = 11", (campaign_id,))
+        conn.commit()
+
+    progress = run(fake, db, lambda engine: engine.run(campaign_id))
+    assert progress == {"sent": 19, "unknown": 1, "total": 20}
+    assert sorted(int(params["chat_id"]) for params in fake.calls_to("sendMessage")) == list(range(12, 21))
+    with db.connection() as conn:
+        assert conn.execute("SELECT status FROM broadcast_campaigns WHERE id = ?", (campaign_id,)).fetchone()[0] == "done"
+
+def test_active_subscribers_segment(fake, db):
+    """Сегмент askeza_active — только с действующей подпиской"""
+    async def scenario(engine):
+        campaign_id = await engine.create("active", "askeza_active", "Новости")
+        return campaign_id, await engine.run(campaign_id)
+
+    campaign_id, progress = run(fake, db, scenario)
+    assert deliveries(db, campaign_id) == {1: "sent"}
+    with pytest.raises(ValueError):
+        run(fake, db, lambda engine: engine.create("bad", "nobody", "Новости"))
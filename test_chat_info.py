@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Тесты кэша прав бота и названий закрытых каналов и чатов
+"""
+
+import asyncio
+import pytest
+from telegram import Bot, Chat, ChatMemberMember
+import channel_manager
+from async_database import AsyncDatabase
+from chat_info import ChatInfoCache
+from channel_manager import ChannelManager
+from database import Database
+from fake_telegram import FakeBotAPI
+from invite_pool import InviteLinkPool
+from membership_index import MembershipIndex
+
+CHANNEL = "-1001"
+
+@pytest.fixture
+def fake():
+    with FakeBotAPI() as instance:
+        yield instance
+
+@pytest.fixture
+def adb(tmp_path):
+    instance = AsyncDatabase(Database(str(tmp_path / "test.db")))
+    yield instance
+    instance.shutdown()
+    instance.db.close()
+
+def run(fake: FakeBotAPI, scenario):
+    async def main():
+        async with Bot(fake.token, base_url=fake.base_url) as bot:
+            return await scenario(bot)
+    return asyncio.run(main())
+
+def test_rights_and_title_are_loaded_once(fake):
+    """Повторные и одновременные запросы в пределах ttl не обращаются к Telegram"""
+    cache = ChatInfoCache(ttl=300, chat_ids=[CHANNEL])
+
+    async def scenario(bot):
+        first = await asyncio.gather(*(cache.get(bot, CHANNEL) for _ in range(5)))
+        return first[0], await cache.get(bot, int(CHANNEL))
+
+    info, again = run(fake, scenario)
+    assert info["is_admin"] and info["can_invite"] and info["can_restrict"]
+    assert info["title"] == f"Chat {CHANNEL}"
+    assert again is info
+    assert len(fake.calls_to("getChatMember")) == 1
+    assert len(fake.calls_to("getChat")) == 1
+
+def test_my_chat_member_update_replaces_rights(fake):
+    """Бота разжаловали: my_chat_member обновляет запись без обращения к API"""
+    cache = ChatInfoCache(ttl=300, chat_ids=[CHANNEL])
+
+    async def scenario(bot):
+        await cache.get(bot, CHANNEL)
+        demoted = ChatMemberMember(user=await bot.get_me())
+        cache.update_bot_member(Chat(int(CHANNEL), Chat.CHANNEL, title="Аскеза"), demoted)
+        return await cache.get(bot, CHANNEL)
+
+    info = run(fake, scenario)
+    assert not info["is_admin"] and not info["can_invite"]
+    assert info["title"] == "Аскеза"
+    assert len(fake.calls_to("getChatMember")) == 1
+
+def test_permissions_check_creates_no_links(fake, adb, monkeypatch):
+    """check_bot_permissions берет право приглашать из прав администратора"""
+    monkeypatch.setattr(channel_manager, "get_async_database", lambda: adb)
+    monkeypatch.setattr(channel_manager, "PRIVATE_CHANNEL_ID", CHANNEL)
+    monkeypatch.setattr(channel_manager, "PRIVATE_CHAT_ID", "-1002")
+    fake.bot_rights["can_invite_users"] = False
+
+    async def scenario(bot):
+        cache = ChatInfoCache(ttl=300, chat_ids=[])
+        manager = ChannelManager(bot, InviteLinkPool(adb.db, [CHANNEL], chat_info=cache), cache,
+                                 members=MembershipIndex(adb.db))
+        permissions = await manager.check_bot_permissions()
+        # Без права приглашать пул не пытается создавать ссылки
+        created = await manager.invites.refill(bot)
+        return permissions, created
+
+    permissions, created = run(fake, scenario)
+    assert permissions["channel"] == {"is_admin": True, "can_invite": False, "error": None}
+    assert permissions["chat"]["is_admin"]
+    assert created == 0
+    assert fake.calls_to("createChatInviteLink") == []
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Тесты слоя базы данных на временном файле SQLite
+"""
+
+import threading
+import pytest
+import database
+from database import Database, get_database
+
+@pytest.fixture
+def db(tmp_path):
+    instance = Database(str(tmp_path / "test.db"))
+    yield instance
+    instance.close()
+
+def test_pragmas_applied(db):
+    """Соединения пула работают в WAL с настроенным кэшем"""
+    with db.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == -16000
+
+def test_connections_are_reused(db):
+    """Повторные вызовы не открывают новых соединений"""
+    with db.connection() as first:
+        pass
+    with db.connection() as second:
+        pass
+    assert first is second
+
+def test_access_roundtrip(db):
+    """Выданный доступ виден через get_user_access"""
+    assert db.add_user(1, "user")
+    assert not db.add_user(1, "user")
+    assert db.grant_access(1, "askeza")
+    access = db.get_user_access(1)
+    assert len(access) == 1
+    assert access[0]["access_type"] == "askeza"
+
+def test_concurrent_threads(db):
+    """Пул выдерживает одновременную работу нескольких потоков"""
+    errors = []
+
+    def worker(offset: int):
+        try:
+            for user_id in range(offset, offset + 50):
+                db.add_user(user_id)
+                db.get_user(user_id)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i * 100,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    with db.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 400
+
+def test_shared_instance(monkeypatch, tmp_path):
+    """get_database возвращает один и тот же объект"""
+    monkeypatch.setattr(database, "DATABASE_PATH", str(tmp_path / "shared.db"))
+    monkeypatch.setattr(database, "_shared_database", None)
+    shared = get_database()
+    assert shared is get_database()
+    assert shared.db_path == str(tmp_path / "shared.db")
+    shared.close()
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
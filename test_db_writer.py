@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Тесты потока записи с групповой фиксацией
+"""
+
+import sqlite3
+import threading
+import pytest
+from database import Database
+from db_writer import DatabaseWriter
+
+@pytest.fixture
+def db(tmp_path):
+    instance = Database(str(tmp_path / "test.db"))
+    yield instance
+    instance.close()
+
+def insert_user(conn, user_id):
+    conn.execute("INSERT INTO users (user_id) VALUES (?)", (user_id,))
+    return user_id
+
+def test_burst_is_grouped_into_batches(db):
+    """Очередь из многих операций фиксируется малым числом транзакций"""
+    gate = threading.Event()
+    db.writer.submit(lambda conn: gate.wait(5))
+    futures = [db.writer.submit(insert_user, user_id) for user_id in range(500)]
+    gate.set()
+
+    assert [future.result(5) for future in futures] == list(range(500))
+    stats = db.writer.stats()
+    assert stats["operations"] == 501
+    assert stats["batches"] <= 6
+
+def test_failed_operation_is_isolated(db):
+    """Ошибка одной операции не откатывает остальные в пакете"""
+    gate = threading.Event()
+    db.writer.submit(lambda conn: gate.wait(5))
+    ok_before = db.writer.submit(insert_user, 1)
+    duplicate = db.writer.submit(insert_user, 1)
+    ok_after = db.writer.submit(insert_user, 2)
+    gate.set()
+
+    assert ok_before.result(5) == 1
+    with pytest.raises(sqlite3.IntegrityError):
+        duplicate.result(5)
+    assert ok_after.result(5) == 2
+    assert db.get_user(1) and db.get_user(2)
+
+def test_result_is_visible_after_future(db):
+    """Future завершается только после COMMIT"""
+    future = db.submit_add_user(10, "user")
+    assert future.result(5) is True
+    with sqlite3.connect(db.db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM users WHERE user_id = 10").fetchone()[0] == 1
+
+def test_write_errors_map_to_default(db):
+    """Синхронные методы сохраняют прежний контракт: False при ошибке"""
+    assert db.create_payment(1, "askeza", 990, "payment-1")
+    assert db.create_payment(1, "askeza", 990, "payment-1") is False
+
+def test_concurrent_writers_never_lock(db):
+    """Запись из многих потоков не приводит к 'database is locked'"""
+    results = []
+
+    def worker(offset):
+        results.extend(db.add_user(user_id) for user_id in range(offset, offset + 100))
+
+    threads = [threading.Thread(target=worker, args=(i * 1000,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(True) == 800
+
+def test_stop_flushes_queue(tmp_path):
+    """stop() дожидается записи всех операций из очереди"""
+    path = str(tmp_path / "writer.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE users (user_id INTEGER PRIMARY KEY)")
+    writer = DatabaseWriter(lambda: sqlite3.connect(path, check_same_thread=False))
+    futures = [writer.submit(insert_user, user_id) for user_id in range(50)]
+    writer.stop()
+    assert all(future.done() for future in futures)
+
+def test_open_failure_fails_all_operations():
+    """Соединение не открылось — и поставленные, и новые операции завершаются ошибкой, а не висят"""
+    opened = threading.Event()
+
+    def open_connection():
+        opened.wait(5)
+        raise sqlite3.OperationalError("unable to open database file")
+
+    writer = DatabaseWriter(open_connection)
+    queued = [writer.submit(insert_user, user_id) for user_id in range(3)]
+    opened.set()
+    for future in queued:
+        with pytest.raises(sqlite3.OperationalError):
+            future.result(5)
+    with pytest.raises(sqlite3.OperationalError):
+        writer.execute(insert_user, 4, timeout=5)
+    writer.stop(timeout=5)
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
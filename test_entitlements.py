@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Тесты единой таблицы прав доступа и переноса из устаревших таблиц
+"""
+
+from datetime import datetime, timedelta
+import pytest
+from access_cache import parse_timestamp
+from database import Database
+from entitlement_migration import EntitlementMigrator
+
+@pytest.fixture
+def db(tmp_path):
+    instance = Database(str(tmp_path / "test.db"))
+    yield instance
+    instance.close()
+
+def entitlement_rows(db: Database) -> list:
+    with db.connection() as conn:
+        return [dict(row) for row in conn.execute("SELECT * FROM entitlements ORDER BY user_id, access_type")]
+
+def test_renewal_extends_instead_of_appending(db):
+    """Повторная оплата продлевает срок и не добавляет строк"""
+    assert db.grant_access(1, "askeza")
+    first_expiry = parse_timestamp(db.get_user_access(1)[0]["expires_at"])
+    assert db.grant_access(1, "askeza")
+
+    rows = entitlement_rows(db)
+    assert len(rows) == 1
+    renewed_expiry = parse_timestamp(rows[0]["expires_at"])
+    assert renewed_expiry - first_expiry > timedelta(days=29)
+    assert len(db.get_user_access(1)) == 1
+
+def test_expired_entitlement_restarts_from_now(db):
+    """Истекший доступ продлевается от текущего момента"""
+    db.grant_access(1, "askeza")
+    with db.connection() as conn:
+        conn.execute("UPDATE entitlements SET expires_at = '2000-01-01 00:00:00', is_active = FALSE")
+    db.access_cache.invalidate(1)
+
+    db.grant_access(1, "askeza")
+    expiry = parse_timestamp(entitlement_rows(db)[0]["expires_at"])
+    assert expiry > datetime.now() + timedelta(days=29)
+    assert db.has_active_access(1)
+
+def create_legacy_tables(db: Database):
+    """Устаревшие таблицы в том виде, в каком они есть в рабочей базе"""
+    future = str(datetime.now() + timedelta(days=10))
+    later = str(datetime.now() + timedelta(days=20))
+    with db.connection() as conn:
+        conn.execute('''
+            CREATE TABLE user_access (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                access_type TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                expires_at TIMESTAMP,
+                is_active INTEGER DEFAULT 1
+            )
+        ''')
+        conn.executemany(
+            "INSERT INTO access (user_id, access_type, expires_at) VALUES (?, ?, ?)",
+            [(1, "askeza", future), (1, "askeza", future), (2, "askeza", "2000-01-01 00:00:00")]
+        )
+        conn.executemany(
+            "INSERT INTO user_access (user_id, access_type, expires_at) VALUES (?, ?, ?)",
+            [(1, "askeza", later), (3, "numerology", future)]
+        )
+    return later
+
+def test_streaming_migration_merges_legacy_tables(db):
+    """Обе устаревшие таблицы сливаются в одну строку на пользователя и тип"""
+    later = create_legacy_tables(db)
+    migrator = EntitlementMigrator(db, batch_size=1, pause=0)
+
+    assert migrator.run() == 5
+    rows = entitlement_rows(db)
+    assert [(row["user_id"], row["access_type"]) for row in rows] == [(1, "askeza"), (2, "askeza"), (3, "numerology")]
+    assert rows[0]["expires_at"] == later
+    assert db.has_active_access(1) and db.has_active_access(3)
+    assert not db.has_active_access(2)
+
+def test_migration_resumes_from_progress(db):
+    """Повторный запуск переносит только новые строки"""
+    create_legacy_tables(db)
+    assert EntitlementMigrator(db, pause=0).run() == 5
+    assert EntitlementMigrator(db, pause=0).run() == 0
+
+    with db.connection() as conn:
+        conn.execute("INSERT INTO access (user_id, access_type, expires_at) VALUES (4, 'askeza', '2099-01-01 00:00:00')")
+    assert EntitlementMigrator(db, pause=0).run() == 1
+    assert db.has_active_access(4)
+
+def test_migration_does_not_resurrect_revoked_entitlement(db):
+    """Отозванное право с тем же или более ранним сроком в устаревшей таблице не оживает"""
+    db.grant_access(1, "askeza")
+    with db.connection() as conn:
+        conn.execute("UPDATE entitlements SET expires_at = '2026-01-01 00:00:00', is_active = FALSE")
+        conn.executemany(
+            "INSERT INTO access (user_id, access_type, expires_at) VALUES (1, 'askeza', ?)",
+            [("2026-01-01 00:00:00",), ("2025-06-01 00:00:00",)]
+        )
+    db.access_cache.invalidate(1)
+
+    assert EntitlementMigrator(db, pause=0).run() == 2
+    assert [(row["expires_at"], row["is_active"]) for row in entitlement_rows(db)] == [("2026-01-01 00:00:00", 0)]
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
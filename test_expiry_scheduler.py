@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Тесты планировщика истечения доступа
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from async_database import AsyncDatabase
+from database import Database
+from expiry_scheduler import ExpiryScheduler
+from notification_outbox import NotificationDispatcher
+
+class FakeChannelManager:
+    """Запоминает пакеты пользователей вместо обращений к Telegram"""
+
+    def __init__(self):
+        self.batches = []
+        # Пользователи, удаление которых не удается
+        self.failing = set()
+
+    async def revoke_access_from_users(self, user_ids, notify_text=None):
+        self.batches.append(list(user_ids))
+        return {user_id: user_id not in self.failing for user_id in user_ids}
+
+@pytest.fixture
+def adb(tmp_path):
+    instance = AsyncDatabase(Database(str(tmp_path / "test.db")))
+    yield instance
+    instance.shutdown()
+    instance.db.close()
+
+def set_expiry(db: Database, user_id: int, access_type: str, expires_at: datetime):
+    """Прямая запись срока в базу (как будто доступ выдан давно)"""
+    with db.connection() as conn:
+        conn.execute(
+            'UPDATE entitlements SET expires_at = ? WHERE user_id = ? AND access_type = ?',
+            (expires_at, user_id, access_type)
+        )
+
+def test_rehydrate_and_revoke_due(adb):
+    """После загрузки из базы отзываются только наступившие сроки, одним пакетом"""
+    now = datetime.now()
+    for user_id in range(1, 6):
+        adb.db.grant_access(user_id, "askeza")
+        set_expiry(adb.db, user_id, "askeza", now + timedelta(seconds=user_id - 3.5))
+    adb.db.load_access_cache()
+
+    channels = FakeChannelManager()
+    scheduler = ExpiryScheduler(adb, channels)
+
+    async def scenario():
+        await scheduler.rehydrate()
+        return await scheduler.run_due(now)
+
+    assert asyncio.run(scenario()) == 3
+    assert channels.batches == [[1, 2, 3]]
+    assert scheduler.pending() == 2
+    assert not adb.db.has_active_access(1)
+    assert adb.db.has_active_access(4)
+
+def test_renewed_entitlement_is_not_revoked(adb):
+    """Старый срок продленного права срабатывает вхолостую"""
+    now = datetime.now()
+    adb.db.grant_access(1, "askeza")
+    set_expiry(adb.db, 1, "askeza", now - timedelta(seconds=1))
+
+    channels = FakeChannelManager()
+    scheduler = ExpiryScheduler(adb, channels)
+
+    async def scenario():
+        await scheduler.rehydrate()
+        # Продление после загрузки: в куче остается устаревший срок
+        set_expiry(adb.db, 1, "askeza", now + timedelta(days=30))
+        return await scheduler.run_due(now)
+
+    assert asyncio.run(scenario()) == 0
+    assert channels.batches == []
+
+def test_user_with_other_access_stays_in_channels(adb):
+    """Истечение одного типа доступа не удаляет пользователя с другим активным"""
+    now = datetime.now()
+    adb.db.grant_access(1, "askeza")
+    adb.db.grant_access(1, "numerology")
+    set_expiry(adb.db, 1, "askeza", now - timedelta(seconds=1))
+    adb.db.load_access_cache()
+
+    channels = FakeChannelManager()
+    scheduler = ExpiryScheduler(adb, channels)
+
+    async def scenario():
+        await scheduler.rehydrate()
+        return await scheduler.run_due(now)
+
+    assert asyncio.run(scenario()) == 1
+    assert channels.batches == []
+    assert [row["access_type"] for row in adb.db.get_user_access(1)] == ["numerology"]
+
+def test_grant_wakes_scheduler_at_exact_time(adb):
+    """Новая выдача попадает в кучу, и цикл просыпается к ее сроку"""
+    channels = FakeChannelManager()
+    scheduler = ExpiryScheduler(adb, channels)
+
+    async def scenario():
+        await scheduler.start()
+        await adb.grant_access(7, "askeza")
+        set_expiry(adb.db, 7, "askeza", datetime.now() + timedelta(seconds=0.2))
+        row = (await adb.get_active_expiries())[0]
+        scheduler.schedule(*row)
+        await asyncio.sleep(0.6)
+        await scheduler.stop()
+
+    asyncio.run(scenario())
+    assert channels.batches == [[7]]
+    assert scheduler.stats()["revoked"] == 1
+
+def test_rescan_picks_up_grants_from_other_processes(adb, tmp_path):
+    """Доступ, выданный другим процессом, попадает в кучу при повторной загрузке без дубликатов"""
+    other = Database(str(tmp_path / "test.db"))
+    channels = FakeChannelManager()
+    scheduler = ExpiryScheduler(adb, channels, rescan_interval=0.2)
+
+    async def scenario():
+        await scheduler.start()
+        # Подписка этого процесса о выдаче не узнает
+        other.grant_access(9, "askeza")
+        set_expiry(other, 9, "askeza", datetime.now() + timedelta(seconds=0.3))
+        await asyncio.sleep(0.8)
+        await scheduler.stop()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        other.close()
+    assert channels.batches == [[9]]
+    assert scheduler.pending() == 0
+
+def test_failed_revoke_is_retried(adb, monkeypatch):
+    """Сроки, отзыв которых не записан, возвращаются в кучу"""
+    now = datetime.now()
+    adb.db.grant_access(1, "askeza")
+    set_expiry(adb.db, 1, "askeza", now - timedelta(seconds=1))
+    adb.db.load_access_cache()
+
+    channels = FakeChannelManager()
+    scheduler = ExpiryScheduler(adb, channels)
+    revoke = adb.revoke_entitlements
+
+    async def failing(entitlements):
+        return None
+
+    async def scenario():
+        await scheduler.rehydrate()
+        monkeypatch.setattr(adb, "revoke_entitlements", failing)
+        failed = await scheduler.run_due(now)
+        pending = scheduler.pending()
+        monkeypatch.setattr(adb, "revoke_entitlements", revoke)
+        return failed, pending, await scheduler.run_due(now)
+
+    assert asyncio.run(scenario()) == (0, 1, 1)
+    assert channels.batches == [[1]]
+    assert scheduler.stats()["failures"] == 1
+
+def test_failed_removal_is_retried_from_outbox(adb):
+    """Неудавшееся удаление из каналов ставится в outbox и повторяется диспетчером"""
+    now = datetime.now()
+    for user_id in (1, 2):
+        adb.db.grant_access(user_id, "askeza")
+        set_expiry(adb.db, user_id, "askeza", now - timedelta(seconds=1))
+    adb.db.load_access_cache()
+
+    channels = FakeChannelManager()
+    channels.failing.add(2)
+    scheduler = ExpiryScheduler(adb, channels)
+    dispatcher = NotificationDispatcher(adb.db, channels)
+
+    async def scenario():
+        await scheduler.rehydrate()
+        await scheduler.run_due(now)
+        # Повтор снова не удался: строка остается в очереди
+        await dispatcher.dispatch_once()
+        with adb.db.connection() as conn:
+            conn.execute("UPDATE notification_outbox SET available_at = 0 WHERE status = 'queued'")
+        channels.failing.clear()
+        return await dispatcher.dispatch_once()
+
+    assert asyncio.run(scenario()) == 1
+    assert channels.batches == [[1, 2], [2], [2]]
+    assert scheduler.stats()["requeued"] == 1
+    with adb.db.connection() as conn:
+        rows = [dict(row) for row in conn.execute("SELECT kind, user_id, status, attempts FROM notification_outbox")]
+    assert rows == [{"kind": "revoke_access", "user_id": 2, "status": "sent", "attempts": 2}]
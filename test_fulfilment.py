@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Тесты однократной выдачи доступа по оплаченному платежу
+"""
+
+import asyncio
+import pytest
+from async_database import AsyncDatabase
+from database import Database
+from fulfilment import PaymentFulfiller
+from notification_outbox import NotificationDispatcher
+
+class FakeBot:
+    """Бот, запоминающий отправленные сообщения"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        await asyncio.sleep(0.01)
+        self.sent.append(chat_id)
+
+class FakeChannelManager:
+    """Менеджер каналов, считающий приглашения"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.invited = []
+
+    async def add_user_to_channel(self, user_id, raise_rejected=False):
+        await asyncio.sleep(0.01)
+        self.invited.append(("channel", user_id))
+        return True
+
+    async def add_user_to_chat(self, user_id, raise_rejected=False):
+        await asyncio.sleep(0.01)
+        self.invited.append(("chat", user_id))
+        return True
+
+@pytest.fixture
+def adb(tmp_path):
+    instance = AsyncDatabase(Database(str(tmp_path / "test.db")))
+    yield instance
+    instance.shutdown()
+    instance.db.close()
+
+@pytest.fixture
+def fulfiller(adb):
+    return PaymentFulfiller(adb)
+
+def create_payment(adb: AsyncDatabase, user_id: int, payment_id: str):
+    adb.db.add_user(user_id, f"user{user_id}")
+    adb.db.create_payment(user_id, "askeza", 990, payment_id)
+
+def test_concurrent_sources_fulfil_once(adb, fulfiller):
+    """Webhook, сверка и история одновременно: один доступ, одно приглашение, одно уведомление"""
+    create_payment(adb, 1, "pay-1")
+    dispatcher = NotificationDispatcher(adb.db, FakeChannelManager(FakeBot()))
+
+    async def scenario():
+        results = await asyncio.gather(*(
+            fulfiller.fulfil("pay-1", source) for source in ("Webhook", "API Check", "History") * 3
+        ))
+        # Выдача не ждет Telegram: приглашения и уведомление лежат в outbox
+        assert dispatcher.channel_manager.invited == []
+        return results, await dispatcher.dispatch_once()
+
+    results, dispatched = asyncio.run(scenario())
+    assert all(results) and dispatched == 3
+    assert sorted(dispatcher.channel_manager.invited) == [("channel", 1), ("chat", 1)]
+    assert dispatcher.channel_manager.bot.sent == [1]
+    assert (fulfiller.fulfilled, fulfiller.duplicates) == (1, 8)
+    assert adb.db.get_payment("pay-1")["status"] == "succeeded"
+    assert len(adb.db.get_user_access(1)) == 1
+
+def test_repeated_fulfilment_does_not_extend_access(adb, fulfiller):
+    """Повторное уведомление о том же платеже не продлевает доступ"""
+    create_payment(adb, 1, "pay-1")
+    asyncio.run(fulfiller.fulfil("pay-1"))
+    expires_at = adb.db.get_user_access(1)[0]["expires_at"]
+
+    asyncio.run(fulfiller.fulfil("pay-1"))
+    assert adb.db.query_user_access(1)[0]["expires_at"] == expires_at
+
+def test_canceled_payment_is_not_fulfilled(adb, fulfiller):
+    """Отмененный платеж не переходит в succeeded"""
+    create_payment(adb, 1, "pay-1")
+    adb.db.update_pending_statuses([("pay-1", "canceled")])
+
+    assert adb.db.claim_fulfilment("pay-1") is None
+    assert adb.db.get_payment("pay-1")["status"] == "canceled"
+    assert adb.db.get_user_access(1) == []
+
+def test_stale_claim_is_resumed_without_second_grant(adb, fulfiller):
+    """После истечения аренды выдача продолжается без повторной записи доступа"""
+    create_payment(adb, 1, "pay-1")
+    claim = adb.db.claim_fulfilment("pay-1")
+    assert claim["entitlement"] is not None
+    expires_at = claim["entitlement"]["expires_at"]
+
+    # Аренда еще действует — второй обработчик ничего не получает
+    assert adb.db.claim_fulfilment("pay-1") is None
+    # Аренда истекла — выдачу можно продолжить, но доступ уже выдан
+    resumed = adb.db.claim_fulfilment("pay-1", lease=0)
+    assert resumed is not None and resumed["entitlement"] is None
+    assert adb.db.query_user_access(1)[0]["expires_at"] == expires_at
+    # Уведомления при продолжении не дублируются
+    with adb.db.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM notification_outbox").fetchone()[0] == 3
+
+    assert adb.db.complete_fulfilment("pay-1")
+    assert not adb.db.complete_fulfilment("pay-1")
+    assert adb.db.claim_fulfilment("pay-1", lease=0) is None
+
+def test_unfulfilled_payments(adb):
+    """Оплаченные платежи без журнала и с истекшей арендой попадают в повтор"""
+    for user_id in range(3):
+        create_payment(adb, user_id, f"pay-{user_id}")
+    adb.db.update_payment_status("pay-0", "succeeded")
+    adb.db.claim_fulfilment("pay-1")
+    adb.db.claim_fulfilment("pay-2")
+    adb.db.complete_fulfilment("pay-2")
+
+    assert [p["yookassa_payment_id"] for p in adb.db.get_unfulfilled_payments(1)] == ["pay-0"]
+    assert sorted(p["yookassa_payment_id"] for p in adb.db.get_unfulfilled_payments(1, lease=-1)) == ["pay-0", "pay-1"]
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Тесты пула одноразовых пригласительных ссылок
+"""
+
+import asyncio
+import pytest
+from telegram import Bot
+from chat_info import ChatInfoCache
+from database import Database
+from fake_telegram import FakeBotAPI
+from invite_pool import InviteLinkPool
+
+CHANNEL = "-1001"
+CHAT = "-1002"
+
+@pytest.fixture
+def db(tmp_path):
+    instance = Database(str(tmp_path / "test.db"))
+    yield instance
+    instance.close()
+
+@pytest.fixture
+def fake():
+    with FakeBotAPI() as instance:
+        yield instance
+
+def make_pool(db: Database, chat_ids, size: int) -> InviteLinkPool:
+    return InviteLinkPool(db, chat_ids, size=size, ttl=3600, chat_info=ChatInfoCache(chat_ids=chat_ids))
+
+def links(db: Database):
+    with db.connection() as conn:
+        return {row["invite_link"]: dict(row) for row in conn.execute("SELECT * FROM invite_links")}
+
+def run(fake: FakeBotAPI, scenario):
+    async def main():
+        async with Bot(fake.token, base_url=fake.base_url) as bot:
+            return await scenario(bot)
+    return asyncio.run(main())
+
+def test_refill_and_issue_without_api_calls(fake, db):
+    """Пул пополняется до size; выдача — без обращений к Telegram, тому же пользователю — та же ссылка"""
+    pool = make_pool(db, [CHANNEL, CHAT], 3)
+
+    async def scenario(bot):
+        created = await pool.refill(bot)
+        calls_before = len(fake.calls)
+        issued = [
+            await pool.issue(bot, CHANNEL, 1),
+            await pool.issue(bot, CHANNEL, 1),
+            await pool.issue(bot, CHANNEL, 2),
+            await pool.issue(bot, CHAT, 1),
+        ]
+        return created, len(fake.calls) - calls_before, issued
+
+    created, api_calls, issued = run(fake, scenario)
+    assert created == 6
+    assert api_calls == 0
+    assert issued[0] == issued[1]
+    assert len(set(issued)) == 3
+    rows = links(db)
+    assert rows[issued[0]]["user_id"] == 1 and rows[issued[0]]["status"] == "issued"
+    assert rows[issued[2]]["user_id"] == 2
+    assert rows[issued[3]]["chat_id"] == CHAT
+    # Все ссылки одноразовые и с ограниченным сроком
+    assert all(params["member_limit"] == "1" and "expire_date" in params
+               for params in fake.calls_to("createChatInviteLink"))
+
+def test_empty_pool_falls_back_to_direct_link(fake, db):
+    """Пустой пул не мешает выдаче: ссылка создается сразу и записывается за пользователем"""
+    pool = make_pool(db, [CHANNEL], 3)
+    invite_link = run(fake, lambda bot: pool.issue(bot, CHANNEL, 7))
+
+    assert pool.misses == 1
+    assert links(db)[invite_link]["user_id"] == 7
+    assert len(fake.calls_to("createChatInviteLink")) == 1
+
+def test_used_link_is_revoked_once(fake, db):
+    """Вступление по ссылке отмечает ее использованной и отзывает в Telegram"""
+    pool = make_pool(db, [CHANNEL], 1)
+
+    async def scenario(bot):
+        await pool.refill(bot)
+        invite_link = await pool.issue(bot, CHANNEL, 5)
+        return invite_link, await pool.mark_used(bot, invite_link, 5), await pool.mark_used(bot, invite_link, 5)
+
+    invite_link, first, second = run(fake, scenario)
+    assert (first, second) == (True, False)
+    assert links(db)[invite_link]["status"] == "used"
+    assert [params["invite_link"] for params in fake.calls_to("revokeChatInviteLink")] == [invite_link]
+
+def test_stale_links_are_revoked_and_replaced(fake, db):
+    """Истекшая выданная ссылка и свободная с малым остатком срока отзываются, пул пополняется"""
+    pool = make_pool(db, [CHANNEL], 2)
+
+    async def prepare(bot):
+        await pool.refill(bot)
+        return await pool.issue(bot, CHANNEL, 9)
+
+    issued = run(fake, prepare)
+    with db.connection() as conn:
+        conn.execute("UPDATE invite_links SET expires_at = 0 WHERE invite_link = ?", (issued,))
+        conn.execute("UPDATE invite_links SET created_at = created_at - 2000 WHERE status = 'available'")
+        conn.commit()
+
+    revoked = run(fake, pool.revoke_stale)
+    run(fake, pool.refill)
+
+    rows = links(db)
+    assert revoked == 2
+    assert rows[issued]["status"] == "revoked"
+    assert sum(row["status"] == "available" for row in rows.values()) == 2
+    assert len(fake.calls_to("revokeChatInviteLink")) == 2
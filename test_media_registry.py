@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Тесты реестра медиафайлов: одна загрузка, дальше отправка по file_id
+"""
+
+import asyncio
+import pytest
+from telegram import Bot
+from database import Database
+from fake_telegram import FakeBotAPI
+from media_registry import MediaRegistry
+
+@pytest.fixture
+def db(tmp_path):
+    instance = Database(str(tmp_path / "test.db"))
+    yield instance
+    instance.close()
+
+@pytest.fixture
+def fake():
+    with FakeBotAPI() as instance:
+        yield instance
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "intro.mp4"
+    path.write_bytes(b"\x00\x00\x00\x18ftypmp42" + b"x" * 4096)
+    return str(path)
+
+def uploads(fake: FakeBotAPI) -> int:
+    return sum(isinstance(params["video"], dict) for params in fake.calls_to("sendVideo"))
+
+async def send_all(fake: FakeBotAPI, registry: MediaRegistry, path: str, chat_ids):
+    async with Bot(fake.token, base_url=fake.base_url) as bot:
+        return [await registry.send(bot, chat_id, path, "video", caption="") for chat_id in chat_ids]
+
+def test_file_is_uploaded_once_and_reused_across_restarts(fake, db, video):
+    """Первая отправка загружает файл, следующие и новый процесс — по сохраненному file_id"""
+    registry = MediaRegistry(db)
+    messages = asyncio.run(send_all(fake, registry, video, [1, 2, 3]))
+
+    assert uploads(fake) == 1
+    assert fake.calls_to("sendVideo")[1]["video"] == messages[0].video.file_id
+    assert registry.stats() == {"uploads": 1, "cached_sends": 2, "rejected": 0}
+
+    # Новый реестр (перезапуск бота) берет file_id из базы
+    restarted = MediaRegistry(db)
+    asyncio.run(send_all(fake, restarted, video, [4]))
+    assert uploads(fake) == 1
+    assert restarted.cached_sends == 1
+
+def test_rejected_file_id_is_reuploaded(fake, db, video):
+    """Отклоненный Telegram file_id заменяется новым после повторной загрузки"""
+    registry = MediaRegistry(db)
+    first = asyncio.run(send_all(fake, registry, video, [1]))[0].video.file_id
+    # Например, файл загружал другой бот или Telegram забыл id
+    fake.files.clear()
+
+    second = asyncio.run(send_all(fake, registry, video, [2, 3]))
+    assert uploads(fake) == 2
+    assert registry.rejected == 1
+    assert second[0].video.file_id != first
+    with db.connection() as conn:
+        stored = conn.execute("SELECT file_id FROM media_assets").fetchall()
+    assert [row["file_id"] for row in stored] == [second[0].video.file_id]
+
+def test_changed_file_and_concurrent_first_sends(fake, db, video):
+    """Одновременные первые отправки дают одну загрузку; измененный файл загружается заново"""
+    registry = MediaRegistry(db)
+
+    async def concurrent():
+        async with Bot(fake.token, base_url=fake.base_url) as bot:
+            await asyncio.gather(*(registry.send(bot, chat_id, video, "video") for chat_id in range(5)))
+
+    asyncio.run(concurrent())
+    assert uploads(fake) == 1
+
+    with open(video, "ab") as f:
+        f.write(b"new cut")
+    asyncio.run(send_all(fake, registry, video, [10]))
+    assert uploads(fake) == 2
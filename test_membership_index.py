@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Тесты индекса участников закрытых канала и чата
+"""
+
+import asyncio
+import time
+import pytest
+from telegram import Bot, Update
+from telegram.ext import Application
+import channel_manager
+from async_database import AsyncDatabase
+from async_yookassa_client import AsyncYooKassaClient
+from channel_manager import ChannelManager
+from chat_info import ChatInfoCache
+from database import Database
+from fake_telegram import FakeBotAPI
+from handlers import BotHandlers
+from invite_pool import InviteLinkPool
+from membership_index import MembershipIndex
+
+CHANNEL = "-1001"
+
+@pytest.fixture
+def adb(tmp_path):
+    instance = AsyncDatabase(Database(str(tmp_path / "test.db")))
+    yield instance
+    instance.shutdown()
+    instance.db.close()
+
+@pytest.fixture
+def fake():
+    with FakeBotAPI() as instance:
+        yield instance
+
+def run(fake: FakeBotAPI, scenario):
+    async def main():
+        async with Bot(fake.token, base_url=fake.base_url) as bot:
+            return await scenario(bot)
+    return asyncio.run(main())
+
+def chat_member_update(user_id: int, old: str, new: str, date: int, invite_link: str = None) -> dict:
+    user = {"id": user_id, "is_bot": False, "first_name": "User"}
+    update = {
+        "update_id": date,
+        "chat_member": {
+            "chat": {"id": int(CHANNEL), "type": "channel", "title": "Аскеза"},
+            "from": user,
+            "date": date,
+            "old_chat_member": {"status": old, "user": user},
+            "new_chat_member": {"status": new, "user": user},
+        },
+    }
+    if invite_link:
+        update["chat_member"]["invite_link"] = {
+            "invite_link": invite_link, "creator": {"id": 1, "is_bot": True, "first_name": "Bot"},
+            "creates_join_request": False, "is_primary": False, "is_revoked": False,
+        }
+    return update
+
+def test_miss_falls_back_to_api_once(fake, adb):
+    """Нет записи — один get_chat_member, дальше ответ из индекса"""
+    index = MembershipIndex(adb.db, ttl=3600)
+
+    async def scenario(bot):
+        return [await index.is_member(bot, CHANNEL, 5) for _ in range(3)]
+
+    assert run(fake, scenario) == [True, True, True]
+    assert len(fake.calls_to("getChatMember")) == 1
+    assert index.stats() == {"hits": 2, "misses": 1}
+
+def test_updates_answer_locally_and_stale_entries_are_rechecked(fake, adb):
+    """Событие выхода отвечает без API; старое событие не откатывает новое; устаревшее — перепроверяется"""
+    index = MembershipIndex(adb.db, ttl=3600)
+    now = time.time()
+
+    async def scenario(bot):
+        await index.record(CHANNEL, 5, "left", now)
+        await index.record(CHANNEL, 5, "member", now - 10)
+        left = await index.is_member(bot, CHANNEL, 5)
+        await index.record(CHANNEL, 6, "left", now - 7200)
+        rechecked = await index.is_member(bot, CHANNEL, 6)
+        return left, rechecked
+
+    assert run(fake, scenario) == (False, True)
+    assert [params["user_id"] for params in fake.calls_to("getChatMember")] == ["6"]
+
+def test_chat_member_update_feeds_index_and_invite_pool(fake, adb, monkeypatch):
+    """chat_member через обработчики бота: индекс обновлен, одноразовая ссылка отозвана"""
+    monkeypatch.setattr(channel_manager, "get_async_database", lambda: adb)
+    monkeypatch.setattr(channel_manager, "PRIVATE_CHANNEL_ID", CHANNEL)
+
+    async def scenario():
+        application = Application.builder().token(fake.token).base_url(fake.base_url).build()
+        chat_info = ChatInfoCache(chat_ids=[])
+        manager = ChannelManager(application.bot, InviteLinkPool(adb.db, [CHANNEL], size=1, chat_info=chat_info),
+                                 chat_info, MembershipIndex(adb.db))
+        BotHandlers(adb, AsyncYooKassaClient("shop", "secret"), manager).register(application)
+        async with application:
+            await manager.invites.refill(application.bot)
+            invite_link = await manager.invites.issue(application.bot, CHANNEL, 5)
+            joined = chat_member_update(5, "left", "member", int(time.time()), invite_link)
+            await application.process_update(Update.de_json(joined, application.bot))
+            in_channel = await manager.check_user_in_channel(5)
+        return invite_link, in_channel
+
+    invite_link, in_channel = asyncio.run(scenario())
+    assert in_channel
+    # Статус пользователя взят из события, а не из get_chat_member
+    assert all(params["user_id"] != "5" for params in fake.calls_to("getChatMember"))
+    assert [params["invite_link"] for params in fake.calls_to("revokeChatInviteLink")] == [invite_link]
+
+def test_revoked_user_can_rejoin(fake, adb, monkeypatch):
+    """Отзыв доступа — удаление без бессрочной блокировки; приглашение не обращается к unban"""
+    monkeypatch.setattr(channel_manager, "get_async_database", lambda: adb)
+    monkeypatch.setattr(channel_manager, "PRIVATE_CHANNEL_ID", CHANNEL)
+    monkeypatch.setattr("config.PRIVATE_CHAT_ID", None)
+
+    async def scenario(bot):
+        chat_info = ChatInfoCache(chat_ids=[])
+        index = MembershipIndex(adb.db)
+        manager = ChannelManager(bot, InviteLinkPool(adb.db, [CHANNEL], size=1, chat_info=chat_info), chat_info, index)
+        revoked = await manager.revoke_access_from_users([5])
+        status = (await index.status(CHANNEL, 5))["status"]
+        await manager.invites.refill(bot)
+        return revoked, status, await manager.add_user_to_channel(5)
+
+    assert run(fake, scenario) == ({5: True}, "left", True)
+    assert [params["user_id"] for params in fake.calls_to("banChatMember")] == ["5"]
+    unbans = fake.calls_to("unbanChatMember")
+    assert len(unbans) == 1 and unbans[0]["only_if_banned"] in ("true", True)
+
+def test_legacy_bans_are_lifted_once(fake, adb, monkeypatch):
+    """Старые блокировки снимаются разовым проходом, а не при каждой выдаче"""
+    monkeypatch.setattr(channel_manager, "get_async_database", lambda: adb)
+    monkeypatch.setattr(channel_manager, "PRIVATE_CHANNEL_ID", CHANNEL)
+    monkeypatch.setattr("config.PRIVATE_CHAT_ID", None)
+
+    async def scenario(bot):
+        chat_info = ChatInfoCache(chat_ids=[])
+        manager = ChannelManager(bot, InviteLinkPool(adb.db, [CHANNEL], size=1, chat_info=chat_info), chat_info,
+                                 MembershipIndex(adb.db))
+        return await manager.lift_bans([5, 6, 5])
+
+    assert run(fake, scenario) == 2
+    assert [params["user_id"] for params in fake.calls_to("unbanChatMember")] == ["5", "6"]
+
+def test_revoke_without_admin_chats_fails(fake, adb, monkeypatch):
+    """Без каналов, где бот администратор, отзыв не считается успешным"""
+    monkeypatch.setattr(channel_manager, "get_async_database", lambda: adb)
+    monkeypatch.setattr(channel_manager, "PRIVATE_CHANNEL_ID", CHANNEL)
+    monkeypatch.setattr("config.PRIVATE_CHAT_ID", None)
+    fake.fail_next("getChatMember", 400, "Bad Request: chat not found")
+
+    async def scenario(bot):
+        chat_info = ChatInfoCache(chat_ids=[])
+        manager = ChannelManager(bot, InviteLinkPool(adb.db, [CHANNEL], size=1, chat_info=chat_info), chat_info,
+                                 MembershipIndex(adb.db))
+        return await manager.revoke_access_from_users([5, 6])
+
+    assert run(fake, scenario) == {5: False, 6: False}
+    assert fake.calls_to("banChatMember") == []
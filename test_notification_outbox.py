@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Тесты outbox уведомлений: постановка вместе с доступом, повторы, ошибки Telegram
+"""
+
+import asyncio
+import time
+import pytest
+import channel_manager
+from async_database import AsyncDatabase
+from channel_manager import ChannelManager
+from chat_info import ChatInfoCache
+from database import Database
+from fake_telegram import FakeBotAPI
+from invite_pool import InviteLinkPool
+from membership_index import MembershipIndex
+from notification_outbox import NotificationDispatcher
+from telegram_transport import TelegramRateLimiter, create_bot
+
+class FakeChannelManager:
+    """Менеджер каналов с настоящим ботом и приглашениями без обращений к Telegram"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.invited = []
+        # Назначения, приглашения в которые не удаются
+        self.failing = set()
+
+    async def _invite(self, destination, user_id):
+        self.invited.append((destination, user_id))
+        return destination not in self.failing
+
+    async def add_user_to_channel(self, user_id, raise_rejected=False):
+        return await self._invite("channel", user_id)
+
+    async def add_user_to_chat(self, user_id, raise_rejected=False):
+        return await self._invite("chat", user_id)
+
+@pytest.fixture
+def db(tmp_path):
+    instance = Database(str(tmp_path / "test.db"))
+    instance.add_user(1, "user1")
+    instance.create_payment(1, "askeza", 990, "pay-1")
+    yield instance
+    instance.close()
+
+@pytest.fixture
+def fake():
+    with FakeBotAPI() as instance:
+        yield instance
+
+def run(fake: FakeBotAPI, db: Database, scenario, **options):
+    async def main():
+        limiter = TelegramRateLimiter(global_rate=1000, chat_rate=1000, max_retries=0)
+        async with create_bot(fake.token, fake.base_url, limiter) as bot:
+            return await scenario(NotificationDispatcher(db, FakeChannelManager(bot), **options))
+    return asyncio.run(main())
+
+def outbox(db: Database):
+    with db.connection() as conn:
+        return {row["kind"]: dict(row) for row in conn.execute("SELECT * FROM notification_outbox")}
+
+def test_grant_enqueues_once_and_dispatches(fake, db):
+    """Доступ и уведомления — одной транзакцией; продолжение выдачи не дублирует уведомления"""
+    assert db.claim_fulfilment("pay-1")
+    assert db.claim_fulfilment("pay-1", lease=0)
+    rows = outbox(db)
+    assert sorted(rows) == ["invite_channel", "invite_chat", "payment_succeeded"]
+    assert rows["payment_succeeded"]["dedupe_key"] == "payment_succeeded:pay-1"
+
+    async def scenario(dispatcher):
+        return await dispatcher.dispatch_once(), await dispatcher.dispatch_once(), dispatcher
+
+    first, second, dispatcher = run(fake, db, scenario)
+    assert (first, second) == (3, 0)
+    assert sorted(dispatcher.channel_manager.invited) == [("channel", 1), ("chat", 1)]
+    calls = fake.calls_to("sendMessage")
+    assert len(calls) == 1 and "reply_markup" in calls[0]
+    assert {row["status"] for row in outbox(db).values()} == {"sent"}
+    assert dispatcher.stats()["queued"] == 0
+
+def test_transient_error_is_retried_with_backoff(fake, db):
+    """Сетевая ошибка — повтор после паузы, после max_attempts — failed"""
+    db.claim_fulfilment("pay-1")
+    fake.fail_next("sendMessage", 500, "Internal Server Error")
+
+    async def scenario(dispatcher):
+        started = time.time()
+        await dispatcher.dispatch_once()
+        retry = outbox(db)["payment_succeeded"]
+        # До истечения паузы строка не выбирается
+        assert retry["status"] == "queued" and retry["available_at"] >= started + 60
+        assert await dispatcher.dispatch_once() == 0
+
+        with db.connection() as conn:
+            conn.execute("UPDATE notification_outbox SET available_at = 0 WHERE status = 'queued'")
+            conn.commit()
+        fake.fail_next("sendMessage", 500, "Internal Server Error")
+        await dispatcher.dispatch_once()
+        return dispatcher
+
+    dispatcher = run(fake, db, scenario, max_attempts=2, retry_delay=60)
+    row = outbox(db)["payment_succeeded"]
+    assert (row["status"], row["attempts"]) == ("failed", 2)
+    assert (dispatcher.sent, dispatcher.retried, dispatcher.failed) == (2, 1, 1)
+    assert len(fake.calls_to("sendMessage")) == 2
+
+def test_blocked_user_is_not_retried(fake, db):
+    """Пользователь заблокировал бота — уведомление сразу failed"""
+    db.claim_fulfilment("pay-1")
+    fake.fail_next("sendMessage", 403, "Forbidden: bot was blocked by the user")
+
+    run(fake, db, lambda dispatcher: dispatcher.dispatch_once())
+    row = outbox(db)["payment_succeeded"]
+    assert (row["status"], row["attempts"]) == ("failed", 1)
+    assert row["last_error"].startswith("Forbidden")
+    assert outbox(db)["invite_channel"]["status"] == "sent"
+
+def test_start_requeues_only_expired_leases(fake, db):
+    """Запуск диспетчера не забирает уведомления, которые сейчас отправляет другой процесс"""
+    db.claim_fulfilment("pay-1")
+    with db.connection() as conn:
+        conn.execute("UPDATE notification_outbox SET status = 'sending', claimed_at = ? WHERE kind = 'payment_succeeded'",
+                     (time.time(),))
+        conn.execute("UPDATE notification_outbox SET status = 'sending', claimed_at = ? WHERE kind = 'invite_channel'",
+                     (time.time() - 600,))
+        conn.commit()
+
+    async def scenario(dispatcher):
+        await dispatcher.start()
+        await dispatcher.stop()
+
+    run(fake, db, scenario, lease=300)
+    rows = outbox(db)
+    assert rows["payment_succeeded"]["status"] == "sending"
+    assert rows["invite_channel"]["status"] in ("queued", "sent")
+    # Уведомление об оплате (с кнопками) не отправлено повторно
+    assert all("reply_markup" not in call for call in fake.calls_to("sendMessage"))
+
+def test_invites_are_retried_per_destination(fake, db):
+    """Неудачное приглашение в чат повторяется без повторного приглашения в канал"""
+    db.claim_fulfilment("pay-1")
+
+    async def scenario(dispatcher):
+        dispatcher.channel_manager.failing.add("chat")
+        await dispatcher.dispatch_once()
+        dispatcher.channel_manager.failing.clear()
+        with db.connection() as conn:
+            conn.execute("UPDATE notification_outbox SET available_at = 0 WHERE status = 'queued'")
+            conn.commit()
+        await dispatcher.dispatch_once()
+        return dispatcher.channel_manager.invited
+
+    invited = run(fake, db, scenario)
+    assert invited.count(("channel", 1)) == 1
+    assert invited.count(("chat", 1)) == 2
+    assert {row["status"] for row in outbox(db).values()} == {"sent"}
+
+def test_blocked_user_invite_is_not_retried(fake, db, monkeypatch):
+    """Отказ Telegram внутри ChannelManager доходит до диспетчера: приглашение сразу failed"""
+    adb = AsyncDatabase(db)
+    monkeypatch.setattr(channel_manager, "get_async_database", lambda: adb)
+    monkeypatch.setattr(channel_manager, "PRIVATE_CHANNEL_ID", "-1001")
+    monkeypatch.setattr("config.PRIVATE_CHAT_ID", None)
+    db.claim_fulfilment("pay-1")
+    fake.fail_next("sendMessage", 403, "Forbidden: bot was blocked by the user")
+
+    async def main():
+        limiter = TelegramRateLimiter(global_rate=1000, chat_rate=1000, max_retries=0)
+        async with create_bot(fake.token, fake.base_url, limiter) as bot:
+            chat_info = ChatInfoCache(chat_ids=[])
+            manager = ChannelManager(bot, InviteLinkPool(db, ["-1001"], size=1, chat_info=chat_info), chat_info,
+                                     MembershipIndex(db))
+            # Приглашение в канал — первая строка очереди, его sendMessage и получает ошибку
+            dispatcher = NotificationDispatcher(db, manager, batch_size=1)
+            await dispatcher.dispatch_once()
+            return dispatcher
+
+    try:
+        dispatcher = asyncio.run(main())
+    finally:
+        adb.shutdown()
+    row = outbox(db)["invite_channel"]
+    assert (row["status"], row["attempts"]) == ("failed", 1)
+    assert row["last_error"].startswith("Forbidden")
+    assert (dispatcher.retried, dispatcher.failed) == (0, 1)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Тесты архивации платежей
+"""
+
+import pytest
+from database import Database
+from payment_archive import PaymentArchiver
+
+@pytest.fixture
+def db(tmp_path):
+    instance = Database(str(tmp_path / "test.db"))
+    yield instance
+    instance.close()
+
+def age_payments(db: Database, days: int):
+    """Сдвиг created_at всех платежей в прошлое (каждый следующий новее)"""
+    with db.connection() as conn:
+        conn.execute(
+            "UPDATE payments SET created_at = datetime('now', ?, '+' || id || ' minutes')",
+            (f'-{days} days',)
+        )
+
+def test_archives_only_old_terminal_payments(db):
+    """Ожидающие платежи остаются в горячей таблице при любом возрасте"""
+    db.add_user(1, "user")
+    for i, status in enumerate(["succeeded", "canceled", "pending", "succeeded"]):
+        db.create_payment(1, "askeza", 990, f"payment-{i}")
+        if status != "pending":
+            db.update_payment_status(f"payment-{i}", status)
+    age_payments(db, 200)
+    db.create_payment(1, "askeza", 990, "fresh")
+    db.update_payment_status("fresh", "succeeded")
+
+    archived = PaymentArchiver(db, older_than_days=90, batch_size=2, pause=0).run_once()
+
+    assert archived == 3
+    with db.connection() as conn:
+        hot = {row[0] for row in conn.execute("SELECT yookassa_payment_id FROM payments")}
+        total = conn.execute("SELECT COUNT(*) FROM all_payments").fetchone()[0]
+    assert hot == {"payment-2", "fresh"}
+    assert total == 5
+
+def test_unified_read_path(db):
+    """История и поиск платежа видят архив прозрачно"""
+    db.add_user(1, "user")
+    for i in range(4):
+        db.create_payment(1, "askeza", 990, f"payment-{i}")
+        db.update_payment_status(f"payment-{i}", "succeeded")
+    age_payments(db, 200)
+    db.create_payment(1, "askeza", 990, "fresh")
+    db.archive_payments(90, 500)
+
+    history = db.get_payment_history(1, limit=3)
+    assert [payment["yookassa_payment_id"] for payment in history] == ["fresh", "payment-3", "payment-2"]
+    assert db.get_payment("payment-0")["status"] == "succeeded"
+    assert db.get_payment("missing") is None
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Тесты адаптивного опроса ожидающих платежей
+"""
+
+import asyncio
+import time
+import pytest
+from async_database import AsyncDatabase
+from async_yookassa_client import AsyncYooKassaClient
+from database import Database
+from fake_yookassa import FakeYooKassa
+from payment_polling import AdaptivePaymentPoller, poll_interval
+from payment_reconciler import PaymentReconciler
+
+@pytest.fixture
+def fake():
+    with FakeYooKassa() as server:
+        yield server
+
+@pytest.fixture
+def adb(tmp_path):
+    instance = AsyncDatabase(Database(str(tmp_path / "test.db")))
+    yield instance
+    instance.shutdown()
+    instance.db.close()
+
+def test_poll_interval_backs_off_with_age():
+    """Часто в начале, затем удвоение, затем потолок"""
+    assert poll_interval(10, 3, 180, 300, 900) == 3
+    assert poll_interval(480, 3, 180, 300, 900) == 6
+    assert poll_interval(780, 3, 180, 300, 900) == 12
+    assert poll_interval(100_000, 3, 180, 300, 900) == 900
+
+def test_fresh_payment_paid_within_seconds(fake, adb):
+    """Оплаченный свежий платеж обрабатывается на первом же опросе"""
+    client = AsyncYooKassaClient(fake.shop_id, fake.secret_key, fake.base_url)
+    fulfilled = []
+
+    async def on_succeeded(payment):
+        fulfilled.append(payment["yookassa_payment_id"])
+        return True
+
+    poller = AdaptivePaymentPoller(PaymentReconciler(adb, client, on_succeeded), fast_interval=3)
+
+    async def scenario():
+        created = await client.create_payment(990, "test")
+        await adb.create_payment(1, "askeza", 990, created["payment_id"])
+        now = time.time()
+        # До первого срока платеж не опрашивается
+        await poller.tick(now)
+        requests_before = fake.requests
+        fake.set_status(created["payment_id"], "succeeded")
+        next_at = await poller.tick(now + 3.5)
+        await client.close()
+        return created["payment_id"], requests_before, next_at - (now + 3.5)
+
+    payment_id, requests_before, wait = asyncio.run(scenario())
+    assert requests_before == 1  # только создание платежа
+    assert fulfilled == [payment_id]
+    assert wait == pytest.approx(3)
+    assert poller.stats()["tracked"] == 0
+
+def test_abandoned_payment_expires(fake, adb):
+    """После окна подтверждения платеж проверяется последний раз и помечается expired"""
+    client = AsyncYooKassaClient(fake.shop_id, fake.secret_key, fake.base_url)
+    poller = AdaptivePaymentPoller(PaymentReconciler(adb, client), confirmation_window=3600)
+
+    async def scenario():
+        created = await client.create_payment(990, "test")
+        await adb.create_payment(1, "askeza", 990, created["payment_id"])
+        now = time.time()
+        await poller.tick(now + 600)
+        rescheduled = poller._next_poll[created["payment_id"]] - (now + 600)
+        await poller.tick(now + 4000)
+        await client.close()
+        return created["payment_id"], rescheduled
+
+    payment_id, rescheduled = asyncio.run(scenario())
+    assert rescheduled > 3  # старый платеж опрашивается реже свежего
+    assert adb.db.get_payment(payment_id)["status"] == "expired"
+    assert adb.db.get_pending_payments() == []
+    assert poller.stats()["expired"] == 1
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Тесты параллельной сверки ожидающих платежей
+"""
+
+import asyncio
+import pytest
+from async_database import AsyncDatabase
+from async_yookassa_client import AsyncYooKassaClient
+from database import Database
+from fake_yookassa import FakeYooKassa
+from payment_reconciler import PaymentReconciler
+
+@pytest.fixture
+def fake():
+    with FakeYooKassa() as server:
+        yield server
+
+@pytest.fixture
+def adb(tmp_path):
+    instance = AsyncDatabase(Database(str(tmp_path / "test.db")))
+    yield instance
+    instance.shutdown()
+    instance.db.close()
+
+def create_pending(adb: AsyncDatabase, client: AsyncYooKassaClient, count: int):
+    """Платежи в фейковой ЮKassa и в базе со статусом pending"""
+    async def scenario():
+        ids = []
+        for user_id in range(count):
+            await adb.add_user(user_id, f"user{user_id}")
+            created = await client.create_payment(990, "test")
+            await adb.create_payment(user_id, "askeza", 990, created["payment_id"])
+            ids.append(created["payment_id"])
+        await client.close()
+        return ids
+    return asyncio.run(scenario())
+
+def test_sweep_is_concurrent_and_batched(fake, adb):
+    """Проход по 20 платежам с задержкой API 0.1 с занимает доли секунды"""
+    client = AsyncYooKassaClient(fake.shop_id, fake.secret_key, fake.base_url)
+    ids = create_pending(adb, client, 20)
+    for payment_id in ids[:5]:
+        fake.set_status(payment_id, "succeeded")
+    for payment_id in ids[5:8]:
+        fake.set_status(payment_id, "canceled")
+    for payment_id in ids[8:10]:
+        fake.set_status(payment_id, "failed")
+    fake.delay = 0.1
+
+    fulfilled = []
+
+    async def on_succeeded(payment):
+        fulfilled.append(payment["yookassa_payment_id"])
+        return True
+
+    reconciler = PaymentReconciler(adb, client, on_succeeded, concurrency=10, deadline=5)
+    batches_before = adb.db.writer.stats()["batches"]
+
+    async def scenario():
+        metrics = await reconciler.sweep(adb.db.get_pending_payments())
+        await client.close()
+        return metrics
+
+    metrics = asyncio.run(scenario())
+    assert metrics["checked"] == 20
+    assert (metrics["succeeded"], metrics["canceled"], metrics["failed"], metrics["fulfilled"]) == (5, 3, 2, 5)
+    assert metrics["duration"] < 1.0
+    assert fake.max_in_flight <= 10
+    assert sorted(fulfilled) == sorted(ids[:5])
+    assert adb.db.writer.stats()["batches"] - batches_before == 1
+    assert len(adb.db.get_pending_payments()) == 10
+
+def test_deadline_cancels_slow_checks(fake, adb):
+    """Не успевшие к сроку запросы отменяются, платежи остаются pending"""
+    client = AsyncYooKassaClient(fake.shop_id, fake.secret_key, fake.base_url)
+    ids = create_pending(adb, client, 3)
+    for payment_id in ids:
+        fake.set_status(payment_id, "succeeded")
+    fake.delay = 0.5
+
+    reconciler = PaymentReconciler(adb, client, deadline=0.1)
+
+    async def scenario():
+        metrics = await reconciler.sweep()
+        await client.close()
+        return metrics
+
+    metrics = asyncio.run(scenario())
+    assert metrics["timed_out"] == 3
+    assert metrics["succeeded"] == 0
+    assert len(adb.db.get_pending_payments()) == 3
+
+def test_payment_processed_elsewhere_is_not_fulfilled_twice(fake, adb):
+    """Если webhook уже сменил статус, сверка не выдает доступ повторно"""
+    client = AsyncYooKassaClient(fake.shop_id, fake.secret_key, fake.base_url)
+    payment_id = create_pending(adb, client, 1)[0]
+    fake.set_status(payment_id, "succeeded")
+    payments = adb.db.get_pending_payments()
+    adb.db.update_payment_status(payment_id, "succeeded")
+
+    fulfilled = []
+
+    async def on_succeeded(payment):
+        fulfilled.append(payment)
+        return True
+
+    async def scenario():
+        metrics = await PaymentReconciler(adb, client, on_succeeded).sweep(payments)
+        await client.close()
+        return metrics
+
+    metrics = asyncio.run(scenario())
+    assert metrics["checked"] == 1 and metrics["succeeded"] == 0
+    assert fulfilled == []
+
+def test_full_sweep_recovers_unfulfilled_payments(fake, adb):
+    """Оплаченный платеж без завершенной выдачи подхватывается полным проходом"""
+    client = AsyncYooKassaClient(fake.shop_id, fake.secret_key, fake.base_url)
+    lost, done = create_pending(adb, client, 2)
+    # Статус сменили, но процесс упал до выдачи доступа
+    adb.db.update_payment_status(lost, "succeeded")
+    adb.db.claim_fulfilment(done)
+    adb.db.complete_fulfilment(done)
+
+    fulfilled = []
+
+    async def on_succeeded(payment):
+        fulfilled.append(payment["yookassa_payment_id"])
+        return True
+
+    async def scenario():
+        metrics = await PaymentReconciler(adb, client, on_succeeded).sweep()
+        await client.close()
+        return metrics
+
+    metrics = asyncio.run(scenario())
+    assert metrics["pending"] == 0 and metrics["recovered"] == 1
+    assert fulfilled == [lost]
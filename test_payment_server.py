@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Тесты асинхронного сервера платежей в event loop бота
+"""
+
+import asyncio
+import httpx
+import pytest
+from async_database import AsyncDatabase
+from async_yookassa_client import AsyncYooKassaClient
+from database import Database
+from fake_yookassa import FakeYooKassa
+from notification_outbox import NotificationDispatcher
+from payment_server import PaymentServer
+
+class FakeBot:
+    """Бот, запоминающий отправленные сообщения"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        self.sent.append(chat_id)
+
+class FakeChannelManager:
+    """Менеджер каналов без обращений к Telegram"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.invited = []
+
+    async def add_user_to_channel(self, user_id, raise_rejected=False):
+        self.invited.append(("channel", user_id))
+        return True
+
+    async def add_user_to_chat(self, user_id, raise_rejected=False):
+        self.invited.append(("chat", user_id))
+        return True
+
+@pytest.fixture
+def adb(tmp_path):
+    instance = AsyncDatabase(Database(str(tmp_path / "test.db")))
+    yield instance
+    instance.shutdown()
+    instance.db.close()
+
+@pytest.fixture
+def yookassa():
+    with FakeYooKassa() as server:
+        yield server
+
+def notification(payment_id: str, status: str = "succeeded") -> dict:
+    return {
+        "type": "notification",
+        "event": f"payment.{status}",
+        "object": {
+            "id": payment_id, "status": status, "paid": status == "succeeded",
+            "amount": {"value": "990.00", "currency": "RUB"},
+            "created_at": "2024-01-01T00:00:00.000Z", "metadata": {}, "test": True, "refundable": False,
+        },
+    }
+
+def make_server(adb: AsyncDatabase, yookassa: FakeYooKassa) -> PaymentServer:
+    client = AsyncYooKassaClient(yookassa.shop_id, yookassa.secret_key, yookassa.base_url)
+    return PaymentServer(adb, client, host="127.0.0.1", port=0, workers=2, reconcile_interval=None)
+
+def create_payment(adb: AsyncDatabase, server: PaymentServer, user_id: int) -> str:
+    """Платеж в фейковой ЮKassa и в базе со статусом pending"""
+    async def scenario():
+        created = await server.yookassa.create_payment(990, "test")
+        await server.yookassa.close()
+        return created["payment_id"]
+    payment_id = asyncio.run(scenario())
+    adb.db.add_user(user_id, f"user{user_id}")
+    adb.db.create_payment(user_id, "askeza", 990, payment_id)
+    return payment_id
+
+def test_webhook_is_acked_and_fulfilled_in_same_loop(adb, yookassa):
+    """Webhook подтверждается сразу, доступ выдается обработчиком очереди, уведомления — из outbox"""
+    server = make_server(adb, yookassa)
+    payment_id = create_payment(adb, server, 1)
+    yookassa.set_status(payment_id, "succeeded")
+    dispatcher = NotificationDispatcher(adb.db, FakeChannelManager(FakeBot()))
+
+    async def scenario():
+        await server.start()
+        await dispatcher.start()
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{server.http.port}") as client:
+                responses = [await client.post("/webhook/yookassa", json=notification(payment_id)) for _ in range(3)]
+                for _ in range(200):
+                    if server.queue.processed == 3 and dispatcher.sent == 2:
+                        break
+                    await asyncio.sleep(0.01)
+                health = await client.get("/health")
+        finally:
+            await dispatcher.stop()
+            await server.stop()
+            await server.yookassa.close()
+        return responses, health
+
+    responses, health = asyncio.run(scenario())
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert responses[0].json() == {"status": "queued"}
+    # Три уведомления об одном платеже — по одному приглашению в канал и чат и одно сообщение
+    assert dispatcher.channel_manager.bot.sent == [1]
+    assert sorted(dispatcher.channel_manager.invited) == [("channel", 1), ("chat", 1)]
+    assert adb.db.get_user_access(1)
+    assert health.status_code == 200
+    assert health.json()["webhook_queue"]["queued"] == 0
+
+def test_webhook_status_is_verified_with_api(adb, yookassa):
+    """Статус берется из API ЮKassa: поддельное succeeded не выдает доступ, отмена записывается"""
+    server = make_server(adb, yookassa)
+    forged, canceled = create_payment(adb, server, 1), create_payment(adb, server, 2)
+    yookassa.set_status(canceled, "canceled")
+
+    async def scenario():
+        try:
+            # В ЮKassa первый платеж все еще pending
+            await server.handle_event(notification(forged))
+            await server.handle_event(notification(canceled, "canceled"))
+        finally:
+            await server.yookassa.close()
+
+    asyncio.run(scenario())
+    assert adb.db.get_payment(forged)["status"] == "pending"
+    assert not adb.db.get_user_access(1)
+    assert adb.db.get_payment(canceled)["status"] == "canceled"
+    assert server.fulfiller.fulfilled == 0
+
+def test_invalid_requests_are_rejected(adb, yookassa):
+    """Некорректное тело — 400, неизвестный путь — 404, другой метод — 405"""
+    server = make_server(adb, yookassa)
+
+    async def scenario():
+        await server.start()
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{server.http.port}") as client:
+                return [
+                    (await client.post("/webhook/yookassa", content=b"not json")).status_code,
+                    (await client.post("/webhook/yookassa", json={"type": "notification"})).status_code,
+                    (await client.get("/missing")).status_code,
+                    (await client.get("/webhook/yookassa")).status_code,
+                ]
+        finally:
+            await server.stop()
+
+    assert asyncio.run(scenario()) == [400, 400, 404, 405]
+    assert server.queue.stats()["queued"] == 0
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Проверка планов горячих запросов: ни один не должен деградировать до полного
+просмотра таблицы или сортировки во временном B-дереве
+"""
+
+import sqlite3
+import pytest
+import broadcast
+import notification_outbox
+import database
+import invite_pool
+import membership_index
+import webhook_queue
+from database import Database
+from migrations import MIGRATIONS, apply_migrations, get_schema_version
+
+# (запрос, параметры, индекс, который должен использоваться)
+HOT_QUERIES = [
+    (database.USER_ACCESS_QUERY, (1,), "PRIMARY KEY"),
+    (database.ACTIVE_ACCESS_QUERY, (), "idx_entitlements_active_expiry"),
+    (database.PAYMENT_HISTORY_QUERY, (1, 10), "idx_payments_user_created"),
+    (database.PENDING_PAYMENTS_QUERY, (), "idx_payments_pending"),
+    (database.EXPIRED_USERS_QUERY, (), "idx_entitlements_active_expiry"),
+    (database.REVOKE_EXPIRED_QUERY, (), "idx_entitlements_active_expiry"),
+    (database.ARCHIVED_PAYMENT_HISTORY_QUERY, (1, 10), "idx_payments_archive_user_created"),
+    (database.ARCHIVE_CANDIDATES_QUERY, ("-90 days", 500), "idx_payments_terminal_created"),
+    (database.EXPIRY_SCHEDULE_QUERY, (), "idx_entitlements_active_expiry"),
+    (database.REVOKE_ENTITLEMENT_QUERY, (1, "askeza", "2030-01-01 00:00:00"), "PRIMARY KEY"),
+    (database.UNFULFILLED_PAYMENTS_QUERY, ("-1 days", 1700000000.0), "idx_payments_terminal_created"),
+    (webhook_queue.CLAIM_QUERY, (1700000000.0, 1), "idx_webhook_events_queued"),
+    (webhook_queue.RECOVER_QUERY, (1700000000.0,), "idx_webhook_events_processing"),
+    (invite_pool.ISSUED_LINK_QUERY, (1, "-1001", 1700000000.0), "idx_invite_links_issued_user"),
+    (invite_pool.TAKE_LINK_QUERY, (1, 1700000000.0, "-1001", 1700000000.0), "idx_invite_links_available"),
+    (invite_pool.EXPIRED_LINKS_QUERY, (1700000000.0, 100), "idx_invite_links_issued_expiry"),
+    (membership_index.MEMBER_QUERY, ("-1001", 1), "PRIMARY KEY"),
+    (broadcast.CLAIM_QUERY, (1700000000.0, 1, 1, 200), "idx_broadcast_deliveries_status"),
+    (broadcast.PROGRESS_QUERY, (1,), "idx_broadcast_deliveries_status"),
+    (broadcast.SEGMENTS["askeza_active"], (), "idx_entitlements_active_expiry"),
+    (broadcast.SEGMENTS["paid"], (), "idx_payment_fulfilments_user"),
+    (notification_outbox.CLAIM_QUERY, (1700000000.0, 1700000000.0, 50), "idx_notification_outbox_queued"),
+    (notification_outbox.RECOVER_QUERY, (1700000000.0,), "idx_notification_outbox_sending"),
+]
+
+@pytest.fixture
+def db(tmp_path):
+    instance = Database(str(tmp_path / "test.db"))
+    yield instance
+    instance.close()
+
+def query_plan(conn, query: str, params: tuple) -> list:
+    """Строки EXPLAIN QUERY PLAN для запроса"""
+    return [row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+@pytest.mark.parametrize("query, params, index", HOT_QUERIES, ids=[index for _, _, index in HOT_QUERIES])
+def test_hot_query_uses_index(db, query, params, index):
+    """Горячий запрос использует ожидаемый индекс"""
+    with db.connection() as conn:
+        plan = query_plan(conn, query, params)
+
+    assert any(index in step for step in plan), plan
+    for step in plan:
+        table_scan = step.startswith("SCAN") and "USING" not in step
+        assert not table_scan, f"Полный просмотр таблицы: {plan}"
+        assert "TEMP B-TREE" not in step, f"Сортировка без индекса: {plan}"
+
+def test_migrations_are_idempotent(db):
+    """Повторный запуск не применяет миграции заново"""
+    with db.connection() as conn:
+        assert get_schema_version(conn) == MIGRATIONS[-1][0]
+        assert apply_migrations(conn) == 0
+
+def test_legacy_database_is_upgraded(tmp_path):
+    """База без schema_version получает индексы и новые таблицы при первом запуске"""
+    path = str(tmp_path / "legacy.db")
+    with sqlite3.connect(path) as conn:
+        for statement in MIGRATIONS[0][2]:
+            conn.execute(statement)
+        conn.execute("INSERT INTO access (user_id, access_type, expires_at) VALUES (1, 'askeza', '2099-01-01')")
+
+    upgraded = Database(path)
+    with upgraded.connection() as conn:
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_access_user_active", "idx_payments_pending", "idx_entitlements_active_expiry"} <= indexes
+    upgraded.close()
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
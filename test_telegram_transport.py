@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Тесты общего транспорта Telegram: лимиты частоты, RetryAfter, полосы приоритета
+"""
+
+import asyncio
+import time
+import pytest
+from fake_telegram import FakeBotAPI
+from telegram_transport import (
+    TokenBucket, TelegramRateLimiter, create_bot, priority, PRIORITY_HIGH, PRIORITY_BULK,
+)
+
+@pytest.fixture
+def fake():
+    with FakeBotAPI() as instance:
+        yield instance
+
+def run(fake: FakeBotAPI, limiter: TelegramRateLimiter, scenario):
+    async def main():
+        async with create_bot(fake.token, fake.base_url, limiter) as bot:
+            return await scenario(bot)
+    return asyncio.run(main())
+
+def test_token_bucket_allows_burst_then_paces():
+    """burst запросов сразу, дальше — по одному в 1/rate секунды"""
+    bucket = TokenBucket(rate=10, burst=3)
+    delays = [bucket.reserve(now=100.0) for _ in range(5)]
+    assert delays == pytest.approx([0, 0, 0, 0.1, 0.2])
+    assert not bucket.idle(100.0)
+    assert bucket.idle(101.0)
+
+def test_retry_after_pauses_and_retries(fake):
+    """RetryAfter: запрос повторяется после паузы, повтор виден в счетчиках метода"""
+    limiter = TelegramRateLimiter()
+    fake.fail_next("sendMessage", 429, "Too Many Requests: retry after 1", retry_after=1)
+
+    async def scenario(bot):
+        started = time.monotonic()
+        message = await bot.send_message(chat_id=5, text="Оплата прошла")
+        return message, time.monotonic() - started
+
+    message, elapsed = run(fake, limiter, scenario)
+    assert message.text == "Оплата прошла"
+    assert elapsed >= 1
+    assert len(fake.calls_to("sendMessage")) == 2
+    counters = limiter.stats()["methods"]["sendMessage"]
+    assert (counters["calls"], counters["attempts"], counters["retries"], counters["errors"]) == (1, 2, 1, 0)
+    assert limiter.stats()["flood_waits"] == 1
+
+def test_high_priority_overtakes_bulk_and_chat_limit_applies(fake):
+    """Рассылка ограничена своей долей лимита, подтверждение оплаты ее не ждет; один чат — не чаще chat_rate"""
+    limiter = TelegramRateLimiter(global_rate=20, bulk_share=0.25, chat_rate=5, chat_burst=1)
+    finished = []
+
+    async def send(bot, chat_id, lane, label):
+        with priority(lane):
+            await bot.send_message(chat_id=chat_id, text=label)
+        finished.append(label)
+
+    async def scenario(bot):
+        started = time.monotonic()
+        bulk = [asyncio.create_task(send(bot, 100 + index, PRIORITY_BULK, f"bulk-{index}")) for index in range(10)]
+        await asyncio.sleep(0.05)
+        await send(bot, 7, PRIORITY_HIGH, "payment")
+        await asyncio.gather(*bulk)
+        # Три сообщения в один чат при 5 в секунду — не быстрее 0.4 с
+        same_chat = time.monotonic()
+        for _ in range(3):
+            await bot.send_message(chat_id=8, text="reply")
+        return time.monotonic() - started, time.monotonic() - same_chat
+
+    total, same_chat = run(fake, limiter, scenario)
+    # 10 сообщений рассылки при 5 в секунду (пачка 5) — не меньше секунды
+    assert total >= 0.9
+    assert finished.index("payment") < 6
+    assert same_chat >= 0.35
+    assert limiter.stats()["methods"]["sendMessage"]["calls"] == 14
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Тесты приема обновлений Telegram по webhook с фейковым Bot API
+"""
+
+import asyncio
+import socket
+import httpx
+import pytest
+from telegram.ext import Application
+from async_database import AsyncDatabase
+from async_yookassa_client import AsyncYooKassaClient
+from database import Database
+from fake_telegram import FakeBotAPI
+from handlers import BotHandlers
+from telegram_webhook import TelegramWebhookServer, serve_webhook
+
+SECRET = "test-secret_token"
+
+class FakeChannelManager:
+    """Менеджер каналов без обращений к Telegram"""
+
+    bot = None
+
+    async def grant_access_to_user(self, user_id, access_type):
+        return True
+
+@pytest.fixture
+def adb(tmp_path):
+    instance = AsyncDatabase(Database(str(tmp_path / "test.db")))
+    yield instance
+    instance.shutdown()
+    instance.db.close()
+
+@pytest.fixture
+def fake():
+    with FakeBotAPI() as instance:
+        yield instance
+
+def message_update(update_id: int, text: str) -> dict:
+    user = {"id": 42, "is_bot": False, "first_name": "Olga", "username": "olga"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 1700000000, "text": text, "from": user,
+            "chat": {"id": 42, "type": "private"},
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}] if text.startswith("/") else [],
+        },
+    }
+
+def build_application(fake: FakeBotAPI, adb: AsyncDatabase) -> Application:
+    application = Application.builder().token(fake.token).base_url(fake.base_url).build()
+    BotHandlers(adb, AsyncYooKassaClient("shop", "secret"), FakeChannelManager()).register(application)
+    return application
+
+async def wait_for(condition, timeout: float = 5.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("условие не выполнилось")
+
+def test_updates_go_through_same_handlers(fake, adb):
+    """Webhook регистрируется с секретом, обновления обрабатываются обработчиками BotHandlers"""
+    async def scenario():
+        stop, ready = asyncio.Event(), asyncio.get_running_loop().create_future()
+        application = build_application(fake, adb)
+        task = asyncio.create_task(serve_webhook(
+            application, SECRET, "127.0.0.1", 0, webhook_url="pending",
+            stop_event=stop, server_ready=ready,
+        ))
+        server = await ready
+        # Адрес, который Telegram получил бы в setWebhook, — на деле адрес нашего сервера
+        fake.webhook_url = f"http://127.0.0.1:{server.http.port}{server.path}"
+
+        statuses = [
+            await fake.deliver(message_update(1, "/start")),
+            await fake.deliver(message_update(2, "привет")),
+        ]
+        await wait_for(lambda: len(fake.calls_to("sendMessage")) >= 2)
+        stop.set()
+        await task
+        return statuses, server
+
+    statuses, server = asyncio.run(scenario())
+    assert statuses == [200, 200]
+    assert fake.webhook_secret == SECRET
+    assert server.received == 2
+    texts = [params["text"] for params in fake.calls_to("sendMessage")]
+    assert "Я жду тебя, Olga!" in texts[0]
+    assert texts[1] == "Используйте кнопки для навигации."
+    # /start записал пользователя в базу
+    assert adb.db.get_user(42)
+
+def test_wrong_secret_and_invalid_body_are_rejected(fake, adb):
+    """Без верного секрета — 403 до разбора тела; тело не Update — 400"""
+    application = build_application(fake, adb)
+    server = TelegramWebhookServer(application, SECRET, "127.0.0.1", 0)
+
+    async def scenario():
+        await server.start()
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{server.http.port}") as client:
+                post = lambda secret, **kwargs: client.post(
+                    "/webhook/telegram", headers={"X-Telegram-Bot-Api-Secret-Token": secret}, **kwargs
+                )
+                return [
+                    (await client.post("/webhook/telegram", json=message_update(1, "hi"))).status_code,
+                    (await post("wrong", json=message_update(1, "hi"))).status_code,
+                    (await post(SECRET, content=b"not json")).status_code,
+                    (await post(SECRET, json={"message": {}})).status_code,
+                ]
+        finally:
+            await server.stop()
+
+    assert asyncio.run(scenario()) == [403, 403, 400, 400]
+    assert server.rejected == 2
+    assert application.update_queue.qsize() == 0
+
+def test_workers_share_port_with_reuse_port(fake, adb):
+    """Несколько серверов с reuse_port слушают один порт, как процессы-воркеры"""
+    if not hasattr(socket, "SO_REUSEPORT"):
+        pytest.skip("SO_REUSEPORT недоступен")
+    application = build_application(fake, adb)
+
+    async def scenario():
+        first = TelegramWebhookServer(application, SECRET, "127.0.0.1", 0, reuse_port=True)
+        await first.start()
+        second = TelegramWebhookServer(application, SECRET, "127.0.0.1", first.http.port, reuse_port=True)
+        await second.start()
+        await first.stop()
+        await second.stop()
+        return first.http.port, second.http.port
+
+    first_port, second_port = asyncio.run(scenario())
+    assert first_port == second_port
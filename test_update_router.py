@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Тесты маршрутизации обновлений бота и цепочки middleware
+"""
+
+import asyncio
+import logging
+from types import SimpleNamespace
+import pytest
+from async_database import AsyncDatabase
+from database import Database
+from update_router import (
+    UpdateRouter, RouteTimer, SampledLogger, UserContextLoader, error_boundary,
+)
+
+class FakeMessage:
+    """Сообщение, запоминающее ответы"""
+
+    def __init__(self, text: str = None):
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text, reply_markup=None):
+        self.replies.append(text)
+
+def callback_update(user_id: int, data: str) -> SimpleNamespace:
+    message = FakeMessage()
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id), callback_query=SimpleNamespace(data=data),
+                           message=None, effective_message=message)
+
+def text_update(user_id: int, text: str) -> SimpleNamespace:
+    message = FakeMessage(text)
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id), callback_query=None,
+                           message=message, effective_message=message)
+
+@pytest.fixture
+def adb(tmp_path):
+    instance = AsyncDatabase(Database(str(tmp_path / "test.db")))
+    yield instance
+    instance.shutdown()
+    instance.db.close()
+
+def test_routes_resolve_by_table():
+    """Точный callback, префикс с аргументом, текст кнопки и запасные маршруты"""
+    calls = []
+
+    async def record(call):
+        calls.append((call.route, call.argument))
+
+    router = UpdateRouter()
+    router.callback("faq", record)
+    router.callback("check_payments", record)
+    router.callback_prefix("pay_", record)
+    router.text("❓ Вопрос/Ответ", "text:faq", record)
+    router.fallback("text", "unknown_text", record)
+
+    async def scenario():
+        return [
+            await router.dispatch_callback(callback_update(1, "faq"), None),
+            await router.dispatch_callback(callback_update(1, "check_payments"), None),
+            await router.dispatch_callback(callback_update(1, "pay_askeza"), None),
+            await router.dispatch_callback(callback_update(1, "missing"), None),
+            await router.dispatch_text(text_update(1, "❓ Вопрос/Ответ"), None),
+            await router.dispatch_text(text_update(1, "привет"), None),
+        ]
+
+    assert asyncio.run(scenario()) == [True, True, True, False, True, True]
+    assert calls == [("faq", None), ("check_payments", None), ("pay_*", "askeza"),
+                     ("text:faq", None), ("unknown_text", None)]
+    with pytest.raises(ValueError):
+        router.callback_prefix("pay", record)
+
+def test_middleware_injects_user_times_routes_and_catches_errors(adb):
+    """Доступ загружается один раз до обработчика; ошибка — ответ пользователю и счетчик маршрута"""
+    adb.db.add_user(1, "user1")
+    adb.db.create_payment(1, "askeza", 990, "pay-1")
+    adb.db.claim_fulfilment("pay-1")
+    timer = RouteTimer()
+    router = UpdateRouter([error_boundary, timer, UserContextLoader(adb)])
+    seen = []
+
+    async def menu(call):
+        seen.append((call.user.user_id, call.user.has_access, [row["access_type"] for row in call.user.access]))
+
+    async def broken(call):
+        raise RuntimeError("boom")
+
+    router.callback("back_to_main", menu)
+    router.callback("broken", broken)
+    update = callback_update(2, "broken")
+
+    async def scenario():
+        await router.dispatch_callback(callback_update(1, "back_to_main"), None)
+        await router.dispatch_callback(callback_update(2, "back_to_main"), None)
+        await router.dispatch_callback(update, None)
+
+    asyncio.run(scenario())
+    assert seen == [(1, True, ["askeza"]), (2, False, [])]
+    assert update.effective_message.replies == ["❌ Произошла ошибка. Попробуйте позже."]
+    stats = timer.stats()
+    assert (stats["back_to_main"]["calls"], stats["back_to_main"]["errors"]) == (2, 0)
+    assert (stats["broken"]["calls"], stats["broken"]["errors"]) == (1, 1)
+    assert stats["back_to_main"]["avg_latency"] <= stats["back_to_main"]["max_latency"]
+
+def test_sampled_logging_logs_route_not_update(caplog):
+    """В лог попадают маршрут, аргумент и пользователь, но не объект обновления"""
+    async def noop(call):
+        pass
+
+    quiet = UpdateRouter([SampledLogger(0)])
+    loud = UpdateRouter([SampledLogger(1)])
+    for router in (quiet, loud):
+        router.callback_prefix("pay_", noop)
+
+    with caplog.at_level(logging.INFO, logger="update_router"):
+        asyncio.run(quiet.dispatch_callback(callback_update(7, "pay_askeza"), None))
+        assert caplog.messages == []
+        asyncio.run(loud.dispatch_callback(callback_update(7, "pay_askeza"), None))
+    assert caplog.messages == ["Маршрут pay_* (askeza) от пользователя 7"]
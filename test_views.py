@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Тесты каталога экранов: статические экраны общие, динамические части подставляются
+"""
+
+import pytest
+import views
+
+def test_static_screens_are_shared_and_immutable():
+    """Статические экраны собраны один раз; клавиатуры нельзя изменить"""
+    assert views.MAIN_MENU[True] is views.MAIN_MENU[True]
+    assert views.FAQ.text == views.FAQ_REPLY.text
+    assert views.PAYMENT_OPTIONS.text == views.PAYMENT_OPTIONS_REPLY.text
+    data = [[button.callback_data for button in row] for row in views.MAIN_MENU[False].reply_markup.inline_keyboard]
+    assert data == [["faq"], ["payment"]]
+    assert len(views.MAIN_MENU[True].reply_markup.inline_keyboard) == 4
+    with pytest.raises(AttributeError):
+        views.FAQ.reply_markup.inline_keyboard = ()
+
+def test_dynamic_parts_are_filled_per_request():
+    """На запрос создаются только текст и кнопка со ссылкой на оплату"""
+    welcome = views.WELCOME.format(username="Анна")
+    assert "Анна" in welcome.text and welcome.reply_markup is views.WELCOME.reply_markup
+
+    screen = views.payment_created("Аскеза", 990, "pay-1", "https://pay.example/pay-1")
+    rows = screen.reply_markup.inline_keyboard
+    assert "pay-1" in screen.text and rows[0][0].url == "https://pay.example/pay-1"
+    assert rows[1:] == views.PAYMENT_CREATED_ROWS and rows[1][0] is views.PAYMENT_CREATED_ROWS[0][0]
+    assert "https://pay.example/pay-1" in views.payment_created_reply("Аскеза", 990, "pay-1", "https://pay.example/pay-1").text
+
+def test_access_and_history_screens():
+    """Статус доступа и история платежей для inline и текстовых сообщений"""
+    assert views.access_status([]) is views.NO_ACCESS_STATUS
+    status = views.access_status([{"access_type": "askeza", "expires_at": "2026-11-01"}])
+    assert "🔸 Аскеза - до 2026-11-01" in status.text and status.reply_markup is views.ACCESS_KEYBOARD
+
+    assert views.payment_history([]) is views.HISTORY_EMPTY
+    payments = [{"payment_type": "askeza", "amount": 990, "status": "succeeded", "yookassa_payment_id": "pay-12345678",
+                 "created_at": "2026-10-01T10:00:00", "paid_at": "2026-10-01T10:05:00"}]
+    inline, reply = views.payment_history(payments), views.payment_history_reply(payments)
+    assert inline.text == reply.text
+    assert "✅ Аскеза - 990₽" in inline.text and "Оплачен: 01.10.2026 10:05" in inline.text
+    assert inline.reply_markup is views.HISTORY_KEYBOARD and reply.reply_markup is None
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Тесты очереди входящих webhook ЮKassa
+"""
+
+import asyncio
+import pytest
+from database import Database
+from webhook_queue import WebhookQueue, WebhookWorkerPool, validate_notification
+
+@pytest.fixture
+def db(tmp_path):
+    instance = Database(str(tmp_path / "test.db"))
+    yield instance
+    instance.close()
+
+def notification(payment_id: str, event: str = "payment.succeeded") -> dict:
+    return {"type": "notification", "event": event, "object": {"id": payment_id, "status": "succeeded"}}
+
+def run_pool(pool: WebhookWorkerPool, until, timeout: float = 5.0):
+    """Работа воркеров, пока until() не станет истинным"""
+    async def scenario():
+        await pool.start()
+        try:
+            for _ in range(int(timeout / 0.01)):
+                if until():
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await pool.stop()
+    asyncio.run(scenario())
+
+def test_validate_notification():
+    """Некорректные уведомления отклоняются до записи в очередь"""
+    assert validate_notification(notification("p1")) is None
+    assert validate_notification(None)
+    assert validate_notification({"type": "notification", "event": "payment.succeeded"})
+    assert validate_notification({"type": "other", "event": "x", "object": {"id": "p1"}})
+
+def test_events_are_processed_and_removed(db):
+    """Каждое событие обрабатывается один раз и уходит из очереди"""
+    queue = WebhookQueue(db)
+    for i in range(10):
+        queue.enqueue(notification(f"p{i}"))
+    assert queue.stats()["queued"] == 10
+
+    handled = []
+
+    async def handler(payload):
+        await asyncio.sleep(0.01)
+        handled.append(payload["object"]["id"])
+
+    pool = WebhookWorkerPool(queue, handler, workers=4)
+    run_pool(pool, lambda: queue.processed == 10)
+
+    assert sorted(handled) == sorted(f"p{i}" for i in range(10))
+    stats = queue.stats()
+    assert stats["queued"] == 0 and stats["processing"] == 0
+    assert stats["latency_p99"] is not None
+
+def test_failing_event_is_retried_then_dead_lettered(db):
+    """Исключение в обработчике — повтор, после max_attempts — dead letter"""
+    queue = WebhookQueue(db)
+    queue.enqueue(notification("broken"))
+    calls = []
+
+    async def handler(payload):
+        calls.append(payload["object"]["id"])
+        raise RuntimeError("Telegram недоступен")
+
+    pool = WebhookWorkerPool(queue, handler, workers=2, max_attempts=3, retry_delay=0.01)
+    run_pool(pool, lambda: queue.dead_lettered == 1)
+
+    assert len(calls) == 3
+    assert queue.retried == 2
+    stats = queue.stats()
+    assert stats["queued"] == 0 and stats["dead_letters"] == 1
+    with db.connection() as conn:
+        row = conn.execute("SELECT payment_id, attempts, last_error FROM webhook_dead_letters").fetchone()
+    assert (row["payment_id"], row["attempts"]) == ("broken", 3)
+    assert "Telegram недоступен" in row["last_error"]
+
+def test_interrupted_events_are_recovered(db):
+    """События, захваченные до падения процесса, обрабатываются после перезапуска"""
+    queue = WebhookQueue(db)
+    queue.enqueue(notification("p1"))
+    assert len(asyncio.run(queue.claim(1))) == 1
+    assert queue.stats()["processing"] == 1
+
+    handled = []
+
+    async def handler(payload):
+        handled.append(payload["object"]["id"])
+
+    # Другой живой процесс: аренда не истекла, событие не трогаем
+    other = WebhookQueue(db)
+    assert asyncio.run(other.recover(lease=300)) == 0
+    assert other.stats()["processing"] == 1
+
+    restarted = WebhookQueue(db)
+    run_pool(WebhookWorkerPool(restarted, handler, workers=1, lease=0), lambda: restarted.processed == 1)
+    assert handled == ["p1"]
+
+def test_enqueue_wakes_running_workers(db):
+    """Новое событие из другого потока подхватывается без ожидания опроса"""
+    queue = WebhookQueue(db)
+    handled = []
+
+    async def handler(payload):
+        handled.append(payload["object"]["id"])
+
+    pool = WebhookWorkerPool(queue, handler, workers=2, idle_poll=60)
+
+    async def scenario():
+        await pool.start()
+        await asyncio.sleep(0.05)
+        await asyncio.get_running_loop().run_in_executor(None, queue.enqueue, notification("p1"))
+        for _ in range(200):
+            if handled:
+                break
+            await asyncio.sleep(0.01)
+        await pool.stop()
+
+    asyncio.run(scenario())
+    assert handled == ["p1"]
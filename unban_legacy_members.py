@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Разовое снятие блокировок в закрытых канале и чате.
+
+Раньше истекший доступ отзывался через ban_chat_member без unban, и такой
+пользователь не мог вернуться по новой ссылке после повторной оплаты. Сейчас
+удаление сразу снимает блокировку, а выдача доступа ее не проверяет, поэтому
+старые блокировки снимаются один раз этим скриптом:
+    python unban_legacy_members.py
+"""
+
+import asyncio
+import logging
+from channel_manager import ChannelManager
+from database import get_database
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+def legacy_user_ids() -> list:
+    """Все пользователи, когда-либо получавшие доступ (только их удаляли из каналов)"""
+    with get_database().connection() as conn:
+        return [row["user_id"] for row in conn.execute("SELECT DISTINCT user_id FROM entitlements ORDER BY user_id")]
+
+async def main():
+    user_ids = legacy_user_ids()
+    print(f"🔓 Снятие блокировок у {len(user_ids)} пользователей")
+    print("=" * 50)
+    lifted = await ChannelManager().lift_bans(user_ids)
+    print(f"✅ Без ошибок: {lifted}/{len(user_ids)}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,188 @@
+import functools
+import logging
+import random
+import time
+from typing import Optional, List, Dict, Any, Callable, Awaitable, Sequence, Tuple
+from telegram import Update
+from telegram.ext import ContextTypes
+from async_database import AsyncDatabase
+import views
+
+logger = logging.getLogger(__name__)
+
+# Разделитель префикса и аргумента в callback_data: 'pay_askeza' -> ('pay_', 'askeza')
+PREFIX_SEPARATOR = "_"
+
+class UserContext:
+    """Состояние пользователя, загруженное один раз на обновление"""
+
+    def __init__(self, user_id: int, access: List[Dict[str, Any]]):
+        self.user_id = user_id
+        self.access = access
+
+    @property
+    def has_access(self) -> bool:
+        return bool(self.access)
+
+class RouteCall:
+    """Обновление, сопоставленное маршруту"""
+
+    def __init__(self, route: str, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                 argument: Optional[str] = None):
+        self.route = route
+        self.update = update
+        self.context = context
+        # Часть callback_data после префикса (для маршрутов по префиксу)
+        self.argument = argument
+        # Заполняется UserContextLoader
+        self.user: Optional[UserContext] = None
+
+    @property
+    def user_id(self) -> int:
+        return self.update.effective_user.id
+
+    @property
+    def query(self):
+        return self.update.callback_query
+
+Handler = Callable[[RouteCall], Awaitable[None]]
+Middleware = Callable[[RouteCall, Handler], Awaitable[None]]
+
+class UpdateRouter:
+    """Маршрутизация callback-кнопок и текстов клавиатуры по таблицам.
+
+    callback_data ищется в словаре точных маршрутов, затем — по префиксу до
+    первого PREFIX_SEPARATOR; текст сообщения — в словаре текстов кнопок.
+    Каждый обработчик при регистрации один раз оборачивается цепочкой
+    middleware (первая в списке — внешняя), поэтому поиск и вызов не зависят
+    от числа маршрутов.
+    """
+
+    def __init__(self, middleware: Sequence[Middleware] = ()):
+        self.middleware = list(middleware)
+        self._callbacks: Dict[str, Tuple[str, Handler]] = {}
+        self._prefixes: Dict[str, Tuple[str, Handler]] = {}
+        self._texts: Dict[str, Tuple[str, Handler]] = {}
+        self._fallbacks: Dict[str, Tuple[str, Handler]] = {}
+
+    def _wrap(self, name: str, handler: Handler) -> Tuple[str, Handler]:
+        for middleware in reversed(self.middleware):
+            handler = functools.partial(middleware, handler=handler)
+        return name, handler
+
+    def callback(self, data: str, handler: Handler, name: str = None):
+        """Маршрут для точного значения callback_data"""
+        self._callbacks[data] = self._wrap(name or data, handler)
+
+    def callback_prefix(self, prefix: str, handler: Handler, name: str = None):
+        """Маршрут для callback_data вида '<prefix><аргумент>'; prefix оканчивается PREFIX_SEPARATOR"""
+        if not prefix.endswith(PREFIX_SEPARATOR) or PREFIX_SEPARATOR in prefix[:-1]:
+            raise ValueError(f"Префикс должен заканчиваться первым '{PREFIX_SEPARATOR}': {prefix}")
+        self._prefixes[prefix] = self._wrap(name or f"{prefix}*", handler)
+
+    def text(self, text: str, name: str, handler: Handler):
+        """Маршрут для текста кнопки обычной клавиатуры"""
+        self._texts[text] = self._wrap(name, handler)
+
+    def fallback(self, kind: str, name: str, handler: Handler):
+        """Обработчик для неизвестных значений ('callback' или 'text')"""
+        self._fallbacks[kind] = self._wrap(name, handler)
+
+    def resolve_callback(self, data: str) -> Optional[Tuple[str, Handler, Optional[str]]]:
+        """Маршрут, обработчик и аргумент для callback_data"""
+        route = self._callbacks.get(data)
+        if route:
+            return route + (None,)
+        prefix, separator, argument = data.partition(PREFIX_SEPARATOR)
+        route = self._prefixes.get(prefix + separator) if separator else None
+        if route:
+            return route + (argument,)
+        route = self._fallbacks.get("callback")
+        return route + (data,) if route else None
+
+    def resolve_text(self, text: str) -> Optional[Tuple[str, Handler, Optional[str]]]:
+        """Маршрут и обработчик для текста сообщения"""
+        route = self._texts.get(text) or self._fallbacks.get("text")
+        return route + (None,) if route else None
+
+    async def dispatch_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+        """Обработка нажатия inline-кнопки; False, если маршрута нет"""
+        return await self._dispatch(self.resolve_callback(update.callback_query.data or ""), update, context)
+
+    async def dispatch_text(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+        """Обработка текстового сообщения; False, если маршрута нет"""
+        return await self._dispatch(self.resolve_text(update.message.text), update, context)
+
+    async def _dispatch(self, resolved, update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+        if resolved is None:
+            return False
+        name, handler, argument = resolved
+        await handler(RouteCall(name, update, context, argument))
+        return True
+
+# Middleware
+
+async def error_boundary(call: RouteCall, handler: Handler):
+    """Ошибка обработчика логируется и превращается в сообщение пользователю"""
+    try:
+        await handler(call)
+    except Exception as e:
+        logger.error(f"Ошибка в маршруте {call.route} (пользователь {call.user_id}): {e}")
+        message = call.update.effective_message
+        if message is None:
+            return
+        try:
+            await views.reply(message, views.ERROR)
+        except Exception as reply_error:
+            logger.error(f"Не удалось сообщить пользователю {call.user_id} об ошибке: {reply_error}")
+
+class RouteTimer:
+    """Число вызовов, ошибок и задержка обработчиков по маршрутам"""
+
+    def __init__(self):
+        self.routes: Dict[str, Dict[str, float]] = {}
+
+    async def __call__(self, call: RouteCall, handler: Handler):
+        counters = self.routes.get(call.route)
+        if counters is None:
+            counters = self.routes[call.route] = {"calls": 0, "errors": 0, "latency": 0.0, "max_latency": 0.0}
+        started = time.monotonic()
+        try:
+            await handler(call)
+        except Exception:
+            counters["errors"] += 1
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            counters["calls"] += 1
+            counters["latency"] += elapsed
+            counters["max_latency"] = max(counters["max_latency"], elapsed)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Счетчики по маршрутам со средней задержкой"""
+        return {
+            route: dict(counters, avg_latency=counters["latency"] / counters["calls"] if counters["calls"] else 0.0)
+            for route, counters in self.routes.items()
+        }
+
+class SampledLogger:
+    """Лог маршрута и пользователя для доли обновлений (без содержимого обновления)"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+
+    async def __call__(self, call: RouteCall, handler: Handler):
+        if self.rate > 0 and random.random() < self.rate:
+            argument = f" ({call.argument})" if call.argument else ""
+            logger.info(f"Маршрут {call.route}{argument} от пользователя {call.user_id}")
+        await handler(call)
+
+class UserContextLoader:
+    """Загрузка состояния доступа пользователя в RouteCall.user"""
+
+    def __init__(self, db: AsyncDatabase):
+        self.db = db
+
+    async def __call__(self, call: RouteCall, handler: Handler):
+        call.user = UserContext(call.user_id, await self.db.get_user_access(call.user_id))
+        await handler(call)
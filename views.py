@@ -0,0 +1,420 @@
+"""
+Каталог экранов бота: тексты и клавиатуры.
+
+Статические экраны собираются один раз при импорте модуля. Разметка
+python-telegram-bot после создания неизменяема, поэтому один и тот же объект
+отдается во все обработчики и потоки. На каждый запрос подставляются только
+динамические части: имя пользователя, сумма, id и ссылка платежа, список
+доступа или платежей.
+"""
+
+from datetime import datetime
+from typing import Optional, List, Dict, Any, NamedTuple, Union
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
+from config import PRIVATE_CHANNEL_ID, PRIVATE_CHAT_ID
+
+class Screen(NamedTuple):
+    """Текст сообщения и клавиатура"""
+    text: str
+    reply_markup: Optional[Union[InlineKeyboardMarkup, ReplyKeyboardMarkup]] = None
+
+    def format(self, **values) -> "Screen":
+        """Экран с подставленными в текст значениями; клавиатура та же"""
+        return Screen(self.text.format(**values), self.reply_markup)
+
+async def edit(query, screen: Screen):
+    """Показ экрана вместо сообщения с inline-кнопкой"""
+    await query.edit_message_text(screen.text, reply_markup=screen.reply_markup)
+
+async def reply(message, screen: Screen):
+    """Ответ экраном на сообщение"""
+    await message.reply_text(screen.text, reply_markup=screen.reply_markup)
+
+def button(text: str, data: str) -> InlineKeyboardButton:
+    """Inline-кнопка с callback_data"""
+    return InlineKeyboardButton(text, callback_data=data)
+
+def inline(*rows) -> InlineKeyboardMarkup:
+    """Inline-клавиатура из рядов кнопок"""
+    return InlineKeyboardMarkup(rows)
+
+def keyboard(*rows) -> ReplyKeyboardMarkup:
+    """Обычная клавиатура из рядов текстов кнопок"""
+    return ReplyKeyboardMarkup([[KeyboardButton(text) for text in row] for row in rows], resize_keyboard=True)
+
+def channel_url() -> Optional[str]:
+    """Ссылка на закрытый канал"""
+    if not PRIVATE_CHANNEL_ID:
+        return None
+    if PRIVATE_CHANNEL_ID.startswith('@'):
+        # Для каналов с @username
+        return f"https://t.me/{PRIVATE_CHANNEL_ID.replace('@', '')}"
+    # Для числовых ID каналов (например, -1002806695160) убираем -100
+    channel_id = PRIVATE_CHANNEL_ID[4:] if PRIVATE_CHANNEL_ID.startswith('-100') else PRIVATE_CHANNEL_ID
+    return f"https://t.me/c/{channel_id}"
+
+def chat_url() -> Optional[str]:
+    """Ссылка на закрытый чат"""
+    return f"https://t.me/{PRIVATE_CHAT_ID.replace('@', '')}" if PRIVATE_CHAT_ID else None
+
+CHANNEL_URL = channel_url()
+CHAT_URL = chat_url()
+
+# Кнопки, общие для нескольких экранов
+BACK_TO_MAIN = button("🔙 Назад", "back_to_main")
+BACK_TO_PAYMENT = button("🔙 Назад", "payment")
+PAY = button("💳 Оплатить доступ", "payment")
+FAQ_BUTTON = button("❓ Вопрос/Ответ", "faq")
+CHANNEL_BUTTON = button("📺 Закрытый канал", "private_channel")
+CHAT_BUTTON = button("💬 Закрытый чат", "private_chat")
+BACK_TO_MAIN_KEYBOARD = inline([BACK_TO_MAIN])
+BACK_TO_PAYMENT_KEYBOARD = inline([BACK_TO_PAYMENT])
+
+# Приветствие /start
+WELCOME_TEXT = """
+Меня зовут, Ольга🌸 И я любитель аскез, данную практику я использую уже целых 4 года😍 даже прошла по ней обучение, чтоб знать все нюансы! Из всех сотни практик, которые я когда либо пробовала, аскеза моя самая любимая!💕
+
+Во-первых, ты попробуешь, а как может быть по другому?!☀️
+
+Во-вторых, ты начнешь верить в чудо, потому что желания могут исполняться самым волшебным образом💫
+
+В третьих, твоя жизнь не станет прежней!⭐️
+
+Я жду тебя, {username}!🫂
+"""
+
+# Главное меню: {есть доступ: экран}
+MAIN_MENU_TEXT = """
+🌟 Добро пожаловать в бот Аскезы! 🌟
+
+Выберите, что вас интересует:
+"""
+
+MAIN_MENU_REPLY_TEXT = """
+🌟 Добро пожаловать в бот Аскезы! 🌟
+Аскеза — это древняя практика духовного развития, которая помогает:
+• Развить силу воли и самодисциплину
+• Очистить разум от негативных мыслей
+• Улучшить концентрацию и фокус
+• Достичь внутренней гармонии и баланса
+Выберите, что вас интересует:
+"""
+
+MAIN_MENU = {
+    True: Screen(MAIN_MENU_TEXT, inline([FAQ_BUTTON], [CHANNEL_BUTTON], [CHAT_BUTTON], [PAY])),
+    False: Screen(MAIN_MENU_TEXT, inline([FAQ_BUTTON], [PAY])),
+}
+
+MAIN_MENU_REPLY = {
+    True: Screen(MAIN_MENU_REPLY_TEXT, keyboard(["❓ Вопрос/Ответ"], ["📺 Закрытый канал", "💬 Закрытый чат"],
+                                                ["💳 Оплатить доступ"])),
+    False: Screen(MAIN_MENU_REPLY_TEXT, keyboard(["❓ Вопрос/Ответ", "💳 Оплатить доступ"])),
+}
+
+WELCOME = Screen(WELCOME_TEXT, MAIN_MENU_REPLY[False].reply_markup)
+
+FAQ_TEXT = """
+❓ Часто задаваемые вопросы:
+
+🔸 Что такое Аскеза?
+Аскеза — это духовная практика, направленная на развитие силы воли через добровольные ограничения и самодисциплину.
+
+🔸 Сколько длится курс?
+Доступ к материалам Аскезы предоставляется на 30 дней с момента оплаты.
+
+🔸 Что включает в себя нумерологический разбор?
+Персональный анализ вашей даты рождения, имени и жизненного пути с рекомендациями по развитию.
+
+🔸 Как происходит оплата?
+Оплата происходит через безопасную систему ЮKassa. Поддерживаются все основные способы оплаты.
+
+🔸 Когда я получу доступ?
+Доступ предоставляется автоматически сразу после успешной оплаты.
+
+🔸 Можно ли продлить доступ?
+Да, вы можете продлить доступ в любое время через бота.
+"""
+
+FAQ = Screen(FAQ_TEXT, BACK_TO_MAIN_KEYBOARD)
+FAQ_REPLY = Screen(FAQ_TEXT, keyboard(["🔙 Назад"]))
+
+PAYMENT_OPTIONS_TEXT = """
+💳 Выберите тип доступа:
+
+🔸 Аскеза - 990₽
+Доступ к закрытому каналу с материалами по Аскезе на 30 дней
+
+🔸 Нумерология - 2490₽
+Персональный анализ и рекомендации от эксперта
+"""
+
+PAYMENT_OPTIONS = Screen(PAYMENT_OPTIONS_TEXT, inline(
+    [button("🔸 Аскеза - 990₽", "pay_askeza")],
+    [button("🔸 Нумерология - 2490₽", "pay_numerology")],
+    [button("📋 Проверить платежи", "check_payments")],
+    [BACK_TO_MAIN],
+))
+PAYMENT_OPTIONS_REPLY = Screen(PAYMENT_OPTIONS_TEXT, keyboard(
+    ["🔸 Аскеза - 990₽", "🔸 Нумерология - 2490₽"],
+    ["📋 Проверить платежи"],
+    ["🔙 Назад"],
+))
+
+# Созданный платеж: ссылка на оплату — единственная кнопка, собираемая на запрос
+PAYMENT_CREATED_TEXT = """
+💳 Оплата {description}
+
+💰 Сумма: {amount}₽
+🆔 ID платежа: {payment_id}
+
+Нажмите на кнопку ниже для перехода к оплате:
+"""
+
+PAYMENT_CREATED_REPLY_TEXT = """
+💳 Оплата {description}
+
+💰 Сумма: {amount}₽
+🆔 ID платежа: {payment_id}
+
+Перейдите по ссылке для оплаты:
+{confirmation_url}
+"""
+
+PAYMENT_CREATED_ROWS = ((button("🔍 Проверить статус", "check_access"),), (BACK_TO_PAYMENT,))
+
+def payment_created(description: str, amount: float, payment_id: str, confirmation_url: str) -> Screen:
+    """Экран созданного платежа с кнопкой перехода к оплате"""
+    return Screen(
+        PAYMENT_CREATED_TEXT.format(description=description, amount=amount, payment_id=payment_id),
+        InlineKeyboardMarkup(((InlineKeyboardButton("💳 Оплатить", url=confirmation_url),),) + PAYMENT_CREATED_ROWS)
+    )
+
+def payment_created_reply(description: str, amount: float, payment_id: str, confirmation_url: str) -> Screen:
+    """Созданный платеж для текстовых сообщений: ссылка в тексте"""
+    return Screen(PAYMENT_CREATED_REPLY_TEXT.format(
+        description=description, amount=amount, payment_id=payment_id, confirmation_url=confirmation_url
+    ))
+
+PAYMENT_FAILED_TEXT = "❌ Ошибка при создании платежа: {error}"
+PAYMENT_FAILED = Screen(PAYMENT_FAILED_TEXT, BACK_TO_PAYMENT_KEYBOARD)
+PAYMENT_ERROR = Screen("❌ Произошла ошибка при создании платежа. Попробуйте позже.", BACK_TO_PAYMENT_KEYBOARD)
+
+# Статус доступа
+ACCESS_TYPE_NAMES = {"askeza": "Аскеза", "numerology": "Нумерологический разбор"}
+ACCESS_KEYBOARD = inline([CHANNEL_BUTTON], [CHAT_BUTTON], [BACK_TO_MAIN])
+NO_ACCESS_STATUS = Screen(
+    "❌ У вас нет активного доступа. Оплатите подписку для получения доступа к материалам.",
+    inline([PAY], [BACK_TO_MAIN])
+)
+
+def access_status(access: List[Dict[str, Any]]) -> Screen:
+    """Список активного доступа пользователя"""
+    if not access:
+        return NO_ACCESS_STATUS
+    lines = "".join(
+        f"🔸 {ACCESS_TYPE_NAMES.get(row['access_type'], 'Нумерологический разбор')} - до {row['expires_at']}\n"
+        for row in access
+    )
+    return Screen("✅ У вас есть активный доступ:\n\n" + lines, ACCESS_KEYBOARD)
+
+# История платежей
+STATUS_EMOJI = {'pending': '⏳', 'succeeded': '✅', 'canceled': '❌', 'expired': '⌛'}
+HISTORY_EMPTY_TEXT = """
+📋 История платежей
+
+У вас пока нет платежей.
+"""
+HISTORY_EMPTY = Screen(HISTORY_EMPTY_TEXT, inline([PAY], [BACK_TO_MAIN]))
+HISTORY_EMPTY_REPLY = Screen(HISTORY_EMPTY_TEXT)
+HISTORY_KEYBOARD = inline([button("🔄 Обновить статусы", "check_payments")], [PAY], [BACK_TO_MAIN])
+HISTORY_ERROR_TEXT = "❌ Произошла ошибка при загрузке истории платежей."
+HISTORY_ERROR = Screen(HISTORY_ERROR_TEXT, BACK_TO_PAYMENT_KEYBOARD)
+HISTORY_ERROR_REPLY = Screen(HISTORY_ERROR_TEXT)
+
+def _format_date(value: str) -> str:
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).strftime('%d.%m.%Y %H:%M')
+
+def history_text(payments: List[Dict[str, Any]]) -> str:
+    """Текст истории платежей"""
+    text = "📋 История платежей:\n\n"
+    for payment in payments:
+        try:
+            created_date = _format_date(payment['created_at'])
+        except Exception:
+            created_date = payment['created_at']
+        type_name = ACCESS_TYPE_NAMES.get(payment['payment_type'], "Нумерологический разбор")
+        text += f"{STATUS_EMOJI.get(payment['status'], '❓')} {type_name} - {payment['amount']}₽\n"
+        text += f"   ID: {payment['yookassa_payment_id'][:8]}...\n"
+        text += f"   Дата: {created_date}\n"
+        if payment['paid_at']:
+            try:
+                text += f"   Оплачен: {_format_date(payment['paid_at'])}\n"
+            except Exception:
+                pass
+        text += "\n"
+    return text
+
+def payment_history(payments: List[Dict[str, Any]]) -> Screen:
+    """История платежей с кнопками обновления и оплаты"""
+    return Screen(history_text(payments), HISTORY_KEYBOARD) if payments else HISTORY_EMPTY
+
+def payment_history_reply(payments: List[Dict[str, Any]]) -> Screen:
+    """История платежей для текстовых сообщений"""
+    return Screen(history_text(payments)) if payments else HISTORY_EMPTY_REPLY
+
+# Закрытые канал и чат
+NO_ACCESS = Screen("❌ У вас нет активного доступа. Сначала оплатите подписку.")
+CHANNEL_NOT_CONFIGURED = Screen("❌ Канал не настроен. Обратитесь к администратору.")
+CHAT_NOT_CONFIGURED = Screen("❌ Чат не настроен. Обратитесь к администратору.")
+
+GO_TO_CHANNEL_KEYBOARD = inline([InlineKeyboardButton("📺 Перейти в канал", url=CHANNEL_URL)], [BACK_TO_MAIN])
+GO_TO_CHAT_KEYBOARD = inline([InlineKeyboardButton("💬 Перейти в чат", url=CHAT_URL)], [BACK_TO_MAIN])
+
+CHANNEL_JOINED = Screen("""
+📺 Закрытый канал Аскезы
+
+✅ Вы уже состоите в нашем закрытом канале!
+Нажмите кнопку ниже для перехода в канал.
+""", GO_TO_CHANNEL_KEYBOARD)
+
+CHANNEL_ADDED = Screen("""
+📺 Закрытый канал Аскезы
+
+✅ Вы были добавлены в закрытый канал!
+Нажмите кнопку ниже для перехода в канал.
+""", GO_TO_CHANNEL_KEYBOARD)
+
+CHANNEL_ADD_FAILED = Screen("""
+📺 Закрытый канал Аскезы
+
+❌ Произошла ошибка при добавлении в канал.
+
+Возможные причины:
+• Бот не является администратором канала
+• У бота нет прав на приглашение пользователей
+• Канал не настроен в системе
+
+Обратитесь к администратору для решения проблемы.
+""", BACK_TO_MAIN_KEYBOARD)
+
+CHANNEL_SUBSCRIBED = Screen("""
+📺 Закрытый канал Аскезы
+
+✅ Отлично! Вы подписаны на наш канал!
+Теперь у вас есть доступ к эксклюзивному контенту.
+
+Нажмите кнопку ниже для перехода в канал.
+""", GO_TO_CHANNEL_KEYBOARD)
+
+CHANNEL_NOT_SUBSCRIBED = Screen("""
+📺 Закрытый канал Аскезы
+
+❌ Вы еще не подписаны на канал.
+
+Пожалуйста, подпишитесь на канал по ссылке, которая была отправлена вам ранее, и попробуйте снова.
+""", inline(
+    [button("🔄 Проверить снова", "check_subscription")], [button("📺 Получить ссылку", "private_channel")], [BACK_TO_MAIN]
+))
+
+CHAT_JOINED = Screen("""
+💬 Закрытый чат Аскезы
+
+Вы уже состоите в нашем закрытом чате!
+Нажмите кнопку ниже для перехода в чат.
+""", GO_TO_CHAT_KEYBOARD)
+
+CHAT_ADDED = Screen("""
+💬 Закрытый чат Аскезы
+
+Вы были добавлены в закрытый чат!
+Нажмите кнопку ниже для перехода в чат.
+""", GO_TO_CHAT_KEYBOARD)
+
+CHAT_ADD_FAILED = Screen("""
+💬 Закрытый чат Аскезы
+
+❌ Произошла ошибка при добавлении в чат.
+
+Возможные причины:
+• Бот не является администратором чата
+• У бота нет прав на приглашение пользователей
+• Чат не настроен в системе
+
+Обратитесь к администратору для решения проблемы.
+""", BACK_TO_MAIN_KEYBOARD)
+
+# Варианты для текстовых сообщений: ссылка в тексте вместо кнопки
+CHANNEL_JOINED_REPLY = Screen(f"""
+📺 Закрытый канал Аскезы
+
+Вы уже состоите в нашем закрытом канале!
+Перейти: {CHANNEL_URL}
+""")
+
+CHANNEL_ADDED_REPLY = Screen(f"""
+📺 Закрытый канал Аскезы
+
+Вы были добавлены в закрытый канал!
+Перейти: {CHANNEL_URL}
+""")
+
+CHANNEL_ADD_FAILED_REPLY = Screen("""
+📺 Закрытый канал Аскезы
+
+Произошла ошибка при добавлении в канал. Обратитесь к администратору.
+""")
+
+CHAT_JOINED_REPLY = Screen(f"""
+💬 Закрытый чат Аскезы
+
+Вы уже состоите в нашем закрытом чате!
+Перейти: {CHAT_URL}
+""")
+
+CHAT_ADDED_REPLY = Screen(f"""
+💬 Закрытый чат Аскезы
+
+Вы были добавлены в закрытый чат!
+Перейти: {CHAT_URL}
+""")
+
+CHAT_ADD_FAILED_REPLY = Screen("""
+💬 Закрытый чат Аскезы
+
+Произошла ошибка при добавлении в чат. Обратитесь к администратору.
+""")
+
+# Ссылки по кнопкам уведомления об оплате (CallbackHandler)
+CHANNEL_LINK = Screen(f"""
+📺 Закрытый канал Аскезы
+
+Присоединяйтесь к нашему закрытому каналу для получения эксклюзивных материалов:
+https://t.me/{(PRIVATE_CHANNEL_ID or '').replace('@', '')}
+""")
+
+CHAT_LINK = Screen(f"""
+💬 Закрытый чат Аскезы
+
+Присоединяйтесь к нашему закрытому чату для общения с единомышленниками:
+{CHAT_URL}
+""")
+
+# Уведомление об успешной оплате (notification_outbox)
+PAYMENT_SUCCEEDED_TEXT = """
+✅ Платеж успешно обработан!
+
+🎉 Поздравляем! Вам предоставлен доступ к {payment_type}.
+
+Теперь вы можете:
+• Получать эксклюзивные материалы
+• Участвовать в закрытых обсуждениях
+• Получать персональные консультации
+"""
+PAYMENT_SUCCEEDED = Screen(PAYMENT_SUCCEEDED_TEXT, inline(
+    [CHANNEL_BUTTON], [CHAT_BUTTON], [button("🏠 Главное меню", "back_to_main")]
+))
+
+# Ошибки
+UNKNOWN_TEXT = Screen("Используйте кнопки для навигации.")
+ERROR = Screen("❌ Произошла ошибка. Попробуйте позже.")
+ERROR_CONTACT_ADMIN = Screen("❌ Произошла ошибка. Попробуйте позже или обратитесь к администратору.")
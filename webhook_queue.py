@@ -0,0 +1,270 @@
+import asyncio
+import collections
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Optional, List, Dict, Any, Callable, Awaitable
+from config import WEBHOOK_WORKERS, WEBHOOK_MAX_ATTEMPTS, WEBHOOK_RETRY_DELAY, WEBHOOK_LEASE
+from database import Database, get_database
+
+logger = logging.getLogger(__name__)
+
+# Максимальная пауза перед повтором (секунды)
+MAX_RETRY_DELAY = 600
+# Сколько последних задержек обработки хранить для статистики
+LATENCY_SAMPLES = 1000
+
+def validate_notification(data: Any) -> Optional[str]:
+    """Проверка структуры уведомления ЮKassa; возвращает текст ошибки или None"""
+    if not isinstance(data, dict):
+        return "Ожидался JSON-объект"
+    if data.get("type") != "notification":
+        return "Поле type должно быть notification"
+    if not isinstance(data.get("event"), str):
+        return "Нет поля event"
+    payment = data.get("object")
+    if not isinstance(payment, dict) or not payment.get("id"):
+        return "Нет объекта платежа"
+    return None
+
+# Следующие события для обработки (idx_webhook_events_queued)
+CLAIM_QUERY = '''
+    SELECT id, event, payment_id, payload, attempts, received_at FROM webhook_events
+    WHERE status = 'queued' AND available_at <= ?
+    ORDER BY available_at
+    LIMIT ?
+'''
+
+# Возврат в очередь событий с истекшей арендой (idx_webhook_events_processing)
+RECOVER_QUERY = '''
+    UPDATE webhook_events SET status = 'queued'
+    WHERE status = 'processing' AND claimed_at <= ?
+'''
+
+# Операции записи: выполняются в потоке DatabaseWriter
+
+def _enqueue(conn: sqlite3.Connection, event: str, payment_id: str, payload: str, now: float) -> int:
+    return conn.execute('''
+        INSERT INTO webhook_events (event, payment_id, payload, received_at, available_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (event, payment_id, payload, now, now)).lastrowid
+
+def _claim(conn: sqlite3.Connection, limit: int, now: float) -> List[Dict[str, Any]]:
+    rows = [dict(row) for row in conn.execute(CLAIM_QUERY, (now, limit))]
+    for row in rows:
+        row["attempts"] += 1
+        conn.execute(
+            "UPDATE webhook_events SET status = 'processing', attempts = ?, claimed_at = ? WHERE id = ?",
+            (row["attempts"], now, row["id"])
+        )
+    return rows
+
+def _complete(conn: sqlite3.Connection, event_id: int):
+    conn.execute('DELETE FROM webhook_events WHERE id = ?', (event_id,))
+
+def _retry(conn: sqlite3.Connection, event_id: int, error: str, available_at: float):
+    conn.execute(
+        "UPDATE webhook_events SET status = 'queued', available_at = ?, last_error = ? WHERE id = ?",
+        (available_at, error, event_id)
+    )
+
+def _dead_letter(conn: sqlite3.Connection, event_id: int, error: str):
+    conn.execute('''
+        INSERT OR REPLACE INTO webhook_dead_letters (id, event, payment_id, payload, attempts, last_error, received_at)
+        SELECT id, event, payment_id, payload, attempts, ?, received_at FROM webhook_events WHERE id = ?
+    ''', (error, event_id))
+    conn.execute('DELETE FROM webhook_events WHERE id = ?', (event_id,))
+
+def _recover(conn: sqlite3.Connection, claimed_before: float) -> int:
+    # События, которые обрабатывались в момент остановки процесса
+    return conn.execute(RECOVER_QUERY, (claimed_before,)).rowcount
+
+class WebhookQueue:
+    """Очередь входящих уведомлений ЮKassa в SQLite.
+
+    HTTP-обработчик только проверяет и сохраняет уведомление (enqueue
+    возвращается после COMMIT), вся работа выполняется воркерами WebhookWorkerPool.
+    """
+
+    def __init__(self, db: Database = None):
+        self.db = db or get_database()
+        self._latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        self._listeners: List[Callable[[], None]] = []
+        self.processed = 0
+        self.retried = 0
+        self.dead_lettered = 0
+
+    def add_listener(self, listener: Callable[[], None]):
+        """Подписка на новые события (для пробуждения воркеров)"""
+        self._listeners.append(listener)
+
+    def enqueue(self, payload: Dict[str, Any]) -> int:
+        """Сохранение уведомления; возвращает id события"""
+        event_id = self.db.writer.execute(
+            _enqueue, payload.get("event"), payload.get("object", {}).get("id"),
+            json.dumps(payload, ensure_ascii=False), time.time()
+        )
+        for listener in self._listeners:
+            listener()
+        return event_id
+
+    async def enqueue_async(self, payload: Dict[str, Any]) -> int:
+        """Сохранение уведомления без блокировки event loop"""
+        event_id = await asyncio.wrap_future(self.db.writer.submit(
+            _enqueue, payload.get("event"), payload.get("object", {}).get("id"),
+            json.dumps(payload, ensure_ascii=False), time.time()
+        ))
+        for listener in self._listeners:
+            listener()
+        return event_id
+
+    async def claim(self, limit: int = 1) -> List[Dict[str, Any]]:
+        """Захват доступных событий для обработки"""
+        events = await asyncio.wrap_future(self.db.writer.submit(_claim, limit, time.time()))
+        for event in events:
+            event["payload"] = json.loads(event["payload"])
+        return events
+
+    async def complete(self, event: Dict[str, Any]):
+        """Успешная обработка: событие удаляется из очереди"""
+        await asyncio.wrap_future(self.db.writer.submit(_complete, event["id"]))
+        self._latencies.append(time.time() - event["received_at"])
+        self.processed += 1
+
+    async def retry(self, event: Dict[str, Any], error: str, delay: float):
+        """Возврат события в очередь с паузой"""
+        await asyncio.wrap_future(self.db.writer.submit(_retry, event["id"], error, time.time() + delay))
+        self.retried += 1
+
+    async def dead_letter(self, event: Dict[str, Any], error: str):
+        """Перенос события, исчерпавшего попытки, в webhook_dead_letters"""
+        await asyncio.wrap_future(self.db.writer.submit(_dead_letter, event["id"], error))
+        self.dead_lettered += 1
+
+    async def recover(self, lease: float = WEBHOOK_LEASE) -> int:
+        """Возврат в очередь событий, захваченных раньше чем lease секунд назад.
+
+        Более свежие может прямо сейчас обрабатывать другой процесс с той же базой.
+        """
+        recovered = await asyncio.wrap_future(self.db.writer.submit(_recover, time.time() - lease))
+        if recovered:
+            logger.info(f"Возвращено в очередь {recovered} прерванных webhook-событий")
+        return recovered
+
+    def stats(self) -> Dict[str, Any]:
+        """Глубина очереди и задержка обработки"""
+        with self.db.connection() as conn:
+            counts = dict(conn.execute(
+                'SELECT status, COUNT(*) FROM webhook_events GROUP BY status'
+            ).fetchall())
+            oldest = conn.execute(
+                "SELECT MIN(received_at) FROM webhook_events WHERE status = 'queued'"
+            ).fetchone()[0]
+            dead = conn.execute('SELECT COUNT(*) FROM webhook_dead_letters').fetchone()[0]
+
+        latencies = sorted(self._latencies)
+        return {
+            "queued": counts.get("queued", 0),
+            "processing": counts.get("processing", 0),
+            "dead_letters": dead,
+            "oldest_queued_age": round(time.time() - oldest, 3) if oldest else 0.0,
+            "processed": self.processed,
+            "retried": self.retried,
+            "latency_p50": round(latencies[len(latencies) // 2], 3) if latencies else None,
+            "latency_p99": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3) if latencies else None,
+        }
+
+class WebhookWorkerPool:
+    """Асинхронные воркеры очереди webhook: handler(payload) для каждого события,
+    повтор с экспоненциальной паузой при исключении, после max_attempts —
+    dead letter. События, брошенные остановленным процессом, возвращаются в
+    очередь после истечения аренды (lease)"""
+
+    def __init__(self, queue: WebhookQueue, handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 workers: int = WEBHOOK_WORKERS, max_attempts: int = WEBHOOK_MAX_ATTEMPTS,
+                 retry_delay: float = WEBHOOK_RETRY_DELAY, lease: float = WEBHOOK_LEASE, idle_poll: float = 1.0):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease = lease
+        self.idle_poll = idle_poll
+        self._recovered_at = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        queue.add_listener(self.notify)
+
+    def notify(self):
+        """Пробуждение воркеров; безопасно вызывать из любого потока"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _process(self, event: Dict[str, Any]):
+        try:
+            await self.handler(event["payload"])
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if event["attempts"] >= self.max_attempts:
+                logger.error(f"Webhook-событие {event['id']} ({event['payment_id']}) перенесено в dead letters: {error}")
+                await self.queue.dead_letter(event, error)
+            else:
+                delay = min(MAX_RETRY_DELAY, self.retry_delay * 2 ** (event["attempts"] - 1))
+                logger.warning(f"Webhook-событие {event['id']} не обработано (попытка {event['attempts']}), "
+                               f"повтор через {delay:.0f} с: {error}")
+                await self.queue.retry(event, error, delay)
+        else:
+            await self.queue.complete(event)
+
+    async def _worker(self):
+        while True:
+            # Сбрасываем до выборки, чтобы не пропустить событие, пришедшее во время claim
+            self._wakeup.clear()
+            try:
+                # Брошенные события — одним воркером и не чаще раза за аренду
+                if time.monotonic() - self._recovered_at >= self.lease:
+                    self._recovered_at = time.monotonic()
+                    await self.queue.recover(self.lease)
+                events = await self.queue.claim(1)
+            except Exception as e:
+                logger.error(f"Ошибка при чтении очереди webhook: {e}")
+                events = []
+
+            if not events:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.idle_poll)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._process(events[0])
+
+    async def start(self):
+        """Запуск воркеров в текущем event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._recovered_at = time.monotonic()
+        await self.queue.recover(self.lease)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Запущено {self.workers} обработчиков очереди webhook")
+
+    async def stop(self):
+        """Остановка воркеров"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run_forever(self):
+        """Запуск воркеров и ожидание (для отдельного потока с asyncio.run)"""
+        await self.start()
+        await asyncio.gather(*self._tasks)
+
+    def start_in_thread(self) -> threading.Thread:
+        """Воркеры в отдельном потоке со своим event loop (для Flask-процессов)"""
+        thread = threading.Thread(target=lambda: asyncio.run(self.run_forever()), name="webhook-workers", daemon=True)
+        thread.start()
+        return thread
@@ -1,98 +1,60 @@
 import logging
 from flask import Flask, request, jsonify
-from yookassa_client import YooKassaClient
-from database import Database
+from async_yookassa_client import get_async_yookassa_client
+from database import get_database
+from async_database import get_async_database
 from channel_manager import ChannelManager
-from telegram import Bot
-from config import BOT_TOKEN, YOOKASSA_SECRET_KEY
+from fulfilment import PaymentFulfiller
+from expiry_scheduler import ExpiryScheduler
+from notification_outbox import NotificationDispatcher
+from webhook_queue import WebhookQueue, WebhookWorkerPool, validate_notification
+from telegram_transport import create_bot
+from config import YOOKASSA_SECRET_KEY
 import json
 
 app = Flask(__name__)
 logger = logging.getLogger(__name__)
 
 # Инициализация компонентов
-yookassa_client = YooKassaClient()
-db = Database()
-channel_manager = ChannelManager()
-bot = Bot(token=BOT_TOKEN)
+yookassa_client = get_async_yookassa_client()
+db = get_database()
+adb = get_async_database()
+webhook_queue = WebhookQueue(db)
+fulfiller = PaymentFulfiller(adb)
 
 @app.route('/webhook/yookassa', methods=['POST'])
 def yookassa_webhook():
-    """Обработка webhook от ЮKassa"""
+    """Прием webhook от ЮKassa: проверка и сохранение в очередь, обработка — в воркерах"""
+    webhook_data = request.get_json(silent=True)
+    
+    error = validate_notification(webhook_data)
+    if error:
+        logger.error(f"Некорректный webhook: {error}")
+        return jsonify({"error": error}), 400
+    
     try:
-        # Получаем данные из webhook
-        webhook_data = request.get_json()
-        
-        if not webhook_data:
-            logger.error("Пустые данные webhook")
-            return jsonify({"error": "Empty data"}), 400
-        
-        # Обрабатываем webhook через YooKassa клиент
-        result = yookassa_client.process_webhook(webhook_data)
-        
-        if result["success"] and result.get("status") == "succeeded":
-            payment_id = result["payment_id"]
-            
-            # Обновляем статус платежа в базе данных
-            db.update_payment_status(payment_id, "succeeded")
-            
-            # Получаем информацию о платеже
-            payment_info = db.get_payment(payment_id)
-            if payment_info:
-                user_id = payment_info["user_id"]
-                payment_type = payment_info["payment_type"]
-                
-                # Предоставляем доступ
-                db.grant_access(user_id, payment_type)
-                
-                # Добавляем пользователя в каналы
-                import asyncio
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                loop.run_until_complete(channel_manager.grant_access_to_user(user_id, payment_type))
-                loop.close()
-                
-                # Уведомляем пользователя
-                success_text = f"""
-✅ Платеж успешно обработан!
-
-🎉 Поздравляем! Вам предоставлен доступ к {payment_type}.
-
-Теперь вы можете:
-• Получать эксклюзивные материалы
-• Участвовать в закрытых обсуждениях
-• Получать персональные консультации
-                """
-                
-                from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-                keyboard = [
-                    [InlineKeyboardButton("📺 Закрытый канал", callback_data="private_channel")],
-                    [InlineKeyboardButton("💬 Закрытый чат", callback_data="private_chat")],
-                    [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_main")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                # Отправляем уведомление пользователю
-                try:
-                    bot.send_message(
-                        chat_id=user_id,
-                        text=success_text,
-                        reply_markup=reply_markup
-                    )
-                    logger.info(f"Уведомление отправлено пользователю {user_id}")
-                except Exception as e:
-                    logger.error(f"Не удалось отправить уведомление пользователю {user_id}: {e}")
-        
-        return jsonify({"status": "ok"})
-        
+        webhook_queue.enqueue(webhook_data)
     except Exception as e:
-        logger.error(f"Ошибка при обработке webhook: {e}")
-        return jsonify({"error": str(e)}), 500
+        # ЮKassa повторит уведомление, если ответ не 200
+        logger.error(f"Не удалось сохранить webhook в очередь: {e}")
+        return jsonify({"error": "Queue unavailable"}), 500
+    
+    return jsonify({"status": "queued"})
+
+async def handle_yookassa_event(webhook_data: dict):
+    """Обработка события из очереди webhook; исключение — повтор позже"""
+    # Статус берется из API ЮKassa, а не из неподписанного тела; приглашения и уведомление — через outbox
+    await fulfiller.apply_notification(webhook_data, yookassa_client)
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Проверка здоровья сервера"""
-    return jsonify({"status": "healthy"})
+    return jsonify({"status": "healthy", "webhook_queue": webhook_queue.stats()})
 
 if __name__ == "__main__":
+    WebhookWorkerPool(webhook_queue, handle_yookassa_event).start_in_thread()
+    # Свой event loop — свой HTTP-клиент бота
+    NotificationDispatcher(db, ChannelManager(create_bot())).start_in_thread()
+    # Отзыв доступа, выданного этим процессом, в момент истечения
+    ExpiryScheduler(adb, ChannelManager(create_bot())).start_in_thread()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -11,8 +11,10 @@ class YooKassaClient:
         Configuration.account_id = YOOKASSA_SHOP_ID
         Configuration.secret_key = YOOKASSA_SECRET_KEY
     
-    def create_payment(self, amount: float, description: str, return_url: str = None) -> dict:
-        """Создание платежа в ЮKassa"""
+    def create_payment(self, amount: float, description: str, return_url: str = None,
+                       idempotence_key: str = None) -> dict:
+        """Создание платежа в ЮKassa (idempotence_key — см. async_yookassa_client.idempotence_key)"""
+        key = idempotence_key or str(uuid.uuid4())
         try:
             payment = Payment.create({
                 "amount": {
@@ -26,9 +28,9 @@ class YooKassaClient:
                 "capture": True,
                 "description": description,
                 "metadata": {
-                    "payment_id": str(uuid.uuid4())
+                    "payment_id": key
                 }
-            })
+            }, key)
             
             return {
                 "success": True,